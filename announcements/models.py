@@ -1,7 +1,7 @@
 import uuid
 from django.db import models
 from core.models import BaseModel
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 
 class Announcement(BaseModel):
     """Modelo para anuncios del administrador a los usuarios del sistema"""
@@ -85,6 +85,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Consultas, tiempo en base y serialización por request (solo con QUERY_INSTRUMENTATION)
+    'core.instrumentation.QueryInstrumentationMiddleware',
+    # Lecturas de reportes en la réplica (solo con DB_REPLICA_HOST), ver core/db_router.py
+    'core.db_router.ReplicaMiddleware',
     # Comentando el middleware CORS para evitar conflictos con Nginx
     # 'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,6 +128,14 @@ ASGI_APPLICATION = 'backend.asgi.application'
 # Detectar si estamos en producción basado en la presencia de variables P_
 IS_PRODUCTION = os.environ.get('P_POSTGRES_DB') is not None
 
+# Conexiones persistentes: segundos que un proceso reutiliza su conexión a PostgreSQL (0 = una
+# conexión nueva por request, con su handshake TLS). Sirve con gunicorn (gunicorn.conf.py), donde
+# cada hilo atiende muchas requests; bajo Daphne/ASGI cada request corre en un hilo nuevo y la
+# conexión no se reutiliza, así que el servicio de WebSockets usa 0.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0'))
+# PgBouncer en modo transacción: no admite cursores con nombre (iterator() usa cursores del servidor)
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'False').lower() == 'true'
+
 
 if IS_PRODUCTION:
     # Configuración de producción con prefijo P_
@@ -252,6 +264,52 @@ else:
     MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
     MEDIA_URL = '/media/'
 
+DATABASES['default'].update({
+    'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+    # Verifica la conexión reutilizada al inicio de cada request (reconecta si la base la cerró)
+    'CONN_HEALTH_CHECKS': DB_CONN_MAX_AGE > 0,
+    'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+})
+
+# Réplica de lectura para reportes y dashboards, ver core/db_router.py
+# Con DB_REPLICA_HOST se agrega la base 'replica' (mismo nombre y credenciales que la primaria salvo
+# que se indiquen) y las vistas de DB_REPLICA_VIEWS leen de ella; sin réplica todo va a 'default'.
+DB_REPLICA_ALIAS = 'replica'
+DB_REPLICA_HOST = os.environ.get('DB_REPLICA_HOST', '')
+if DB_REPLICA_HOST:
+    DATABASES[DB_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Vistas (nombre de la URL) que leen de la réplica en GET
+DB_REPLICA_VIEWS = [
+    'report-stock', 'report-sales', 'report-shifts', 'report-lot-accuracy', 'dashboard-summary',
+    'dashboard', 'dashboard-timeline', 'supplier-statement', 'shift-list', 'shift-detail',
+]
+# Después de escribir, las lecturas del usuario van a la primaria durante estos segundos
+DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', '5'))
+# Con más atraso que esto (medido por `manage.py check_replica`) se lee de la primaria
+DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', '10'))
+# La marca de escritura y el atraso deben verse desde todos los procesos: Redis
+DB_REPLICA_CACHE = 'replica' if DB_REPLICA_HOST else 'default'
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if DB_REPLICA_HOST:
+    CACHES['replica'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'fruitpos',
+    }
+
+# Los health checks responden por HTTP aunque SECURE_SSL_REDIRECT esté activo (Docker y nginx los llaman sin TLS)
+SECURE_REDIRECT_EXEMPT = [r'^health/']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -341,4 +399,89 @@ REST_FRAMEWORK = {
     ],
 }
 
+# JSON con orjson y listados de lotes, bins y ventas desde values(), ver core/fast_json.py
+# Misma salida que los serializers; `manage.py benchmark_serialization` lo compara
+FAST_JSON = os.environ.get('FAST_JSON', 'False').lower() == 'true'
+if FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'core.fast_json.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'core.fast_json.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 # No forzar backends S3 aquí. Si USE_SPACES=True arriba, ya se configuró.
+
+# Política de historial (django-simple-history), ver core/history.py
+# Guardados que solo tocan estos campos no generan registro histórico
+HISTORY_SKIP_UPDATE_FIELDS = ['updated_at']
+# Acumular los registros históricos de una transacción y escribirlos en lote al hacer commit.
+# Opt-in: dentro de la transacción .history no ve los registros hasta el commit
+HISTORY_BATCH_WRITES = os.environ.get('HISTORY_BATCH_WRITES', 'False').lower() == 'true'
+# Retención para `manage.py archive_history`
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', '365'))
+HISTORY_ARCHIVE_ROOT = os.environ.get('HISTORY_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'history_archive'))
+# Tablas de historial que `manage.py partition_history` particiona por mes (solo PostgreSQL, opcional)
+HISTORY_PARTITIONED_MODELS = [
+    'sales.Sale',
+    'sales.SalePending',
+    'inventory.FruitLot',
+    'inventory.StockReservation',
+    'inventory.FruitBin',
+]
+
+# Carga diferida de imágenes y comprobantes, ver core/uploads.py
+# Los archivos subidos quedan en este directorio local hasta que se procesan y suben al storage.
+# Con un worker aparte debe ser el mismo directorio para ambos (en docker-compose.production.yml,
+# el volumen uploads_spool montado en api y uploads-worker)
+UPLOADS_SPOOL_DIR = os.environ.get('UPLOADS_SPOOL_DIR', os.path.join(BASE_DIR, 'uploads_spool'))
+# Procesar en un hilo del mismo proceso al confirmar la transacción; con False solo los procesa
+# `manage.py process_uploads` (worker aparte)
+UPLOADS_PROCESS_IN_THREAD = os.environ.get('UPLOADS_PROCESS_IN_THREAD', 'True').lower() == 'true'
+UPLOADS_MAX_DIMENSION = int(os.environ.get('UPLOADS_MAX_DIMENSION', '2048'))
+UPLOADS_THUMBNAIL_SIZE = int(os.environ.get('UPLOADS_THUMBNAIL_SIZE', '320'))
+UPLOADS_WEBP_QUALITY = int(os.environ.get('UPLOADS_WEBP_QUALITY', '80'))
+
+# Instrumentación de consultas por request, ver core/instrumentation.py
+QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'False').lower() == 'true'
+# Presupuesto por vista (nombre de la URL, p. ej. 'fruitbin-list'); lo no definido usa el default
+QUERY_BUDGET_DEFAULT = {'queries': 50, 'db_ms': 500}
+QUERY_BUDGETS = {
+    'dashboard': {'queries': 60},
+    'search': {'queries': 5, 'db_ms': 200},
+}
+QUERY_INSTRUMENTATION_LOG = os.environ.get('QUERY_INSTRUMENTATION_LOG', os.path.join(BASE_DIR, 'logs', 'queries.log'))
+
+if QUERY_INSTRUMENTATION:
+    os.makedirs(os.path.dirname(QUERY_INSTRUMENTATION_LOG), exist_ok=True)
+    # Una línea JSON por request, el formato que lee `manage.py query_report`
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'json': {'format': '%(message)s'}},
+        'handlers': {
+            'queries': {
+                'class': 'logging.handlers.WatchedFileHandler',
+                'filename': QUERY_INSTRUMENTATION_LOG,
+                'formatter': 'json',
+            },
+        },
+        'loggers': {
+            'core.instrumentation': {'handlers': ['queries'], 'level': 'INFO', 'propagate': False},
+        },
+    }
+
+# Informe de precisión de predicciones de lotes, ver inventory/lot_accuracy.py
+# Segundos que se guarda en cache; la clave ya cambia cuando el negocio cierra o recalcula lotes
+LOT_ACCURACY_CACHE_SECONDS = int(os.environ.get('LOT_ACCURACY_CACHE_SECONDS', '3600'))
+
+# Reportes en segundo plano, ver reports/jobs.py
+# Con False solo los calcula `manage.py process_report_jobs --loop` (worker aparte, recomendado en producción)
+REPORT_JOBS_PROCESS_IN_THREAD = os.environ.get('REPORT_JOBS_PROCESS_IN_THREAD', 'True').lower() == 'true'
+# Una solicitud igual dentro de esta ventana reutiliza el job
+REPORT_JOBS_DEDUP_SECONDS = int(os.environ.get('REPORT_JOBS_DEDUP_SECONDS', '300'))
+# `process_report_jobs --purge` borra los jobs terminados más antiguos
+REPORT_JOBS_RETENTION_DAYS = int(os.environ.get('REPORT_JOBS_RETENTION_DAYS', '7'))
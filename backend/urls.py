@@ -27,7 +27,8 @@ from shifts import urls as shifts_urls
 from reports import urls as reports_urls
 from announcements import urls as announcements_urls
 from notifications import urls as notifications_urls
-from core.views import DashboardView
+from core.health import health, ready
+from core.views import DashboardView, DashboardTimelineView, SearchView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -45,6 +46,12 @@ urlpatterns = [
     path('api/v1/inventory/concession-settlements/', include('inventory.urls_settlements')),
     
     path('api/v1/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('api/v1/dashboard/timeline/', DashboardTimelineView.as_view(), name='dashboard-timeline'),
+    path('api/v1/search/', SearchView.as_view(), name='search'),
+
+    # Health checks (ver core/health.py)
+    path('health/', health, name='health'),
+    path('health/ready/', ready, name='health-ready'),
 
     
 ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
 from core.models import BaseModel
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 from django.utils.translation import gettext_lazy as _
 
 # Importar modelos de cuentas bancarias
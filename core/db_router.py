@@ -0,0 +1,172 @@
+"""
+Lecturas de reportes y dashboards en una réplica de PostgreSQL.
+
+Con la base ``replica`` configurada (DB_REPLICA_HOST), ``ReplicaMiddleware`` habilita la réplica
+solo para las vistas de DB_REPLICA_VIEWS pedidas con GET/HEAD: reportes, dashboard, estado de
+cuenta de proveedores, turnos. Todo lo demás (checkout, altas, ediciones) sigue en la primaria.
+
+Lectura de lo propio (read-your-writes): durante DB_REPLICA_STICKY_SECONDS después de que un
+usuario escribe, sus lecturas vuelven a la primaria, para que no vea un reporte sin la venta que
+acaba de registrar. La marca se guarda en la cache DB_REPLICA_CACHE (Redis, compartida entre
+procesos). Dentro de una misma request, después de la primera escritura o dentro de
+``transaction.atomic`` también se lee de la primaria.
+
+``manage.py check_replica`` mide el atraso de la réplica y lo deja en la misma cache; mientras
+supere DB_REPLICA_MAX_LAG_SECONDS (o la réplica no responda) las lecturas vuelven a la primaria.
+Con ``--routing`` muestra a qué base va cada caso.
+
+Fuera de una request (comandos, jobs de reportes) se puede leer de la réplica con
+``usar_replica(user)``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_lectura_actual = ContextVar('lectura_replica', default=None)
+
+CLAVE_LAG = 'db_replica:lag'
+
+
+def _clave_escritura(user_id):
+    return f'db_replica:escritura:{user_id}'
+
+
+def replica_configurada():
+    return settings.DB_REPLICA_ALIAS in settings.DATABASES
+
+
+def _cache():
+    return caches[settings.DB_REPLICA_CACHE]
+
+
+def marcar_escritura(user_id):
+    """Las lecturas de este usuario van a la primaria durante DB_REPLICA_STICKY_SECONDS."""
+    _cache().set(_clave_escritura(user_id), 1, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def registrar_lag(segundos, timeout):
+    """Guarda el atraso medido (None si la réplica no responde) para todos los procesos."""
+    _cache().set(CLAVE_LAG, float('inf') if segundos is None else segundos, timeout)
+
+
+def replica_para(user_id=None):
+    """Alias de la réplica si este usuario puede leer de ella ahora, o None (primaria)."""
+    if not replica_configurada():
+        return None
+    claves = [CLAVE_LAG] if user_id is None else [CLAVE_LAG, _clave_escritura(user_id)]
+    valores = _cache().get_many(claves)
+    if user_id is not None and _clave_escritura(user_id) in valores:
+        return None
+    lag = valores.get(CLAVE_LAG)
+    if lag is not None and lag > settings.DB_REPLICA_MAX_LAG_SECONDS:
+        return None
+    return settings.DB_REPLICA_ALIAS
+
+
+class LecturaReplica:
+    """Estado de una request o bloque: si puede usar la réplica y si ya escribió."""
+
+    def __init__(self, request=None, user=None, habilitada=True):
+        self.request = request
+        self.user = user
+        self.habilitada = habilitada
+        self.escribio = False
+        self._alias = None
+        self._decidida = False
+        self._resolviendo = False
+
+    def alias(self):
+        if not self.habilitada or self.escribio:
+            return None
+        if self._decidida:
+            return self._alias
+        if self.request is None:
+            self._alias = replica_para(self.user.pk if self.user is not None else None)
+            self._decidida = True
+            return self._alias
+        # Con JWT el usuario se conoce recién cuando DRF autentica (y reemplaza request.user); hasta
+        # entonces, y mientras se resuelve el usuario de sesión, se lee de la primaria.
+        if self._resolviendo:
+            return None
+        self._resolviendo = True
+        try:
+            user = getattr(self.request, 'user', None)
+            if user is None or not user.is_authenticated:
+                return None
+        finally:
+            self._resolviendo = False
+        self._alias = replica_para(user.pk)
+        self._decidida = True
+        return self._alias
+
+
+@contextmanager
+def usar_replica(user=None):
+    """Lecturas en la réplica dentro del bloque, respetando las escrituras recientes de ``user``."""
+    token = _lectura_actual.set(LecturaReplica(user=user))
+    try:
+        yield
+    finally:
+        _lectura_actual.reset(token)
+
+
+class ReplicaRouter:
+    """Lecturas a la réplica solo dentro de una LecturaReplica habilitada; escrituras siempre a la primaria."""
+
+    def db_for_read(self, model, **hints):
+        lectura = _lectura_actual.get()
+        if lectura is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return lectura.alias()
+
+    def db_for_write(self, model, **hints):
+        lectura = _lectura_actual.get()
+        if lectura is not None:
+            lectura.escribio = True
+        # Explícito: un objeto leído de la réplica se guarda en la primaria
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, settings.DB_REPLICA_ALIAS}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        if db == settings.DB_REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Habilita la réplica para las vistas de DB_REPLICA_VIEWS y marca a los usuarios que escriben."""
+
+    def __init__(self, get_response):
+        if not replica_configurada():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.vistas = set(settings.DB_REPLICA_VIEWS)
+
+    def __call__(self, request):
+        lectura = LecturaReplica(request=request, habilitada=False)
+        token = _lectura_actual.set(lectura)
+        try:
+            response = self.get_response(request)
+        finally:
+            _lectura_actual.reset(token)
+        escritura = request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+        if lectura.escribio or escritura:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                marcar_escritura(user.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        lectura = _lectura_actual.get()
+        if lectura is not None and request.method in ('GET', 'HEAD'):
+            lectura.habilitada = request.resolver_match.url_name in self.vistas
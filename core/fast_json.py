@@ -0,0 +1,188 @@
+"""
+Camino rápido para respuestas JSON grandes (opt-in con FAST_JSON).
+
+- ``ORJSONRenderer`` / ``ORJSONParser``: reemplazan a JSONRenderer/JSONParser de DRF usando orjson,
+  que serializa UUID, datetime y date de forma nativa. Lo que orjson no conoce (Decimal que
+  devuelve un SerializerMethodField, textos traducibles, timedelta) pasa por el JSONEncoder de DRF,
+  así que el JSON es el mismo.
+- ``RowMapper``: listados de solo lectura armados desde ``values()`` en lugar de instancias y un
+  serializer. El plan de campos (lookup, conversión y si se omite cuando la relación es nula) se
+  calcula una vez por clase a partir del modelo, con las mismas reglas que el serializer de DRF
+  al que reemplaza: decimales como texto con sus decimales, fechas y horas en la zona horaria del
+  proyecto, ``get_<campo>_display`` desde los choices. Lo que requiere lógica se completa en
+  ``completar()`` con columnas anotadas en la misma consulta.
+- ``FastListMixin``: ``list()`` de un ViewSet con su ``list_mapper`` cuando FAST_JSON está activo;
+  filtros, búsqueda, orden y paginación siguen siendo los del ViewSet.
+
+``manage.py benchmark_serialization`` compara tiempo y memoria contra el serializer y verifica que
+la salida sea idéntica.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import force_str
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+def dumps(data, indent=False):
+    # Como el JSONEncoder de DRF: claves no str (p. ej. int) y 'Z' para datetimes en UTC
+    opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(data, default=_default, option=opciones)
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data, indent=bool(self.get_indent(accepted_media_type, renderer_context or {})))
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class Campo(NamedTuple):
+    salida: str
+    # Lookup de values() (p. ej. 'producto__nombre'); None si lo completa completar()
+    lookup: Optional[str] = None
+    # get_<campo>_display()
+    display: bool = False
+    # El serializer omite la clave si la relación es nula (campo con source 'fk.x' sin allow_null)
+    omitir_nulo: bool = False
+    # Valor tal cual (lo que devuelve un SerializerMethodField), sin la conversión del campo del modelo
+    crudo: bool = False
+
+
+def _campo_modelo(model, lookup):
+    """Campo del modelo al final de un lookup, o None si es una anotación."""
+    campo = None
+    for parte in lookup.split('__'):
+        try:
+            campo = model._meta.get_field(parte)
+        except FieldDoesNotExist:
+            return None
+        if campo.is_relation:
+            model = campo.related_model
+    return campo
+
+
+def _decimal(decimal_places):
+    exponente = Decimal(1).scaleb(-decimal_places)
+
+    def convertir(valor):
+        return format(valor.quantize(exponente), 'f')
+    return convertir
+
+
+def _fecha_hora(valor):
+    texto = timezone.localtime(valor).isoformat()
+    return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+
+
+def _conversor(campo, display):
+    if campo is None:
+        return None
+    if display:
+        opciones = {valor: force_str(nombre, strings_only=True) for valor, nombre in campo.flatchoices}
+        return lambda valor: opciones.get(valor, valor)
+    if isinstance(campo, models.DecimalField):
+        return _decimal(campo.decimal_places)
+    if isinstance(campo, models.DateTimeField) and settings.USE_TZ:
+        return _fecha_hora
+    return None
+
+
+class RowMapper:
+    """Filas de ``values()`` a dicts con la misma salida que el serializer de lista."""
+    model = None
+    campos = ()
+    # Columnas que usa completar() además de las de campos
+    lookups_extra = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.plan = self.get_plan()
+
+    @classmethod
+    def get_plan(cls):
+        if '_plan' not in cls.__dict__:
+            cls._plan = [
+                (c.salida, c.lookup, None if c.crudo else _conversor(_campo_modelo(cls.model, c.lookup), c.display),
+                 c.omitir_nulo) if c.lookup else (c.salida, None, None, False)
+                for c in (Campo(c, c) if isinstance(c, str) else c for c in cls.campos)
+            ]
+        return cls._plan
+
+    def anotaciones(self):
+        """Expresiones que se agregan a values() para los campos calculados."""
+        return {}
+
+    def values(self, queryset):
+        lookups = dict.fromkeys([lookup for _, lookup, _, _ in self.plan if lookup] + list(self.lookups_extra))
+        return queryset.values(*lookups, **self.anotaciones())
+
+    def completar(self, fila, salida):
+        """Calcula los campos sin lookup; ``fila`` es el dict de values()."""
+
+    def preparar(self, filas):
+        """Gancho para cargar en lote lo que no sale de la consulta principal."""
+
+    def map(self, filas):
+        filas = list(filas)
+        self.preparar(filas)
+        plan = self.plan
+        resultado = []
+        for fila in filas:
+            salida = {}
+            for nombre, lookup, conversor, omitir_nulo in plan:
+                if lookup is None:
+                    salida[nombre] = None
+                    continue
+                valor = fila[lookup]
+                if valor is None:
+                    if not omitir_nulo:
+                        salida[nombre] = None
+                elif conversor is None:
+                    salida[nombre] = valor
+                else:
+                    salida[nombre] = conversor(valor)
+            self.completar(fila, salida)
+            resultado.append(salida)
+        return resultado
+
+
+class FastListMixin:
+    """``list()`` con ``list_mapper`` en lugar del serializer cuando FAST_JSON está activo."""
+    list_mapper = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_JSON or self.list_mapper is None:
+            return super().list(request, *args, **kwargs)
+        mapper = self.list_mapper(context=self.get_serializer_context())
+        filas = mapper.values(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(filas)
+        if pagina is not None:
+            return self.get_paginated_response(mapper.map(pagina))
+        return Response(mapper.map(filas))
@@ -0,0 +1,41 @@
+"""
+Health checks para Docker, nginx y el balanceador.
+
+- ``/health/``: el proceso responde; no toca la base (sirve para reiniciar un worker colgado).
+- ``/health/ready/``: además ejecuta ``SELECT 1`` en cada base configurada. Responde 503 solo si
+  falla la primaria (sirve para sacar la instancia de rotación sin reiniciarla); una réplica caída
+  queda como ``degraded`` con 200, porque core/db_router.py lee de la primaria mientras tanto.
+
+Son vistas Django simples, sin DRF ni autenticación, para que respondan aunque la API falle.
+"""
+import logging
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+def health(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def _responde(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except Exception as e:
+        logger.warning(f"Health check: la base '{alias}' no responde: {e}")
+        return False
+
+
+def ready(request):
+    bases = {alias: 'ok' for alias in connections}
+    for alias in bases:
+        if not _responde(alias):
+            bases[alias] = 'error' if alias == DEFAULT_DB_ALIAS else 'degraded'
+    if bases[DEFAULT_DB_ALIAS] == 'error':
+        return JsonResponse({'status': 'error', 'databases': bases}, status=503)
+    estado = 'ok' if all(valor == 'ok' for valor in bases.values()) else 'degraded'
+    return JsonResponse({'status': estado, 'databases': bases})
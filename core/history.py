@@ -0,0 +1,171 @@
+"""
+Política de escritura del historial (django-simple-history).
+
+Casi todos los modelos registran ``HistoricalRecords()`` y cada guardado copia
+la fila completa en su tabla ``historical*``. Este módulo expone una subclase
+de ``HistoricalRecords`` con el mismo nombre para que los modelos solo cambien
+el import, y agrega dos controles configurables desde settings:
+
+- ``HISTORY_SKIP_UPDATE_FIELDS``: si un ``save(update_fields=...)`` solo toca
+  estos campos (p.ej. ``updated_at``) no se escribe historial. Cada modelo puede
+  sumar campos propios con ``HistoricalRecords(skip_update_fields=[...])``.
+- ``HISTORY_BATCH_WRITES``: dentro de un ``transaction.atomic`` los registros
+  se acumulan y se insertan con un ``bulk_create`` por modelo al hacer commit.
+  Si la transacción (o un savepoint) se revierte, sus registros se descartan.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.utils import timezone
+from simple_history.models import HistoricalRecords as BaseHistoricalRecords
+from simple_history.signals import (
+    post_create_historical_record,
+    pre_create_historical_record,
+)
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def history_batching_enabled():
+    return getattr(settings, 'HISTORY_BATCH_WRITES', False)
+
+
+class _HistoryBatch:
+    """
+    Registros históricos pendientes de un mismo bloque atómico (o savepoint).
+    Se registra como callback de ``on_commit``: si el bloque se revierte Django
+    descarta el callback y los registros nunca se insertan.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.rows = []
+
+    def is_pending(self, connection):
+        return any(hook[1] is self for hook in connection.run_on_commit)
+
+    def add(self, history_model, history_instance, instance, history_user, history_change_reason):
+        self.rows.append((history_model, history_instance, instance, history_user, history_change_reason))
+
+    def __call__(self):
+        por_modelo = {}
+        for row in self.rows:
+            por_modelo.setdefault(row[0], []).append(row)
+        self.rows = []
+
+        for history_model, rows in por_modelo.items():
+            history_model.objects.using(self.using).bulk_create([row[1] for row in rows])
+            for _, history_instance, instance, history_user, history_change_reason in rows:
+                post_create_historical_record.send(
+                    sender=history_model,
+                    instance=instance,
+                    history_instance=history_instance,
+                    history_date=history_instance.history_date,
+                    history_user=history_user,
+                    history_change_reason=history_change_reason,
+                    using=self.using,
+                )
+        logger.debug(f"Historial en lote: {sum(len(r) for r in por_modelo.values())} registros en {len(por_modelo)} tablas")
+
+
+def _get_batch(using):
+    """Devuelve el lote del bloque atómico actual, creándolo si no existe."""
+    connection = connections[using]
+    batches = getattr(_local, 'batches', None)
+    if batches is None:
+        batches = _local.batches = {}
+
+    key = (using, tuple(connection.savepoint_ids))
+    batch = batches.get(key)
+    # Un lote de una transacción anterior (confirmada o revertida) ya no está en run_on_commit
+    if batch is None or not batch.is_pending(connection):
+        batch = _HistoryBatch(using)
+        batches[key] = batch
+        transaction.on_commit(batch, using=using)
+    return batch
+
+
+class HistoricalRecords(BaseHistoricalRecords):
+    """
+    ``HistoricalRecords`` con política de omisión por ``update_fields`` y
+    escritura en lote por transacción. Acepta los mismos argumentos que el
+    original más ``skip_update_fields``.
+    """
+
+    def __init__(self, *args, skip_update_fields=None, **kwargs):
+        self.skip_update_fields = set(skip_update_fields or [])
+        super().__init__(*args, **kwargs)
+
+    def get_skip_update_fields(self):
+        return set(getattr(settings, 'HISTORY_SKIP_UPDATE_FIELDS', [])) | self.skip_update_fields
+
+    def post_save(self, instance, created, using=None, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not created and update_fields:
+            skip = self.get_skip_update_fields()
+            if skip and set(update_fields).issubset(skip):
+                return
+        super().post_save(instance, created, using=using, **kwargs)
+
+    def create_historical_record(self, instance, history_type, using=None):
+        db = using or router.db_for_write(instance.__class__, instance=instance) or DEFAULT_DB_ALIAS
+        if not history_batching_enabled() or not connections[db].in_atomic_block:
+            return super().create_historical_record(instance, history_type, using=using)
+
+        manager = getattr(instance, self.manager_name)
+        history_model = manager.model
+        if getattr(history_model, '_history_m2m_fields', None):
+            # El historial de m2m necesita la fila guardada; se mantiene el flujo original
+            return super().create_historical_record(instance, history_type, using=using)
+
+        using = using if self.use_base_model_db else None
+        history_date = getattr(instance, '_history_date', timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+
+        attrs = {}
+        for field in self.fields_included(instance):
+            attrs[field.attname] = getattr(instance, field.attname)
+        if getattr(history_model, 'history_relation', None) is not None:
+            attrs['history_relation'] = instance
+
+        history_instance = history_model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+
+        pre_create_historical_record.send(
+            sender=history_model,
+            instance=instance,
+            history_date=history_date,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            history_instance=history_instance,
+            using=using,
+        )
+
+        target_db = using or router.db_for_write(history_model, instance=history_instance) or DEFAULT_DB_ALIAS
+        _get_batch(target_db).add(history_model, history_instance, instance, history_user, history_change_reason)
+
+
+def write_history_archive(table, mes, rows, root=None):
+    """
+    Agrega filas de historial a <root>/<tabla>/<YYYY-MM>.jsonl.gz. gzip admite
+    concatenar miembros, así que varias ejecuciones pueden escribir el mismo mes.
+    """
+    directory = os.path.join(root or settings.HISTORY_ARCHIVE_ROOT, table)
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(os.path.join(directory, f'{mes}.jsonl.gz'), 'at', encoding='utf-8') as fh:
+        for row in rows:
+            fh.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
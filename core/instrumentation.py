@@ -0,0 +1,153 @@
+"""
+Instrumentación de consultas ORM por request.
+
+``QueryInstrumentationMiddleware`` envuelve cada request con ``connection.execute_wrapper`` y
+registra la cantidad de consultas, el tiempo total en la base, las consultas repetidas (misma
+forma de SQL, típico de un N+1) y el tiempo de serialización de DRF. Los resultados salen como
+header ``Server-Timing`` (visibles en la pestaña Network del navegador) y como una línea JSON en
+el logger ``core.instrumentation``; si la vista excede su presupuesto (QUERY_BUDGETS) la línea se
+registra como warning. ``manage.py query_report`` resume ese log.
+
+Con QUERY_INSTRUMENTATION=False el middleware se descarta al arrancar (MiddlewareNotUsed) y los
+serializers no se tocan: no hay costo por request.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_registro_actual = ContextVar('registro_consultas', default=None)
+
+# IN (%s, %s, ...) con distinta cantidad de parámetros es la misma consulta
+_LISTA_PARAMETROS = re.compile(r'\((?:%s, )+%s\)')
+_ESPACIOS = re.compile(r'\s+')
+
+
+def huella(sql):
+    """Forma normalizada de una consulta: los parámetros ya vienen como %s."""
+    return _ESPACIOS.sub(' ', _LISTA_PARAMETROS.sub('(%s...)', sql)).strip()
+
+
+class RegistroConsultas:
+    """Contadores de una request; se usa como execute_wrapper de cada conexión."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.db_segundos = 0.0
+        self.serializacion_segundos = 0.0
+        self.huellas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_segundos += time.perf_counter() - inicio
+            self.consultas += 1
+            self.huellas[huella(sql)] += 1
+
+    def repetidas(self, minimo=2, limite=5):
+        return [
+            {'huella': hashlib.sha1(sql.encode()).hexdigest()[:10], 'n': n, 'sql': sql[:200]}
+            for sql, n in self.huellas.most_common(limite) if n >= minimo
+        ]
+
+
+def _medir_serializacion(propiedad):
+    """Envuelve Serializer.data: el tiempo (incluidas las consultas perezosas) se suma al registro."""
+    getter = propiedad.fget
+
+    def data(self):
+        registro = _registro_actual.get()
+        if registro is None:
+            return getter(self)
+        inicio = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            registro.serializacion_segundos += time.perf_counter() - inicio
+
+    data._instrumentado = True
+    return property(data)
+
+
+def _instrumentar_serializers():
+    from rest_framework import serializers
+
+    for clase in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(clase.data.fget, '_instrumentado', False):
+            clase.data = _medir_serializacion(clase.data)
+
+
+def _nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match._func_path
+
+
+def presupuesto(vista):
+    """Presupuesto de la vista: QUERY_BUDGET_DEFAULT con lo que defina QUERY_BUDGETS[vista]."""
+    return {**settings.QUERY_BUDGET_DEFAULT, **settings.QUERY_BUDGETS.get(vista, {})}
+
+
+class QueryInstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _instrumentar_serializers()
+
+    def __call__(self, request):
+        registro = RegistroConsultas()
+        token = _registro_actual.set(registro)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # Registrar el wrapper no abre la conexión; solo se usa si la vista consulta ese alias
+                for conexion in connections.all():
+                    stack.enter_context(conexion.execute_wrapper(registro))
+                response = self.get_response(request)
+        finally:
+            _registro_actual.reset(token)
+        total = time.perf_counter() - inicio
+
+        vista = _nombre_vista(request)
+        if vista is None:
+            return response
+        self._reportar(request, response, vista, registro, total)
+        return response
+
+    def _reportar(self, request, response, vista, registro, total):
+        medicion = {
+            'vista': vista,
+            'metodo': request.method,
+            'ruta': request.path,
+            'status': response.status_code,
+            'queries': registro.consultas,
+            'db_ms': round(registro.db_segundos * 1000, 2),
+            'ser_ms': round(registro.serializacion_segundos * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repetidas': registro.repetidas(),
+        }
+        limites = presupuesto(vista)
+        medicion['excede'] = [clave for clave, limite in limites.items() if medicion.get(clave, 0) > limite]
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={medicion["db_ms"]};desc="{registro.consultas} queries"',
+            f'ser;dur={medicion["ser_ms"]}',
+            f'total;dur={medicion["total_ms"]}',
+        ])
+        nivel = logging.WARNING if medicion['excede'] else logging.INFO
+        logger.log(nivel, json.dumps(medicion, ensure_ascii=False))
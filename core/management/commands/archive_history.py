@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from simple_history.models import registered_models
+from simple_history.utils import get_history_model_for_model
+
+from core.history import write_history_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Archiva el historial (tablas historical*) más antiguo que N días en archivos "
+        "JSONL comprimidos por tabla y mes, y lo elimina de la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Modelos a procesar (app_label.Model). Por defecto todos.')
+        parser.add_argument('--days', type=int, default=None,
+                            help='Conservar los últimos N días (por defecto HISTORY_RETENTION_DAYS)')
+        parser.add_argument('--output', default=None,
+                            help='Directorio de archivo (por defecto HISTORY_ARCHIVE_ROOT)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--include-creation', action='store_true',
+                            help="También archivar los registros de creación ('+'); por defecto se conservan "
+                                 "porque se usan para obtener los valores de llegada de los lotes")
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin escribir ni eliminar')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.HISTORY_RETENTION_DAYS
+        root = options['output'] or settings.HISTORY_ARCHIVE_ROOT
+        cutoff = timezone.now() - timedelta(days=days)
+
+        models = self._get_models(options['models'])
+        total = 0
+        for model in models:
+            history_model = get_history_model_for_model(model)
+            qs = history_model.objects.filter(history_date__lt=cutoff)
+            if not options['include_creation']:
+                qs = qs.exclude(history_type='+')
+
+            if options['dry_run']:
+                found = qs.count()
+                if found:
+                    self.stdout.write(f"{history_model._meta.db_table}: {found} registros por archivar")
+                total += found
+                continue
+
+            archivados = self._archive(history_model, qs, root, options['batch_size'])
+            if archivados:
+                self.stdout.write(f"{history_model._meta.db_table}: {archivados} registros archivados")
+            total += archivados
+
+        accion = 'por archivar' if options['dry_run'] else 'archivados'
+        self.stdout.write(self.style.SUCCESS(f"Total {accion} (anteriores a {cutoff:%Y-%m-%d}): {total}"))
+
+    def _get_models(self, labels):
+        from django.apps import apps
+
+        if not labels:
+            return [m for m in registered_models.values() if hasattr(m._meta, 'simple_history_manager_attribute')]
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f"Modelo no encontrado: {label}")
+            if not hasattr(model._meta, 'simple_history_manager_attribute'):
+                raise CommandError(f"{label} no tiene historial")
+            models.append(model)
+        return models
+
+    def _archive(self, history_model, qs, root, batch_size):
+        """Escribe los registros en <root>/<tabla>/<YYYY-MM>.jsonl.gz y los elimina por bloques."""
+        table = history_model._meta.db_table
+        pk_name = history_model._meta.pk.attname
+
+        archivados = 0
+        last_pk = None
+        while True:
+            batch_qs = qs.order_by(pk_name)
+            if last_pk is not None:
+                batch_qs = batch_qs.filter(**{f'{pk_name}__gt': last_pk})
+            rows = list(batch_qs.values()[:batch_size])
+            if not rows:
+                break
+
+            por_mes = {}
+            for row in rows:
+                por_mes.setdefault(row['history_date'].strftime('%Y-%m'), []).append(row)
+
+            # Primero se escribe el archivo; solo si tuvo éxito se eliminan las filas
+            for mes, filas in por_mes.items():
+                write_history_archive(table, mes, filas, root)
+
+            ids = [row[pk_name] for row in rows]
+            with transaction.atomic():
+                history_model.objects.filter(**{f'{pk_name}__in': ids}).delete()
+
+            archivados += len(rows)
+            last_pk = ids[-1]
+        return archivados
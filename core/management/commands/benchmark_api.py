@@ -0,0 +1,289 @@
+import json
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+# Presupuesto por endpoint: latencia p95 (ms), consultas SQL por request y memoria pico (KiB).
+# Se pueden sobrescribir con --budgets archivo.json (mismo formato, claves parciales).
+BUDGETS = {
+    'lotes_lista': {'p95_ms': 2000, 'queries': 60, 'memoria_kb': 65536},
+    'lote_detalle': {'p95_ms': 300, 'queries': 150, 'memoria_kb': 4096},
+    # Reservas y ventas de todos los lotes en consultas agrupadas: no crece con la cantidad de lotes
+    'reporte_stock': {'p95_ms': 1500, 'queries': 20, 'memoria_kb': 32768},
+    'dashboard_resumen': {'p95_ms': 1500, 'queries': 60, 'memoria_kb': 16384},
+    'proveedores_lista': {'p95_ms': 300, 'queries': 10, 'memoria_kb': 4096},
+    'venta_crear': {'p95_ms': 500, 'queries': 60, 'memoria_kb': 4096},
+    'pendiente_crear': {'p95_ms': 500, 'queries': 40, 'memoria_kb': 4096},
+    'pendiente_confirmar': {'p95_ms': 500, 'queries': 60, 'memoria_kb': 4096},
+    'cierre_turno': {'p95_ms': 500, 'queries': 30, 'memoria_kb': 4096},
+    # Búsqueda unificada: en PostgreSQL requiere los índices de `search_indexes create`
+    'busqueda_nombre': {'p95_ms': 300, 'queries': 5, 'memoria_kb': 4096},
+    'busqueda_codigo': {'p95_ms': 300, 'queries': 5, 'memoria_kb': 4096},
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de los endpoints principales contra la base local (idealmente PostgreSQL con "
+        "datos de generate_load_data). Mide latencia p50/p95, consultas SQL y memoria por request, "
+        "escribe el resultado en JSON y termina con error si se excede algún presupuesto. "
+        "Los endpoints de escritura se ejecutan dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f"Subconjunto a ejecutar: {', '.join(BUDGETS)}")
+        parser.add_argument('--business', type=int, default=None,
+                            help='ID del negocio (por defecto el que tiene más ventas)')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--budgets', default=None, help='JSON con presupuestos que reemplazan a los por defecto')
+        parser.add_argument('--output', default=None,
+                            help='Archivo JSON de salida (por defecto bench_results/api-<fecha>.json)')
+        parser.add_argument('--no-fail', action='store_true', help='Informar presupuestos excedidos sin fallar')
+
+    def handle(self, *args, **options):
+        from rest_framework.test import APIClient
+
+        budgets = self._load_budgets(options['budgets'])
+        nombres = options['endpoints'] or list(BUDGETS)
+        desconocidos = set(nombres) - set(BUDGETS)
+        if desconocidos:
+            raise CommandError(f"Endpoints desconocidos: {', '.join(sorted(desconocidos))}")
+
+        self.business = self._get_business(options['business'])
+        self.user = self.business.miembros.select_related('user').exclude(
+            user__groups__name='Proveedor').first().user
+        # Un error 500 se registra como status del endpoint en lugar de cortar el benchmark
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(self.user)
+
+        resultados = {}
+        excedidos = []
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for nombre in nombres:
+                resultado = self._run(nombre, options['iterations'], options['warmup'])
+                resultado['presupuesto'] = budgets[nombre]
+                resultado['excedido'] = self._check_budget(resultado, budgets[nombre])
+                resultados[nombre] = resultado
+                self._print(nombre, resultado)
+                if resultado['excedido']:
+                    excedidos.append(nombre)
+
+        output = self._write_output(resultados, options)
+        self.stdout.write(f"Resultados en {output}")
+
+        if excedidos:
+            mensaje = f"Presupuesto excedido en: {', '.join(excedidos)}"
+            if not options['no_fail']:
+                raise CommandError(mensaje)
+            self.stdout.write(self.style.WARNING(mensaje))
+            return
+        self.stdout.write(self.style.SUCCESS('Todos los endpoints dentro del presupuesto'))
+
+    def _load_budgets(self, path):
+        budgets = {nombre: dict(valores) for nombre, valores in BUDGETS.items()}
+        if path:
+            with open(path) as fh:
+                for nombre, valores in json.load(fh).items():
+                    budgets.setdefault(nombre, {}).update(valores)
+        return budgets
+
+    def _get_business(self, business_id):
+        from business.models import Business
+
+        qs = Business.objects.all()
+        if business_id:
+            qs = qs.filter(pk=business_id)
+        business = qs.annotate(n=Count('sale')).order_by('-n').first()
+        if business is None or not business.miembros.exists():
+            raise CommandError('No hay un negocio con usuarios; genera datos con generate_load_data.')
+        return business
+
+    # Ejecución y medición
+
+    def _run(self, nombre, iterations, warmup):
+        endpoint = getattr(self, f'_endpoint_{nombre}')
+        tiempos, consultas, status_codes = [], [], set()
+
+        for i in range(warmup + iterations):
+            elapsed, queries, status_code = self._measure(endpoint)
+            if i >= warmup:
+                tiempos.append(elapsed)
+                consultas.append(queries)
+                status_codes.add(status_code)
+
+        # La memoria se mide aparte: tracemalloc agrega overhead que distorsiona la latencia
+        tracemalloc.start()
+        try:
+            self._measure(endpoint)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'iteraciones': iterations,
+            'p50_ms': round(self._percentile(tiempos, 50), 2),
+            'p95_ms': round(self._percentile(tiempos, 95), 2),
+            'media_ms': round(statistics.mean(tiempos), 2),
+            'queries': max(consultas),
+            'memoria_kb': round(pico / 1024),
+            'status': sorted(status_codes),
+        }
+
+    def _measure(self, endpoint):
+        """
+        Ejecuta una request dentro de una transacción que se revierte. La preparación (crear el
+        turno o la venta pendiente a confirmar) queda fuera de la medición. Lo que corre en
+        on_commit (p. ej. el historial en lote) no se mide.
+        """
+        medicion = {}
+        try:
+            with transaction.atomic():
+                request = endpoint()
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    response = request()
+                    medicion['elapsed'] = (time.perf_counter() - inicio) * 1000
+                medicion['queries'] = len(ctx.captured_queries)
+                medicion['status'] = response.status_code
+                raise _Rollback
+        except _Rollback:
+            pass
+        return medicion['elapsed'], medicion['queries'], medicion['status']
+
+    def _percentile(self, values, percent):
+        if len(values) == 1:
+            return values[0]
+        return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+    def _check_budget(self, resultado, budget):
+        excedido = [clave for clave, limite in budget.items() if resultado.get(clave, 0) > limite]
+        if any(code >= 400 for code in resultado['status']):
+            excedido.append('status')
+        return excedido
+
+    def _print(self, nombre, resultado):
+        linea = (f"{nombre:<22} p50 {resultado['p50_ms']:>8.1f} ms  p95 {resultado['p95_ms']:>8.1f} ms  "
+                 f"{resultado['queries']:>4} queries  {resultado['memoria_kb']:>7} KiB  status {resultado['status']}")
+        if resultado['excedido']:
+            self.stdout.write(self.style.ERROR(f"{linea}  excede: {', '.join(resultado['excedido'])}"))
+        else:
+            self.stdout.write(linea)
+
+    def _write_output(self, resultados, options):
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'bench_results', f"api-{timezone.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                    cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        data = {
+            'fecha': timezone.now().isoformat(),
+            'commit': commit,
+            'base_de_datos': connection.vendor,
+            'negocio': self.business.pk,
+            'iteraciones': options['iterations'],
+            'resultados': resultados,
+        }
+        with open(output, 'w') as fh:
+            json.dump(data, fh, indent=2, ensure_ascii=False)
+        return output
+
+    # Endpoints: cada uno prepara sus datos y devuelve la request a medir
+
+    def _lote(self):
+        from inventory.models import FruitLot
+
+        lote = (FruitLot.objects.filter(business=self.business, cantidad_cajas__gt=5, producto__isnull=False)
+                .select_related('producto').order_by('-id').first())
+        if lote is None:
+            raise CommandError('El negocio no tiene lotes con stock.')
+        return lote
+
+    def _item_payload(self, lote):
+        if lote.producto.tipo_producto == 'palta':
+            peso = (lote.peso_neto or Decimal('0')) / max(lote.cantidad_cajas, 1)
+            # Números como los envía el frontend
+            return {'lote': str(lote.uid), 'unidades_vendidas': 1, 'peso_vendido': float(peso.quantize(Decimal('0.01'))),
+                    'precio_kg': 3000}
+        return {'lote': str(lote.uid), 'unidades_vendidas': 1, 'precio_unidad': 12000}
+
+    def _endpoint_lotes_lista(self):
+        return lambda: self.client.get('/api/v1/inventory/fruits/')
+
+    def _endpoint_lote_detalle(self):
+        lote = self._lote()
+        return lambda: self.client.get(f'/api/v1/inventory/fruits/detalle/{lote.uid}/')
+
+    def _endpoint_reporte_stock(self):
+        return lambda: self.client.get('/api/v1/reports/stock/')
+
+    def _endpoint_dashboard_resumen(self):
+        return lambda: self.client.get('/api/v1/reports/summary/')
+
+    def _endpoint_proveedores_lista(self):
+        return lambda: self.client.get('/api/v1/inventory/suppliers/')
+
+    def _endpoint_venta_crear(self):
+        # Mismo formato que el frontend: multipart con los ítems como JSON y el total calculado
+        data = {'metodo_pago': 'efectivo', 'vendedor': self.user.pk, 'total': '0',
+                'items': json.dumps([self._item_payload(self._lote())])}
+        return lambda: self.client.post('/api/v1/sales/', data, format='multipart')
+
+    def _endpoint_pendiente_crear(self):
+        data = {'metodo_pago': 'efectivo', 'nombre_cliente': 'Benchmark', 'business': self.business.pk,
+                'items': [self._item_payload(self._lote())]}
+        return lambda: self.client.post('/api/v1/pending/', data, format='json')
+
+    def _endpoint_pendiente_confirmar(self):
+        data = {'metodo_pago': 'efectivo', 'nombre_cliente': 'Benchmark', 'business': self.business.pk,
+                'items': [self._item_payload(self._lote())]}
+        response = self.client.post('/api/v1/pending/', data, format='json')
+        if response.status_code >= 400:
+            raise CommandError(f"No se pudo crear la venta pendiente a confirmar: {response.data}")
+        uid = response.data['uid']
+        return lambda: self.client.patch(f'/api/v1/pending/{uid}/', {'estado': 'confirmada'}, format='json')
+
+    def _endpoint_busqueda_nombre(self):
+        from sales.models import Customer
+
+        # Parte del nombre de un cliente, sin la primera letra: coincide por contenido, no por prefijo
+        cliente = Customer.objects.filter(business=self.business).order_by('-id').first()
+        q = cliente.nombre[1:6] if cliente else 'alta'
+        return lambda: self.client.get('/api/v1/search/', {'q': q})
+
+    def _endpoint_busqueda_codigo(self):
+        from sales.models import Sale
+
+        venta = Sale.objects.filter(business=self.business).exclude(codigo_venta=None).order_by('-id').first()
+        q = venta.codigo_venta[-6:] if venta else '00001'
+        return lambda: self.client.get('/api/v1/search/', {'q': q})
+
+    def _endpoint_cierre_turno(self):
+        from shifts.models import Shift
+
+        shift = Shift.objects.create(
+            business=self.business, usuario_abre=self.user, estado='abierto',
+            fecha_apertura=timezone.now() - timedelta(hours=8),
+        )
+        data = {'shift': str(shift.uid), 'business': self.business.pk, 'cerrado_por': self.user.pk,
+                'efectivo_declarado': '0', 'cajas_contadas': 0,
+                'explicacion_diferencias': 'Benchmark'}
+        return lambda: self.client.post('/api/v1/shift-closings/', data, format='json')
@@ -0,0 +1,82 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo de escritura del historial con y sin la política de core/history.py. "
+        "Crea y luego elimina sus propios datos: ejecutar contra una base local."
+    )
+
+    MODOS = [
+        ('sin política', {'HISTORY_SKIP_UPDATE_FIELDS': [], 'HISTORY_BATCH_WRITES': False}),
+        ('solo omisión', {'HISTORY_SKIP_UPDATE_FIELDS': ['updated_at'], 'HISTORY_BATCH_WRITES': False}),
+        ('omisión + lote', {'HISTORY_SKIP_UPDATE_FIELDS': ['updated_at'], 'HISTORY_BATCH_WRITES': True}),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help='Objetos por modo')
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por modo (se reporta la mejor)')
+
+    def handle(self, *args, **options):
+        from inventory.models import Supplier
+
+        business, cleanup = self._fixture()
+        try:
+            self.stdout.write(f"{'modo':<18}{'tiempo (ms)':>14}{'queries':>10}{'historial':>12}")
+            for nombre, overrides in self.MODOS:
+                mejor = None
+                for _ in range(options['repeat']):
+                    with override_settings(**overrides):
+                        resultado = self._run(Supplier, business, options['rows'])
+                    if mejor is None or resultado[0] < mejor[0]:
+                        mejor = resultado
+                elapsed, queries, history_rows = mejor
+                self.stdout.write(f"{nombre:<18}{elapsed * 1000:>14.1f}{queries:>10}{history_rows:>12}")
+        finally:
+            cleanup()
+
+    def _run(self, Supplier, business, rows):
+        """Por objeto: creación, actualización de un campo y un 'touch' de updated_at."""
+        HistoricalSupplier = Supplier.history.model
+        prefix = f'BENCH-{uuid.uuid4().hex[:8]}-'
+        inicio_historial = HistoricalSupplier.objects.count()
+
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            with transaction.atomic():
+                for i in range(rows):
+                    proveedor = Supplier.objects.create(nombre=f'Proveedor {i}', rut=f'{prefix}{i}', business=business)
+                    proveedor.telefono = '+56900000000'
+                    proveedor.save(update_fields=['telefono', 'updated_at'])
+                    proveedor.save(update_fields=['updated_at'])
+            elapsed = time.perf_counter() - start
+
+        history_rows = HistoricalSupplier.objects.count() - inicio_historial
+        Supplier.objects.filter(rut__startswith=prefix).delete()
+        HistoricalSupplier.objects.filter(rut__startswith=prefix).delete()
+        return elapsed, len(ctx.captured_queries), history_rows
+
+    def _fixture(self):
+        from accounts.models import CustomUser, Perfil
+        from business.models import Business
+
+        suffix = uuid.uuid4().hex[:8]
+        user = CustomUser.objects.create(email=f'bench-{suffix}@example.com', first_name='Bench', last_name='History')
+        perfil = Perfil.objects.create(user=user)
+        business = Business.objects.create(
+            nombre='Benchmark historial', rut=f'BENCH-{suffix}', dueno=perfil,
+            email=user.email, telefono='0', direccion='-',
+        )
+
+        def cleanup():
+            business_id = business.id
+            business.delete()
+            Business.history.model.objects.filter(id=business_id).delete()
+            user.delete()
+
+        return business, cleanup
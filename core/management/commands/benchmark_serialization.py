@@ -0,0 +1,186 @@
+import gc
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.fast_json import ORJSONRenderer
+
+LISTADOS = ('lotes', 'bins', 'ventas')
+
+# Variantes medidas: cómo se arman los datos y con qué renderer se escribe el JSON
+VARIANTES = (
+    ('drf', 'serializer', JSONRenderer),
+    ('drf_orjson', 'serializer', ORJSONRenderer),
+    ('rows_orjson', 'rows', ORJSONRenderer),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark de los listados de lotes, bins y ventas: serializer de DRF con JSONRenderer, "
+        "serializer con orjson y filas de values() (core/fast_json.py) con orjson, sobre las mismas "
+        "N filas. Mide el tiempo de armar los datos (consultas incluidas) y de escribir el JSON, la "
+        "memoria pico y las consultas, y verifica que el JSON de las filas sea idéntico al del serializer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('listados', nargs='*', help=f"Subconjunto a medir: {', '.join(LISTADOS)}")
+        parser.add_argument('--rows', type=int, default=10000, help='Filas por listado')
+        parser.add_argument('--iterations', type=int, default=3, help='Repeticiones por variante (se informa la mediana)')
+        parser.add_argument('--output', default=None,
+                            help='Archivo JSON de salida (por defecto bench_results/serialization-<fecha>.json)')
+
+    def handle(self, *args, **options):
+        listados = options['listados'] or list(LISTADOS)
+        desconocidos = set(listados) - set(LISTADOS)
+        if desconocidos:
+            raise CommandError(f"Listados desconocidos: {', '.join(sorted(desconocidos))}")
+
+        resultados, distintos = {}, []
+        for nombre in listados:
+            queryset, serializer_class, mapper_class, serializer_queryset = getattr(self, f'_listado_{nombre}')()
+            ids = list(queryset.order_by('-pk').values_list('pk', flat=True)[:options['rows']])
+            if not ids:
+                self.stdout.write(self.style.WARNING(f"{nombre}: sin datos; genera datos con generate_load_data"))
+                continue
+            base = queryset.filter(pk__in=ids).order_by('-pk')
+
+            def datos(modo):
+                if modo == 'serializer':
+                    return serializer_class(serializer_queryset(base), many=True).data
+                return mapper_class().map(mapper_class().values(base))
+
+            resultado = {'filas': len(ids)}
+            salidas = {}
+            for variante, modo, renderer_class in VARIANTES:
+                resultado[variante], salidas[variante] = self._medir(
+                    lambda: datos(modo), renderer_class(), options['iterations'])
+            resultado['identica'] = self._comparar(nombre, salidas['drf'], salidas['rows_orjson'])
+            resultados[nombre] = resultado
+            self._print(nombre, resultado)
+            if not resultado['identica']:
+                distintos.append(nombre)
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'bench_results', f"serialization-{timezone.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as fh:
+            json.dump({'fecha': timezone.now().isoformat(), 'base_de_datos': connection.vendor,
+                       'listados': resultados}, fh, indent=2)
+        self.stdout.write(f"Resultados en {output}")
+
+        if distintos:
+            raise CommandError(f"El JSON de las filas no coincide con el del serializer en: {', '.join(distintos)}")
+
+    # Listados: queryset base, serializer, mapper y cómo prepara el queryset el serializer
+    # (relaciones precargadas, para medir la serialización y no las consultas N+1 evitables)
+
+    def _listado_lotes(self):
+        from inventory.list_rows import FruitLotListRows
+        from inventory.models import FruitLot
+        from inventory.serializers import FruitLotListSerializer
+
+        return (FruitLot.objects.all(), FruitLotListSerializer, FruitLotListRows,
+                lambda qs: qs.select_related('producto', 'proveedor', 'box_type'))
+
+    def _listado_bins(self):
+        from inventory.fruit_bin_serializers import FruitBinListSerializer
+        from inventory.list_rows import FruitBinListRows
+        from inventory.models import FruitBin
+
+        return (FruitBin.objects.all(), FruitBinListSerializer, FruitBinListRows,
+                lambda qs: qs.select_related('producto', 'proveedor', 'propietario_original', 'recepcion'))
+
+    def _listado_ventas(self):
+        from sales.list_rows import SaleListRows
+        from sales.models import Sale, SaleItem
+        from sales.serializers import SaleListSerializer
+
+        items = SaleItem.objects.select_related(
+            'lote__producto', 'lote__proveedor', 'lote__propietario_original',
+            'bin__producto', 'bin__proveedor', 'bin__recepcion', 'bin__propietario_original',
+        )
+        return (Sale.objects.all(), SaleListSerializer, SaleListRows,
+                lambda qs: qs.select_related('cliente', 'vendedor').prefetch_related(Prefetch('items', items)))
+
+    # Medición
+
+    def _medir(self, armar, renderer, iteraciones):
+        """Tiempo de armar los datos (consultas incluidas) y de escribir el JSON, por separado."""
+        tiempos_datos, tiempos_json = [], []
+        consultas = [0]
+
+        def contar(execute, sql, params, many, context):
+            consultas[0] += 1
+            return execute(sql, params, many, context)
+
+        for _ in range(max(1, iteraciones)):
+            # Sin basura de la variante anterior: la recolección caería dentro de esta medición
+            gc.collect()
+            consultas[0] = 0
+            with connection.execute_wrapper(contar):
+                inicio = time.perf_counter()
+                datos = armar()
+                medio = time.perf_counter()
+                contenido = renderer.render(datos)
+                fin = time.perf_counter()
+            tiempos_datos.append((medio - inicio) * 1000)
+            tiempos_json.append((fin - medio) * 1000)
+            del datos
+
+        # La memoria se mide aparte: tracemalloc agrega overhead que distorsiona el tiempo
+        gc.collect()
+        tracemalloc.start()
+        try:
+            renderer.render(armar())
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        datos_ms, json_ms = statistics.median(tiempos_datos), statistics.median(tiempos_json)
+        return {
+            'ms': round(datos_ms + json_ms, 1),
+            'datos_ms': round(datos_ms, 1),
+            'json_ms': round(json_ms, 1),
+            'memoria_kb': round(pico / 1024),
+            'queries': consultas[0],
+            'bytes': len(contenido),
+        }, contenido
+
+    def _comparar(self, nombre, esperado, obtenido):
+        esperado, obtenido = json.loads(esperado), json.loads(obtenido)
+        if esperado == obtenido:
+            return True
+        for i, (fila_esperada, fila) in enumerate(zip(esperado, obtenido)):
+            if fila_esperada != fila:
+                claves = sorted(set(fila_esperada) | set(fila))
+                diferencias = {clave: (fila_esperada.get(clave), fila.get(clave)) for clave in claves
+                               if fila_esperada.get(clave, '<sin clave>') != fila.get(clave, '<sin clave>')}
+                self.stdout.write(self.style.ERROR(f"{nombre}: la fila {i} difiere (serializer, filas): {diferencias}"))
+                break
+        else:
+            self.stdout.write(self.style.ERROR(f"{nombre}: {len(esperado)} filas contra {len(obtenido)}"))
+        return False
+
+    def _print(self, nombre, resultado):
+        base = resultado['drf']
+        self.stdout.write(f"{nombre} ({resultado['filas']} filas)")
+        for variante, _, _ in VARIANTES:
+            medida = resultado[variante]
+            mejora = base['ms'] / medida['ms'] if medida['ms'] else 0
+            self.stdout.write(
+                f"  {variante:<12} {medida['ms']:>9.1f} ms (datos {medida['datos_ms']:>8.1f}, json {medida['json_ms']:>7.1f})  "
+                f"x{mejora:<5.1f} {medida['memoria_kb']:>8} KiB  "
+                f"{medida['queries']:>6} queries  {medida['bytes']:>10} bytes"
+            )
+        estado = 'JSON idéntico' if resultado['identica'] else 'JSON distinto'
+        self.stdout.write(self.style.SUCCESS(f"  {estado}") if resultado['identica'] else self.style.ERROR(f"  {estado}"))
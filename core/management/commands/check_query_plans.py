@@ -0,0 +1,104 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica con EXPLAIN que las consultas más frecuentes (multi-negocio) usen índices "
+        "y no recorran la tabla completa. Pensado para una base con datos de carga "
+        "(ver generate_load_data). Termina con error si alguna consulta hace Seq Scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=None,
+                            help='ID del negocio a usar (por defecto el que tiene más ventas)')
+        parser.add_argument('--min-rows', type=int, default=5000,
+                            help='Omitir tablas con menos filas: con pocos datos el planner prefiere Seq Scan')
+        parser.add_argument('--show-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        from business.models import Business
+
+        business = self._get_business(Business, options['business'])
+        if business is None:
+            raise CommandError('No hay negocios con datos; genera datos con generate_load_data.')
+
+        fallidas = 0
+        for nombre, qs in self._queries(business):
+            table = qs.model._meta.db_table
+            filas = qs.model._default_manager.count()
+            if filas < options['min_rows']:
+                self.stdout.write(f"[omitida] {nombre}: {table} tiene {filas} filas (< {options['min_rows']})")
+                continue
+
+            plan = qs.explain()
+            if self._is_full_scan(plan, table):
+                fallidas += 1
+                self.stdout.write(self.style.ERROR(f"[FALLA]   {nombre}: recorre {table} completa"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"[ok]      {nombre}"))
+            if options['show_plans'] or self._is_full_scan(plan, table):
+                self.stdout.write(plan)
+
+        if fallidas:
+            raise CommandError(f"{fallidas} consulta(s) sin índice")
+
+    def _get_business(self, Business, business_id):
+        if business_id:
+            return Business.objects.filter(pk=business_id).first()
+        return Business.objects.annotate(n=Count('sale')).order_by('-n').first()
+
+    def _is_full_scan(self, plan, table):
+        if connection.vendor == 'postgresql':
+            return f"Seq Scan on {table}" in plan
+        # SQLite: "SCAN tabla" sin índice vs "SEARCH tabla USING INDEX ..."
+        return re.search(rf"\bSCAN {table}\b(?! USING (COVERING )?INDEX)", plan) is not None
+
+    def _queries(self, business):
+        from accounts.models import CustomUser
+        from inventory.models import FruitBin, FruitLot, StockReservation
+        from notifications.models import Notification
+        from sales.models import Customer, Sale
+
+        hasta = timezone.now()
+        desde = hasta - timedelta(days=30)
+        lote = FruitLot.objects.filter(business=business).order_by('-id').first()
+        usuario = CustomUser.objects.filter(perfil__business=business).first()
+        cliente = Customer.objects.filter(business=business, credito_activo=True).first()
+
+        yield 'ventas del negocio por fecha', (
+            Sale.objects.filter(business=business, created_at__range=(desde, hasta)).order_by('-created_at')[:50]
+        )
+        yield 'reporte de ventas por método de pago', (
+            Sale.objects.filter(business=business, cancelada=False, metodo_pago='efectivo',
+                                created_at__range=(desde, hasta))
+        )
+        if cliente is not None:
+            yield 'ventas a crédito abiertas de un cliente', (
+                Sale.objects.filter(cliente=cliente, metodo_pago='credito', pagado=False)
+            )
+        yield 'lotes con stock', (
+            FruitLot.objects.filter(business=business, estado_lote='activo', cantidad_cajas__gt=0)
+        )
+        yield 'bins disponibles', FruitBin.objects.filter(business=business, estado='DISPONIBLE')
+        if lote is not None:
+            yield 'reservas activas de un lote', StockReservation.objects.filter(lote=lote, estado='en_proceso')
+        if usuario is not None:
+            yield 'notificaciones no leídas', (
+                Notification.objects.filter(usuario=usuario, leida=False).order_by('-created_at')[:20]
+            )
+        if lote is not None:
+            yield 'notificación de stock bajo existente', (
+                Notification.objects.filter(tipo='stock_bajo', objeto_relacionado_id=str(lote.id))
+            )
+        if connection.vendor == 'postgresql':
+            # En SQLite LIKE siempre recorre la tabla: solo se verifica con los índices de search_indexes
+            from core.search import FUENTES
+
+            for fuente in FUENTES:
+                yield f'búsqueda de {fuente.tipo}', fuente.resultados(business, 'ALT', postgres=True)
@@ -0,0 +1,130 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, router, transaction
+
+from core.db_router import (
+    LecturaReplica, _lectura_actual, marcar_escritura, registrar_lag, replica_configurada, usar_replica,
+)
+
+# Segundos desde la última transacción aplicada; 0 si la réplica ya aplicó todo lo recibido
+# (sin escrituras en la primaria pg_last_xact_replay_timestamp() envejece aunque no haya atraso)
+SQL_LAG = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el atraso de la réplica de lectura (core/db_router.py) y lo publica en la cache: "
+        "mientras supere DB_REPLICA_MAX_LAG_SECONDS o la réplica no responda, los reportes leen de "
+        "la primaria. Sin --loop mide una vez y termina con error si el atraso excede el máximo; con "
+        "--loop queda como monitor. --routing muestra a qué base va cada caso de lectura."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Seguir midiendo')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Segundos entre mediciones con --loop')
+        parser.add_argument('--max-lag', type=float, default=None,
+                            help='Atraso máximo en segundos (por defecto DB_REPLICA_MAX_LAG_SECONDS)')
+        parser.add_argument('--routing', action='store_true', help='Mostrar el ruteo de cada caso y salir')
+
+    def handle(self, *args, **options):
+        if not replica_configurada():
+            raise CommandError(f"No hay base '{settings.DB_REPLICA_ALIAS}' configurada (DB_REPLICA_HOST).")
+        backend = settings.CACHES[settings.DB_REPLICA_CACHE]['BACKEND']
+        if backend.endswith('LocMemCache'):
+            self.stdout.write(self.style.WARNING(
+                f"La cache '{settings.DB_REPLICA_CACHE}' es local al proceso: la marca de escritura y el "
+                "atraso no se comparten con los workers de la API."
+            ))
+        if options['routing']:
+            self._routing()
+            return
+
+        maximo = options['max_lag'] if options['max_lag'] is not None else settings.DB_REPLICA_MAX_LAG_SECONDS
+        # El valor publicado vence si el monitor deja de correr
+        timeout = max(60, options['sleep'] * 3)
+        while True:
+            lag = self._medir()
+            registrar_lag(lag, timeout)
+            if lag is None:
+                linea = self.style.ERROR('réplica sin respuesta: lecturas a la primaria')
+            elif lag > maximo:
+                linea = self.style.ERROR(f"atraso {lag:.1f} s (máximo {maximo:.0f} s): lecturas a la primaria")
+            else:
+                linea = self.style.SUCCESS(f"atraso {lag:.1f} s")
+            self.stdout.write(linea)
+            if not options['loop']:
+                if lag is None or lag > maximo:
+                    raise CommandError('La réplica no está en condiciones de atender lecturas.')
+                return
+            time.sleep(options['sleep'])
+
+    def _medir(self):
+        conexion = connections[settings.DB_REPLICA_ALIAS]
+        if conexion.vendor != 'postgresql':
+            raise CommandError(f"La medición de atraso requiere PostgreSQL (la réplica es {conexion.vendor}).")
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute(SQL_LAG)
+                lag = cursor.fetchone()[0]
+        except DatabaseError as e:
+            self.stderr.write(f"Error consultando la réplica: {e}")
+            conexion.close()
+            return None
+        if lag is None:
+            raise CommandError(f"'{settings.DB_REPLICA_ALIAS}' no es una réplica (pg_is_in_recovery() es falso).")
+        return float(lag)
+
+    def _routing(self):
+        """Ejecuta el router real en cada caso; no consulta las bases."""
+        User = get_user_model()
+        usuario = User(pk=0)
+        replica = settings.DB_REPLICA_ALIAS
+
+        def con_lectura(lectura, antes=None):
+            token = _lectura_actual.set(lectura)
+            try:
+                if antes:
+                    antes()
+                return router.db_for_read(User)
+            finally:
+                _lectura_actual.reset(token)
+
+        def escribir():
+            router.db_for_write(User)
+
+        def en_transaccion():
+            with transaction.atomic():
+                return router.db_for_read(User)
+
+        casos = [
+            ('fuera de una request', router.db_for_read(User), DEFAULT_DB_ALIAS),
+            ('vista que no está en DB_REPLICA_VIEWS', con_lectura(LecturaReplica(user=usuario, habilitada=False)), DEFAULT_DB_ALIAS),
+            ('vista de reporte (GET)', con_lectura(LecturaReplica(user=usuario)), replica),
+            ('vista de reporte, después de escribir', con_lectura(LecturaReplica(user=usuario), escribir), DEFAULT_DB_ALIAS),
+        ]
+        with usar_replica(usuario):
+            casos.append(('vista de reporte, dentro de transaction.atomic', en_transaccion(), DEFAULT_DB_ALIAS))
+        casos.append(('escritura', router.db_for_write(User), DEFAULT_DB_ALIAS))
+
+        # Un usuario ficticio para no afectar a uno real
+        marcar_escritura(usuario.pk)
+        casos.append((f"usuario que escribió hace menos de {settings.DB_REPLICA_STICKY_SECONDS} s",
+                      con_lectura(LecturaReplica(user=usuario)), DEFAULT_DB_ALIAS))
+
+        errores = 0
+        for nombre, alias, esperado in casos:
+            ok = alias == esperado or (alias is None and esperado == DEFAULT_DB_ALIAS)
+            errores += not ok
+            linea = f"{nombre:<50} -> {alias or DEFAULT_DB_ALIAS}"
+            self.stdout.write(self.style.SUCCESS(linea) if ok else self.style.ERROR(f"{linea} (esperado {esperado})"))
+        if errores:
+            raise CommandError(f"{errores} casos con ruteo inesperado")
@@ -0,0 +1,696 @@
+import csv
+import io
+import random
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+PRODUCTOS = [
+    # nombre, marca, unidad, es_palta, peso caja (kg), precio venta base
+    ('Palta Hass', 'Pampa Baja', 'kilogramo', True, Decimal('10'), Decimal('3200')),
+    ('Palta Edranol', 'Pampa Baja', 'kilogramo', True, Decimal('10'), Decimal('2600')),
+    ('Mango Kent', 'Piura', 'caja', False, Decimal('4'), Decimal('14000')),
+    ('Plátano Cavendish', 'Ecuador', 'caja', False, Decimal('18'), Decimal('16000')),
+    ('Limón Sutil', 'Valle Central', 'caja', False, Decimal('15'), Decimal('12000')),
+    ('Naranja Navel', 'Valle Central', 'caja', False, Decimal('15'), Decimal('11000')),
+]
+CALIDADES = ['5TA', '4TA', '3RA', '3RA', '2DA', '2DA', '1RA', '1RA', 'EXTRA', 'SUPER_EXTRA']
+CALIBRES = ['12', '14', '16', '18', '20', '22', '24', '26']
+METODOS_PAGO = ['efectivo'] * 50 + ['transferencia'] * 25 + ['transbank'] * 15 + ['credito'] * 10
+# Lunes a domingo: los fines de semana venden menos
+PESO_DIA = [1.0, 1.0, 1.0, 1.0, 1.1, 0.8, 0.3]
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos con forma de producción (negocios, lotes, recepciones, bins, "
+        "reservas, ventas con ítems, turnos, pagos, cuenta corriente de clientes y proveedores y "
+        "resultado de los lotes agotados) usando bulk_create y COPY en PostgreSQL. Pensado para "
+        "bases locales de carga y benchmarks, no para producción."
+    )
+
+    # Tablas grandes que se cargan con COPY cuando la base es PostgreSQL
+    COPY_MODELS = {'sales.Sale', 'sales.SaleItem', 'sales.CustomerPayment', 'sales.CustomerPayment_ventas',
+                   'sales.PaymentAllocation', 'sales.CustomerLedgerEntry', 'inventory.SupplierLedgerEntry'}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=5)
+        parser.add_argument('--lots', type=int, default=5000, help='Total de lotes (pallets)')
+        parser.add_argument('--sales', type=int, default=50000, help='Total de ventas')
+        parser.add_argument('--bins', type=int, default=None, help='Total de bins (por defecto lots/5)')
+        parser.add_argument('--pending', type=int, default=None,
+                            help='Ventas pendientes con su reserva (por defecto sales/100)')
+        parser.add_argument('--customers', type=int, default=200, help='Clientes por negocio')
+        parser.add_argument('--suppliers', type=int, default=15, help='Proveedores por negocio')
+        parser.add_argument('--days', type=int, default=365, help='Días de historia a generar')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--chunk', type=int, default=20000, help='Ventas generadas por bloque')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--no-copy', action='store_true', help='Usar bulk_create también para las tablas grandes')
+        parser.add_argument('--with-history', action='store_true',
+                            help='Crear el registro histórico inicial de cada lote (lo usan los detalles de pallet)')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        self.with_history = options['with_history']
+        self.counts = Counter()
+        self.next_ids = {}
+        # Identificador de la corrida para los campos únicos (rut, qr, códigos)
+        self.run = self.rng.randint(100, 999)
+
+        # Se genera hasta ayer: así los códigos del día (VEN-/PRE-<hoy>) siguen libres para el uso normal
+        self.end = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.end - timedelta(days=options['days'])
+
+        inicio = time.perf_counter()
+        with self._sin_auto_now():
+            negocios = self._businesses(options['businesses'])
+            self._catalogs(negocios, options)
+            lotes = self._lots(negocios, options['lots'])
+            bins = self._bins(negocios, options['bins'] if options['bins'] is not None else options['lots'] // 5)
+            self._supplier_ledger(self.recepciones + self.pagos_proveedor + bins)
+            self._shifts(negocios)
+            self._pending(negocios, lotes, options['pending'] if options['pending'] is not None else options['sales'] // 100)
+            self._sales(negocios, lotes, options['sales'], options['chunk'])
+
+        self._reset_sequences()
+        # Fuera de _sin_auto_now: FruitLotResult completa created_at/updated_at con auto_now
+        self._lot_results(lotes)
+        elapsed = time.perf_counter() - inicio
+        for label, count in sorted(self.counts.items()):
+            self.stdout.write(f"  {label:<32}{count:>12}")
+        self.stdout.write(self.style.SUCCESS(f"Datos generados en {elapsed:.1f}s (corrida {self.run})"))
+
+    # Infraestructura
+
+    @contextmanager
+    def _sin_auto_now(self):
+        """bulk_create aplica auto_now/auto_now_add; se desactivan para conservar las fechas generadas."""
+        from django.apps import apps
+
+        desactivados = []
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                    desactivados.append((field, field.auto_now, field.auto_now_add))
+                    field.auto_now = field.auto_now_add = False
+        try:
+            yield
+        finally:
+            for field, auto_now, auto_now_add in desactivados:
+                field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+    def _ids(self, model, n):
+        """Reserva n IDs consecutivos para poder enlazar filas antes de insertarlas."""
+        label = model._meta.label
+        if label not in self.next_ids:
+            self.next_ids[label] = (model._default_manager.aggregate(m=Max('pk'))['m'] or 0) + 1
+        first = self.next_ids[label]
+        self.next_ids[label] = first + n
+        return range(first, first + n)
+
+    def _write(self, model, objs):
+        if not objs:
+            return
+        with transaction.atomic():
+            if self.use_copy and model._meta.label in self.COPY_MODELS:
+                self._copy(model, objs)
+            else:
+                model._default_manager.bulk_create(objs, batch_size=self.batch_size)
+        self.counts[model._meta.label] += len(objs)
+
+    def _copy(self, model, objs):
+        qn = connection.ops.quote_name
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objs:
+            row = []
+            for field in fields:
+                value = field.get_db_prep_save(getattr(obj, field.attname), connection)
+                if value is None:
+                    row.append('\\N')
+                elif isinstance(value, bool):
+                    row.append('t' if value else 'f')
+                else:
+                    row.append(str(value))
+            writer.writerow(row)
+        buffer.seek(0)
+
+        columns = ', '.join(qn(field.column) for field in fields)
+        sql = f"COPY {qn(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    def _reset_sequences(self):
+        from django.apps import apps
+
+        models = [apps.get_model(label) for label in self.next_ids]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def _random_datetime(self, desde=None, hasta=None):
+        """Fecha dentro del rango, con menos actividad en fines de semana y horario de 6 a 19 h."""
+        desde = max(desde or self.start, self.start)
+        hasta = min(hasta or self.end, self.end)
+        if hasta <= desde:
+            return desde
+        dias = max((hasta - desde).days, 1)
+        while True:
+            dia = desde + timedelta(days=self.rng.randrange(dias))
+            if self.rng.random() <= PESO_DIA[dia.weekday()] / 1.1:
+                break
+        hora = min(max(self.rng.gauss(10, 2.5), 6), 19)
+        valor = dia.replace(hour=int(hora), minute=self.rng.randrange(60), second=self.rng.randrange(60))
+        return min(max(valor, desde), hasta - timedelta(seconds=1))
+
+    def _weighted_business(self, negocios):
+        return self.rng.choices(negocios, weights=self.business_weights)[0]
+
+    # Generadores
+
+    def _businesses(self, n):
+        from accounts.models import CustomUser, Perfil
+        from business.models import Business
+
+        password = make_password(None)
+        usuarios, perfiles, negocios = [], [], []
+        user_ids = iter(self._ids(CustomUser, n * 4))
+        perfil_ids = iter(self._ids(Perfil, n * 4))
+        business_ids = self._ids(Business, n)
+
+        for i, business_id in enumerate(business_ids):
+            miembros = []
+            for j in range(4):
+                user = CustomUser(
+                    id=next(user_ids), email=f'carga{self.run}-{i}-{j}@example.com', password=password,
+                    first_name=f'Usuario{j}', last_name=f'Negocio{i}',
+                    created_at=self.start, updated_at=self.start,
+                )
+                usuarios.append(user)
+                perfil = Perfil(id=next(perfil_ids), user=user, business_id=None)
+                perfiles.append(perfil)
+                miembros.append((user, perfil))
+            negocio = Business(
+                id=business_id, nombre=f'Frutería de carga {i}', rut=f'C{self.run}-{i}', dueno=miembros[0][1],
+                email=miembros[0][0].email, telefono='+56900000000', direccion=f'Feria {i}',
+                created_at=self.start, updated_at=self.start,
+            )
+            negocio.usuarios = [user for user, _ in miembros]
+            negocios.append(negocio)
+
+        self._write(CustomUser, usuarios)
+        self._write(Perfil, perfiles)
+        self._write(Business, negocios)
+        # Perfil y Business se referencian mutuamente: el negocio del perfil se asigna al final
+        for i, negocio in enumerate(negocios):
+            for perfil in perfiles[i * 4:(i + 1) * 4]:
+                perfil.business_id = negocio.id
+        Perfil.objects.bulk_update(perfiles, ['business'], batch_size=self.batch_size)
+
+        # Pocos negocios concentran la mayor parte del movimiento (distribución tipo Zipf)
+        self.business_weights = [1 / (i + 1) ** 0.8 for i in range(n)]
+        return negocios
+
+    def _catalogs(self, negocios, options):
+        from inventory.models import BoxType, PalletType, Product, Supplier
+        from inventory.product_categories import clasificar
+        from sales.models import Customer
+
+        productos, cajas, pallets, proveedores, clientes = [], [], [], [], []
+        product_ids = iter(self._ids(Product, len(negocios) * len(PRODUCTOS)))
+        box_ids = iter(self._ids(BoxType, len(negocios) * 3))
+        pallet_ids = iter(self._ids(PalletType, len(negocios)))
+        supplier_ids = iter(self._ids(Supplier, len(negocios) * options['suppliers']))
+        customer_ids = iter(self._ids(Customer, len(negocios) * options['customers']))
+
+        for i, negocio in enumerate(negocios):
+            negocio.productos = []
+            for nombre, marca, unidad, es_palta, peso_caja, precio in PRODUCTOS:
+                producto = Product(
+                    id=next(product_ids), nombre=nombre, marca=marca, unidad=unidad,
+                    tipo_producto='palta' if es_palta else 'otro', categoria=clasificar(nombre), business=negocio,
+                    created_at=self.start, updated_at=self.start,
+                )
+                producto.peso_caja_kg, producto.precio_base, producto.es_palta = peso_caja, precio, es_palta
+                negocio.productos.append(producto)
+            productos.extend(negocio.productos)
+
+            negocio.cajas = [
+                BoxType(id=next(box_ids), nombre=nombre, peso_caja=peso, business=negocio, stock_cajas_vacias=200)
+                for nombre, peso in (('plastico', Decimal('1.5')), ('toro', Decimal('2.0')), ('madera', Decimal('1.2')))
+            ]
+            cajas.extend(negocio.cajas)
+            negocio.pallet = PalletType(id=next(pallet_ids), nombre='Estándar', peso_pallet=Decimal('20'), business=negocio)
+            pallets.append(negocio.pallet)
+
+            negocio.proveedores = [
+                Supplier(
+                    id=next(supplier_ids), nombre=f'Proveedor {j}', rut=f'P{self.run}-{i}-{j}', business=negocio,
+                    direccion='Valle Central', created_at=self.start, updated_at=self.start,
+                )
+                for j in range(options['suppliers'])
+            ]
+            proveedores.extend(negocio.proveedores)
+
+            negocio.clientes = []
+            for j in range(options['customers']):
+                credito = self.rng.random() < 0.2
+                desde = self._random_datetime()
+                negocio.clientes.append(Customer(
+                    id=next(customer_ids), nombre=f'Cliente {i}-{j}', rut=f'K{self.run}-{i}-{j}', business=negocio,
+                    frecuente=self.rng.random() < 0.6, credito_activo=credito,
+                    limite_credito=Decimal(self.rng.choice([200000, 500000, 1000000])) if credito else Decimal('0'),
+                    cliente_desde=desde.date(), created_at=desde, updated_at=desde,
+                ))
+            negocio.clientes_credito = [c for c in negocio.clientes if c.credito_activo]
+            clientes.extend(negocio.clientes)
+
+        self._write(Product, productos)
+        self._write(BoxType, cajas)
+        self._write(PalletType, pallets)
+        self._write(Supplier, proveedores)
+        self._write(Customer, clientes)
+
+    def _lots(self, negocios, total):
+        """Lotes agrupados en recepciones aprobadas, con su detalle y estado de maduración inicial."""
+        from inventory.models import FruitLot, GoodsReception, MadurationHistory, ReceptionDetail, SupplierPayment
+
+        por_negocio = Counter(self._weighted_business(negocios).id for _ in range(total))
+        lot_ids = iter(self._ids(FruitLot, total))
+        detail_ids = iter(self._ids(ReceptionDetail, total))
+        reception_ids = iter(self._ids(GoodsReception, total))
+        mh_ids = iter(self._ids(MadurationHistory, total))
+
+        lotes, detalles, recepciones, historial, pagos = [], [], [], [], []
+        numero = 0
+        for negocio in negocios:
+            restantes = por_negocio[negocio.id]
+            negocio.lotes = []
+            while restantes > 0:
+                fecha = self._random_datetime()
+                proveedor = self.rng.choice(negocio.proveedores)
+                numero += 1
+                recepcion = GoodsReception(
+                    id=next(reception_ids), numero_guia=f'GE-{fecha.year}-{self.run}{numero:06d}',
+                    fecha_recepcion=fecha, proveedor=proveedor, recibido_por=negocio.usuarios[0],
+                    estado='aprobado', business=negocio, created_at=fecha, updated_at=fecha,
+                    estado_pago='pagado' if fecha < self.end - timedelta(days=30) else 'pendiente',
+                )
+                pallets = min(restantes, self.rng.randint(1, 6))
+                restantes -= pallets
+                total_cajas, total_bruto, monto = 0, Decimal('0'), Decimal('0')
+                for _ in range(pallets):
+                    lote, detalle = self._lot(negocio, recepcion, proveedor, fecha, next(lot_ids), next(detail_ids))
+                    lotes.append(lote)
+                    detalles.append(detalle)
+                    negocio.lotes.append(lote)
+                    historial.append(MadurationHistory(
+                        id=next(mh_ids), lote=lote, estado_maduracion='verde', fecha_cambio=fecha.date()))
+                    total_cajas += detalle.cantidad_cajas
+                    total_bruto += detalle.peso_bruto
+                    monto += detalle.cantidad_cajas * detalle.costo
+                recepcion.total_pallets, recepcion.total_cajas = pallets, total_cajas
+                recepcion.total_peso_bruto, recepcion.monto_total = total_bruto, monto
+                recepciones.append(recepcion)
+                if recepcion.estado_pago == 'pagado':
+                    fecha_pago = min(fecha + timedelta(days=self.rng.randint(3, 30)), self.end - timedelta(seconds=1))
+                    pagos.append(SupplierPayment(
+                        recepcion=recepcion, monto=monto, fecha_pago=fecha_pago,
+                        metodo_pago=self.rng.choice(['transferencia', 'transferencia', 'efectivo', 'cheque']),
+                        business=negocio, created_at=fecha_pago, updated_at=fecha_pago,
+                    ))
+
+        self._write(GoodsReception, recepciones)
+        self._write(FruitLot, lotes)
+        self._write(ReceptionDetail, detalles)
+        self._write(MadurationHistory, historial)
+        for pago, pago_id in zip(pagos, self._ids(SupplierPayment, len(pagos))):
+            pago.id = pago_id
+        self._write(SupplierPayment, pagos)
+        self.recepciones, self.pagos_proveedor = recepciones, pagos
+        if self.with_history:
+            for lote in lotes:
+                lote._history_date = lote.created_at
+            FruitLot.history.bulk_history_create(lotes, batch_size=self.batch_size)
+            self.counts['inventory.HistoricalFruitLot'] += len(lotes)
+        return lotes
+
+    def _lot(self, negocio, recepcion, proveedor, fecha, lot_id, detail_id):
+        from inventory.models import FruitLot, ReceptionDetail
+
+        producto = self.rng.choice(negocio.productos)
+        box_type = self.rng.choice(negocio.cajas)
+        cajas_iniciales = self.rng.randint(40, 90)
+        peso_neto_inicial = producto.peso_caja_kg * cajas_iniciales
+        peso_bruto = peso_neto_inicial + box_type.peso_caja * cajas_iniciales + negocio.pallet.peso_pallet
+        costo = (producto.precio_base * Decimal('0.6')).quantize(Decimal('1'))
+        if producto.es_palta:
+            costo = (producto.precio_base * Decimal('0.6') * producto.peso_caja_kg).quantize(Decimal('1'))
+
+        # Los lotes antiguos están agotados; los recientes conservan parte del stock
+        edad = (self.end - fecha).days
+        restante = 0.0 if edad > 30 else max(0.0, 1 - edad / 30 - self.rng.random() * 0.2)
+        cajas = int(cajas_iniciales * restante)
+        concesion = self.rng.random() < 0.1
+        calidad = self.rng.choice(CALIDADES)
+        calibre = self.rng.choice(CALIBRES)
+        estado_maduracion = 'verde' if edad < 3 else self.rng.choice(['pre-maduro', 'maduro', 'maduro', 'sobremaduro'])
+
+        lote = FruitLot(
+            id=lot_id, producto=producto, marca=producto.marca, calidad=calidad, proveedor=proveedor,
+            procedencia='Valle Central', pais='Chile', calibre=calibre, box_type=box_type,
+            pallet_type=negocio.pallet, cantidad_cajas=cajas,
+            cantidad_unidades=0, unidades_por_caja=0,
+            peso_bruto=peso_bruto, peso_neto=(producto.peso_caja_kg * cajas) if producto.es_palta else peso_neto_inicial,
+            qr_code=f'LOT-{self.run}-{uuid.uuid4()}', business=negocio, fecha_ingreso=fecha.date(),
+            estado_maduracion=estado_maduracion,
+            porcentaje_perdida_estimado=Decimal(self.rng.choice([2, 3, 5, 8])),
+            costo_inicial=costo, costo_diario_almacenaje=Decimal('150'),
+            precio_sugerido_min=(producto.precio_base * Decimal('0.9')).quantize(Decimal('1')),
+            precio_sugerido_max=(producto.precio_base * Decimal('1.2')).quantize(Decimal('1')),
+            estado_lote='activo' if cajas > 0 else 'agotado',
+            en_concesion=concesion, comision_por_kilo=Decimal('300') if concesion else None,
+            propietario_original=proveedor if concesion else None,
+            created_at=fecha, updated_at=fecha,
+        )
+        lote.es_palta, lote.precio_base = producto.es_palta, producto.precio_base
+        detalle = ReceptionDetail(
+            id=detail_id, recepcion=recepcion, producto=producto, marca=producto.marca, calibre=calibre,
+            box_type=box_type, cantidad_cajas=cajas_iniciales, peso_bruto=peso_bruto,
+            peso_tara=box_type.peso_caja * cajas_iniciales + negocio.pallet.peso_pallet,
+            calidad=self.rng.randint(2, 5), estado_maduracion='verde', costo=costo,
+            porcentaje_perdida_estimado=lote.porcentaje_perdida_estimado, en_concesion=concesion,
+            comision_por_kilo=lote.comision_por_kilo or Decimal('0'), lote_creado=lote,
+            precio_sugerido_min=lote.precio_sugerido_min, precio_sugerido_max=lote.precio_sugerido_max,
+            created_at=fecha, updated_at=fecha,
+        )
+        return lote, detalle
+
+    def _bins(self, negocios, total):
+        from inventory.models import FruitBin
+
+        bins = []
+        for n, bin_id in enumerate(self._ids(FruitBin, total)):
+            negocio = self._weighted_business(negocios)
+            producto = self.rng.choice([p for p in negocio.productos if p.es_palta])
+            fecha = self._random_datetime()
+            bruto = Decimal(self.rng.randint(300, 450))
+            tara = Decimal('40')
+            estado = 'VENDIDO' if (self.end - fecha).days > 20 else self.rng.choice(
+                ['DISPONIBLE', 'DISPONIBLE', 'DISPONIBLE', 'EN_PROCESO', 'TRANSFORMADO'])
+            bins.append(FruitBin(
+                id=bin_id, codigo=f'BIN-{self.run}-{n:06d}', producto=producto, business=negocio,
+                peso_bruto=tara if estado == 'VENDIDO' else bruto, peso_tara=tara,
+                peso_neto=Decimal('0') if estado == 'VENDIDO' else bruto - tara,
+                costo_por_kilo=Decimal(self.rng.randint(1200, 1900)), estado=estado,
+                calidad=self.rng.choice(CALIDADES), ubicacion=self.rng.choice(['BODEGA', 'BODEGA', 'PACKING']),
+                fecha_recepcion=fecha, proveedor=self.rng.choice(negocio.proveedores),
+                pago_pendiente=self.rng.random() < 0.3, created_at=fecha, updated_at=fecha,
+            ))
+        self._write(FruitBin, bins)
+        return bins
+
+    def _supplier_ledger(self, documentos):
+        """Cuenta corriente de los proveedores: los movimientos de sus documentos y el saldo en Supplier."""
+        from inventory.models import Supplier, SupplierLedgerEntry
+        from inventory.supplier_ledger import movimientos_iniciales
+
+        movimientos = movimientos_iniciales(documentos)
+        saldos = Counter()
+        for movimiento, movimiento_id in zip(movimientos, self._ids(SupplierLedgerEntry, len(movimientos))):
+            movimiento.id, movimiento.created_at = movimiento_id, movimiento.fecha
+            saldos[movimiento.proveedor_id] += movimiento.monto
+        self._write(SupplierLedgerEntry, movimientos)
+        Supplier.objects.bulk_update(
+            [Supplier(id=proveedor_id, saldo_cuenta=saldo) for proveedor_id, saldo in saldos.items()],
+            ['saldo_cuenta'], batch_size=self.batch_size,
+        )
+
+    def _shifts(self, negocios):
+        """Un turno diario por negocio con sus gastos y cierre de caja."""
+        from shifts.models import Shift, ShiftClosing, ShiftExpense
+
+        dias = (self.end - self.start).days
+        shift_ids = iter(self._ids(Shift, dias * len(negocios)))
+        closing_ids = iter(self._ids(ShiftClosing, dias * len(negocios)))
+        turnos, cierres, gastos = [], [], []
+        for negocio in negocios:
+            for d in range(dias):
+                apertura = (self.start + timedelta(days=d)).replace(hour=7)
+                cierre = apertura.replace(hour=19)
+                turno = Shift(
+                    id=next(shift_ids), uid=uuid.uuid4(), business=negocio, usuario_abre=negocio.usuarios[1],
+                    usuario_cierra=negocio.usuarios[1], fecha_apertura=apertura, fecha_cierre=cierre,
+                    estado='cerrado', saldo_inicial=Decimal('50000'), created_at=apertura, updated_at=cierre,
+                )
+                turnos.append(turno)
+                cierres.append(ShiftClosing(
+                    id=next(closing_ids), shift=turno, business=negocio, fecha_cierre_caja=cierre,
+                    cerrado_por=negocio.usuarios[1], efectivo_declarado=Decimal(self.rng.randint(100, 900) * 1000),
+                    cajas_contadas=self.rng.randint(50, 400), created_at=cierre, updated_at=cierre,
+                ))
+                for _ in range(self.rng.choice([0, 0, 1, 1, 2, 3])):
+                    gastos.append(ShiftExpense(
+                        shift=turno, descripcion='Gasto operativo', monto=Decimal(self.rng.randint(2, 60) * 1000),
+                        categoria=self.rng.choice(['transporte', 'insumos', 'alimentacion', 'otros']),
+                        autorizado_por=negocio.usuarios[0], registrado_por=negocio.usuarios[1],
+                        fecha=apertura + timedelta(hours=self.rng.randint(1, 10)), business=negocio,
+                        created_at=apertura, updated_at=apertura,
+                    ))
+        self._write(Shift, turnos)
+        self._write(ShiftClosing, cierres)
+        self._write(ShiftExpense, gastos)
+
+    def _pending(self, negocios, lotes, total):
+        """Ventas pendientes de un ítem, cada una con su reserva de stock."""
+        from inventory.models import StockReservation
+        from sales.models import SalePending, SalePendingItem
+
+        if not lotes:
+            return
+        pendientes, items, reservas = [], [], []
+        pending_ids = iter(self._ids(SalePending, total))
+        item_ids = iter(self._ids(SalePendingItem, total))
+        for n in range(total):
+            negocio = self._weighted_business(negocios)
+            if not negocio.lotes:
+                continue
+            lote = self.rng.choice(negocio.lotes)
+            fecha = self._random_datetime(desde=lote.created_at)
+            vencida = (self.end - fecha).days > 1
+            estado = self.rng.choice(['confirmada', 'confirmada', 'cancelada', 'expirada']) if vencida else 'pendiente'
+            cliente = self.rng.choice(negocio.clientes) if self.rng.random() < 0.5 else None
+            cajas = self.rng.randint(1, 5)
+            kg = lote.producto.peso_caja_kg * cajas if lote.es_palta else Decimal('0')
+            precio = lote.precio_base
+            subtotal = kg * precio if lote.es_palta else cajas * precio
+
+            pendiente = SalePending(
+                id=next(pending_ids), codigo_venta=f'PRE-{fecha:%Y%m%d}-{self.run}{n:06d}', cliente=cliente,
+                cantidad_cajas=cajas, total=subtotal, metodo_pago='efectivo', vendedor=negocio.usuarios[2],
+                estado=estado, business=negocio, created_at=fecha, updated_at=fecha,
+            )
+            item = SalePendingItem(
+                id=next(item_ids), venta_pendiente=pendiente, lote=lote, cantidad_kg=kg,
+                precio_kg=precio if lote.es_palta else Decimal('0'), cantidad_unidades=cajas,
+                precio_unidad=Decimal('0') if lote.es_palta else precio, subtotal=subtotal,
+                created_at=fecha, updated_at=fecha,
+            )
+            estado_reserva = {'pendiente': 'en_proceso', 'confirmada': 'confirmada'}.get(estado, estado)
+            reservas.append(StockReservation(
+                lote=lote, item_venta_pendiente=item, usuario=negocio.usuarios[2], cajas_reservadas=cajas,
+                kg_reservados=kg, unidades_reservadas=0 if lote.es_palta else cajas, cliente=cliente,
+                estado=estado_reserva, created_at=fecha, updated_at=fecha,
+            ))
+            pendientes.append(pendiente)
+            items.append(item)
+        self._write(SalePending, pendientes)
+        self._write(SalePendingItem, items)
+        self._write(StockReservation, reservas)
+
+    def _sales(self, negocios, lotes, total, chunk):
+        from sales.models import CustomerPayment, PaymentAllocation, Sale, SaleItem
+
+        if not lotes:
+            return
+        Through = CustomerPayment.ventas.through
+        generadas = 0
+        numero = 0
+        # Movimientos de cuenta corriente (cliente, fecha, monto, venta, pago, descripción); se
+        # registran al final, en orden de fecha, para calcular el saldo acumulado
+        movimientos = []
+        while generadas < total:
+            n = min(chunk, total - generadas)
+            ventas, items, pagos, enlaces, aplicaciones = [], [], [], [], []
+            sale_ids = iter(self._ids(Sale, n))
+            for _ in range(n):
+                negocio = self._weighted_business(negocios)
+                if not negocio.lotes:
+                    continue
+                numero += 1
+                venta, venta_items = self._sale(negocio, next(sale_ids), numero)
+                ventas.append(venta)
+                items.extend(venta_items)
+                pago = self._payment(venta)
+                if pago is not None:
+                    pagos.append(pago)
+
+            for item, item_id in zip(items, self._ids(SaleItem, len(items))):
+                item.id = item_id
+            for pago, pago_id in zip(pagos, self._ids(CustomerPayment, len(pagos))):
+                pago.id = pago_id
+                enlaces.append(Through(customerpayment_id=pago_id, sale_id=pago.venta_pagada.id))
+                aplicaciones.append(PaymentAllocation(pago_id=pago_id, venta_id=pago.venta_pagada.id,
+                                                      monto=pago.monto, created_at=pago.created_at))
+            for enlace, enlace_id in zip(enlaces, self._ids(Through, len(enlaces))):
+                enlace.id = enlace_id
+            for aplicacion, aplicacion_id in zip(aplicaciones, self._ids(PaymentAllocation, len(aplicaciones))):
+                aplicacion.id = aplicacion_id
+
+            self._write(Sale, ventas)
+            self._write(SaleItem, items)
+            self._write(CustomerPayment, pagos)
+            self._write(Through, enlaces)
+            self._write(PaymentAllocation, aplicaciones)
+            # Lo que registraría sales/ledger.py: un cargo por venta a crédito no cancelada y un abono por pago
+            movimientos.extend(
+                (venta.cliente_id, venta.created_at, venta.total, venta.id, None, f"Venta {venta.codigo_venta}")
+                for venta in ventas
+                if venta.cliente_id and venta.metodo_pago == 'credito' and not venta.cancelada
+            )
+            movimientos.extend(
+                (pago.cliente_id, pago.created_at, -pago.monto, None, pago.id, f"Pago {pago.uid}") for pago in pagos
+            )
+            generadas += n
+            self.stdout.write(f"  ventas: {generadas}/{total}")
+
+        self._customer_ledger(negocios, movimientos)
+
+    def _customer_ledger(self, negocios, movimientos):
+        """Cuenta corriente de los clientes generados: movimientos con saldo acumulado y saldos en Customer."""
+        from sales.models import Customer, CustomerLedgerEntry
+
+        business_de = {cliente.id: negocio.id for negocio in negocios for cliente in negocio.clientes}
+        saldos = Counter()
+        pagado = Counter()
+        entradas = []
+        movimientos.sort(key=lambda m: (m[0], m[1]))
+        for (cliente_id, fecha, monto, venta_id, pago_id, descripcion), entrada_id in zip(
+                movimientos, self._ids(CustomerLedgerEntry, len(movimientos))):
+            saldos[cliente_id] += monto
+            if pago_id is not None:
+                pagado[cliente_id] -= monto
+            entradas.append(CustomerLedgerEntry(
+                id=entrada_id, cliente_id=cliente_id, business_id=business_de[cliente_id],
+                tipo='abono' if pago_id is not None else 'cargo', monto=monto, saldo=saldos[cliente_id],
+                venta_id=venta_id, pago_id=pago_id, descripcion=descripcion, created_at=fecha,
+            ))
+        self._write(CustomerLedgerEntry, entradas)
+
+        clientes = [cliente for negocio in negocios for cliente in negocio.clientes if cliente.id in saldos]
+        for cliente in clientes:
+            cliente.saldo_credito, cliente.monto_pagado = saldos[cliente.id], pagado[cliente.id]
+        Customer.objects.bulk_update(clientes, ['saldo_credito', 'monto_pagado'], batch_size=self.batch_size)
+
+    def _lot_results(self, lotes):
+        """Resultado (FruitLotResult) de los lotes agotados, como al agotarse con la última venta."""
+        from inventory.lot_result_service import cerrar_lotes
+
+        ids = [lote.id for lote in lotes if lote.cantidad_cajas == 0]
+        for inicio in range(0, len(ids), self.batch_size):
+            self.counts['inventory.FruitLotResult'] += len(cerrar_lotes(ids[inicio:inicio + self.batch_size]))
+
+    def _sale(self, negocio, sale_id, numero):
+        from sales.models import Sale, SaleItem
+
+        primero = self.rng.choice(negocio.lotes)
+        fecha = self._random_datetime(desde=primero.created_at, hasta=primero.created_at + timedelta(days=30))
+        cliente = self.rng.choice(negocio.clientes) if self.rng.random() < 0.4 else None
+        metodo = self.rng.choice(METODOS_PAGO)
+        if metodo == 'credito':
+            # El crédito solo se da a clientes habilitados
+            if negocio.clientes_credito:
+                cliente = self.rng.choice(negocio.clientes_credito)
+            else:
+                metodo = 'efectivo'
+
+        venta = Sale(
+            id=sale_id, codigo_venta=f'VEN-{fecha:%Y%m%d}-{self.run}{numero:07d}', cliente=cliente,
+            vendedor=self.rng.choice(negocio.usuarios[1:]), total=Decimal('0'), metodo_pago=metodo,
+            business=negocio, created_at=fecha, updated_at=fecha,
+        )
+        items, cajas = [], 0
+        lotes_item = [primero] + [self.rng.choice(negocio.lotes) for _ in range(self.rng.choice([0, 0, 1, 1, 2, 3]))]
+        for lote in lotes_item:
+            unidades = self.rng.randint(1, 6)
+            precio = (lote.precio_base * Decimal(self.rng.uniform(0.85, 1.15))).quantize(Decimal('1'))
+            if lote.es_palta:
+                kg = (lote.producto.peso_caja_kg * unidades * Decimal(self.rng.uniform(0.95, 1.05))).quantize(Decimal('0.01'))
+                subtotal = (kg * precio).quantize(Decimal('1'))
+                item = SaleItem(venta=venta, lote=lote, peso_vendido=kg, precio_kg=precio,
+                                unidades_vendidas=unidades, subtotal=subtotal)
+            else:
+                subtotal = unidades * precio
+                item = SaleItem(venta=venta, lote=lote, unidades_vendidas=unidades, precio_unidad=precio,
+                                subtotal=subtotal)
+            if lote.en_concesion:
+                item.es_concesion, item.proveedor_original_id = True, lote.propietario_original_id
+                item.comision_ganada = (lote.comision_por_kilo * (item.peso_vendido or unidades)).quantize(Decimal('1'))
+            item.created_at = item.updated_at = fecha
+            items.append(item)
+            venta.total += subtotal
+            cajas += unidades
+        venta.cajas_vendidas = cajas
+
+        if self.rng.random() < 0.02:
+            venta.cancelada, venta.fecha_cancelacion = True, fecha + timedelta(minutes=10)
+            venta.motivo_cancelacion, venta.cancelada_por = 'Error de digitación', negocio.usuarios[0]
+        if metodo == 'credito':
+            venta.fecha_vencimiento = (fecha + timedelta(days=30)).date()
+            antiguedad = (self.end - fecha).days
+            pagada = antiguedad > 30 and self.rng.random() < 0.85 or self.rng.random() < 0.3
+            if pagada:
+                venta.pagado, venta.saldo_pendiente, venta.estado_pago = True, Decimal('0'), 'completo'
+            elif self.rng.random() < 0.2:
+                venta.pagado, venta.estado_pago = False, 'parcial'
+                venta.saldo_pendiente = (venta.total / 2).quantize(Decimal('1'))
+            else:
+                venta.pagado, venta.saldo_pendiente, venta.estado_pago = False, venta.total, 'pendiente'
+        else:
+            venta.pagado, venta.saldo_pendiente, venta.estado_pago = True, Decimal('0'), 'completo'
+        return venta, items
+
+    def _payment(self, venta):
+        from sales.models import CustomerPayment
+
+        if venta.metodo_pago != 'credito' or venta.estado_pago == 'pendiente':
+            return None
+        monto = venta.total - venta.saldo_pendiente
+        fecha = min(venta.created_at + timedelta(days=self.rng.randint(1, 30)), self.end - timedelta(seconds=1))
+        pago = CustomerPayment(
+            cliente=venta.cliente, monto=monto, fecha_pago=fecha,
+            metodo_pago=self.rng.choice(['transferencia', 'efectivo', 'cheque']),
+            business=venta.business, created_at=fecha, updated_at=fecha,
+        )
+        pago.venta_pagada = venta
+        return pago
@@ -0,0 +1,188 @@
+import http.client
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+RUTAS_DEFAULT = [
+    '/health/ready/',
+    '/api/v1/inventory/products/',
+    '/api/v1/dashboard/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga contra un servidor en ejecución (estilo wrk): N conexiones keep-alive "
+        "piden las rutas en ronda durante D segundos y se informan requests por segundo, latencia "
+        "p50/p95/p99 y errores. Sirve para comparar modos de servidor (Daphne vs gunicorn, "
+        "DB_CONN_MAX_AGE) con la misma base: guarda el resultado en JSON y --compare muestra la "
+        "diferencia contra una corrida anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', default='http://127.0.0.1:8000', help='URL base del servidor')
+        parser.add_argument('--path', action='append', dest='paths', default=None,
+                            help=f"Ruta a pedir (repetible). Por defecto: {', '.join(RUTAS_DEFAULT)}")
+        parser.add_argument('--user', default=None,
+                            help='Email o ID del usuario para el que se genera un token JWT (por defecto un miembro del negocio con más ventas)')
+        parser.add_argument('--token', default=None, help='Token JWT ya generado (omite --user)')
+        parser.add_argument('--concurrency', '-c', type=int, default=10, help='Conexiones simultáneas')
+        parser.add_argument('--duration', '-d', type=float, default=10.0, help='Segundos de carga')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Segundos iniciales que no se miden')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--label', default='', help='Nombre de la corrida (p. ej. "daphne" o "gunicorn")')
+        parser.add_argument('--output', default=None, help='Archivo JSON de salida (por defecto bench_results/load-<fecha>.json)')
+        parser.add_argument('--compare', default=None, help='JSON de una corrida anterior para comparar')
+
+    def handle(self, *args, **options):
+        destino = urlsplit(options['url'])
+        if destino.scheme not in ('http', 'https') or not destino.hostname:
+            raise CommandError(f"URL inválida: {options['url']}")
+        rutas = options['paths'] or RUTAS_DEFAULT
+        token = options['token'] or self._token(options['user'])
+        headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+
+        muestras = []
+        lock = threading.Lock()
+        inicio_medicion = time.monotonic() + options['warmup']
+        fin = inicio_medicion + options['duration']
+
+        def trabajador(n):
+            conexion = None
+            propias = []
+            i = n
+            while True:
+                ahora = time.monotonic()
+                if ahora >= fin:
+                    break
+                ruta = rutas[i % len(rutas)]
+                i += 1
+                if conexion is None:
+                    clase = http.client.HTTPSConnection if destino.scheme == 'https' else http.client.HTTPConnection
+                    conexion = clase(destino.hostname, destino.port, timeout=options['timeout'])
+                t0 = time.perf_counter()
+                try:
+                    conexion.request('GET', ruta, headers=headers)
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    status = respuesta.status
+                    if respuesta.getheader('Connection', '').lower() == 'close':
+                        conexion.close()
+                        conexion = None
+                except (OSError, http.client.HTTPException):
+                    status = 0
+                    conexion.close()
+                    conexion = None
+                if ahora >= inicio_medicion:
+                    propias.append((ruta, status, (time.perf_counter() - t0) * 1000))
+            if conexion is not None:
+                conexion.close()
+            with lock:
+                muestras.extend(propias)
+
+        self.stdout.write(
+            f"{options['url']} {options['concurrency']} conexiones, {options['duration']:.0f} s "
+            f"(+{options['warmup']:.0f} s de calentamiento), {len(rutas)} rutas"
+        )
+        hilos = [threading.Thread(target=trabajador, args=(n,), daemon=True) for n in range(options['concurrency'])]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        if not muestras:
+            raise CommandError('No se completó ninguna request; ¿está corriendo el servidor?')
+        resultado = self._resumen(muestras, options['duration'])
+        resultado.update({
+            'label': options['label'], 'url': options['url'], 'concurrencia': options['concurrency'],
+            'duracion_s': options['duration'], 'fecha': timezone.now().isoformat(),
+        })
+        self._print(resultado)
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'bench_results', f"load-{timezone.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as fh:
+            json.dump(resultado, fh, indent=2)
+        self.stdout.write(f"Resultados en {output}")
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self._comparar(json.load(fh), resultado)
+
+    def _token(self, usuario):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from accounts.models import CustomUser
+        from business.models import Business
+        from django.db.models import Count
+
+        if usuario:
+            filtro = {'pk': usuario} if str(usuario).isdigit() else {'email': usuario}
+            user = CustomUser.objects.filter(**filtro).first()
+        else:
+            business = Business.objects.annotate(n=Count('sale')).order_by('-n').first()
+            miembro = business.miembros.select_related('user').first() if business else None
+            user = miembro.user if miembro else None
+        if user is None:
+            raise CommandError('No se encontró el usuario para generar el token; use --user o --token.')
+        return str(AccessToken.for_user(user))
+
+    def _percentil(self, valores, p):
+        if len(valores) == 1:
+            return valores[0]
+        return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+    def _stats(self, muestras, duracion):
+        tiempos = [ms for _, _, ms in muestras]
+        errores = sum(1 for _, status, _ in muestras if status == 0 or status >= 500)
+        return {
+            'requests': len(muestras),
+            'rps': round(len(muestras) / duracion, 1),
+            'p50_ms': round(self._percentil(tiempos, 50), 1),
+            'p95_ms': round(self._percentil(tiempos, 95), 1),
+            'p99_ms': round(self._percentil(tiempos, 99), 1),
+            'errores': errores,
+            'status': sorted({status for _, status, _ in muestras}),
+        }
+
+    def _resumen(self, muestras, duracion):
+        por_ruta = defaultdict(list)
+        for muestra in muestras:
+            por_ruta[muestra[0]].append(muestra)
+        return {
+            **self._stats(muestras, duracion),
+            'rutas': {ruta: self._stats(propias, duracion) for ruta, propias in por_ruta.items()},
+        }
+
+    def _linea(self, nombre, stats):
+        return (f"{nombre:<40} {stats['rps']:>8.1f} req/s  p50 {stats['p50_ms']:>7.1f} ms  "
+                f"p95 {stats['p95_ms']:>7.1f} ms  p99 {stats['p99_ms']:>7.1f} ms  "
+                f"errores {stats['errores']}  status {stats['status']}")
+
+    def _print(self, resultado):
+        for ruta, stats in resultado['rutas'].items():
+            self.stdout.write(self._linea(ruta, stats))
+        linea = self._linea('TOTAL', resultado)
+        self.stdout.write(self.style.ERROR(linea) if resultado['errores'] else self.style.SUCCESS(linea))
+
+    def _comparar(self, antes, despues):
+        self.stdout.write(f"\nComparación {antes.get('label') or 'anterior'} -> {despues.get('label') or 'actual'}")
+        for ruta in ['TOTAL', *despues['rutas']]:
+            a = antes if ruta == 'TOTAL' else antes.get('rutas', {}).get(ruta)
+            d = despues if ruta == 'TOTAL' else despues['rutas'][ruta]
+            if not a:
+                continue
+            cambio = (d['rps'] - a['rps']) / a['rps'] * 100 if a['rps'] else 0
+            self.stdout.write(
+                f"{ruta:<40} {a['rps']:>8.1f} -> {d['rps']:>8.1f} req/s ({cambio:+.0f}%)  "
+                f"p95 {a['p95_ms']:.1f} -> {d['p95_ms']:.1f} ms"
+            )
@@ -0,0 +1,237 @@
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from simple_history.utils import get_history_model_for_model
+
+from core.history import write_history_archive
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Particionamiento mensual (PostgreSQL, opcional) de las tablas de historial más grandes "
+        "por history_date. Acciones: convert, create, detach, status, explain."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['convert', 'create', 'detach', 'status', 'explain'])
+        parser.add_argument('models', nargs='*',
+                            help='Modelos (app_label.Model). Por defecto HISTORY_PARTITIONED_MODELS')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='create/convert: meses futuros a crear')
+        parser.add_argument('--older-than-months', type=int, default=12,
+                            help='detach: desacoplar particiones anteriores a N meses')
+        parser.add_argument('--archive', action='store_true',
+                            help='detach: archivar las filas en HISTORY_ARCHIVE_ROOT y eliminar la partición')
+        parser.add_argument('--months', type=int, default=1, help='explain: rango de meses a consultar')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El particionamiento solo está disponible en PostgreSQL.')
+
+        labels = options['models'] or settings.HISTORY_PARTITIONED_MODELS
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f"Modelo no encontrado: {label}")
+            history_model = get_history_model_for_model(model)
+            getattr(self, f"_{options['action']}")(history_model, options)
+
+    # Utilidades de catálogo
+
+    def _is_partitioned(self, cursor, table):
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+    def _partitions(self, cursor, table):
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def _partition_name(self, table, month):
+        return f"{table}_p{month:%Y%m}"
+
+    def _create_partitions(self, cursor, table, first_month, last_month):
+        qn = connection.ops.quote_name
+        creadas = 0
+        month = first_month
+        while month <= last_month:
+            name = self._partition_name(table, month)
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [month.isoformat(), _add_months(month, 1).isoformat()],
+            )
+            creadas += 1
+            month = _add_months(month, 1)
+        return creadas
+
+    # Acciones
+
+    def _convert(self, history_model, options):
+        """
+        Convierte la tabla de historial en una tabla particionada por mes. El PK pasa a ser
+        (history_id, history_date) como exige PostgreSQL; para Django sigue siendo history_id.
+        Todo ocurre en una transacción: si algo falla, la tabla original queda intacta.
+        """
+        qn = connection.ops.quote_name
+        table = history_model._meta.db_table
+        pk = history_model._meta.pk.column
+        legacy = f"{table}_legacy"
+        # Nombre propio: la secuencia/identity original pertenece a la tabla legacy y se elimina con ella
+        seq = f"{table}_{pk}_part_seq"
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if self._is_partitioned(cursor, table):
+                self.stdout.write(f"{table}: ya está particionada")
+                return
+
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN ("
+                " SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+                [table, table],
+            )
+            index_defs = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'",
+                [table],
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(f"SELECT min(history_date), max({qn(pk)}) FROM {qn(table)}")
+            min_date, max_id = cursor.fetchone()
+
+            cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+            # Sin INCLUDING IDENTITY: las tablas particionadas (PG < 17) no admiten columnas identity
+            cursor.execute(
+                f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                f"PARTITION BY RANGE (history_date)"
+            )
+            cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {qn(seq)}")
+            cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN {qn(pk)} SET DEFAULT nextval(%s)", [seq])
+            cursor.execute(f"ALTER SEQUENCE {qn(seq)} OWNED BY {qn(table)}.{qn(pk)}")
+            cursor.execute("SELECT setval(%s, %s)", [seq, (max_id or 0) + 1])
+            # Django genera los PK con pg_get_serial_sequence, que ahora apunta a la nueva secuencia
+
+            first = _month_start(min_date) if min_date else _month_start(timezone.now())
+            last = _add_months(_month_start(timezone.now()), options['months_ahead'])
+            creadas = self._create_partitions(cursor, table, first, last)
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+
+            cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+            copiadas = cursor.rowcount
+            cursor.execute(f"DROP TABLE {qn(legacy)}")
+
+            # PK, índices y FK se crean sobre la tabla padre (se propagan a cada partición). Las
+            # definiciones se leyeron antes del RENAME, así que ya apuntan al nombre original.
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY ({qn(pk)}, history_date)")
+            for index_def in index_defs:
+                cursor.execute(index_def)
+            for name, definition in foreign_keys:
+                cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{table}: particionada ({creadas} particiones mensuales + default, {copiadas} filas copiadas)"
+        ))
+
+    def _create(self, history_model, options):
+        table = history_model._meta.db_table
+        with connection.cursor() as cursor:
+            if not self._is_partitioned(cursor, table):
+                self.stdout.write(f"{table}: no está particionada (ejecuta 'convert' primero)")
+                return
+            current = _month_start(timezone.now())
+            creadas = self._create_partitions(cursor, table, current, _add_months(current, options['months_ahead']))
+        self.stdout.write(f"{table}: particiones aseguradas hasta {_add_months(current, options['months_ahead']):%Y-%m}"
+                          f" ({creadas} revisadas)")
+
+    def _detach(self, history_model, options):
+        qn = connection.ops.quote_name
+        table = history_model._meta.db_table
+        cutoff = _add_months(_month_start(timezone.now()), -options['older_than_months'])
+        prefix = f"{table}_p"
+
+        with connection.cursor() as cursor:
+            if not self._is_partitioned(cursor, table):
+                self.stdout.write(f"{table}: no está particionada")
+                return
+            for name in self._partitions(cursor, table):
+                suffix = name[len(prefix):] if name.startswith(prefix) else ''
+                if len(suffix) != 6 or not suffix.isdigit():
+                    continue
+                month = date(int(suffix[:4]), int(suffix[4:]), 1)
+                if month >= cutoff:
+                    continue
+
+                cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+                if options['archive']:
+                    filas = self._archive_partition(cursor, table, name, month)
+                    cursor.execute(f"DROP TABLE {qn(name)}")
+                    self.stdout.write(f"{name}: desacoplada, {filas} filas archivadas y tabla eliminada")
+                else:
+                    self.stdout.write(f"{name}: desacoplada (la tabla se conserva)")
+
+    def _archive_partition(self, cursor, table, name, month):
+        qn = connection.ops.quote_name
+        cursor.execute(f"SELECT * FROM {qn(name)}")
+        columns = [col[0] for col in cursor.description]
+        total = 0
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            write_history_archive(table, f"{month:%Y-%m}", [dict(zip(columns, row)) for row in rows])
+            total += len(rows)
+        return total
+
+    def _status(self, history_model, options):
+        qn = connection.ops.quote_name
+        table = history_model._meta.db_table
+        with connection.cursor() as cursor:
+            if not self._is_partitioned(cursor, table):
+                self.stdout.write(f"{table}: sin particionar")
+                return
+            self.stdout.write(f"{table}:")
+            for name in self._partitions(cursor, table):
+                cursor.execute(f"SELECT count(*) FROM {qn(name)}")
+                self.stdout.write(f"  {name}: {cursor.fetchone()[0]} filas")
+
+    def _explain(self, history_model, options):
+        """Muestra cuántas particiones recorre una consulta por rango de history_date."""
+        table = history_model._meta.db_table
+        end = timezone.now()
+        start = end - timedelta(days=31 * options['months'])
+        qs = history_model.objects.filter(history_date__gte=start, history_date__lt=end)
+        plan = qs.explain()
+        with connection.cursor() as cursor:
+            partitions = self._partitions(cursor, table)
+        usadas = [name for name in partitions if name in plan]
+        self.stdout.write(f"{table}: la consulta de {options['months']} mes(es) recorre "
+                          f"{len(usadas)} de {len(partitions)} particiones")
+        if options['verbosity'] > 1:
+            self.stdout.write(plan)
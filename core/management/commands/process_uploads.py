@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa las cargas de imágenes y comprobantes pendientes (core/uploads.py): WebP sin EXIF, "
+        "miniatura y subida al storage. Sin --loop procesa lo pendiente y termina; con --loop queda "
+        "como worker. Reintenta los jobs que fallaron (hasta 3 intentos) y los que quedaron a medias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Seguir esperando jobs nuevos')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Segundos de espera entre rondas con --loop')
+        parser.add_argument('--limit', type=int, default=100, help='Jobs por ronda')
+        parser.add_argument('--status', action='store_true', help='Solo mostrar cuántos jobs hay por estado')
+
+    def handle(self, *args, **options):
+        from core.models import UploadJob
+        from core.uploads import procesar_pendientes
+
+        if options['status']:
+            for fila in UploadJob.objects.order_by().values('estado').annotate(n=Count('id')).order_by('estado'):
+                self.stdout.write(f"{fila['estado']:<12} {fila['n']}")
+            return
+
+        while True:
+            jobs = procesar_pendientes(options['limit'])
+            for job in jobs:
+                linea = f"[{job.estado}] {job}"
+                if job.estado == 'completado':
+                    self.stdout.write(self.style.SUCCESS(linea))
+                else:
+                    self.stdout.write(self.style.ERROR(f"{linea}: {job.error}"))
+            if not options['loop']:
+                break
+            if not jobs:
+                time.sleep(options['sleep'])
@@ -0,0 +1,93 @@
+import json
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ORDENES = ('p95_ms', 'queries', 'db_ms', 'excedidas', 'requests')
+
+
+class Command(BaseCommand):
+    help = (
+        "Resume el log de QueryInstrumentationMiddleware (una línea JSON por request): por vista, "
+        "cantidad de requests, latencia p50/p95, consultas y tiempo en base, requests fuera de "
+        "presupuesto y la consulta más repetida. Muestra primero las peores vistas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('logfile', nargs='?', default=None,
+                            help='Archivo de log (por defecto QUERY_INSTRUMENTATION_LOG)')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=ORDENES, default='p95_ms')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+
+    def handle(self, *args, **options):
+        path = options['logfile'] or settings.QUERY_INSTRUMENTATION_LOG
+        try:
+            with open(path, encoding='utf-8') as fh:
+                mediciones, invalidas = self._leer(fh)
+        except OSError as e:
+            raise CommandError(f"No se pudo leer {path}: {e}")
+        if not mediciones:
+            raise CommandError(f"{path} no tiene mediciones")
+
+        resumen = sorted(self._resumir(mediciones), key=lambda r: r[options['sort']], reverse=True)[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(resumen, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{len(mediciones)} requests en {path}" + (f" ({invalidas} líneas ignoradas)" if invalidas else ''))
+        self.stdout.write(f"{'vista':<40} {'req':>6} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'db ms':>8} {'excede':>7}")
+        for fila in resumen:
+            linea = (f"{fila['vista'][:40]:<40} {fila['requests']:>6} {fila['p50_ms']:>8.1f} {fila['p95_ms']:>8.1f} "
+                     f"{fila['queries']:>8} {fila['db_ms']:>8.1f} {fila['excedidas']:>7}")
+            self.stdout.write(self.style.ERROR(linea) if fila['excedidas'] else linea)
+            if fila['repetida']:
+                self.stdout.write(f"    repetida x{fila['repetida']['n']}: {fila['repetida']['sql'][:110]}")
+
+    def _leer(self, fh):
+        mediciones, invalidas = [], 0
+        for linea in fh:
+            # Tolerar prefijos de otros formatters (fecha, nivel) antes del JSON
+            inicio = linea.find('{')
+            try:
+                medicion = json.loads(linea[inicio:]) if inicio >= 0 else None
+            except ValueError:
+                medicion = None
+            if not isinstance(medicion, dict) or 'vista' not in medicion:
+                invalidas += 1
+                continue
+            mediciones.append(medicion)
+        return mediciones, invalidas
+
+    def _resumir(self, mediciones):
+        por_vista = defaultdict(list)
+        for medicion in mediciones:
+            por_vista[medicion['vista']].append(medicion)
+
+        for vista, filas in por_vista.items():
+            tiempos = sorted(f['total_ms'] for f in filas)
+            repetidas = Counter()
+            ejemplos = {}
+            for fila in filas:
+                for r in fila.get('repetidas', []):
+                    # La peor repetición vista para cada huella
+                    repetidas[r['huella']] = max(repetidas[r['huella']], r['n'])
+                    ejemplos[r['huella']] = r['sql']
+            peor = repetidas.most_common(1)
+            yield {
+                'vista': vista,
+                'requests': len(filas),
+                'p50_ms': round(self._percentil(tiempos, 50), 2),
+                'p95_ms': round(self._percentil(tiempos, 95), 2),
+                'queries': max(f['queries'] for f in filas),
+                'db_ms': round(statistics.mean(f['db_ms'] for f in filas), 2),
+                'excedidas': sum(1 for f in filas if f.get('excede')),
+                'repetida': {'huella': peor[0][0], 'n': peor[0][1], 'sql': ejemplos[peor[0][0]]} if peor else None,
+            }
+
+    def _percentil(self, valores, percent):
+        if len(valores) == 1:
+            return valores[0]
+        return statistics.quantiles(valores, n=100, method='inclusive')[percent - 1]
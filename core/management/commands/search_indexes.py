@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Índices de trigramas (PostgreSQL, extensión pg_trgm) para la búsqueda unificada "
+        "(core/search.py). Acciones: create, drop, status. Los índices se crean y eliminan con "
+        "CONCURRENTLY, sin bloquear escrituras."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['create', 'drop', 'status'])
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Los índices de trigramas solo están disponibles en PostgreSQL.')
+        getattr(self, f"_{options['action']}")()
+
+    def _indices(self):
+        from core.search import FUENTES
+
+        vistos = set()
+        for fuente in FUENTES:
+            for tabla, columna in fuente.columnas_indexadas():
+                if (tabla, columna) not in vistos:
+                    vistos.add((tabla, columna))
+                    yield f"{tabla}_{columna}_trgm", tabla, columna
+
+    def _existe(self, cursor, nombre):
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [nombre])
+        return cursor.fetchone() is not None
+
+    def _create(self):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for nombre, tabla, columna in self._indices():
+                if self._existe(cursor, nombre):
+                    self.stdout.write(f"[existe]  {nombre}")
+                    continue
+                # Misma expresión que genera icontains en PostgreSQL: UPPER(columna::text)
+                cursor.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {qn(nombre)} ON {qn(tabla)} "
+                    f"USING gin (UPPER({qn(columna)}::text) gin_trgm_ops)"
+                )
+                self.stdout.write(self.style.SUCCESS(f"[creado]  {nombre}"))
+            for _, tabla, _ in self._indices():
+                cursor.execute(f"ANALYZE {qn(tabla)}")
+
+    def _drop(self):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for nombre, _, _ in self._indices():
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {qn(nombre)}")
+                self.stdout.write(f"[eliminado] {nombre}")
+
+    def _status(self):
+        faltantes = 0
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'pg_trgm'")
+            extension = cursor.fetchone()
+            self.stdout.write(f"pg_trgm: {extension[0] if extension else 'no instalada'}")
+            for nombre, tabla, columna in self._indices():
+                cursor.execute(
+                    "SELECT pg_size_pretty(pg_relation_size(%s::regclass)) FROM pg_indexes WHERE indexname = %s",
+                    [nombre, nombre],
+                )
+                fila = cursor.fetchone()
+                if fila:
+                    self.stdout.write(f"[ok]      {nombre} ({tabla}.{columna}, {fila[0]})")
+                else:
+                    faltantes += 1
+                    self.stdout.write(self.style.WARNING(f"[falta]   {nombre} ({tabla}.{columna})"))
+        if faltantes:
+            raise CommandError(f"Faltan {faltantes} índice(s); ejecuta search_indexes create")
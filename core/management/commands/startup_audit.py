@@ -0,0 +1,158 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Presupuesto por fase de arranque: tiempo (ms, mediana de las corridas), memoria residente (MiB)
+# y módulos que no deben quedar cargados (se importan recién cuando se usan).
+# Se pueden sobrescribir con --budgets archivo.json (mismo formato, claves parciales).
+BUDGETS = {
+    # django.setup(): lo que paga cada proceso (web, workers, comandos) antes de hacer nada
+    'setup': {
+        'ms': 900,
+        'rss_mb': 110,
+        'diferidos': ['numpy', 'PIL', 'requests', 'openai', 'twilio', 'boto3', 'botocore'],
+    },
+    # setup + ROOT_URLCONF: lo que paga un worker web antes de atender la primera request.
+    # requests queda fuera porque rest_framework.compat lo importa si está instalado.
+    'urls': {
+        'ms': 1600,
+        'rss_mb': 140,
+        'diferidos': ['numpy', 'PIL', 'openai', 'twilio', 'boto3', 'botocore'],
+    },
+}
+
+SCRIPT = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+if {urls}:
+    from django.conf import settings
+    __import__(settings.ROOT_URLCONF)
+ms = (time.perf_counter() - t0) * 1000
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'ms': ms, 'rss_mb': rss_kb / 1024, 'modulos': sorted(sys.modules)}}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque de un proceso nuevo (django.setup() y la carga de las URLs) con "
+        "python -X importtime: tiempo, memoria residente y los paquetes que más tardan en importarse. "
+        "Termina con error si se excede el presupuesto o si queda cargado un módulo pesado que debe "
+        "importarse recién al usarse (numpy, PIL, SDKs externos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fases', nargs='*', help=f"Subconjunto a medir: {', '.join(BUDGETS)}")
+        parser.add_argument('--runs', type=int, default=5, help='Procesos por fase (se informa la mediana)')
+        parser.add_argument('--top', type=int, default=12, help='Paquetes a listar por tiempo de import')
+        parser.add_argument('--budgets', default=None, help='JSON con presupuestos que reemplazan a los por defecto')
+        parser.add_argument('--output', default=None,
+                            help='Archivo JSON de salida (por defecto bench_results/startup-<fecha>.json)')
+        parser.add_argument('--no-fail', action='store_true', help='Informar presupuestos excedidos sin fallar')
+        parser.add_argument('--check', action='store_true',
+                            help='Solo verificar los presupuestos, sin escribir el JSON de resultados (lo usan los tests)')
+
+    def handle(self, *args, **options):
+        budgets = {fase: dict(valores) for fase, valores in BUDGETS.items()}
+        if options['budgets']:
+            with open(options['budgets']) as fh:
+                for fase, valores in json.load(fh).items():
+                    budgets.setdefault(fase, {}).update(valores)
+        fases = options['fases'] or list(BUDGETS)
+        desconocidas = set(fases) - set(budgets)
+        if desconocidas:
+            raise CommandError(f"Fases desconocidas: {', '.join(sorted(desconocidas))}")
+
+        resultados, excedidos = {}, []
+        for fase in fases:
+            resultado = self._medir(fase, options['runs'], options['top'])
+            resultado['presupuesto'] = budgets[fase]
+            resultado['excedido'] = self._check_budget(resultado, budgets[fase])
+            resultados[fase] = resultado
+            self._print(fase, resultado)
+            if resultado['excedido']:
+                excedidos.append(fase)
+
+        if not options['check']:
+            self._guardar(resultados, options['output'])
+
+        if excedidos:
+            mensaje = f"Presupuesto de arranque excedido en: {', '.join(excedidos)}"
+            if not options['no_fail']:
+                raise CommandError(mensaje)
+            self.stdout.write(self.style.WARNING(mensaje))
+            return
+        self.stdout.write(self.style.SUCCESS('Arranque dentro del presupuesto'))
+
+    def _guardar(self, resultados, output):
+        output = output or os.path.join(
+            settings.BASE_DIR, 'bench_results', f"startup-{timezone.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as fh:
+            json.dump({'fecha': timezone.now().isoformat(), 'python': sys.version.split()[0], 'fases': resultados}, fh, indent=2)
+        self.stdout.write(f"Resultados en {output}")
+
+    def _ejecutar(self, fase):
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(urls=fase == 'urls')],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f"El proceso de prueba falló:\n{proceso.stderr[-2000:]}")
+        return json.loads(proceso.stdout.strip().splitlines()[-1]), proceso.stderr
+
+    def _medir(self, fase, runs, top):
+        corridas = [self._ejecutar(fase) for _ in range(max(1, runs))]
+        datos = [dato for dato, _ in corridas]
+        modulos = set(datos[-1]['modulos'])
+        return {
+            'corridas': len(corridas),
+            'ms': round(statistics.median(dato['ms'] for dato in datos), 1),
+            'rss_mb': round(max(dato['rss_mb'] for dato in datos), 1),
+            'modulos': len(modulos),
+            'diferidos_cargados': [],
+            'paquetes': self._paquetes(corridas[-1][1], top),
+            '_cargados': modulos,
+        }
+
+    def _paquetes(self, importtime, top):
+        """Tiempo propio de import (ms) sumado por paquete raíz, de mayor a menor."""
+        por_paquete = defaultdict(int)
+        for linea in importtime.splitlines():
+            if not linea.startswith('import time:') or 'self [us]' in linea:
+                continue
+            _, propio, _, nombre = (parte.strip() for parte in linea.replace('import time:', '|', 1).split('|'))
+            por_paquete[nombre.split('.')[0]] += int(propio)
+        mayores = sorted(por_paquete.items(), key=lambda item: -item[1])[:top]
+        return [{'paquete': nombre, 'ms': round(us / 1000, 1)} for nombre, us in mayores]
+
+    def _check_budget(self, resultado, budget):
+        cargados = resultado.pop('_cargados')
+        resultado['diferidos_cargados'] = sorted(
+            modulo for modulo in budget.get('diferidos', []) if modulo in cargados
+        )
+        excedido = [clave for clave in ('ms', 'rss_mb') if clave in budget and resultado[clave] > budget[clave]]
+        if resultado['diferidos_cargados']:
+            excedido.append('diferidos')
+        return excedido
+
+    def _print(self, fase, resultado):
+        linea = (f"{fase:<6} {resultado['ms']:>8.1f} ms  {resultado['rss_mb']:>6.1f} MiB  "
+                 f"{resultado['modulos']:>5} módulos")
+        if resultado['excedido']:
+            detalle = ', '.join(resultado['excedido'])
+            if resultado['diferidos_cargados']:
+                detalle += f" (cargados: {', '.join(resultado['diferidos_cargados'])})"
+            self.stdout.write(self.style.ERROR(f"{linea}  excede: {detalle}"))
+        else:
+            self.stdout.write(linea)
+        self.stdout.write('       ' + ', '.join(f"{p['paquete']} {p['ms']}" for p in resultado['paquetes']))
@@ -1,5 +1,5 @@
 from django.db import models
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 
 class BaseHistoricalModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -17,4 +17,33 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
         # Orden global por fecha de creación descendente
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class UploadJob(BaseModel):
+    """
+    Archivo subido que espera ser procesado (ver core/uploads.py): está en UPLOADS_SPOOL_DIR y se
+    asigna al campo `campo` del objeto cuando el worker lo sube al storage.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    campo = models.CharField(max_length=64)
+    ruta = models.CharField(max_length=255, help_text="Ruta del archivo en UPLOADS_SPOOL_DIR")
+    nombre_original = models.CharField(max_length=255, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.content_type.model}#{self.object_id}.{self.campo} ({self.estado})"
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['estado', 'created_at'], name='uploadjob_estado_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='uploadjob_objeto_idx'),
+        ]
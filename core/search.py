@@ -0,0 +1,150 @@
+"""
+Búsqueda unificada del negocio: productos, lotes (código QR), bins, clientes (nombre y RUT),
+proveedores y ventas (código).
+
+Cada fuente filtra con ``icontains`` sobre sus campos y aporta las mismas columnas (tipo, uid,
+título, subtítulo y puntaje); todas se combinan en una sola consulta ``UNION ALL`` ordenada por
+puntaje, como el timeline del dashboard (core/timeline.py).
+
+En PostgreSQL Django traduce ``icontains`` a ``UPPER(campo::text) LIKE UPPER(%q%)``; el comando
+``search_indexes create`` crea un índice GIN ``gin_trgm_ops`` (extensión pg_trgm) sobre esa misma
+expresión, así que el LIKE se resuelve por el índice en vez de recorrer la tabla (y de paso lo
+aprovechan los demás filtros ``nombre__icontains`` de la API). Los nombres además coinciden con
+errores de tipeo (operador ``%>`` de pg_trgm) y el puntaje usa ``word_similarity``.
+En SQLite (desarrollo) solo se usa ``icontains`` y el puntaje distingue exacto, prefijo y contenido.
+"""
+from django.db import connections, router
+from django.db.models import Case, CharField, F, FloatField, Q, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Upper
+
+from inventory.models import FruitBin, FruitLot, Product, Supplier
+from sales.models import Customer, Sale
+
+TEXTO = CharField()
+PUNTAJE = FloatField()
+
+# Con menos de 3 caracteres pg_trgm no puede usar el índice (no hay trigramas completos)
+LARGO_MINIMO = 3
+LIMITE_MAXIMO = 50
+
+COLUMNAS = ('tipo', 'uid', 'titulo', 'subtitulo', 'score')
+
+
+class BusquedaInvalida(ValueError):
+    pass
+
+
+def _texto(valor):
+    return Value(valor, output_field=TEXTO)
+
+
+def _mayusculas(campo):
+    """La misma expresión que indexa search_indexes: UPPER(campo::text)."""
+    return Upper(Cast(campo, TextField()))
+
+
+class Fuente:
+    """
+    Un tipo de resultado: su queryset base, los campos en los que se busca y cómo llenar las
+    columnas comunes. `difusos` son los campos (nombres) que en PostgreSQL también coinciden por
+    similitud de trigramas; los códigos solo coinciden por contenido.
+    """
+
+    def __init__(self, tipo, queryset, campos, titulo, subtitulo, difusos=(), negocio='business'):
+        self.tipo = tipo
+        self.queryset = queryset
+        self.campos = campos
+        self.difusos = difusos
+        self.titulo = titulo
+        self.subtitulo = subtitulo
+        self.negocio = negocio
+
+    def _puntaje(self, campo, q, postgres):
+        if postgres:
+            from django.contrib.postgres.search import TrigramWordSimilarity
+            parecido = TrigramWordSimilarity(q.upper(), _mayusculas(campo)) * Value(0.8)
+        else:
+            parecido = Value(0.5)
+        return Case(
+            When(**{f'{campo}__iexact': q}, then=Value(1.0)),
+            When(**{f'{campo}__istartswith': q}, then=Value(0.9)),
+            default=parecido,
+            output_field=PUNTAJE,
+        )
+
+    def resultados(self, business, q, postgres=False):
+        filtro = Q()
+        for campo in self.campos:
+            filtro |= Q(**{f'{campo}__icontains': q})
+        if postgres:
+            from django.contrib.postgres.lookups import TrigramWordSimilar
+            for campo in self.difusos:
+                filtro |= TrigramWordSimilar(_mayusculas(campo), q.upper())
+
+        puntajes = [Coalesce(self._puntaje(campo, q, postgres), Value(0.0)) for campo in self.campos]
+        return self.queryset.filter(filtro, **{self.negocio: business}).annotate(
+            tipo=_texto(self.tipo),
+            titulo=Coalesce(self.titulo, _texto(''), output_field=TEXTO),
+            subtitulo=Coalesce(self.subtitulo, _texto(''), output_field=TEXTO),
+            score=Greatest(*puntajes) if len(puntajes) > 1 else puntajes[0],
+        ).order_by().values(*COLUMNAS)
+
+    def columnas_indexadas(self):
+        """(tabla, columna) de los campos propios del modelo en los que se busca."""
+        meta = self.queryset.model._meta
+        for campo in self.campos:
+            if '__' not in campo:
+                yield meta.db_table, meta.get_field(campo).column
+
+
+FUENTES = [
+    Fuente('producto', Product.objects.all(), ['nombre'], difusos=['nombre'],
+           titulo=F('nombre'), subtitulo=F('marca')),
+    Fuente('lote', FruitLot.objects.all(), ['qr_code'],
+           titulo=F('qr_code'), subtitulo=F('producto__nombre')),
+    Fuente('bin', FruitBin.objects.all(), ['codigo'],
+           titulo=F('codigo'), subtitulo=F('producto__nombre')),
+    Fuente('cliente', Customer.objects.all(), ['nombre', 'rut'], difusos=['nombre'],
+           titulo=F('nombre'), subtitulo=F('rut')),
+    Fuente('proveedor', Supplier.objects.all(), ['nombre'], difusos=['nombre'],
+           titulo=F('nombre'), subtitulo=F('rut')),
+    Fuente('venta', Sale.objects.all(), ['codigo_venta'],
+           titulo=F('codigo_venta'), subtitulo=F('cliente__nombre')),
+]
+
+TIPOS = [fuente.tipo for fuente in FUENTES]
+
+
+def buscar(business, q, tipos=None, limit=20):
+    """
+    Resultados del negocio que coinciden con `q`, del más al menos relevante.
+    `tipos` restringe las fuentes (por defecto todas). Cada resultado es un dict con tipo, uid,
+    titulo, subtitulo y score (entre 0 y 1).
+    """
+    q = (q or '').strip()
+    if len(q) < LARGO_MINIMO:
+        raise BusquedaInvalida(f'La búsqueda debe tener al menos {LARGO_MINIMO} caracteres.')
+    desconocidos = set(tipos or []) - set(TIPOS)
+    if desconocidos:
+        raise BusquedaInvalida(f"Tipos desconocidos: {', '.join(sorted(desconocidos))}. Opciones: {', '.join(TIPOS)}")
+
+    fuentes = [fuente for fuente in FUENTES if not tipos or fuente.tipo in tipos]
+    conexion = connections[router.db_for_read(Product)]
+    postgres = conexion.vendor == 'postgresql'
+    # SQLite y otros motores no aceptan ORDER BY/LIMIT dentro de las ramas de un UNION
+    limitar_ramas = conexion.features.supports_slicing_ordering_in_compound
+
+    ramas = []
+    for fuente in fuentes:
+        qs = fuente.resultados(business, q, postgres=postgres)
+        if limitar_ramas or len(fuentes) == 1:
+            qs = qs.order_by('-score', 'titulo')[:limit]
+        ramas.append(qs)
+
+    if len(ramas) == 1:
+        filas = list(ramas[0])
+    else:
+        filas = list(ramas[0].union(*ramas[1:], all=True).order_by('-score', 'tipo', 'titulo')[:limit])
+    for fila in filas:
+        fila['score'] = round(float(fila['score']), 3)
+    return filas
@@ -0,0 +1,123 @@
+"""
+Planes de las consultas de ventas más frecuentes (dashboard, listado de ventas, crédito de un
+cliente): con los índices de sales.Sale ninguna debe recorrer completas las tablas de ventas ni de
+ítems. Solo corre con PostgreSQL; sobre una base con datos de carga usar `manage.py check_query_plans`.
+"""
+import re
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Perfil
+from business.models import Business
+from sales.models import Customer, Sale, SaleItem
+
+TABLAS = (Sale._meta.db_table, SaleItem._meta.db_table)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Los planes se verifican con EXPLAIN de PostgreSQL')
+class PlanesDeConsultaTests(TestCase):
+    client_class = APIClient
+
+    NEGOCIOS = 4
+    VENTAS_POR_NEGOCIO = 1500
+    DIAS = 365
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        admin = Group.objects.create(name='Administrador')
+        negocios = []
+        for n in range(cls.NEGOCIOS):
+            usuario = User.objects.create_user(email=f'admin{n}@test.cl', password='x', first_name='Admin')
+            usuario.groups.add(admin)
+            perfil = Perfil.objects.create(user=usuario)
+            perfil.business = Business.objects.create(
+                nombre=f'Negocio {n}', rut=f'{n}-9', dueno=perfil, email=usuario.email, telefono='1', direccion='-',
+            )
+            perfil.save(update_fields=['business'])
+            clientes = Customer.objects.bulk_create([
+                Customer(nombre=f'Cliente {n}-{c}', rut=f'{n}-{c}-7', business=perfil.business, credito_activo=True)
+                for c in range(30)
+            ])
+            negocios.append((usuario, perfil.business, clientes))
+        cls.usuario, cls.negocio, clientes = negocios[0]
+        cls.cliente = clientes[0]
+
+        ventas = []
+        for usuario, negocio, clientes in negocios:
+            for i in range(cls.VENTAS_POR_NEGOCIO):
+                credito = i % 4 == 0
+                ventas.append(Sale(
+                    vendedor=usuario, business=negocio, cliente=clientes[i % len(clientes)], total=Decimal('10000'),
+                    metodo_pago='credito' if credito else 'efectivo', pagado=not (credito and i % 8 == 0),
+                    saldo_pendiente=Decimal('10000') if credito and i % 8 == 0 else 0,
+                ))
+        ventas = Sale.objects.bulk_create(ventas, batch_size=1000)
+        SaleItem.objects.bulk_create(
+            [
+                SaleItem(venta=venta, peso_vendido=Decimal('10'), precio_kg=Decimal('500'), subtotal=Decimal('5000'))
+                for venta in ventas for _ in range(2)
+            ],
+            batch_size=1000,
+        )
+        with connection.cursor() as cursor:
+            # Fechas repartidas en el último año
+            cursor.execute(
+                f"UPDATE {Sale._meta.db_table} SET created_at = now() - (id %% %s) * interval '1 day'", [cls.DIAS]
+            )
+            for tabla in TABLAS:
+                cursor.execute(f'ANALYZE {tabla}')
+
+    def setUp(self):
+        self.client.force_authenticate(self.usuario)
+
+    def _planes(self, url, **params):
+        """EXPLAIN de cada SELECT sobre ventas o ítems que ejecuta la vista."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        with connection.cursor() as cursor:
+            # Con pocas filas el planner prefiere Seq Scan aunque haya índice: se desactiva para que
+            # un Seq Scan en el plan signifique que no hay índice utilizable
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            planes = []
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(re.search(rf'"{t}"', sql) for t in TABLAS):
+                    continue
+                cursor.execute('EXPLAIN ' + sql)
+                planes.append('\n'.join(fila[0] for fila in cursor.fetchall()))
+        self.assertTrue(planes, f'{url} no consultó ventas')
+        return '\n\n'.join(planes)
+
+    def _sin_seq_scan(self, plan):
+        for tabla in TABLAS:
+            self.assertNotIn(f'Seq Scan on {tabla}', plan)
+
+    def test_dashboard(self):
+        hoy = timezone.localdate()
+        plan = self._planes(
+            reverse('dashboard'), start_date=(hoy - timedelta(days=30)).isoformat(), end_date=hoy.isoformat(),
+        )
+        self._sin_seq_scan(plan)
+        self.assertIn('sale_biz_created_idx', plan)
+
+    def test_listado_de_ventas(self):
+        plan = self._planes(reverse('sale-list'))
+        self._sin_seq_scan(plan)
+        self.assertIn('sale_biz_created_idx', plan)
+
+    def test_ventas_a_credito_pendientes_de_un_cliente(self):
+        plan = self._planes(reverse('ordenes-pendientes-cliente', args=[self.cliente.uid]))
+        self._sin_seq_scan(plan)
+        self.assertIn('sale_credito_abierto_idx', plan)
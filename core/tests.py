@@ -1,3 +1,372 @@
-from django.test import TestCase
+import json
+import re
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Perfil
+from business.models import Business
+from sales.models import Customer, Sale
+
+from .db_router import ReplicaMiddleware, registrar_lag
+
+
+def crear_negocio():
+    usuario = get_user_model().objects.create_user(email='admin@test.cl', password='x', first_name='Admin')
+    usuario.groups.add(Group.objects.get_or_create(name='Administrador')[0])
+    perfil = Perfil.objects.create(user=usuario)
+    perfil.business = Business.objects.create(
+        nombre='Negocio', rut='1-9', dueno=perfil, email=usuario.email, telefono='1', direccion='-',
+    )
+    perfil.save(update_fields=['business'])
+    return usuario, perfil.business
+
+
+REPLICA = settings.DB_REPLICA_ALIAS
+HAY_REPLICA = REPLICA in settings.DATABASES
+
+
+@mock.patch('core.db_router.replica_configurada', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    Decisiones del router a través de ReplicaMiddleware. No consulta las bases: cada vista de prueba
+    anota a qué alias irían sus lecturas y escrituras.
+    """
+
+    def setUp(self):
+        caches[settings.DB_REPLICA_CACHE].clear()
+        self.addCleanup(caches[settings.DB_REPLICA_CACHE].clear)
+        User = get_user_model()
+        self.usuario = User(pk=1, email='vendedor@test.cl')
+        self.otro = User(pk=2, email='cajero@test.cl')
+        self.factory = RequestFactory()
+
+    def _pedir(self, metodo, url_name, user, escribir=False, status=200):
+        """Pasa una request por el middleware y devuelve los alias que usó la vista."""
+        User = get_user_model()
+        usados = {}
+
+        def vista(request):
+            usados['lectura'] = router.db_for_read(User)
+            if escribir:
+                usados['escritura'] = router.db_for_write(User)
+                usados['lectura_despues'] = router.db_for_read(User)
+            return HttpResponse(status=status)
+
+        url = reverse(url_name)
+        request = getattr(self.factory, metodo)(url)
+        request.user = user
+        request.resolver_match = resolve(url)
+        middleware = ReplicaMiddleware(lambda r: middleware.process_view(r, vista, (), {}) or vista(r))
+        middleware(request)
+        return usados
+
+    def test_get_de_reporte_lee_de_replica(self, _):
+        self.assertEqual(self._pedir('get', 'report-stock', self.usuario)['lectura'], REPLICA)
+        self.assertEqual(self._pedir('head', 'dashboard', self.usuario)['lectura'], REPLICA)
+
+    def test_vistas_que_no_son_reportes_leen_de_primaria(self, _):
+        self.assertEqual(self._pedir('get', 'sale-list', self.usuario)['lectura'], DEFAULT_DB_ALIAS)
+
+    def test_escrituras_van_a_primaria(self, _):
+        # POST a una vista de reportes: ni la lectura ni la escritura usan la réplica
+        usados = self._pedir('post', 'report-stock', self.usuario, escribir=True)
+        self.assertEqual(usados['lectura'], DEFAULT_DB_ALIAS)
+        self.assertEqual(usados['escritura'], DEFAULT_DB_ALIAS)
+        # Un GET de reporte que escribe sigue leyendo de la primaria desde esa escritura
+        caches[settings.DB_REPLICA_CACHE].clear()
+        usados = self._pedir('get', 'report-stock', self.usuario, escribir=True)
+        self.assertEqual(usados['lectura'], REPLICA)
+        self.assertEqual(usados['escritura'], DEFAULT_DB_ALIAS)
+        self.assertEqual(usados['lectura_despues'], DEFAULT_DB_ALIAS)
+
+    def test_despues_de_escribir_lee_de_primaria(self, _):
+        self._pedir('post', 'sale-list', self.usuario, status=201)
+        self.assertEqual(self._pedir('get', 'report-stock', self.usuario)['lectura'], DEFAULT_DB_ALIAS)
+        # La marca es del usuario que escribió
+        self.assertEqual(self._pedir('get', 'report-stock', self.otro)['lectura'], REPLICA)
+        # Una escritura rechazada no marca al usuario
+        self._pedir('post', 'sale-list', self.otro, status=400)
+        self.assertEqual(self._pedir('get', 'report-stock', self.otro)['lectura'], REPLICA)
+
+    def test_marca_de_escritura_vence(self, _):
+        with self.settings(DB_REPLICA_STICKY_SECONDS=0):
+            self._pedir('post', 'sale-list', self.usuario, status=201)
+        self.assertEqual(self._pedir('get', 'report-stock', self.usuario)['lectura'], REPLICA)
+
+    def test_atraso_excesivo_lee_de_primaria(self, _):
+        registrar_lag(settings.DB_REPLICA_MAX_LAG_SECONDS + 10, 60)
+        self.assertEqual(self._pedir('get', 'report-stock', self.usuario)['lectura'], DEFAULT_DB_ALIAS)
+        # Réplica sin respuesta
+        registrar_lag(None, 60)
+        self.assertEqual(self._pedir('get', 'report-stock', self.usuario)['lectura'], DEFAULT_DB_ALIAS)
+        registrar_lag(settings.DB_REPLICA_MAX_LAG_SECONDS / 2, 60)
+        self.assertEqual(self._pedir('get', 'report-stock', self.usuario)['lectura'], REPLICA)
+
+
+@skipUnless(HAY_REPLICA, 'Sin base réplica configurada (DB_REPLICA_HOST)')
+class ReplicaEnRequestsTests(TransactionTestCase):
+    """
+    Requests reales con la réplica configurada (en tests es espejo de 'default'). Es
+    TransactionTestCase porque dentro de transaction.atomic todas las lecturas van a la primaria.
+    """
+
+    client_class = APIClient
+    # Sin réplica la clase se omite, pero el alias igual debe existir al declararla
+    databases = {DEFAULT_DB_ALIAS, REPLICA} if HAY_REPLICA else {DEFAULT_DB_ALIAS}
+
+    def setUp(self):
+        caches[settings.DB_REPLICA_CACHE].clear()
+        self.addCleanup(caches[settings.DB_REPLICA_CACHE].clear)
+        self.usuario, _ = crear_negocio()
+        self.client.force_authenticate(self.usuario)
+
+    def _alias_usados(self, metodo, url, **kwargs):
+        usados = []
+
+        def anotar(alias):
+            def wrapper(execute, sql, params, many, context):
+                usados.append(alias)
+                return execute(sql, params, many, context)
+            return wrapper
+
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(anotar(DEFAULT_DB_ALIAS)), \
+                connections[REPLICA].execute_wrapper(anotar(REPLICA)):
+            response = getattr(self.client, metodo)(url, **kwargs)
+        return response, usados
+
+    def test_reporte_lee_de_replica_y_el_resto_de_primaria(self):
+        response, usados = self._alias_usados('get', reverse('report-stock'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(REPLICA, usados)
+
+        response, usados = self._alias_usados('get', reverse('sale-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(REPLICA, usados)
+
+
+class HistorialEnLoteTests(TestCase):
+    """
+    Escritura del historial con HISTORY_BATCH_WRITES (core/history.py). TestCase corre dentro de una
+    transacción, así que los lotes quedan en on_commit y se ejecutan con captureOnCommitCallbacks.
+    """
+
+    CAMPOS = ('history_type', 'nombre', 'telefono', 'credito_activo', 'business_id')
+
+    def setUp(self):
+        _, self.negocio = crear_negocio()
+
+    def _operaciones(self, rut):
+        cliente = Customer.objects.create(nombre='Cliente', rut=rut, business=self.negocio)
+        cliente.telefono = '111'
+        cliente.save()
+        cliente.save(update_fields=['updated_at'])
+        cliente.nombre = 'Cliente frecuente'
+        cliente.save(update_fields=['nombre'])
+        pk = cliente.pk
+        cliente.delete()
+        return pk
+
+    def _historial(self, pk):
+        return list(
+            Customer.history.filter(id=pk).order_by('history_date', 'history_id').values_list(*self.CAMPOS)
+        )
+
+    def test_lote_igual_a_escritura_directa(self):
+        with override_settings(HISTORY_BATCH_WRITES=False):
+            directo = self._operaciones('1-1')
+
+        with override_settings(HISTORY_BATCH_WRITES=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                en_lote = self._operaciones('2-2')
+                # Nada se escribe hasta el commit
+                self.assertFalse(Customer.history.filter(id=en_lote).exists())
+
+        self.assertEqual(len(self._historial(directo)), 4)
+        self.assertEqual(self._historial(en_lote), self._historial(directo))
+
+    @override_settings(HISTORY_BATCH_WRITES=True)
+    def test_savepoint_revertido_descarta_su_historial(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            guardado = Customer.objects.create(nombre='Guardado', rut='1-1', business=self.negocio)
+            try:
+                with transaction.atomic():
+                    revertido = Customer.objects.create(nombre='Revertido', rut='2-2', business=self.negocio)
+                    guardado.telefono = '111'
+                    guardado.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(list(Customer.history.filter(id=guardado.pk).values_list('history_type', flat=True)), ['+'])
+        self.assertFalse(Customer.history.filter(id=revertido.pk).exists())
+
+    def test_solo_updated_at_no_escribe_historial(self):
+        for en_lote in (False, True):
+            with self.subTest(en_lote=en_lote), override_settings(HISTORY_BATCH_WRITES=en_lote):
+                with self.captureOnCommitCallbacks(execute=True):
+                    cliente = Customer.objects.create(nombre='Cliente', rut=f'{int(en_lote)}-1', business=self.negocio)
+                    cliente.save(update_fields=['updated_at'])
+                self.assertEqual(cliente.history.count(), 1)
+
+
+class DashboardTotalesTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.usuario, self.negocio = crear_negocio()
+        self.client.force_authenticate(self.usuario)
+
+    def _venta(self, momento):
+        venta = Sale.objects.create(
+            vendedor=self.usuario, business=self.negocio, total=Decimal('1000'), metodo_pago='efectivo',
+        )
+        Sale.objects.filter(pk=venta.pk).update(created_at=timezone.make_aware(momento))
+
+    def test_totales_incluyen_el_dia_final_completo(self):
+        inicio, fin = date(2025, 3, 1), date(2025, 3, 31)
+        self._venta(datetime(2025, 3, 1, 0, 0))
+        self._venta(datetime(2025, 3, 31, 18, 30))
+        self._venta(datetime(2025, 4, 1, 0, 0))
+        self._venta(datetime(2025, 2, 28, 23, 59))
+
+        response = self.client.get(reverse('dashboard'), {'start_date': inicio, 'end_date': fin})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totales']['ventas'], 2)
+        self.assertEqual(response.data['totales']['total_ingresos'], Decimal('2000'))
+
+
+def _mes(valor, meses=0):
+    mes = valor.month - 1 + meses
+    return date(valor.year + mes // 12, mes % 12 + 1, 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'El particionamiento solo existe en PostgreSQL')
+class ParticionarHistorialTests(TestCase):
+    """
+    `partition_history convert/create` sobre el historial de ventas. Es TestCase: el DDL de
+    PostgreSQL es transaccional, así que la conversión se revierte al terminar cada prueba.
+    """
+
+    MESES_ATRAS = 4
+
+    def setUp(self):
+        self.usuario, self.negocio = crear_negocio()
+        self.Historial = Sale.history.model
+        self.tabla = self.Historial._meta.db_table
+        for _ in range(self.MESES_ATRAS + 1):
+            Sale.objects.create(vendedor=self.usuario, total=Decimal('1000'), metodo_pago='efectivo', business=self.negocio)
+        # Un registro de historial por mes, desde MESES_ATRAS meses atrás hasta el actual
+        hoy = timezone.now()
+        for i, pk in enumerate(self.Historial.objects.order_by('history_id').values_list('pk', flat=True)):
+            self.Historial.objects.filter(pk=pk).update(history_date=hoy - timedelta(days=31 * i))
+        self.filas = self.Historial.objects.count()
+
+    def _particiones(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits i "
+                "JOIN pg_class parent ON parent.oid = i.inhparent JOIN pg_class child ON child.oid = i.inhrelid "
+                "WHERE parent.relname = %s",
+                [self.tabla],
+            )
+            return {fila[0] for fila in cursor.fetchall()}
+
+    def _particionar(self, *args):
+        # ALTER TABLE falla con chequeos de FK diferidos pendientes: se ejecutan antes
+        connection.check_constraints()
+        call_command('partition_history', *args, 'sales.Sale', stdout=StringIO())
+
+    def test_convert_conserva_filas_y_secuencia(self):
+        self._particionar('convert', '--months-ahead', '2')
+        particiones = self._particiones()
+        self.assertIn(f'{self.tabla}_default', particiones)
+        self.assertIn(f'{self.tabla}_p{_mes(timezone.now(), 2):%Y%m}', particiones)
+        self.assertIn(f'{self.tabla}_p{_mes(timezone.now() - timedelta(days=31 * self.MESES_ATRAS)):%Y%m}', particiones)
+        self.assertEqual(self.Historial.objects.count(), self.filas)
+
+        # Los registros nuevos toman ids de la nueva secuencia, sin chocar con los copiados
+        maximo = self.Historial.objects.order_by('-history_id').values_list('history_id', flat=True).first()
+        venta = Sale.objects.create(vendedor=self.usuario, total=Decimal('500'), metodo_pago='efectivo', business=self.negocio)
+        venta.total = Decimal('600')
+        venta.save()
+        self.assertEqual(self.Historial.objects.count(), self.filas + 2)
+        self.assertGreater(self.Historial.objects.filter(id=venta.pk).latest('history_id').history_id, maximo)
+
+        # convert es idempotente
+        self._particionar('convert')
+        self.assertEqual(self.Historial.objects.count(), self.filas + 2)
+
+    def test_create_agrega_meses_futuros(self):
+        self._particionar('convert', '--months-ahead', '1')
+        self._particionar('create', '--months-ahead', '6')
+        particiones = self._particiones()
+        for meses in range(7):
+            self.assertIn(f'{self.tabla}_p{_mes(timezone.now(), meses):%Y%m}', particiones)
+
+    def test_consulta_por_rango_de_fechas_recorre_una_particion(self):
+        self._particionar('convert')
+        self._particionar('create')
+        mes = _mes(timezone.now(), -1)
+        # Las particiones van de medianoche a medianoche UTC (la zona de la conexión)
+        desde = datetime(mes.year, mes.month, 1, tzinfo=dt_timezone.utc)
+        siguiente = _mes(mes, 1)
+        hasta = datetime(siguiente.year, siguiente.month, 1, tzinfo=dt_timezone.utc)
+        plan = self.Historial.objects.filter(history_date__gte=desde, history_date__lt=hasta).explain()
+        recorridas = [p for p in self._particiones() if re.search(rf'\b{p}\b', plan)]
+        self.assertEqual(recorridas, [f'{self.tabla}_p{mes:%Y%m}'], plan)
+
+
+class PresupuestoArranqueTests(SimpleTestCase):
+    """Presupuestos de arranque de `startup_audit` (tiempo, memoria y módulos diferidos)."""
+
+    def test_arranque_dentro_del_presupuesto(self):
+        salida = StringIO()
+        call_command('startup_audit', '--check', '--runs', '3', stdout=salida)
+        self.assertIn('Arranque dentro del presupuesto', salida.getvalue())
+
+    def test_presupuesto_excedido_falla(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as fh:
+            json.dump({'setup': {'ms': 0}}, fh)
+            fh.flush()
+            with self.assertRaisesMessage(CommandError, 'Presupuesto de arranque excedido en: setup'):
+                call_command('startup_audit', 'setup', '--check', '--runs', '1', '--budgets', fh.name, stdout=StringIO())
+
+
+class ReadyTests(SimpleTestCase):
+    """/health/ready/: solo la primaria saca la instancia de rotación."""
+
+    def _ready(self, caidas):
+        with mock.patch('core.health.connections', [DEFAULT_DB_ALIAS, REPLICA]), \
+                mock.patch('core.health._responde', side_effect=lambda alias: alias not in caidas):
+            response = self.client.get(reverse('health-ready'))
+        return response.status_code, json.loads(response.content)
+
+    def test_todas_las_bases_responden(self):
+        self.assertEqual(self._ready(set()), (200, {'status': 'ok', 'databases': {DEFAULT_DB_ALIAS: 'ok', REPLICA: 'ok'}}))
+
+    def test_replica_caida_queda_degradada(self):
+        self.assertEqual(
+            self._ready({REPLICA}),
+            (200, {'status': 'degraded', 'databases': {DEFAULT_DB_ALIAS: 'ok', REPLICA: 'degraded'}}),
+        )
+
+    def test_primaria_caida_responde_503(self):
+        status, cuerpo = self._ready({DEFAULT_DB_ALIAS})
+        self.assertEqual(status, 503)
+        self.assertEqual(cuerpo['status'], 'error')
@@ -0,0 +1,179 @@
+"""
+Timeline de actividad del negocio (dashboard).
+
+Cada fuente (ventas, reservas, lotes, ventas pendientes) aporta las mismas columnas y todas se
+combinan en una sola consulta ``UNION ALL`` con el ORDER BY y el LIMIT aplicados en la base.
+En PostgreSQL cada rama lleva además su propio ORDER BY/LIMIT, así que cada fuente lee a lo más
+``limit + 1`` filas por su índice ``(business, created_at)`` en vez de todo el rango de fechas.
+
+El orden es (fecha, tipo, id) descendente y la paginación es por cursor (keyset): el cursor
+codifica la última fila entregada y la página siguiente continúa estrictamente después de ella,
+sin OFFSET y sin duplicados aunque entren eventos nuevos.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connections, router
+from django.db.models import (
+    CharField, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Cast, Coalesce
+
+from inventory.models import FruitLot, StockReservation
+from sales.models import Sale, SaleItem, SalePending, SalePendingItem
+
+DECIMAL = DecimalField(max_digits=14, decimal_places=2)
+TEXTO = CharField()
+
+# Columnas comunes de todas las fuentes, en el orden del UNION
+COLUMNAS = ('event_date', 'event_rank', 'event_id', 'event_type', 'description', 'subtitle',
+            'amount', 'quantity', 'event_status', 'event_payment')
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _texto(valor):
+    return Value(valor, output_field=TEXTO)
+
+
+def _decimal(expresion):
+    return Coalesce(Cast(expresion, DECIMAL), Value(Decimal('0'), output_field=DECIMAL))
+
+
+def _suma_items(model, campo, fk):
+    total = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(s=Sum(campo)).values('s')
+    return Subquery(total, output_field=DECIMAL)
+
+
+class Fuente:
+    """Un tipo de evento del timeline: su queryset base y cómo llenar las columnas comunes."""
+
+    def __init__(self, tipo, rank, queryset, negocio='business', **columnas):
+        self.tipo = tipo
+        # Desempate entre eventos de distinto tipo con la misma fecha
+        self.rank = rank
+        self.queryset = queryset
+        self.negocio = negocio
+        self.columnas = columnas
+
+    def eventos(self, business, desde, hasta):
+        return self.queryset.filter(
+            **{self.negocio: business}, created_at__gte=desde, created_at__lt=hasta,
+        ).annotate(
+            event_date=F('created_at'),
+            event_rank=Value(self.rank, output_field=IntegerField()),
+            event_id=F('id'),
+            event_type=_texto(self.tipo),
+            description=self.columnas.get('description', _texto('')),
+            subtitle=Coalesce(self.columnas.get('subtitle', _texto('')), _texto(''), output_field=TEXTO),
+            amount=_decimal(self.columnas.get('amount', Value(0))),
+            quantity=_decimal(self.columnas.get('quantity', Value(0))),
+            event_status=Coalesce(self.columnas.get('status', _texto('')), _texto(''), output_field=TEXTO),
+            event_payment=Coalesce(self.columnas.get('payment', _texto('')), _texto(''), output_field=TEXTO),
+        ).order_by().values(*COLUMNAS)
+
+    def despues_de(self, cursor):
+        """Filtro keyset: filas de esta fuente que van después del cursor en orden descendente."""
+        fecha, rank, event_id = cursor
+        if self.rank < rank:
+            return Q(created_at__lte=fecha)
+        if self.rank > rank:
+            return Q(created_at__lt=fecha)
+        return Q(created_at__lt=fecha) | Q(created_at=fecha, id__lt=event_id)
+
+
+FUENTES = [
+    Fuente(
+        'Sale', 4, Sale.objects.all(),
+        description=_texto('Venta'),
+        subtitle=F('codigo_venta'),
+        amount=F('total'),
+        quantity=_suma_items(SaleItem, 'peso_vendido', 'venta'),
+        status=F('estado_pago'),
+        payment=F('metodo_pago'),
+    ),
+    Fuente(
+        'Reserva', 3, StockReservation.objects.all(), negocio='lote__business',
+        description=_texto('Reserva de stock'),
+        subtitle=F('nombre_cliente'),
+        quantity=F('kg_reservados'),
+        status=F('estado'),
+    ),
+    Fuente(
+        'Lote', 2, FruitLot.objects.all(),
+        description=_texto('Nuevo lote'),
+        subtitle=F('proveedor__nombre'),
+        quantity=F('peso_neto'),
+        status=F('estado_lote'),
+    ),
+    Fuente(
+        'Pendiente', 1, SalePending.objects.all(),
+        description=_texto('Venta pendiente'),
+        subtitle=F('nombre_cliente'),
+        amount=F('total'),
+        quantity=_suma_items(SalePendingItem, 'cantidad_kg', 'venta_pendiente'),
+        status=F('estado'),
+        payment=F('metodo_pago'),
+    ),
+]
+
+
+def codificar_cursor(evento):
+    datos = [evento['event_date'].isoformat(), evento['event_rank'], evento['event_id']]
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        fecha, rank, event_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(fecha), int(rank), int(event_id)
+    except (ValueError, TypeError):
+        raise CursorInvalido('Cursor de timeline inválido')
+
+
+def _formatear(fila):
+    evento = {
+        'event_type': fila['event_type'],
+        'event_date': fila['event_date'],
+        'description': fila['description'],
+        'subtitle': fila['subtitle'],
+        'amount': fila['amount'],
+        'quantity': fila['quantity'],
+        'event_id': fila['event_id'],
+    }
+    # Mismas claves extra que entregaba el timeline anterior
+    if fila['event_type'] == 'Sale':
+        evento['metodo_pago'] = fila['event_payment']
+    else:
+        evento['estado'] = fila['event_status']
+    return evento
+
+
+def timeline(business, desde, hasta, limit=50, cursor=None):
+    """
+    Eventos del negocio con fecha en [desde, hasta), del más reciente al más antiguo.
+    Devuelve (eventos, cursor_siguiente); cursor_siguiente es None si no hay más.
+    """
+    posicion = decodificar_cursor(cursor) if cursor else None
+    alias = router.db_for_read(Sale)
+    # SQLite y otros motores no aceptan ORDER BY/LIMIT dentro de las ramas de un UNION
+    limitar_ramas = connections[alias].features.supports_slicing_ordering_in_compound
+
+    ramas = []
+    for fuente in FUENTES:
+        qs = fuente.eventos(business, desde, hasta)
+        if posicion:
+            qs = qs.filter(fuente.despues_de(posicion))
+        if limitar_ramas:
+            qs = qs.order_by('-event_date', '-event_id')[:limit + 1]
+        ramas.append(qs)
+
+    union = ramas[0].union(*ramas[1:], all=True).order_by('-event_date', '-event_rank', '-event_id')
+    filas = list(union[:limit + 1])
+
+    siguiente = codificar_cursor(filas[limit - 1]) if len(filas) > limit else None
+    return [_formatear(fila) for fila in filas[:limit]], siguiente
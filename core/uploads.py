@@ -0,0 +1,227 @@
+"""
+Carga diferida de imágenes y comprobantes.
+
+Las fotos de boletas tomadas con el teléfono pesan varios MB; subirlas al storage (Spaces) dentro
+de la request la bloqueaba. Con ``CargaDiferidaMixin`` el serializer guarda el objeto sin el
+archivo, deja el archivo en disco local (UPLOADS_SPOOL_DIR) y registra un ``UploadJob``; la
+respuesta sale de inmediato con el campo aún vacío.
+
+El job lo procesa un hilo del mismo proceso al confirmar la transacción (UPLOADS_PROCESS_IN_THREAD)
+o ``manage.py process_uploads`` (worker aparte, que además reintenta los pendientes). Las imágenes
+se rotan según su EXIF y se recodifican a WebP sin metadatos (se descartan EXIF y GPS), con una
+miniatura al lado (``<nombre>_thumb.webp``); los PDF y otros archivos se suben tal cual. El
+archivo se asigna con un UPDATE, sin pasar por save() ni señales.
+
+Se usa el storage del campo (STORAGES['default']), así que en pruebas basta con
+``override_settings(STORAGES={'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}, ...})``
+o un FileSystemStorage en un directorio temporal.
+"""
+import io
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.models import UploadJob
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 3
+# Un job "procesando" más antiguo que esto quedó huérfano (p. ej. el proceso se reinició)
+PROCESANDO_VENCIDO = timedelta(minutes=15)
+SUFIJO_MINIATURA = '_thumb.webp'
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='uploads')
+    return _executor
+
+
+def nombre_miniatura(nombre):
+    """Nombre de la miniatura de un archivo ya procesado, o None si no tiene (PDF, sin procesar)."""
+    if not nombre or not nombre.endswith('.webp'):
+        return None
+    return nombre[:-len('.webp')] + SUFIJO_MINIATURA
+
+
+# Encolado
+
+def _copiar_a_spool(archivo):
+    """Escribe el archivo subido en UPLOADS_SPOOL_DIR por bloques y devuelve la ruta."""
+    os.makedirs(settings.UPLOADS_SPOOL_DIR, exist_ok=True)
+    _, extension = os.path.splitext(archivo.name or '')
+    ruta = os.path.join(settings.UPLOADS_SPOOL_DIR, f"{uuid.uuid4().hex}{extension.lower()}")
+    temporal = getattr(archivo, 'temporary_file_path', None)
+    if temporal is not None:
+        # Los archivos grandes ya están en disco (TemporaryUploadedFile): se copian sin leerlos a memoria
+        shutil.copyfile(temporal(), ruta)
+    else:
+        with open(ruta, 'wb') as destino:
+            for bloque in archivo.chunks():
+                destino.write(bloque)
+    return ruta
+
+
+def encolar(instance, campo, archivo):
+    """
+    Deja `archivo` (un UploadedFile) pendiente de procesar para `instance.<campo>` y devuelve el job.
+    Si hay una transacción abierta, el procesamiento parte cuando se confirma.
+    """
+    job = UploadJob.objects.create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        campo=campo,
+        ruta=_copiar_a_spool(archivo),
+        nombre_original=(archivo.name or '')[:255],
+    )
+    if settings.UPLOADS_PROCESS_IN_THREAD:
+        transaction.on_commit(lambda: _pool().submit(_procesar_en_hilo, job.pk))
+    return job
+
+
+def _procesar_en_hilo(job_id):
+    close_old_connections()
+    try:
+        procesar(job_id)
+    except Exception:
+        logger.exception(f"Error inesperado procesando la carga {job_id}")
+    finally:
+        connection.close()
+
+
+# Procesamiento
+
+def _a_webp(imagen, lado_maximo):
+    copia = imagen.copy()
+    copia.thumbnail((lado_maximo, lado_maximo))
+    salida = io.BytesIO()
+    # Sin exif= ni icc_profile=: la imagen se guarda sin metadatos
+    copia.save(salida, 'WEBP', quality=settings.UPLOADS_WEBP_QUALITY, method=4)
+    return salida.getvalue()
+
+
+def _convertir(ruta):
+    """(contenido, miniatura) en WebP si es una imagen; (None, None) si no lo es."""
+    # Pillow se carga recién al procesar el primer archivo, no al importar los serializers
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(ruta) as original:
+            imagen = ImageOps.exif_transpose(original)
+            imagen.load()
+    except (UnidentifiedImageError, OSError):
+        return None, None
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() or imagen.mode == 'P' else 'RGB')
+    return _a_webp(imagen, settings.UPLOADS_MAX_DIMENSION), _a_webp(imagen, settings.UPLOADS_THUMBNAIL_SIZE)
+
+
+def _reclamar(job_id):
+    """Marca el job como en proceso; False si otro worker ya lo tomó o no está pendiente."""
+    return UploadJob.objects.filter(pk=job_id, estado='pendiente').update(
+        estado='procesando', intentos=F('intentos') + 1, updated_at=timezone.now(),
+    ) == 1
+
+
+def procesar(job_id):
+    """Procesa un job pendiente y asigna el archivo resultante a su objeto. Devuelve el job."""
+    if not _reclamar(job_id):
+        return None
+    job = UploadJob.objects.select_related('content_type').get(pk=job_id)
+    try:
+        _subir(job)
+    except Exception as e:
+        job.estado = 'error' if job.intentos >= MAX_INTENTOS else 'pendiente'
+        job.error = str(e)
+        job.save(update_fields=['estado', 'error', 'updated_at'])
+        logger.exception(f"Error procesando la carga {job.pk} ({job})")
+        return job
+
+    job.estado = 'completado'
+    job.error = ''
+    job.save(update_fields=['estado', 'error', 'updated_at'])
+    try:
+        os.remove(job.ruta)
+    except OSError:
+        pass
+    return job
+
+
+def _subir(job):
+    model = job.content_type.model_class()
+    instance = model._default_manager.filter(pk=job.object_id).first()
+    if instance is None:
+        raise ValueError('El objeto ya no existe')
+    field = model._meta.get_field(job.campo)
+
+    contenido, miniatura = _convertir(job.ruta)
+    if contenido is None:
+        _, extension = os.path.splitext(job.nombre_original or job.ruta)
+        with open(job.ruta, 'rb') as fh:
+            contenido = fh.read()
+    else:
+        extension = '.webp'
+
+    nombre = field.storage.save(
+        field.generate_filename(instance, f"{uuid.uuid4().hex}{extension.lower()}"), ContentFile(contenido),
+    )
+    if miniatura is not None:
+        field.storage.save(nombre_miniatura(nombre), ContentFile(miniatura))
+    model._default_manager.filter(pk=instance.pk).update(**{job.campo: nombre})
+
+
+def procesar_pendientes(limite=100):
+    """Procesa hasta `limite` jobs pendientes (los huérfanos en proceso vuelven a pendientes)."""
+    UploadJob.objects.filter(
+        estado='procesando', updated_at__lt=timezone.now() - PROCESANDO_VENCIDO,
+    ).update(estado='pendiente')
+    ids = list(UploadJob.objects.filter(estado='pendiente').order_by('created_at').values_list('pk', flat=True)[:limite])
+    return [job for job in map(procesar, ids) if job is not None]
+
+
+# Serializers
+
+class CargaDiferidaMixin:
+    """
+    Para ModelSerializers: los archivos de `campos_diferidos` no se escriben al storage durante
+    la request sino que se encolan (ver encolar). Mientras se procesan, el campo queda vacío.
+    """
+    campos_diferidos = ()
+
+    def save(self, **kwargs):
+        archivos = {
+            campo: self._validated_data.pop(campo)
+            for campo in self.campos_diferidos
+            if self._validated_data.get(campo)
+        }
+        with transaction.atomic():
+            instance = super().save(**kwargs)
+            for campo, archivo in archivos.items():
+                encolar(instance, campo, archivo)
+        return instance
+
+
+class MiniaturaField(serializers.ReadOnlyField):
+    """URL de la miniatura de un archivo procesado (None si no hay archivo o no es imagen)."""
+
+    def to_representation(self, value):
+        nombre = nombre_miniatura(getattr(value, 'name', None))
+        if nombre is None:
+            return None
+        url = value.storage.url(nombre)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
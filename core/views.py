@@ -2,100 +2,38 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils.dateparse import parse_date
-from datetime import datetime, timedelta
-from sales.models import Sale, Customer, SalePending
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from sales.models import Sale, SaleItem, Customer, SalePending
 from inventory.models import Product, FruitLot, StockReservation
 from shifts.models import Shift
 from business.models import Business
 from accounts.models import CustomUser
-from django.db.models import Sum, Count, F, Q, Value as V, CharField, DecimalField, IntegerField, DateTimeField
+from django.db.models import Sum, Count, F, Q, Value as V, CharField, DecimalField, IntegerField, DateTimeField, OuterRef, Subquery
 from django.db import models
 from accounts.authentication import CustomJWTAuthentication
 from accounts.models import Perfil
 from itertools import chain
 from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+from core.timeline import CursorInvalido, timeline
+from core.search import LIMITE_MAXIMO, BusquedaInvalida, buscar
 
 class DashboardView(APIView):
     authentication_classes = [CustomJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
-    def get_timeline(self, business, start_date, end_date, limit=50):
-        """Genera un timeline con los eventos más relevantes del negocio."""
-        # Ventas realizadas
-        ventas = Sale.objects.filter(
-            business=business, 
-            created_at__range=[start_date, end_date]
-        ).annotate(
-            event_type=models.Value('Sale'),
-            event_date=F('created_at'),
-            description=models.Value('Venta'),
-            subtitle=models.Value(''),
-            amount=F('total'),
-            quantity=F('peso_vendido'),
-            event_id=F('id'),
-        ).values(
-            'event_type', 'event_date', 'description', 'subtitle', 
-            'amount', 'quantity', 'event_id', 'metodo_pago'
-        )
-        
-        # Reservas de stock
-        reservas = StockReservation.objects.filter(
-            lote__business=business, 
-            created_at__range=[start_date, end_date]
-        ).annotate(
-            event_type=models.Value('Reserva'),
-            event_date=F('created_at'),
-            description=models.Value('Reserva de stock'),
-            subtitle=models.Value(''),
-            amount=models.Value(0),
-            quantity=F('cantidad_kg'),
-            event_id=F('id'),
-        ).values(
-            'event_type', 'event_date', 'description', 'subtitle', 
-            'amount', 'quantity', 'event_id', 'estado'
-        )
-        
-        # Lotes nuevos
-        lotes = FruitLot.objects.filter(
-            business=business, 
-            created_at__range=[start_date, end_date]
-        ).annotate(
-            event_type=models.Value('Lote'),
-            event_date=F('created_at'),
-            description=models.Value('Nuevo lote'),
-            subtitle=F('proveedor'),
-            amount=models.Value(0),
-            quantity=F('peso_neto'),
-            event_id=F('id'),
-        ).values(
-            'event_type', 'event_date', 'description', 'subtitle', 
-            'amount', 'quantity', 'event_id'
-        )
-        
-        # Ventas pendientes
-        pendientes = SalePending.objects.filter(
-            business=business, 
-            created_at__range=[start_date, end_date]
-        ).annotate(
-            event_type=models.Value('Pendiente'),
-            event_date=F('created_at'),
-            description=models.Value('Venta pendiente'),
-            subtitle=models.Value(''),
-            amount=models.Value(0),
-            quantity=F('cantidad_kg'),
-            event_id=F('id'),
-        ).values(
-            'event_type', 'event_date', 'description', 'subtitle', 
-            'amount', 'quantity', 'event_id', 'estado'
-        )
-        
-        # Combinamos todos los eventos
-        all_events = list(chain(ventas, reservas, lotes, pendientes))
-        
-        # Ordenamos por fecha (más reciente primero) y limitamos
-        sorted_events = sorted(all_events, key=lambda x: x['event_date'], reverse=True)[:limit]
-        
-        return sorted_events
+    @staticmethod
+    def limites(start_date, end_date):
+        """Rango [desde, hasta) en datetimes locales que incluye completo el día end_date."""
+        desde = timezone.make_aware(datetime.combine(start_date, time.min))
+        hasta = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        return desde, hasta
+
+    def get_timeline(self, business, start_date, end_date, limit=50, cursor=None):
+        """Genera un timeline con los eventos más relevantes del negocio (ver core/timeline.py)."""
+        desde, hasta = self.limites(start_date, end_date)
+        return timeline(business, desde, hasta, limit=limit, cursor=cursor)
 
     def get(self, request):
         user = request.user
@@ -117,17 +55,23 @@ class DashboardView(APIView):
             start_date = end_date - timedelta(days=30)
         else:
             start_date = parse_date(start_date)
+        # Mismos límites que el timeline: __range con fechas cortaba el último día a las 00:00
+        desde, hasta = self.limites(start_date, end_date)
 
         # Ventas
-        sales_qs = Sale.objects.filter(business=business, created_at__range=[start_date, end_date])
+        sales_qs = Sale.objects.filter(business=business, created_at__gte=desde, created_at__lt=hasta)
         total_ventas = sales_qs.count()
-        total_kilos = sales_qs.aggregate(total=Sum('peso_vendido'))['total'] or 0
+        # Los kilos están en los ítems; se suman por venta para no duplicar el total al agrupar
+        kilos_venta = SaleItem.objects.filter(venta=OuterRef('pk')).order_by().values('venta').annotate(
+            s=Sum('peso_vendido')).values('s')
+        sales_qs = sales_qs.annotate(kilos_venta=Subquery(kilos_venta, output_field=DecimalField(max_digits=12, decimal_places=2)))
+        total_kilos = SaleItem.objects.filter(venta__in=sales_qs.values('pk')).aggregate(total=Sum('peso_vendido'))['total'] or 0
         total_ingresos = sales_qs.aggregate(total=Sum('total'))['total'] or 0
 
         # Ventas agrupadas
         sales_by_date = sales_qs.extra({'date': "date(created_at)"}).values('date').annotate(
             total_ventas=Count('id'),
-            total_kilos=Sum('peso_vendido'),
+            total_kilos=Sum('kilos_venta'),
             total_ingresos=Sum('total')
         ).order_by('date')
 
@@ -142,17 +86,17 @@ class DashboardView(APIView):
         )
 
         # Reservas de stock
-        reservas = StockReservation.objects.filter(lote__business=business, created_at__range=[start_date, end_date])
+        reservas = StockReservation.objects.filter(lote__business=business, created_at__gte=desde, created_at__lt=hasta)
         reservas_count = reservas.count()
         reservas_pendientes = reservas.filter(estado='pendiente').count()
 
         # Clientes
         clientes = Customer.objects.filter(business=business)
         clientes_count = clientes.count()
-        nuevos_clientes = clientes.filter(created_at__range=[start_date, end_date]).count()
+        nuevos_clientes = clientes.filter(created_at__gte=desde, created_at__lt=hasta).count()
 
         # Turnos
-        turnos = Shift.objects.filter(business=business, fecha_apertura__range=[start_date, end_date])
+        turnos = Shift.objects.filter(business=business, fecha_apertura__gte=desde, fecha_apertura__lt=hasta)
         turnos_count = turnos.count()
         turnos_abiertos = turnos.filter(fecha_cierre__isnull=True).count()
 
@@ -165,8 +109,8 @@ class DashboardView(APIView):
             .order_by('rol')
         )
         
-        # Timeline de actividades
-        timeline = self.get_timeline(business, start_date, end_date)
+        # Timeline de actividades (las páginas siguientes se piden a /dashboard/timeline/)
+        eventos, timeline_cursor = self.get_timeline(business, start_date, end_date)
 
         return Response({
             'totales': {
@@ -184,6 +128,61 @@ class DashboardView(APIView):
             'ventas_por_fecha': list(sales_by_date),
             'stock': list(stock),
             'usuarios_por_rol': list(usuarios),
-            'timeline': timeline,
+            'timeline': eventos,
+            'timeline_cursor': timeline_cursor,
         })
 
+
+
+class DashboardTimelineView(DashboardView):
+    """
+    Páginas siguientes del timeline del dashboard ("cargar más").
+    Parámetros: start_date, end_date (como el dashboard), cursor (timeline_cursor o next_cursor
+    de la respuesta anterior) y limit (máximo 200).
+    """
+
+    def get(self, request):
+        perfil = getattr(request.user, 'perfil', None)
+        if perfil is None:
+            return Response({'detail': 'Perfil no encontrado.'}, status=404)
+
+        end_date = parse_date(request.query_params.get('end_date') or '') or datetime.now().date()
+        start_date = parse_date(request.query_params.get('start_date') or '') or end_date - timedelta(days=30)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero.'})
+
+        try:
+            eventos, siguiente = self.get_timeline(
+                perfil.business, start_date, end_date, limit=limit, cursor=request.query_params.get('cursor'))
+        except CursorInvalido as e:
+            raise ValidationError({'cursor': str(e)})
+        return Response({'results': eventos, 'next_cursor': siguiente})
+
+
+class SearchView(APIView):
+    """
+    Búsqueda unificada del negocio (ver core/search.py).
+    Parámetros: q (al menos 3 caracteres), tipos (opcional, separados por coma: producto, lote,
+    bin, cliente, proveedor, venta) y limit (máximo 50).
+    """
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        perfil = getattr(request.user, 'perfil', None)
+        if perfil is None:
+            return Response({'detail': 'Perfil no encontrado.'}, status=404)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), LIMITE_MAXIMO)
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero.'})
+        tipos = [t.strip() for t in request.query_params.get('tipos', '').split(',') if t.strip()]
+
+        try:
+            resultados = buscar(perfil.business, request.query_params.get('q'), tipos=tipos, limit=limit)
+        except BusquedaInvalida as e:
+            raise ValidationError({'q': str(e)})
+        return Response({'results': resultados})
@@ -40,6 +40,10 @@ echo -e "${GREEN}¡Base de datos lista!${NC}"
 echo -e "${YELLOW}Aplicando migraciones...${NC}"
 python manage.py migrate --noinput
 
+# Categoría de los productos que aún no la tienen (idempotente: solo toca los que tienen categoría vacía)
+echo -e "${YELLOW}Clasificando productos sin categoría...${NC}"
+python manage.py classify_products
+
 # Collectstatic (solo en producción o si se solicita explícitamente)
 if [ "$DJANGO_ENV" = "production" ] || [ "$COLLECT_STATIC" = "True" ]; then
     echo -e "${YELLOW}Recolectando archivos estáticos...${NC}"
@@ -50,10 +54,20 @@ fi
 echo -e "${GREEN}Iniciando servidor con DJANGO_SETTINGS_MODULE=$DJANGO_SETTINGS_MODULE${NC}"
 echo -e "${GREEN}Entorno: $DJANGO_ENV${NC}"
 
-# Ejecutar el comando que se pasa como argumento o iniciar Daphne por defecto
+# Ejecutar el comando que se pasa como argumento o iniciar el servidor según SERVER_MODE:
+#   http -> gunicorn (varios procesos, conexiones persistentes), solo HTTP; ver gunicorn.conf.py
+#   ws   -> Daphne solo para WebSockets (sin conexiones persistentes a la base)
+#   sin definir -> Daphne para HTTP y WebSockets en un solo proceso
 if [ $# -gt 0 ]; then
     echo -e "${GREEN}Ejecutando comando: $@${NC}"
     exec "$@"
+elif [ "$SERVER_MODE" = "http" ]; then
+    echo -e "${GREEN}Iniciando gunicorn (HTTP)...${NC}"
+    exec gunicorn -c gunicorn.conf.py backend.wsgi:application
+elif [ "$SERVER_MODE" = "ws" ]; then
+    echo -e "${GREEN}Iniciando Daphne (WebSockets)...${NC}"
+    export DB_CONN_MAX_AGE=0
+    exec daphne -b 0.0.0.0 -p 8000 backend.asgi:application
 else
     # Iniciar Daphne para ambos entornos
     echo -e "${GREEN}Iniciando Daphne...${NC}"
@@ -0,0 +1,48 @@
+"""
+Configuración de gunicorn para el tráfico HTTP en producción.
+
+    gunicorn -c gunicorn.conf.py backend.wsgi:application
+
+Las requests HTTP van a gunicorn con varios procesos y hilos (WSGI), donde cada hilo reutiliza su
+conexión a PostgreSQL entre requests (DB_CONN_MAX_AGE). Los WebSockets siguen en Daphne, en un
+servicio aparte (ver docker-entrypoint.sh, SERVER_MODE=ws).
+
+Todo se puede ajustar por variables de entorno sin reconstruir la imagen.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Procesos: 2 por CPU + 1 es el punto de partida habitual; cada uno con varios hilos porque las
+# vistas pasan la mayor parte del tiempo esperando a la base.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Reportes largos: más que el default de 30 s (los muy pesados van por reports/jobs)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+# nginx mantiene conexiones abiertas hacia la API
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Reciclar procesos de a poco para acotar el crecimiento de memoria
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+# Cargar la aplicación antes de crear los procesos: arranque más rápido y memoria compartida.
+# Las conexiones a la base se abren recién en cada proceso (Django las crea en la primera consulta).
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+# Detrás de nginx
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '*')
+
+
+def pre_fork(server, worker):
+    # Con preload_app, una conexión abierta al importar no debe heredarse a los procesos hijos
+    from django.db import connections
+
+    connections.close_all()
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from .models import BoxType, FruitLot, GoodsReception, Product, Supplier, ReceptionDetail, FruitBin
 from .bin_to_lot_models import BinToLotTransformation, BinToLotTransformationDetail
+from .models_ledger import SupplierBalanceSnapshot, SupplierLedgerEntry
+from .fruitlot_results import FruitLotResult
 
 @admin.register(BoxType)
 class BoxTypeAdmin(admin.ModelAdmin):
@@ -21,3 +23,54 @@ admin.site.register(Supplier)
 admin.site.register(ReceptionDetail)
 admin.site.register(BinToLotTransformation)
 admin.site.register(BinToLotTransformationDetail)
+
+
+# Cuenta corriente de proveedores: solo lectura, los movimientos los registra inventory/supplier_ledger.py
+class SupplierLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('proveedor', 'fecha', 'tipo', 'monto', 'descripcion', 'created_at')
+    list_filter = ('tipo', 'business')
+    search_fields = ('proveedor__nombre', 'proveedor__rut', 'descripcion')
+    raw_id_fields = ('proveedor', 'recepcion', 'bin', 'pago', 'liquidacion')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+admin.site.register(SupplierLedgerEntry, SupplierLedgerEntryAdmin)
+
+
+class SupplierBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('proveedor', 'mes', 'saldo', 'cargos', 'abonos', 'movimientos')
+    list_filter = ('business',)
+    search_fields = ('proveedor__nombre', 'proveedor__rut')
+    raw_id_fields = ('proveedor',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(SupplierBalanceSnapshot, SupplierBalanceSnapshotAdmin)
+
+
+# Resultado de lotes agotados: lo calcula inventory/lot_result_service.py
+class FruitLotResultAdmin(admin.ModelAdmin):
+    list_display = ('fruitlot', 'fecha_venta_completa', 'real_ingreso_total', 'real_ganancia_total',
+                    'real_margen', 'prediccion_margen', 'real_dias_en_inventario')
+    list_filter = ('business',)
+    search_fields = ('fruitlot__qr_code', 'fruitlot__producto__nombre')
+    raw_id_fields = ('fruitlot',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(FruitLotResult, FruitLotResultAdmin)
@@ -1,8 +1,6 @@
 from rest_framework import serializers
 from .models import FruitBin, FruitLot, BoxType, PalletType
 from .bin_to_lot_models import BinToLotTransformation, BinToLotTransformationDetail
-from django.db import transaction
-from django.utils import timezone
 
 class BinToLotSerializer(serializers.Serializer):
     """
@@ -94,11 +92,6 @@ class BinToLotSerializer(serializers.Serializer):
         except BoxType.DoesNotExist:
             raise serializers.ValidationError("El tipo de caja especificado no existe")
         
-        # Calcular pesos disponibles en bins
-        from decimal import Decimal
-        total_neto_bins = sum((bin.peso_bruto - bin.peso_tara) for bin in bins)
-        data['total_neto_bins'] = total_neto_bins
-        
         # Aplicar restricciones según el tipo de caja
         box_type_nombre = box_type.nombre.lower()
         # La capacidad de contenido por caja define el peso neto esperado
@@ -127,143 +120,25 @@ class BinToLotSerializer(serializers.Serializer):
         if box_type.capacidad_por_caja > 30:
             raise serializers.ValidationError(f"La capacidad por caja definida ({box_type.capacidad_por_caja} kg) es demasiado alta. Revise el tipo de caja.")
         
-        # Añadir los bins al contexto para usarlos en create
-        data['bins'] = bins
-        
         return data
 
-    @transaction.atomic
     def create(self, validated_data):
         """
-        Crear un nuevo lote (pallet) a partir de los bins seleccionados
+        Crear un nuevo lote (pallet) a partir de los bins seleccionados.
+        Los bins se bloquean y se revalidan antes de descontar (ver bin_to_lot_service.py).
         """
-        bins = validated_data.pop('bins')
-        box_type = validated_data.pop('box_type')
-        from decimal import Decimal, ROUND_HALF_UP
-        total_neto_bins = validated_data.pop('total_neto_bins')
-        box_type_id = validated_data.pop('box_type_id')
-        
-        # Obtener el primer bin como referencia
-        bin_referencia = bins.first()
-        
-        # Si es un producto tipo palta, se maneja por peso
-        es_palta = bin_referencia.producto.tipo_producto == 'palta'
-        
-        # Calcular el peso neto del lote como cantidad_cajas * capacidad_por_caja (peso de producto por caja)
-        peso_neto = (Decimal(validated_data['cantidad_cajas']) * box_type.capacidad_por_caja).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        if peso_neto <= 0:
-            raise serializers.ValidationError("El peso neto calculado del lote debe ser positivo")
-        if peso_neto > total_neto_bins:
-            raise serializers.ValidationError("El peso neto del lote excede el peso neto disponible en los bins seleccionados")
-        
-        # Calcular unidades por caja si es producto tipo 'otro'
-        unidades_por_caja = 0
-        cantidad_unidades = 0
-        if not es_palta:
-            # Para productos que no son palta, asumimos que se manejan por unidades
-            # El usuario debería proporcionar este valor, pero aquí usamos un valor por defecto
-            unidades_por_caja = 12  # Valor por defecto, idealmente vendría del frontend
-            cantidad_unidades = validated_data['cantidad_cajas'] * unidades_por_caja
-        
-        # Crear el nuevo lote
-        # Usar el proveedor proporcionado en la solicitud si está disponible, de lo contrario usar el del bin
-        proveedor = validated_data.get('proveedor_obj') or bin_referencia.proveedor
-        
-        # Tara total por cajas (sin considerar pallet_type, que puede ser None)
-        tara_total = (box_type.peso_caja * validated_data['cantidad_cajas']).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        nuevo_lote = FruitLot.objects.create(
-            producto=bin_referencia.producto,
-            marca=bin_referencia.variedad or "",
-            proveedor=proveedor,
-            procedencia=proveedor.direccion if proveedor and proveedor.direccion else "No especificada",
-            pais="Chile",  # Valor por defecto
-            calibre=validated_data['calibre'],
-            box_type=box_type,
+        from .bin_to_lot_service import transformar_bins
+        return transformar_bins(
+            validated_data['bin_ids'],
+            box_type=validated_data['box_type'],
             cantidad_cajas=validated_data['cantidad_cajas'],
-            # Peso bruto = neto + tara de cajas
-            peso_bruto=(peso_neto + tara_total).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-            peso_neto=peso_neto,
-            business=bin_referencia.business,
-            fecha_ingreso=timezone.now().date(),
-            estado_maduracion='verde',  # Valor por defecto
+            calibre=validated_data['calibre'],
             costo_inicial=validated_data['costo_inicial'],
-            costo_diario_almacenaje=0,  # Valor por defecto
-            porcentaje_perdida_estimado=0,  # Valor por defecto
+            proveedor=validated_data.get('proveedor_obj'),
             precio_sugerido_min=validated_data.get('precio_sugerido_min'),
             precio_sugerido_max=validated_data.get('precio_sugerido_max'),
-            # Campos para productos tipo 'otro'
-            unidades_por_caja=unidades_por_caja,
-            cantidad_unidades=cantidad_unidades
+            business=self.context.get('business'),
         )
-        
-        # Registrar el cambio de estado de maduración inicial
-        from .models import MadurationHistory
-        MadurationHistory.objects.create(
-            lote=nuevo_lote,
-            estado_maduracion=nuevo_lote.estado_maduracion
-        )
-        
-        # Descontar kilos de forma secuencial: consumir completamente el primer bin, y el resto del siguiente, etc.
-        # Orden propuesto: bins con mayor neto primero para minimizar parciales
-        neto_restante = peso_neto
-        bins_list = sorted(list(bins), key=lambda b: (b.peso_bruto - b.peso_tara), reverse=True)
-        detalles_snapshot = []  # (bin, peso_bruto_previo, peso_tara_previa, kg_descontados)
-        total_neto_consumido = Decimal('0.00')
-        for bin in bins_list:
-            if neto_restante <= 0:
-                break
-            bin_neto_actual = (bin.peso_bruto - bin.peso_tara)
-            kg_a_descontar = bin_neto_actual if bin_neto_actual <= neto_restante else neto_restante
-
-            # Guardar snapshot previo
-            peso_bruto_previo = bin.peso_bruto
-            peso_tara_previa = bin.peso_tara
-            detalles_snapshot.append((bin, peso_bruto_previo, peso_tara_previa, kg_a_descontar))
-
-            # Aplicar descuento
-            bin.peso_bruto = (bin.peso_bruto - kg_a_descontar).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            # Normalizar y actualizar estado
-            if (bin.peso_bruto - bin.peso_tara) <= 0:
-                bin.peso_bruto = bin.peso_tara
-                bin.estado = 'TRANSFORMADO'
-            else:
-                bin.estado = 'EN_PROCESO'
-            bin.save(update_fields=['peso_bruto', 'estado'])
-
-            neto_restante = (neto_restante - kg_a_descontar).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            total_neto_consumido = (total_neto_consumido + kg_a_descontar).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        if neto_restante > 0:
-            # No alcanzó el neto requerido
-            raise serializers.ValidationError("El peso neto requerido excede el peso disponible en los bins seleccionados")
-        
-        # Registrar la transformación para mantener la trazabilidad
-        # Calcular merma como diferencia entre neto de bins y neto del lote
-        merma_calc = (total_neto_bins - peso_neto).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        # Calcular merma como diferencia entre neto consumido y neto resultante (si hubiera ajuste)
-        merma_calc = (total_neto_consumido - peso_neto).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        transformacion = BinToLotTransformation.objects.create(
-            lote=nuevo_lote,
-            cantidad_cajas_resultantes=validated_data['cantidad_cajas'],
-            peso_total_bins=total_neto_consumido,
-            peso_neto_resultante=peso_neto,
-            merma=merma_calc,
-            business=bin_referencia.business
-        )
-        
-        # Registrar los detalles de cada bin utilizado
-        for bin, peso_bruto_previo, peso_tara_previa, kg_desc in detalles_snapshot:
-            BinToLotTransformationDetail.objects.create(
-                transformacion=transformacion,
-                bin=bin,
-                peso_bruto_previo=peso_bruto_previo,
-                peso_tara_previa=peso_tara_previa,
-                kg_descontados=kg_desc
-            )
-        
-        return nuevo_lote
 
 class BinToLotResponseSerializer(serializers.ModelSerializer):
     """
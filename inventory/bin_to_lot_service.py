@@ -0,0 +1,162 @@
+"""
+Transformación de bins a un lote (pallet).
+
+Los bins seleccionados se bloquean (select_for_update, en orden de id para que dos operaciones que
+comparten bins no se bloqueen mutuamente) y recién entonces se leen sus pesos: si dos operadores
+transforman bins en común, el segundo espera al primero y descuenta sobre los kilos que quedaron,
+en vez de contar dos veces los mismos kilos.
+
+El reparto de kilos se calcula en memoria y se escribe con un bulk_update de los bins (con su
+historial) y un bulk_create de los detalles de la transformación, así que la cantidad de consultas
+no depende de cuántos bins se usen.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from simple_history.utils import bulk_update_with_history
+
+from .bin_to_lot_models import BinToLotTransformation, BinToLotTransformationDetail
+from .models import FruitBin, FruitLot, MadurationHistory
+
+ESTADOS_TRANSFORMABLES = ('DISPONIBLE', 'EN_PROCESO')
+CAMPOS_PESO_BIN = ['peso_bruto', 'peso_neto', 'estado', 'updated_at']
+CENTAVO = Decimal('0.01')
+
+
+def _redondear(valor):
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def bloquear_bins(bin_uids, business=None):
+    """Bins con esos uid, bloqueados hasta el fin de la transacción."""
+    qs = (
+        FruitBin.objects.select_for_update(of=('self',))
+        .select_related('producto', 'proveedor')
+        .filter(uid__in=bin_uids)
+        .order_by('pk')
+    )
+    if business is not None:
+        qs = qs.filter(business=business)
+    return list(qs)
+
+
+def repartir_kilos(bins, peso_neto):
+    """
+    Descuenta `peso_neto` de los bins, consumiendo primero los de mayor peso neto para dejar la
+    menor cantidad de bins parciales. Modifica los bins en memoria y devuelve
+    [(bin, peso_bruto_previo, peso_tara_previa, kg_descontados)].
+    """
+    restante = peso_neto
+    movimientos = []
+    for bin in sorted(bins, key=lambda b: (-(b.peso_bruto - b.peso_tara), b.pk)):
+        if restante <= 0:
+            break
+        kg = min(max(bin.peso_bruto - bin.peso_tara, Decimal('0')), restante)
+        movimientos.append((bin, bin.peso_bruto, bin.peso_tara, kg))
+
+        bin.peso_bruto = _redondear(bin.peso_bruto - kg)
+        if bin.peso_bruto - bin.peso_tara <= 0:
+            bin.peso_bruto = bin.peso_tara
+            bin.estado = 'TRANSFORMADO'
+        else:
+            bin.estado = 'EN_PROCESO'
+        bin.peso_neto = bin.peso_bruto - bin.peso_tara
+        restante = _redondear(restante - kg)
+
+    if restante > 0:
+        raise serializers.ValidationError("El peso neto requerido excede el peso disponible en los bins seleccionados")
+    return movimientos
+
+
+def transformar_bins(bin_uids, box_type, cantidad_cajas, calibre, costo_inicial, proveedor=None,
+                     precio_sugerido_min=None, precio_sugerido_max=None, business=None):
+    """
+    Crea un lote de `cantidad_cajas` cajas de `box_type` descontando sus kilos de los bins indicados.
+    El proveedor del lote es `proveedor` o, si no se indica, el del bin de referencia.
+    Devuelve el lote creado.
+    """
+    peso_neto = _redondear(Decimal(cantidad_cajas) * box_type.capacidad_por_caja)
+    if peso_neto <= 0:
+        raise serializers.ValidationError("El peso neto calculado del lote debe ser positivo")
+
+    with transaction.atomic():
+        bins = bloquear_bins(bin_uids, business)
+        # Se vuelve a validar con los bins bloqueados: otra transformación pudo cambiarlos
+        if len(bins) != len(set(bin_uids)):
+            raise serializers.ValidationError("Uno o más bins no existen")
+        no_disponibles = [b.codigo for b in bins if b.estado not in ESTADOS_TRANSFORMABLES]
+        if no_disponibles:
+            raise serializers.ValidationError(
+                f"Los siguientes bins no están en un estado válido (DISPONIBLE o EN_PROCESO): {', '.join(no_disponibles)}"
+            )
+        if len({b.producto_id for b in bins}) > 1:
+            raise serializers.ValidationError("Todos los bins deben ser del mismo producto")
+
+        total_neto_bins = sum((b.peso_bruto - b.peso_tara for b in bins), Decimal('0'))
+        if peso_neto > total_neto_bins:
+            raise serializers.ValidationError("El peso neto del lote excede el peso neto disponible en los bins seleccionados")
+
+        movimientos = repartir_kilos(bins, peso_neto)
+        total_neto_consumido = _redondear(sum(kg for _, _, _, kg in movimientos))
+
+        bin_referencia = bins[0]
+        producto = bin_referencia.producto
+        proveedor = proveedor or bin_referencia.proveedor
+
+        # Para productos que no son palta se maneja por unidades; a falta de dato del frontend, 12 por caja
+        unidades_por_caja = 0 if producto.tipo_producto == 'palta' else 12
+        # Tara total por cajas (sin considerar pallet_type, que puede ser None)
+        tara_total = _redondear(box_type.peso_caja * cantidad_cajas)
+
+        lote = FruitLot.objects.create(
+            producto=producto,
+            marca=bin_referencia.variedad or "",
+            proveedor=proveedor,
+            procedencia=proveedor.direccion if proveedor and proveedor.direccion else "No especificada",
+            pais="Chile",
+            calibre=calibre,
+            box_type=box_type,
+            cantidad_cajas=cantidad_cajas,
+            peso_bruto=_redondear(peso_neto + tara_total),
+            peso_neto=peso_neto,
+            business_id=bin_referencia.business_id,
+            fecha_ingreso=timezone.now().date(),
+            estado_maduracion='verde',
+            costo_inicial=costo_inicial,
+            costo_diario_almacenaje=0,
+            porcentaje_perdida_estimado=0,
+            precio_sugerido_min=precio_sugerido_min,
+            precio_sugerido_max=precio_sugerido_max,
+            unidades_por_caja=unidades_por_caja,
+            cantidad_unidades=cantidad_cajas * unidades_por_caja,
+        )
+        MadurationHistory.objects.create(lote=lote, estado_maduracion=lote.estado_maduracion)
+
+        ahora = timezone.now()
+        usados = [bin for bin, _, _, _ in movimientos]
+        for bin in usados:
+            bin.updated_at = ahora
+        bulk_update_with_history(usados, FruitBin, CAMPOS_PESO_BIN, default_change_reason=f"Transformación a lote {lote.uid}")
+
+        transformacion = BinToLotTransformation.objects.create(
+            lote=lote,
+            cantidad_cajas_resultantes=cantidad_cajas,
+            peso_total_bins=total_neto_consumido,
+            peso_neto_resultante=peso_neto,
+            # Merma: diferencia entre el neto consumido de los bins y el neto resultante
+            merma=_redondear(total_neto_consumido - peso_neto),
+            business_id=bin_referencia.business_id,
+        )
+        BinToLotTransformationDetail.objects.bulk_create([
+            BinToLotTransformationDetail(
+                transformacion=transformacion,
+                bin=bin,
+                peso_bruto_previo=peso_bruto_previo,
+                peso_tara_previa=peso_tara_previa,
+                kg_descontados=kg,
+            )
+            for bin, peso_bruto_previo, peso_tara_previa, kg in movimientos
+        ])
+    return lote
@@ -42,7 +42,7 @@ class BinToLotTransformView(APIView):
             )
         
         # Validar y procesar los datos de entrada
-        serializer = BinToLotSerializer(data=request.data)
+        serializer = BinToLotSerializer(data=request.data, context={'business': business})
         if serializer.is_valid():
             try:
                 # Crear el nuevo lote
@@ -1,3 +1,8 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,11 +10,41 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from core.permissions import IsSameBusiness
 
-from .models import ConcessionSettlement, ConcessionSettlementDetail, FruitLot
+from .models import ConcessionSettlement, ConcessionSettlementDetail, Supplier
 from .serializers import ConcessionSettlementSerializer, ConcessionSettlementDetailSerializer
+from .settlement_service import generar_liquidacion, pendiente_por_origen, resumen_pendiente
 from .views import RolePermissionMixin
 
 
+def _fecha_periodo(valor, campo, fin=False):
+    """
+    Fecha o fecha-hora ISO a datetime. Una fecha sin hora como límite final incluye el día completo
+    (se devuelve el inicio del día siguiente, porque el período es [desde, hasta)).
+    """
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+        fecha_hora = None if fecha else parse_datetime(valor)
+    except ValueError:
+        fecha = fecha_hora = None
+    if fecha is None and fecha_hora is None:
+        raise ValidationError({campo: 'Formato de fecha inválido (use AAAA-MM-DD)'})
+    if fecha is not None:
+        if fin:
+            fecha += timedelta(days=1)
+        fecha_hora = datetime.combine(fecha, time.min)
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+def _con_detalles(qs):
+    """Liquidaciones con proveedor y detalles (venta, lote o bin y producto) precargados."""
+    detalles = ConcessionSettlementDetail.objects.select_related('venta', 'lote__producto', 'bin__producto')
+    return qs.select_related('proveedor').prefetch_related(Prefetch('detalles', queryset=detalles))
+
+
 class ConcessionSettlementViewSet(RolePermissionMixin, viewsets.ModelViewSet):
     serializer_class = ConcessionSettlementSerializer
     permission_classes = [IsAuthenticated, IsSameBusiness]
@@ -29,7 +64,26 @@ class ConcessionSettlementViewSet(RolePermissionMixin, viewsets.ModelViewSet):
         if estado:
             qs = qs.filter(estado=estado)
             
-        return qs
+        return _con_detalles(qs)
+
+    def _parametros_liquidacion(self, datos, proveedor_requerido=True):
+        """(business, proveedor, desde, hasta) a partir de proveedor/desde/hasta de la request."""
+        perfil = getattr(self.request.user, 'perfil', None)
+        if perfil is None:
+            raise ValidationError({'detail': 'Perfil no encontrado para el usuario'})
+        proveedor = None
+        proveedor_uid = datos.get('proveedor')
+        if proveedor_uid:
+            proveedor = Supplier.objects.filter(business=perfil.business, uid=proveedor_uid).first()
+            if proveedor is None:
+                raise ValidationError({'proveedor': 'Proveedor no encontrado'})
+        elif proveedor_requerido:
+            raise ValidationError({'proveedor': 'Este campo es requerido'})
+        desde = _fecha_periodo(datos.get('desde'), 'desde')
+        hasta = _fecha_periodo(datos.get('hasta'), 'hasta', fin=True)
+        if desde and hasta and desde >= hasta:
+            raise ValidationError({'hasta': 'Debe ser posterior a desde'})
+        return perfil.business, proveedor, desde, hasta
     
     def perform_create(self, serializer):
         user = self.request.user
@@ -91,33 +145,28 @@ class ConcessionSettlementViewSet(RolePermissionMixin, viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def lotes_pendientes_liquidacion(self, request):
-        """Obtiene los lotes en concesión que tienen ventas pendientes de liquidar"""
-        user = request.user
-        perfil = getattr(user, 'perfil', None)
-        if perfil is None:
-            return Response({'detail': 'Perfil no encontrado para el usuario'}, 
-                            status=status.HTTP_400_BAD_REQUEST)
-        
-        # Obtener el proveedor si se proporciona
-        proveedor_uid = request.query_params.get('proveedor', None)
-        
-        # Filtrar lotes en concesión
-        lotes = FruitLot.objects.filter(
-            business=perfil.business,
-            en_concesion=True
-        )
-        
-        # Filtrar por proveedor si se proporciona
-        if proveedor_uid:
-            lotes = lotes.filter(propietario_original__uid=proveedor_uid)
-        
-        # Filtrar lotes que tienen ventas no liquidadas
-        # Esto requiere una lógica más compleja que se implementaría aquí
-        # Por ahora, simplemente devolvemos todos los lotes en concesión
-        
-        from .serializers import FruitLotSerializer
-        serializer = FruitLotSerializer(lotes, many=True)
-        return Response(serializer.data)
+        """
+        Lotes y bins en concesión con ventas pendientes de liquidar, con kilos, ventas, comisión y
+        neto por origen. Filtros opcionales: proveedor (uid), desde, hasta.
+        """
+        business, proveedor, desde, hasta = self._parametros_liquidacion(request.query_params, proveedor_requerido=False)
+        return Response(pendiente_por_origen(business, proveedor, desde, hasta))
+
+    @action(detail=False, methods=['get'])
+    def calcular(self, request):
+        """Vista previa de la liquidación de un proveedor (proveedor, desde, hasta) sin crearla."""
+        business, proveedor, desde, hasta = self._parametros_liquidacion(request.query_params)
+        resumen = resumen_pendiente(business, proveedor, desde, hasta)
+        resumen.update({'proveedor': proveedor.uid, 'proveedor_nombre': proveedor.nombre, 'desde': desde, 'hasta': hasta})
+        return Response(resumen)
+
+    @action(detail=False, methods=['post'])
+    def generar(self, request):
+        """Crea la liquidación de un proveedor con todas sus ventas en concesión pendientes del período."""
+        business, proveedor, desde, hasta = self._parametros_liquidacion(request.data)
+        liquidacion = generar_liquidacion(business, proveedor, desde, hasta, notas=request.data.get('notas'))
+        liquidacion = _con_detalles(ConcessionSettlement.objects.filter(pk=liquidacion.pk)).get()
+        return Response(self.get_serializer(liquidacion).data, status=status.HTTP_201_CREATED)
 
 
 class ConcessionSettlementDetailViewSet(RolePermissionMixin, viewsets.ModelViewSet):
@@ -18,7 +18,7 @@ class FruitBinListSerializer(serializers.ModelSerializer):
     peso_neto = serializers.SerializerMethodField()
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     calidad_display = serializers.CharField(source='get_calidad_display', read_only=True)
-    pago_pendiente = serializers.BooleanField(source='pago_pendiente', read_only=True)
+    pago_pendiente = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = FruitBin
@@ -66,7 +66,7 @@ class FruitBinDetailSerializer(serializers.ModelSerializer):
             'proveedor', 'proveedor_uid', 'proveedor_nombre', 'proveedor_info',
             'en_concesion', 'comision_por_kilo', 'comision_base', 'comision_porcentaje', 'comision_monto', 'fecha_limite_concesion',
             'propietario_original_uid', 'propietario_original_nombre',
-            'pago_pendiente', 'temperatura', 'observaciones',
+            'pago_pendiente', 'estado_pago_recepcion', 'temperatura', 'observaciones',
             'created_at', 'updated_at', 'vendido', 'venta', 'transformaciones'
         ]
     
@@ -256,6 +256,7 @@ class FruitBinBulkCreateSerializer(serializers.Serializer):
         """Crea múltiples bins con los mismos datos"""
         cantidad = validated_data.pop('cantidad')
         business = validated_data.pop('business', None)
+        usuario = validated_data.pop('usuario', None)
         # Extraer inputs flexibles de comisión
         en_concesion = validated_data.get('en_concesion', False)
         comision_base = validated_data.pop('comision_base', None)
@@ -287,52 +288,55 @@ class FruitBinBulkCreateSerializer(serializers.Serializer):
             recepcion_uuid = validated_data.pop('recepcion')
             recepcion = get_object_or_404(GoodsReception, uid=recepcion_uuid)
         
-        bins_creados = []
-        for i in range(cantidad):
-            # Generar un código único para cada bin
-            codigo = f"BIN-{uuid.uuid4().hex[:8].upper()}"
-            
-            # Crear el bin
-            bin_data = {
-                'codigo': codigo,
-                'business': business,
-                'producto': producto,
-                'proveedor': proveedor,
-                'propietario_original': propietario_original,
-                'recepcion': recepcion,
-                **validated_data
-            }
-            # Persistir configuración de comisión tal como vino
-            bin_data['comision_base'] = comision_base
-            bin_data['comision_monto'] = comision_monto
-            bin_data['comision_porcentaje'] = comision_porcentaje
-            # Persistir estado de pago si vino
-            if 'pago_pendiente' in validated_data:
-                bin_data['pago_pendiente'] = validated_data['pago_pendiente']
-            # Calcular costo_total si no viene y hay costo_por_kilo
-            try:
-                if bin_data.get('costo_total') in (None, '') and bin_data.get('costo_por_kilo') not in (None, ''):
-                    from decimal import Decimal as D
-                    peso_bruto = D(str(bin_data.get('peso_bruto') or 0))
-                    peso_tara = D(str(bin_data.get('peso_tara') or 0))
-                    peso_neto_est = max(peso_bruto - peso_tara, D('0'))
-                    bin_data['costo_total'] = (D(str(bin_data['costo_por_kilo'])) * peso_neto_est).quantize(D('0.01'))
-            except Exception:
-                pass
-            # Resolver comisión por kilo si corresponde (solo base 'kg')
-            try:
+        bin_data = {
+            'business': business,
+            'producto': producto,
+            'proveedor': proveedor,
+            'propietario_original': propietario_original,
+            'recepcion': recepcion,
+            **validated_data
+        }
+        # Persistir configuración de comisión tal como vino
+        bin_data['comision_base'] = comision_base
+        bin_data['comision_monto'] = comision_monto
+        bin_data['comision_porcentaje'] = comision_porcentaje
+        # Calcular costo_total si no viene y hay costo_por_kilo
+        try:
+            if bin_data.get('costo_total') in (None, '') and bin_data.get('costo_por_kilo') not in (None, ''):
                 from decimal import Decimal as D
-                if en_concesion and (comision_base == 'kg'):
-                    if comision_monto not in (None, ''):
-                        bin_data['comision_por_kilo'] = D(str(comision_monto))
-                    elif comision_porcentaje not in (None, ''):
-                        costo_kg = bin_data.get('costo_por_kilo')
-                        if costo_kg not in (None, ''):
-                            bin_data['comision_por_kilo'] = D(str(costo_kg)) * D(str(comision_porcentaje)) / D('100')
-            except Exception:
-                pass
-            
-            bin_obj = FruitBin.objects.create(**bin_data)
-            bins_creados.append(bin_obj)
+                peso_bruto = D(str(bin_data.get('peso_bruto') or 0))
+                peso_tara = D(str(bin_data.get('peso_tara') or 0))
+                peso_neto_est = max(peso_bruto - peso_tara, D('0'))
+                bin_data['costo_total'] = (D(str(bin_data['costo_por_kilo'])) * peso_neto_est).quantize(D('0.01'))
+        except Exception:
+            pass
+        # Resolver comisión por kilo si corresponde (solo base 'kg')
+        try:
+            from decimal import Decimal as D
+            if en_concesion and (comision_base == 'kg'):
+                if comision_monto not in (None, ''):
+                    bin_data['comision_por_kilo'] = D(str(comision_monto))
+                elif comision_porcentaje not in (None, ''):
+                    costo_kg = bin_data.get('costo_por_kilo')
+                    if costo_kg not in (None, ''):
+                        bin_data['comision_por_kilo'] = D(str(costo_kg)) * D(str(comision_porcentaje)) / D('100')
+        except Exception:
+            pass
+
+        # Todos los bins llevan los mismos datos: un solo INSERT (más su historial)
+        from .fruit_bin_service import crear_bins
+        bins_creados = crear_bins(cantidad, bin_data, usuario=usuario)
         
         return bins_creados
+
+
+class FruitBinBulkUpdateSerializer(serializers.Serializer):
+    """Entrada de las actualizaciones masivas de bins (ubicación, estado, calidad, pago pendiente)"""
+    bins = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=5000,
+                                 help_text='UIDs de los bins a actualizar')
+    cambios = serializers.DictField(help_text='Campos a cambiar, p.ej. {"ubicacion": "PACKING"}')
+    detalle = serializers.BooleanField(default=False, help_text='Devolver los bins serializados en vez de solo sus UIDs')
+
+    def validate_cambios(self, value):
+        from .fruit_bin_service import validar_cambios
+        return validar_cambios(value)
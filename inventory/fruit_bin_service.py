@@ -0,0 +1,102 @@
+"""
+Operaciones masivas sobre bins.
+
+Mover 500 bins al packing o marcarlos como pagados no pasa por save() bin a bin: los bins que
+realmente cambian se leen (bloqueados) en una consulta, se actualizan con un solo UPDATE y su
+historial se escribe con un bulk insert. La cantidad de consultas no depende de cuántos bins sean.
+"""
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from simple_history.utils import bulk_create_with_history
+
+from . import supplier_ledger
+from .models import FruitBin
+
+# Campos que se pueden cambiar en forma masiva y sus valores válidos
+CAMPOS_MASIVOS = {
+    'ubicacion': [c[0] for c in FruitBin.UBICACION_CHOICES],
+    'estado': [c[0] for c in FruitBin.ESTADO_CHOICES],
+    'calidad': [c[0] for c in FruitBin.CALIDAD_CHOICES],
+    'pago_pendiente': None,
+}
+
+
+def validar_cambios(cambios):
+    """Valida `cambios` ({campo: valor}) contra CAMPOS_MASIVOS y devuelve los valores normalizados."""
+    if not isinstance(cambios, dict) or not cambios:
+        raise serializers.ValidationError('Debes indicar al menos un campo a actualizar')
+
+    limpios, errores = {}, {}
+    for campo, valor in cambios.items():
+        if campo not in CAMPOS_MASIVOS:
+            errores[campo] = f"No se puede actualizar en forma masiva. Campos permitidos: {', '.join(CAMPOS_MASIVOS)}"
+        elif campo == 'pago_pendiente':
+            try:
+                limpios[campo] = serializers.BooleanField().to_internal_value(valor)
+            except serializers.ValidationError:
+                errores[campo] = 'Debe ser verdadero o falso'
+        elif valor not in CAMPOS_MASIVOS[campo]:
+            errores[campo] = f"Valor inválido. Opciones: {', '.join(CAMPOS_MASIVOS[campo])}"
+        else:
+            limpios[campo] = valor
+    if errores:
+        raise serializers.ValidationError(errores)
+    return limpios
+
+
+def actualizar_bins(business, uids, cambios, usuario=None):
+    """
+    Aplica `cambios` (ya validados) a los bins del negocio con esos uid.
+    Los bins que ya tienen esos valores no se tocan ni generan historial.
+    Devuelve los bins modificados, con los valores nuevos.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        # exclude(**cambios) deja fuera solo los bins que ya tienen todos los valores pedidos
+        bins = list(
+            FruitBin.objects.select_for_update()
+            .filter(business=business, uid__in=uids)
+            .exclude(**cambios)
+            .order_by('pk')
+        )
+        if not bins:
+            return []
+
+        FruitBin.objects.filter(pk__in=[b.pk for b in bins]).update(**cambios, updated_at=ahora)
+        for bin in bins:
+            for campo, valor in cambios.items():
+                setattr(bin, campo, valor)
+            bin.updated_at = ahora
+        FruitBin.historial.bulk_history_create(
+            bins, update=True, default_user=usuario, default_change_reason='Actualización masiva', default_date=ahora,
+        )
+        # El UPDATE no pasa por las señales: los pagos de bins se registran aquí, en lote
+        if 'pago_pendiente' in cambios:
+            supplier_ledger.sincronizar(bins)
+    return bins
+
+
+def crear_bins(cantidad, datos, usuario=None):
+    """
+    Crea `cantidad` bins con los mismos `datos` (campos del modelo, FKs ya resueltas) en un solo
+    INSERT más el de su historial. Cada bin recibe un código único.
+    """
+    peso_bruto = datos.get('peso_bruto')
+    peso_tara = datos.get('peso_tara') or Decimal('0')
+    bins = [
+        FruitBin(
+            codigo=f"BIN-{uuid.uuid4().hex[:8].upper()}",
+            # save() no se ejecuta en bulk_create: peso_neto se calcula aquí
+            peso_neto=peso_bruto - peso_tara if peso_bruto is not None else None,
+            **datos,
+        )
+        for _ in range(cantidad)
+    ]
+    with transaction.atomic():
+        creados = bulk_create_with_history(bins, FruitBin, default_user=usuario)
+        supplier_ledger.sincronizar(creados)
+        return creados
@@ -13,8 +13,13 @@ from django_filters.rest_framework import (
     MultipleChoiceFilter,
 )
 from .models import FruitBin
-from .fruit_bin_serializers import FruitBinListSerializer, FruitBinDetailSerializer, FruitBinBulkCreateSerializer
+from .fruit_bin_serializers import (
+    FruitBinListSerializer, FruitBinDetailSerializer, FruitBinBulkCreateSerializer, FruitBinBulkUpdateSerializer,
+)
+from .fruit_bin_service import actualizar_bins
+from core.fast_json import FastListMixin
 from core.permissions import IsSameBusiness
+from .list_rows import FruitBinListRows
 from accounts.models import CustomUser, Perfil
 
 
@@ -84,7 +89,6 @@ class FruitBinFilter(FilterSet):
     
     def filter_producto(self, queryset, name, value):
         """Filtra bins por producto, aceptando tanto ID como nombre"""
-        from .models import Product
         import json
         
         if value is None:
@@ -113,18 +117,16 @@ class FruitBinFilter(FilterSet):
             producto_id = int(value)
             return queryset.filter(producto_id=producto_id)
         except (ValueError, TypeError):
-            # Si no es un ID válido, buscar por nombre
-            productos = Product.objects.filter(nombre__icontains=value)
-            if productos.exists():
-                return queryset.filter(producto__in=productos)
-            return queryset.none()
+            # Si no es un ID válido, buscar por nombre (un solo JOIN, con el índice de trigramas
+            # de search_indexes en PostgreSQL)
+            return queryset.filter(producto__nombre__icontains=value)
     
     class Meta:
         model = FruitBin
         fields = ['estado', 'producto', 'variedad', 'proveedor', 'calidad', 'peso_neto_min', 'peso_neto_max']
 
 
-class FruitBinViewSet(viewsets.ModelViewSet):
+class FruitBinViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar bins de fruta.
     Permite listar, crear, actualizar y eliminar bins.
@@ -155,9 +157,10 @@ class FruitBinViewSet(viewsets.ModelViewSet):
     ordering_fields = ['fecha_recepcion', 'codigo', 'peso_bruto']
     ordering = ['-fecha_recepcion']
     lookup_field = 'uid'
+    list_mapper = FruitBinListRows
     
-    def get_queryset(self):
-        """Filtra los bins por el negocio del usuario actual"""
+    def get_business(self):
+        """Negocio del usuario actual (directo o a través de su perfil)"""
         user = self.request.user
         business = None
         
@@ -172,7 +175,11 @@ class FruitBinViewSet(viewsets.ModelViewSet):
                     business = perfil.business
             except Perfil.DoesNotExist:
                 pass
-        
+        return business
+
+    def get_queryset(self):
+        """Filtra los bins por el negocio del usuario actual"""
+        business = self.get_business()
         if business:
             return FruitBin.objects.filter(business=business)
         return FruitBin.objects.none()
@@ -217,20 +224,42 @@ class FruitBinViewSet(viewsets.ModelViewSet):
         if nueva_ubicacion not in valid_values:
             raise ValidationError({'ubicacion': f"Valor inválido. Opciones: {', '.join(valid_values)}"})
 
-        # Restringir por business del usuario
-        queryset = self.get_queryset().filter(uid__in=uids)
-        actualizados = []
-        for b in queryset:
-            b.ubicacion = nueva_ubicacion
-            b.save(update_fields=['ubicacion', 'updated_at'])
-            actualizados.append(b)
-
-        data = FruitBinListSerializer(actualizados, many=True, context={'request': request}).data
-        return Response({
-            'cantidad_actualizada': len(actualizados),
-            'ubicacion': nueva_ubicacion,
-            'bins': data,
+        serializer = FruitBinBulkUpdateSerializer(data={
+            'bins': uids,
+            'cambios': {'ubicacion': nueva_ubicacion},
+            # Por compatibilidad este endpoint devuelve los bins completos salvo ?detalle=false
+            'detalle': request.query_params.get('detalle', 'true'),
         })
+        serializer.is_valid(raise_exception=True)
+        respuesta = self._actualizar_masivo(serializer.validated_data)
+        respuesta['ubicacion'] = nueva_ubicacion
+        return Response(respuesta)
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """Actualiza ubicación, estado, calidad y/o pago pendiente de múltiples bins del negocio actual.
+        Endpoint: POST /api/v1/inventory/fruitbins/bulk-update/
+        Body: { "bins": ["uid1","uid2",...], "cambios": {"ubicacion": "PACKING", "pago_pendiente": false}, "detalle": false }
+        Responde la cantidad actualizada y los UIDs de los bins que cambiaron; con "detalle": true, los bins serializados.
+        """
+        serializer = FruitBinBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(self._actualizar_masivo(serializer.validated_data))
+
+    def _actualizar_masivo(self, datos):
+        business = self.get_business()
+        if not business:
+            raise ValidationError({'detail': 'Usuario no tiene un negocio asociado'})
+        bins = actualizar_bins(business, datos['bins'], datos['cambios'], usuario=self.request.user)
+        respuesta = {'cantidad_actualizada': len(bins), 'cambios': datos['cambios']}
+        if datos['detalle']:
+            queryset = FruitBin.objects.filter(pk__in=[b.pk for b in bins]).select_related(
+                'producto', 'proveedor', 'propietario_original', 'recepcion'
+            )
+            respuesta['bins'] = FruitBinListSerializer(queryset, many=True, context={'request': self.request}).data
+        else:
+            respuesta['bins'] = [str(b.uid) for b in bins]
+        return respuesta
 
 
 
@@ -265,14 +294,17 @@ class FruitBinBulkCreateView(APIView):
                 )
                 
             # Crear los bins
-            bins = serializer.save(business=business)
+            bins = serializer.save(business=business, usuario=user)
             
-            # Devolver la respuesta con los bins creados
+            # Devolver la respuesta con los bins creados (?detalle=false: solo UIDs y códigos)
             response_data = {
                 'cantidad_creada': len(bins),
                 'mensaje': f'Se han creado {len(bins)} bins correctamente',
-                'bins': FruitBinListSerializer(bins, many=True).data
             }
+            if request.query_params.get('detalle', 'true').lower() in ('false', '0', 'no'):
+                response_data['bins'] = [{'uid': str(b.uid), 'codigo': b.codigo} for b in bins]
+            else:
+                response_data['bins'] = FruitBinListSerializer(bins, many=True).data
             
             return Response(response_data, status=status.HTTP_201_CREATED)
         
@@ -1,14 +1,26 @@
 from django.db import models
 from django.utils import timezone
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 
 class FruitLotResult(models.Model):
     """
     Almacena los resultados reales de un lote de fruta después de su venta completa.
     Permite contrastar la predicción inicial con el resultado real.
+
+    Se calcula una vez, cuando el lote queda sin cajas (inventory/lot_result_service.py), y es lo
+    que leen los endpoints de pallets vendidos. Los lotes agotados antes de existir el cierre se
+    cargan con `manage.py backfill_lot_results`.
     """
     fruitlot = models.OneToOneField('inventory.FruitLot', on_delete=models.CASCADE, related_name='resultado')
+    business = models.ForeignKey('business.Business', on_delete=models.CASCADE, related_name='resultados_lotes')
     fecha_venta_completa = models.DateTimeField(default=timezone.now)
+
+    # Totales de venta del lote (ventas no canceladas)
+    num_ventas = models.PositiveIntegerField(default=0)
+    kilos_vendidos = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    unidades_vendidas = models.PositiveIntegerField(default=0)
+    costo_vendido = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                        help_text="Costo inicial de lo vendido (sin almacenaje ni merma)")
     
     # Datos de predicción (copiados del lote al momento de creación)
     prediccion_costo_total = models.DecimalField(max_digits=12, decimal_places=2)
@@ -49,3 +61,6 @@ class FruitLotResult(models.Model):
     class Meta:
         verbose_name = "Resultado de lote"
         verbose_name_plural = "Resultados de lotes"
+        indexes = [
+            models.Index(fields=['business', '-fecha_venta_completa'], name='lot_result_biz_fecha_idx'),
+        ]
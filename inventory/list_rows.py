@@ -0,0 +1,112 @@
+"""
+Listados de lotes y bins desde ``values()`` (FAST_JSON, ver core/fast_json.py).
+
+Misma salida que ``FruitLotListSerializer`` y ``FruitBinListSerializer``. Las reservas activas y
+los valores iniciales del pallet (primer registro del historial), que el serializer consulta lote
+por lote, salen como subconsultas de la consulta principal.
+"""
+from django.db.models import DecimalField, Exists, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.fast_json import Campo, RowMapper
+
+from .models import FruitBin, FruitLot, StockReservation
+
+
+def _reservado(campo, output_field):
+    return Coalesce(
+        Subquery(
+            StockReservation.objects.filter(lote=OuterRef('pk'), estado='en_proceso')
+            .order_by().values('lote').annotate(total=Sum(campo)).values('total'),
+            output_field=output_field,
+        ),
+        0,
+        output_field=output_field,
+    )
+
+
+class FruitLotListRows(RowMapper):
+    model = FruitLot
+    campos = (
+        'uid', 'producto',
+        Campo('producto_nombre', 'producto__nombre', omitir_nulo=True),
+        Campo('tipo_producto', 'producto__tipo_producto', omitir_nulo=True),
+        Campo('categoria', 'producto__categoria', omitir_nulo=True),
+        'calibre', 'variedad', 'marca', 'calidad',
+        Campo('calidad_display', 'calidad', display=True),
+        Campo('codigo', 'qr_code'),
+        'peso_bruto', 'peso_neto',
+        Campo('peso_reservado'),
+        Campo('cajas_disponibles'),
+        'estado_maduracion', 'estado_lote', 'fecha_ingreso', 'procedencia',
+        Campo('proveedor', 'proveedor__nombre', omitir_nulo=True),
+        'costo_inicial', 'en_concesion',
+        Campo('costo_total_pallet'),
+        Campo('kg_por_caja_estimada'),
+        Campo('tara_por_caja_kg'),
+        Campo('kg_bruto_por_caja_estimada'),
+        Campo('box_type_peso_caja'),
+    )
+    lookups_extra = ('cantidad_cajas', 'box_type__peso_caja')
+
+    def anotaciones(self):
+        historial = FruitLot.history.model.objects.filter(id=OuterRef('pk')).order_by('history_date')
+        return {
+            'fila_reservado_cajas': _reservado('cajas_reservadas', IntegerField()),
+            'fila_reservado_kg': _reservado('kg_reservados', DecimalField(max_digits=12, decimal_places=2)),
+            'fila_con_historial': Exists(historial),
+            'fila_peso_neto_inicial': Subquery(historial.values('peso_neto')[:1]),
+            'fila_cajas_inicial': Subquery(historial.values('cantidad_cajas')[:1]),
+        }
+
+    def completar(self, fila, salida):
+        cantidad_cajas = fila['cantidad_cajas']
+        peso_neto = fila['peso_neto']
+        tipo = fila['producto__tipo_producto']
+        con_producto = fila['producto'] is not None
+
+        salida['cajas_disponibles'] = cantidad_cajas - (fila['fila_reservado_cajas'] or 0)
+        salida['peso_reservado'] = float(fila['fila_reservado_kg'] or 0) if tipo == 'palta' else 0
+
+        costo = float(fila['costo_inicial'] or 0)
+        if not con_producto:
+            salida['costo_total_pallet'] = 0
+        elif tipo == 'palta':
+            inicial = fila['fila_peso_neto_inicial'] if fila['fila_con_historial'] else peso_neto
+            salida['costo_total_pallet'] = float(inicial or 0) * costo
+        else:
+            inicial = fila['fila_cajas_inicial'] if fila['fila_con_historial'] else cantidad_cajas
+            salida['costo_total_pallet'] = float(int(inicial or 0)) * costo
+
+        kg = round(float(peso_neto) / float(cantidad_cajas), 2) if cantidad_cajas and peso_neto else None
+        tara = fila['box_type__peso_caja']
+        tara = float(tara) if tara is not None else None
+        salida['kg_por_caja_estimada'] = kg
+        salida['tara_por_caja_kg'] = tara
+        salida['kg_bruto_por_caja_estimada'] = round(kg + tara, 2) if kg is not None and tara is not None else None
+        salida['box_type_peso_caja'] = tara
+
+
+class FruitBinListRows(RowMapper):
+    model = FruitBin
+    campos = (
+        'uid', 'codigo',
+        Campo('producto', 'producto__uid', omitir_nulo=True),
+        Campo('producto_nombre', 'producto__nombre', omitir_nulo=True),
+        Campo('producto_tipo', 'producto__tipo_producto', omitir_nulo=True),
+        'variedad', 'peso_bruto', 'peso_tara',
+        # SerializerMethodField: el Decimal sin formatear (el JSON lo escribe como número)
+        Campo('peso_neto', 'peso_neto', crudo=True),
+        'costo_por_kilo', 'costo_total', 'estado',
+        Campo('estado_display', 'estado', display=True),
+        'calidad',
+        Campo('calidad_display', 'calidad', display=True),
+        Campo('proveedor', 'proveedor__uid', omitir_nulo=True),
+        Campo('proveedor_nombre', 'proveedor__nombre', omitir_nulo=True),
+        'en_concesion', 'comision_por_kilo', 'comision_base', 'comision_porcentaje', 'comision_monto',
+        'fecha_limite_concesion',
+        Campo('propietario_original', 'propietario_original__uid'),
+        Campo('propietario_original_nombre', 'propietario_original__nombre'),
+        Campo('recepcion', 'recepcion__uid'),
+        'pago_pendiente', 'fecha_recepcion',
+    )
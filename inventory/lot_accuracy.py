@@ -0,0 +1,164 @@
+"""
+Precisión de las predicciones de lotes (FruitLotResult).
+
+Agrupa el error de predicción (real - predicho) de merma, margen y días en inventario de los lotes
+cerrados por producto, categoría, proveedor, calibre, calidad y estado de maduración, para ajustar
+precios sugeridos y mermas estimadas.
+
+Los resultados del negocio se cargan con un solo values_list y se procesan con NumPy: por cada
+dimensión los lotes se ordenan una vez por (grupo, error) y los conteos, promedios, desviaciones y
+percentiles de todos los grupos salen de bincount e índices sobre esos arreglos, sin recorrer los
+lotes en Python. Los percentiles interpolan igual que numpy.percentile (lineal).
+
+El informe se guarda en cache por negocio. La clave incluye la cantidad de resultados del negocio
+y su último updated_at: un lote recién cerrado o recalculado deja de usar el cache anterior.
+"""
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import FruitLotResult
+
+DIMENSIONES = {
+    'producto': 'fruitlot__producto__nombre',
+    'categoria': 'fruitlot__producto__categoria',
+    'proveedor': 'fruitlot__proveedor__nombre',
+    'calibre': 'fruitlot__calibre',
+    'calidad': 'fruitlot__calidad',
+    'estado_maduracion': 'fruitlot__estado_maduracion',
+}
+
+# métrica -> (campo real, campo predicho)
+METRICAS = {
+    'perdida_porcentaje': ('real_perdida_porcentaje', 'prediccion_perdida_porcentaje'),
+    'margen': ('real_margen', 'prediccion_margen'),
+    'dias': ('real_dias_en_inventario', 'prediccion_dias_estimados'),
+}
+
+PERCENTILES = (10, 25, 50, 75, 90)
+BINS_DISTRIBUCION = 10
+SIN_DATO = 'Sin dato'
+
+
+def _cargar(business, desde=None, hasta=None):
+    """Claves de cada dimensión (arreglos de texto) y valores reales/predichos (n x métricas)."""
+    qs = FruitLotResult.objects.filter(business=business)
+    if desde is not None:
+        qs = qs.filter(fecha_venta_completa__date__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(fecha_venta_completa__date__lte=hasta)
+    campos_reales = [real for real, _ in METRICAS.values()]
+    campos_predichos = [pred for _, pred in METRICAS.values()]
+    filas = list(qs.order_by().values_list(*DIMENSIONES.values(), *campos_reales, *campos_predichos))
+    if not filas:
+        return 0, {}, None, None
+
+    n_dim, n_met = len(DIMENSIONES), len(METRICAS)
+    columnas = list(zip(*filas))
+    claves = {
+        dimension: np.array([SIN_DATO if v in (None, '') else str(v) for v in columnas[i]], dtype=object)
+        for i, dimension in enumerate(DIMENSIONES)
+    }
+    numeros = np.array(columnas[n_dim:], dtype=float).T
+    return len(filas), claves, numeros[:, :n_met], numeros[:, n_met:]
+
+
+def _estadisticas(claves, real, pred):
+    """
+    Estadísticas por grupo de `claves` para cada métrica. Devuelve las etiquetas de los grupos,
+    la cantidad de lotes de cada uno y, por métrica, un dict de arreglos (un valor por grupo).
+    """
+    etiquetas, codigos = np.unique(claves.astype(str), return_inverse=True)
+    n_grupos = len(etiquetas)
+    conteo = np.bincount(codigos, minlength=n_grupos)
+    inicio = np.concatenate(([0], np.cumsum(conteo)[:-1]))
+    # Posición de cada percentil dentro del tramo ordenado de cada grupo
+    posiciones = inicio[:, None] + np.array(PERCENTILES)[None, :] / 100 * (conteo[:, None] - 1)
+    bajo = np.floor(posiciones).astype(int)
+    alto = np.ceil(posiciones).astype(int)
+    fraccion = posiciones - bajo
+
+    error = real - pred
+    por_metrica = {}
+    for j, metrica in enumerate(METRICAS):
+        e = error[:, j]
+        media = np.bincount(codigos, weights=e, minlength=n_grupos) / conteo
+        cuadrados = np.bincount(codigos, weights=e * e, minlength=n_grupos) / conteo
+        ordenado = e[np.lexsort((e, codigos))]
+        cuantiles = ordenado[bajo] * (1 - fraccion) + ordenado[alto] * fraccion
+        por_metrica[metrica] = {
+            'real_promedio': np.bincount(codigos, weights=real[:, j], minlength=n_grupos) / conteo,
+            'prediccion_promedio': np.bincount(codigos, weights=pred[:, j], minlength=n_grupos) / conteo,
+            'sesgo': media,
+            'error_absoluto': np.bincount(codigos, weights=np.abs(e), minlength=n_grupos) / conteo,
+            'desviacion': np.sqrt(np.maximum(cuadrados - media * media, 0)),
+            **{f'p{p}': cuantiles[:, k] for k, p in enumerate(PERCENTILES)},
+        }
+    return etiquetas, conteo, por_metrica
+
+
+def _grupos(etiquetas, conteo, por_metrica, minimo):
+    """Filas del informe (grupos con al menos `minimo` lotes, de mayor a menor)."""
+    redondeado = {
+        metrica: {clave: np.round(valores, 2).tolist() for clave, valores in estadisticas.items()}
+        for metrica, estadisticas in por_metrica.items()
+    }
+    filas = []
+    for i in np.argsort(-conteo, kind='stable'):
+        if conteo[i] < minimo:
+            continue
+        fila = {'grupo': str(etiquetas[i]), 'lotes': int(conteo[i])}
+        for metrica, estadisticas in redondeado.items():
+            fila[metrica] = {clave: valores[i] for clave, valores in estadisticas.items()}
+        filas.append(fila)
+    return filas
+
+
+def _distribucion(error):
+    conteos, limites = np.histogram(error, bins=BINS_DISTRIBUCION)
+    return {'limites': np.round(limites, 2).tolist(), 'conteos': conteos.tolist()}
+
+
+def calcular(business, desde=None, hasta=None, dimensiones=None, minimo=1):
+    """Informe de precisión de las predicciones de los lotes cerrados del negocio."""
+    dimensiones = [d for d in (dimensiones or DIMENSIONES) if d in DIMENSIONES]
+    n, claves, real, pred = _cargar(business, desde, hasta)
+    informe = {'lotes': n, 'metricas': {}, 'dimensiones': {}}
+    if not n:
+        return informe
+
+    # Totales del negocio: un solo grupo
+    _, _, totales = _estadisticas(np.zeros(n, dtype=object), real, pred)
+    error = real - pred
+    for j, metrica in enumerate(METRICAS):
+        informe['metricas'][metrica] = {
+            clave: round(float(valores[0]), 2) for clave, valores in totales[metrica].items()
+        }
+        informe['metricas'][metrica]['distribucion'] = _distribucion(error[:, j])
+
+    for dimension in dimensiones:
+        informe['dimensiones'][dimension] = _grupos(*_estadisticas(claves[dimension], real, pred), minimo)
+    return informe
+
+
+def _clave_cache(business, parametros):
+    marca = FruitLotResult.objects.filter(business=business).aggregate(n=Count('id'), ultimo=Max('updated_at'))
+    huella = hashlib.sha1(json.dumps(
+        {**parametros, 'n': marca['n'], 'ultimo': marca['ultimo']}, sort_keys=True, default=str,
+    ).encode()).hexdigest()[:16]
+    return f"lot_accuracy:{business.pk}:{huella}"
+
+
+def informe(business, desde=None, hasta=None, dimensiones=None, minimo=1):
+    """calcular() con cache por negocio hasta que cambien sus resultados de lotes."""
+    parametros = {'desde': desde, 'hasta': hasta, 'dimensiones': sorted(dimensiones or DIMENSIONES), 'minimo': minimo}
+    clave = _clave_cache(business, parametros)
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular(business, desde, hasta, dimensiones, minimo)
+        cache.set(clave, resultado, settings.LOT_ACCURACY_CACHE_SECONDS)
+    return resultado
@@ -0,0 +1,194 @@
+"""
+Cierre de lotes agotados.
+
+Cuando un lote queda sin cajas se calcula una sola vez su resultado (FruitLotResult): lo vendido,
+la merma, el costo con almacenaje, la ganancia y los días en inventario, contra lo que se esperaba
+del lote al ingresar. Los endpoints de pallets vendidos leen esa tabla en vez de recalcular todo
+con cada request. Una venta cancelada recalcula el resultado de sus lotes, y un lote que vuelve a
+tener cajas pierde el suyo hasta agotarse de nuevo.
+
+Predicción (datos del lote al ingresar):
+  - días: los de maduración de la categoría del producto hasta sobremaduro
+  - merma: porcentaje_perdida_estimado sobre el peso inicial (solo productos por kilo)
+  - precio: promedio del rango sugerido del lote, o costo + 30% si no tiene
+  - costo: costo inicial + almacenaje diario por los días estimados
+Real:
+  - peso inicial = kilos vendidos + peso neto que quedó al agotarse; lo que quedó es merma
+  - costo: costo inicial + almacenaje diario por los días entre el ingreso y la última venta
+  - ingreso: subtotales de las ventas no canceladas
+Los productos por caja/unidad no tienen merma medible: se valorizan por unidad vendida.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from sales.models import SaleItem
+
+from .models import FruitLot, FruitLotResult
+from .product_categories import CATEGORIAS, OTRO, categoria_de
+
+CENTAVO = Decimal('0.01')
+CIEN = Decimal('100')
+MARGEN_SUGERIDO = Decimal('1.30')
+# Tope de los campos de porcentaje (max_digits=5)
+TOPE_PORCENTAJE = Decimal('999.99')
+
+
+def _d(valor):
+    return Decimal(valor or 0)
+
+
+def _porcentaje(parte, total):
+    if not total:
+        return Decimal('0.00')
+    valor = (parte / total * CIEN).quantize(CENTAVO)
+    return max(-TOPE_PORCENTAJE, min(TOPE_PORCENTAJE, valor))
+
+
+def _totales(lote_ids):
+    """Totales de venta por lote, en una consulta."""
+    filas = (
+        SaleItem.objects.filter(lote_id__in=lote_ids, venta__cancelada=False)
+        .values('lote_id')
+        .annotate(
+            num_ventas=Count('venta', distinct=True),
+            kilos=Sum('peso_vendido'),
+            unidades=Sum('unidades_vendidas'),
+            ingreso=Sum('subtotal'),
+            ultima_venta=Max('venta__created_at'),
+        )
+        .order_by()
+    )
+    return {fila['lote_id']: fila for fila in filas}
+
+
+def calcular_resultado(lote, totales, ahora=None):
+    """FruitLotResult (sin guardar) del lote con los totales de _totales()."""
+    categoria = categoria_de(lote.producto)
+    por_peso = categoria.venta_por_peso
+    kilos = _d(totales.get('kilos'))
+    unidades = totales.get('unidades') or 0
+    ingreso = _d(totales.get('ingreso'))
+    fecha_cierre = totales.get('ultima_venta') or ahora or timezone.now()
+
+    dias_reales = max(0, (timezone.localdate(fecha_cierre) - lote.fecha_ingreso).days)
+    dias_estimados = (categoria.dias_maduracion or CATEGORIAS[OTRO].dias_maduracion)[-1]
+
+    # Por kilo para paltas; por unidad (caja / unidades_por_caja) para el resto
+    divisor = 1 if por_peso else max(1, lote.unidades_por_caja or 0)
+    costo_unitario = _d(lote.costo_inicial) / divisor
+    almacenaje_unitario = _d(lote.costo_diario_almacenaje) / divisor
+    if por_peso:
+        perdida_real = max(_d(lote.peso_neto), Decimal('0'))
+        cantidad_inicial = kilos + perdida_real
+        perdida_pred_pct = _d(lote.porcentaje_perdida_estimado)
+        perdida_pred = cantidad_inicial * perdida_pred_pct / CIEN
+        costo_vendido = kilos * costo_unitario
+    else:
+        cantidad_inicial = Decimal(unidades)
+        perdida_real = perdida_pred = perdida_pred_pct = Decimal('0')
+        costo_vendido = unidades * costo_unitario
+
+    if lote.precio_sugerido_min and lote.precio_sugerido_max:
+        precio_pred = (lote.precio_sugerido_min + lote.precio_sugerido_max) / 2
+    else:
+        precio_pred = lote.precio_sugerido_min or lote.precio_sugerido_max or costo_unitario * MARGEN_SUGERIDO
+
+    pred_costo = cantidad_inicial * (costo_unitario + almacenaje_unitario * dias_estimados)
+    pred_ingreso = (cantidad_inicial - perdida_pred) * precio_pred
+    pred_ganancia = pred_ingreso - pred_costo
+    real_costo = cantidad_inicial * (costo_unitario + almacenaje_unitario * dias_reales)
+    real_ganancia = ingreso - real_costo
+
+    pred = {
+        'costo_total': pred_costo.quantize(CENTAVO),
+        'perdida_kg': perdida_pred.quantize(CENTAVO),
+        'perdida_porcentaje': min(TOPE_PORCENTAJE, perdida_pred_pct.quantize(CENTAVO)),
+        'ingreso_total': pred_ingreso.quantize(CENTAVO),
+        'ganancia_total': pred_ganancia.quantize(CENTAVO),
+        'margen': _porcentaje(pred_ganancia, pred_ingreso),
+    }
+    real = {
+        'costo_total': real_costo.quantize(CENTAVO),
+        'perdida_kg': perdida_real.quantize(CENTAVO),
+        'perdida_porcentaje': _porcentaje(perdida_real, cantidad_inicial),
+        'ingreso_total': ingreso.quantize(CENTAVO),
+        'ganancia_total': real_ganancia.quantize(CENTAVO),
+        'margen': _porcentaje(real_ganancia, ingreso),
+    }
+    return FruitLotResult(
+        fruitlot=lote,
+        business_id=lote.business_id,
+        fecha_venta_completa=fecha_cierre,
+        num_ventas=totales.get('num_ventas') or 0,
+        kilos_vendidos=kilos.quantize(CENTAVO),
+        unidades_vendidas=unidades,
+        costo_vendido=costo_vendido.quantize(CENTAVO),
+        prediccion_costo_total=pred['costo_total'],
+        prediccion_perdida_kg=pred['perdida_kg'],
+        prediccion_perdida_porcentaje=pred['perdida_porcentaje'],
+        prediccion_ingreso_total=pred['ingreso_total'],
+        prediccion_ganancia_total=pred['ganancia_total'],
+        prediccion_margen=pred['margen'],
+        prediccion_dias_estimados=dias_estimados,
+        real_costo_total=real['costo_total'],
+        real_perdida_kg=real['perdida_kg'],
+        real_perdida_porcentaje=real['perdida_porcentaje'],
+        real_ingreso_total=real['ingreso_total'],
+        real_ganancia_total=real['ganancia_total'],
+        real_margen=real['margen'],
+        real_dias_en_inventario=dias_reales,
+        diferencia_costo=real['costo_total'] - pred['costo_total'],
+        diferencia_perdida_kg=real['perdida_kg'] - pred['perdida_kg'],
+        diferencia_perdida_porcentaje=real['perdida_porcentaje'] - pred['perdida_porcentaje'],
+        diferencia_ingreso=real['ingreso_total'] - pred['ingreso_total'],
+        diferencia_ganancia=real['ganancia_total'] - pred['ganancia_total'],
+        diferencia_margen=max(-TOPE_PORCENTAJE, min(TOPE_PORCENTAJE, real['margen'] - pred['margen'])),
+        diferencia_dias=dias_reales - dias_estimados,
+    )
+
+
+def cerrar_lotes(lote_ids, reemplazar=False):
+    """
+    Calcula y guarda el resultado de los lotes agotados indicados (los que aún tienen cajas se
+    ignoran). Sin `reemplazar` no toca los lotes que ya tienen resultado. Devuelve los creados.
+    """
+    with transaction.atomic():
+        # El bloqueo serializa cierres simultáneos del mismo lote (OneToOne)
+        lotes = list(
+            FruitLot.objects.select_for_update(of=('self',)).select_related('producto')
+            .filter(pk__in=lote_ids, cantidad_cajas=0)
+        )
+        if not lotes:
+            return []
+        ids = [lote.pk for lote in lotes]
+        existentes = FruitLotResult.objects.filter(fruitlot_id__in=ids)
+        if reemplazar:
+            existentes.delete()
+            cerrados = set()
+        else:
+            cerrados = set(existentes.values_list('fruitlot_id', flat=True))
+        totales = _totales([pk for pk in ids if pk not in cerrados])
+        ahora = timezone.now()
+        nuevos = [
+            calcular_resultado(lote, totales.get(lote.pk, {}), ahora)
+            for lote in lotes if lote.pk not in cerrados
+        ]
+        FruitLotResult.objects.bulk_create(nuevos, batch_size=500)
+    return nuevos
+
+
+def reabrir_lote(lote_id):
+    """El lote volvió a tener cajas: su resultado ya no vale."""
+    FruitLotResult.objects.filter(fruitlot_id=lote_id).delete()
+
+
+def resultado_de(lote):
+    """Resultado del lote agotado; lo calcula en el momento si todavía no existe."""
+    resultado = FruitLotResult.objects.filter(fruitlot=lote).first()
+    if resultado is None:
+        cerrar_lotes([lote.pk])
+        resultado = FruitLotResult.objects.filter(fruitlot=lote).first()
+    return resultado
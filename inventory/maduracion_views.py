@@ -16,21 +16,12 @@ class MaduracionPaltasView(APIView):
     def get(self, request, format=None):
         business = request.user.perfil.business
         
-        # Filtrar lotes de paltas (productos que contienen 'palta' o 'aguacate' en su nombre)
+        # Lotes de paltas (incluye 'aguacate'): categoría asignada al guardar el producto
         lotes_paltas = FruitLot.objects.filter(
             business=business,
-            producto__nombre__icontains='palta'
+            producto__categoria='palta'
         ).select_related('producto', 'box_type').order_by('fecha_ingreso')
         
-        # También incluir productos con 'aguacate' en su nombre (término usado en algunos países)
-        lotes_aguacate = FruitLot.objects.filter(
-            business=business,
-            producto__nombre__icontains='aguacate'
-        ).select_related('producto', 'box_type').order_by('fecha_ingreso')
-        
-        # Combinar los queryset
-        lotes_paltas = lotes_paltas.union(lotes_aguacate)
-        
         # Preparar datos de respuesta
         data = []
         for lote in lotes_paltas:
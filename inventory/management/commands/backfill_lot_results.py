@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from inventory.lot_result_service import cerrar_lotes
+from inventory.models import FruitLot
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula el resultado (FruitLotResult) de los lotes agotados que no lo tienen, p. ej. los "
+        "que se agotaron antes de existir el cierre automático. Con --rebuild recalcula también los "
+        "existentes. Procesa por bloques: una consulta de totales de venta por bloque."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=None, help='Solo los lotes de este negocio')
+        parser.add_argument('--rebuild', action='store_true', help='Recalcular también los resultados existentes')
+        parser.add_argument('--batch-size', type=int, default=500, help='Lotes por bloque')
+
+    def handle(self, *args, **options):
+        lotes = FruitLot.objects.filter(cantidad_cajas=0).order_by('id')
+        if options['business']:
+            lotes = lotes.filter(business_id=options['business'])
+        if not options['rebuild']:
+            lotes = lotes.filter(resultado__isnull=True)
+
+        ids = list(lotes.values_list('id', flat=True))
+        tamano = max(1, options['batch_size'])
+        creados = 0
+        for inicio in range(0, len(ids), tamano):
+            creados += len(cerrar_lotes(ids[inicio:inicio + tamano], reemplazar=options['rebuild']))
+            self.stdout.write(f"{min(inicio + tamano, len(ids))}/{len(ids)} lotes")
+        self.stdout.write(self.style.SUCCESS(f"{creados} resultados de lotes calculados"))
@@ -0,0 +1,95 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la transformación de bins a un lote (por defecto 200 bins a un pallet). La prueba de "
+        "transformaciones simultáneas está en inventory/tests.py. "
+        "Crea y luego elimina sus propios datos: ejecutar contra una base local."
+    )
+
+    KG_POR_BIN = Decimal('6.00')
+    TARA_BIN = Decimal('40.00')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bins', type=int, default=200, help='Bins por transformación')
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones del benchmark (se reporta la mejor)')
+
+    def handle(self, *args, **options):
+        fixture, cleanup = self._fixture(options['bins'])
+        try:
+            self._benchmark(fixture, options['repeat'])
+        finally:
+            cleanup()
+
+    def _benchmark(self, fixture, repeat):
+        from inventory.bin_to_lot_service import transformar_bins
+
+        # Un pallet que consume casi todos los bins (y deja uno parcial)
+        cajas = int(len(fixture['bins']) * self.KG_POR_BIN * Decimal('0.95') / fixture['box_type'].capacidad_por_caja)
+        mejor = None
+        for _ in range(repeat):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    lote = transformar_bins(
+                        fixture['bins'], fixture['box_type'], cajas, 'EXTRA', Decimal('1000'), business=fixture['business'],
+                    )
+                    elapsed = time.perf_counter() - start
+                usados = lote.transformaciones_origen.get().detalles.count()
+                # Se revierte para que cada repetición parta de los mismos bins
+                transaction.set_rollback(True)
+            if mejor is None or elapsed < mejor[0]:
+                mejor = (elapsed, len(ctx.captured_queries), usados)
+
+        elapsed, queries, usados = mejor
+        self.stdout.write(
+            f"{len(fixture['bins'])} bins -> 1 pallet de {cajas} cajas: {elapsed * 1000:.1f} ms, "
+            f"{queries} queries, {usados} bins descontados"
+        )
+
+    def _fixture(self, cantidad):
+        from accounts.models import CustomUser, Perfil
+        from business.models import Business
+        from inventory.models import BoxType, FruitBin, FruitLot, Product, Supplier
+
+        suffix = uuid.uuid4().hex[:8]
+        user = CustomUser.objects.create(email=f'bench-{suffix}@example.com', first_name='Bench', last_name='Bins')
+        perfil = Perfil.objects.create(user=user)
+        business = Business.objects.create(
+            nombre='Benchmark bins', rut=f'BENCH-{suffix}', dueno=perfil,
+            email=user.email, telefono='0', direccion='-',
+        )
+        producto = Product.objects.create(nombre='Palta Hass (benchmark)', business=business)
+        proveedor = Supplier.objects.create(nombre='Proveedor benchmark', rut=f'BENCH-{suffix}', business=business)
+        box_type = BoxType.objects.create(
+            nombre='rejilla', peso_caja=Decimal('0.50'), capacidad_por_caja=Decimal('10'), business=business,
+        )
+        bins = FruitBin.objects.bulk_create([
+            FruitBin(
+                codigo=f'BENCH-{suffix}-{i}', producto=producto, proveedor=proveedor, business=business,
+                peso_bruto=self.TARA_BIN + self.KG_POR_BIN, peso_tara=self.TARA_BIN, peso_neto=self.KG_POR_BIN,
+            )
+            for i in range(cantidad)
+        ])
+        fixture = {'business': business, 'box_type': box_type, 'bins': [b.uid for b in bins]}
+
+        def cleanup():
+            business_id = business.id
+            # Los bins protegen al producto y al proveedor: se borran antes que el negocio
+            FruitLot.objects.filter(business_id=business_id).delete()
+            FruitBin.objects.filter(business_id=business_id).delete()
+            business.delete()
+            for model in (Business, FruitBin, FruitLot, Product, Supplier):
+                history = model._meta.simple_history_manager_attribute
+                filtro = {'id': business_id} if model is Business else {'business_id': business_id}
+                getattr(model, history).model.objects.filter(**filtro).delete()
+            user.delete()
+
+        return fixture, cleanup
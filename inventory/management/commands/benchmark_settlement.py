@@ -0,0 +1,159 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la generación de una liquidación de concesión (inventory/settlement_service.py) sobre "
+        "miles de ítems de venta, verifica las comisiones por kilo, caja y porcentaje, y que una "
+        "segunda liquidación no vuelva a incluir las mismas ventas. Crea y luego elimina sus propios "
+        "datos: ejecutar contra una base local."
+    )
+
+    PESO_ITEM = Decimal('5.00')
+    UNIDADES_ITEM = 2
+    SUBTOTAL_ITEM = Decimal('10000.00')
+    # (comision_base, comision_por_kilo, comision_monto, comision_porcentaje) -> comisión esperada por ítem
+    CONFIGURACIONES = [
+        (('kg', Decimal('100'), None, None), Decimal('500.00')),
+        (('caja', None, Decimal('500'), None), Decimal('1000.00')),
+        (('venta', None, None, Decimal('10')), Decimal('1000.00')),
+        (('venta', None, Decimal('300'), None), Decimal('300.00')),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000, help='Ítems de venta en concesión a liquidar')
+        parser.add_argument('--items-por-venta', type=int, default=4, help='Ítems por venta')
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones del benchmark (se reporta la mejor)')
+
+    def handle(self, *args, **options):
+        fixture, cleanup = self._fixture(options['items'], options['items_por_venta'])
+        try:
+            self._benchmark(fixture, options['repeat'])
+            self._sin_duplicados(fixture)
+        finally:
+            cleanup()
+
+    def _esperado(self, fixture):
+        por_config = fixture['items'] // len(self.CONFIGURACIONES)
+        comision = sum((esperada * por_config for _, esperada in self.CONFIGURACIONES), Decimal('0'))
+        ventas = self.SUBTOTAL_ITEM * por_config * len(self.CONFIGURACIONES)
+        return ventas, comision
+
+    def _benchmark(self, fixture, repeat):
+        from inventory.settlement_service import generar_liquidacion
+
+        mejor = None
+        for _ in range(repeat):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    liquidacion = generar_liquidacion(fixture['business'], fixture['proveedor'])
+                    elapsed = time.perf_counter() - start
+                detalles = liquidacion.detalles.count()
+                # Se revierte para que cada repetición liquide las mismas ventas
+                transaction.set_rollback(True)
+            if mejor is None or elapsed < mejor[0]:
+                mejor = (elapsed, len(ctx.captured_queries), detalles, liquidacion)
+
+        elapsed, queries, detalles, liquidacion = mejor
+        self.stdout.write(
+            f"{fixture['items']} ítems en {fixture['ventas']} ventas -> 1 liquidación: {elapsed * 1000:.1f} ms, "
+            f"{queries} queries, {detalles} detalles"
+        )
+        ventas, comision = self._esperado(fixture)
+        self.stdout.write(
+            f"ventas {liquidacion.total_ventas}, comisión {liquidacion.total_comision}, "
+            f"a liquidar {liquidacion.monto_a_liquidar}"
+        )
+        errores = []
+        if detalles != fixture['items']:
+            errores.append(f"{detalles} detalles, se esperaban {fixture['items']}")
+        if liquidacion.total_ventas != ventas:
+            errores.append(f"total ventas {liquidacion.total_ventas}, se esperaba {ventas}")
+        if liquidacion.total_comision != comision:
+            errores.append(f"comisión {liquidacion.total_comision}, se esperaba {comision}")
+        if errores:
+            raise CommandError('Liquidación incorrecta: ' + '; '.join(errores))
+        self.stdout.write(self.style.SUCCESS('Comisiones por kilo, caja y porcentaje correctas'))
+
+    def _sin_duplicados(self, fixture):
+        """Una segunda liquidación del mismo proveedor no encuentra ventas pendientes."""
+        from inventory.settlement_service import generar_liquidacion, resumen_pendiente
+
+        generar_liquidacion(fixture['business'], fixture['proveedor'])
+        pendiente = resumen_pendiente(fixture['business'], fixture['proveedor'])
+        if pendiente['items']:
+            raise CommandError(f"Quedaron {pendiente['items']} ítems pendientes tras liquidar")
+        try:
+            generar_liquidacion(fixture['business'], fixture['proveedor'])
+        except Exception:
+            self.stdout.write(self.style.SUCCESS('Sin ventas liquidadas dos veces'))
+        else:
+            raise CommandError('La segunda liquidación volvió a incluir ventas ya liquidadas')
+
+    def _fixture(self, cantidad, por_venta):
+        from accounts.models import CustomUser, Perfil
+        from business.models import Business
+        from inventory.models import (
+            ConcessionSettlement, ConcessionSettlementDetail, FruitBin, Product, Supplier,
+        )
+        from sales.models import Sale, SaleItem
+
+        suffix = uuid.uuid4().hex[:8]
+        user = CustomUser.objects.create(email=f'bench-{suffix}@example.com', first_name='Bench', last_name='Liquidacion')
+        perfil = Perfil.objects.create(user=user)
+        business = Business.objects.create(
+            nombre='Benchmark liquidación', rut=f'BENCH-{suffix}', dueno=perfil,
+            email=user.email, telefono='0', direccion='-',
+        )
+        producto = Product.objects.create(nombre='Palta Hass (benchmark)', business=business)
+        proveedor = Supplier.objects.create(nombre='Proveedor benchmark', rut=f'BENCH-{suffix}', business=business)
+        bins = FruitBin.objects.bulk_create([
+            FruitBin(
+                codigo=f'BENCH-{suffix}-{base}-{i}', producto=producto, proveedor=proveedor, business=business,
+                peso_bruto=Decimal('500'), peso_tara=Decimal('40'), peso_neto=Decimal('460'),
+                en_concesion=True, propietario_original=proveedor, comision_base=base,
+                comision_por_kilo=por_kilo, comision_monto=monto, comision_porcentaje=porcentaje,
+            )
+            for i, ((base, por_kilo, monto, porcentaje), _) in enumerate(self.CONFIGURACIONES)
+        ])
+
+        cantidad -= cantidad % len(self.CONFIGURACIONES)
+        n_ventas = -(-cantidad // por_venta)
+        ventas = Sale.objects.bulk_create([
+            Sale(vendedor=user, business=business, total=self.SUBTOTAL_ITEM * por_venta, metodo_pago='efectivo',
+                 es_concesion=True)
+            for _ in range(n_ventas)
+        ])
+        # bulk_create no pasa por SaleItem.save(): no descuenta stock de los bins
+        SaleItem.objects.bulk_create([
+            SaleItem(
+                venta=ventas[i // por_venta], bin=bins[i % len(bins)],
+                peso_vendido=self.PESO_ITEM, unidades_vendidas=self.UNIDADES_ITEM, subtotal=self.SUBTOTAL_ITEM,
+                es_concesion=True,
+            )
+            for i in range(cantidad)
+        ], batch_size=1000)
+        fixture = {'business': business, 'proveedor': proveedor, 'items': cantidad, 'ventas': n_ventas}
+
+        def cleanup():
+            business_id = business.id
+            # Detalles y ventas protegen a los bins, y estos al producto y al proveedor
+            ConcessionSettlementDetail.objects.filter(liquidacion__business_id=business_id).delete()
+            ConcessionSettlement.objects.filter(business_id=business_id).delete()
+            Sale.objects.filter(business_id=business_id).delete()
+            FruitBin.objects.filter(business_id=business_id).delete()
+            business.delete()
+            for model in (Business, ConcessionSettlement, FruitBin, Product, Supplier, Sale):
+                history = model._meta.simple_history_manager_attribute
+                filtro = {'id': business_id} if model is Business else {'business_id': business_id}
+                getattr(model, history).model.objects.filter(**filtro).delete()
+            user.delete()
+
+        return fixture, cleanup
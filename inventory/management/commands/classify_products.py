@@ -0,0 +1,58 @@
+from functools import reduce
+from operator import or_
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from inventory.models import Product
+from inventory.product_categories import CATEGORIAS, OTRO
+
+
+class Command(BaseCommand):
+    help = (
+        "Asigna la categoría (inventory/product_categories.py) a los productos que no la tienen, "
+        "según las palabras de cada categoría en el nombre, con un UPDATE por categoría. También "
+        "alinea tipo_producto con la categoría. Con --force reclasifica todos los productos, incluso "
+        "los que tienen una categoría asignada a mano."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=None, help='Solo los productos de este negocio')
+        parser.add_argument('--force', action='store_true', help='Reclasificar también los que ya tienen categoría')
+        parser.add_argument('--dry-run', action='store_true', help='Mostrar el resultado sin guardar')
+
+    def handle(self, *args, **options):
+        productos = Product.objects.all()
+        if options['business']:
+            productos = productos.filter(business_id=options['business'])
+
+        with transaction.atomic():
+            if options['force']:
+                productos.update(categoria='')
+            # Se recorren las categorías en el mismo orden que clasificar(): gana la primera que calza
+            for clave, categoria in CATEGORIAS.items():
+                pendientes = productos.filter(categoria='')
+                if categoria.palabras:
+                    pendientes = pendientes.filter(
+                        reduce(or_, (Q(nombre__icontains=palabra) for palabra in categoria.palabras))
+                    )
+                elif clave != OTRO:
+                    continue
+                n = pendientes.update(categoria=clave, tipo_producto=categoria.tipo_producto)
+                if n:
+                    self.stdout.write(f"{categoria.nombre}: {n} productos clasificados")
+
+            # tipo_producto de los productos que ya tenían categoría
+            for clave, categoria in CATEGORIAS.items():
+                productos.filter(categoria=clave).exclude(tipo_producto=categoria.tipo_producto).update(
+                    tipo_producto=categoria.tipo_producto
+                )
+
+            resumen = productos.order_by().values('categoria').annotate(n=Count('id')).order_by('categoria')
+            self.stdout.write(', '.join(f"{fila['categoria']}: {fila['n']}" for fila in resumen) or 'Sin productos')
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING('Dry run: no se guardaron cambios'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Productos clasificados'))
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Supplier, SupplierBalanceSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda el cierre mensual (saldo al final de cada mes) de la cuenta corriente de los "
+        "proveedores, para que el estado de cuenta no recorra el libro desde el inicio. Cierra los "
+        "meses completos que falten hasta el mes anterior a --hasta (por defecto, el mes actual). "
+        "Pensado para ejecutarse al inicio de cada mes (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=None, help='Solo los proveedores de este negocio')
+        parser.add_argument('--hasta', default=None, help='Mes (AAAA-MM) hasta el que se cierra, sin incluirlo')
+        parser.add_argument('--rebuild', action='store_true', help='Eliminar los cierres existentes y recalcularlos')
+
+    def handle(self, *args, **options):
+        from inventory.supplier_ledger import cerrar_meses
+
+        hasta = None
+        if options['hasta']:
+            try:
+                hasta = datetime.strptime(options['hasta'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--hasta debe tener el formato AAAA-MM')
+
+        proveedores = Supplier.objects.filter(movimientos__isnull=False).distinct().only('id', 'business_id')
+        if options['business']:
+            proveedores = proveedores.filter(business_id=options['business'])
+        if options['rebuild']:
+            cierres = SupplierBalanceSnapshot.objects.all()
+            if options['business']:
+                cierres = cierres.filter(business_id=options['business'])
+            eliminados, _ = cierres.delete()
+            self.stdout.write(f"{eliminados} cierres eliminados")
+
+        creados = cerrar_meses(proveedores.order_by('id'), hasta)
+        self.stdout.write(self.style.SUCCESS(f"{creados} cierres mensuales guardados"))
@@ -0,0 +1,86 @@
+from decimal import Decimal
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from inventory import supplier_ledger
+from inventory.models import (
+    ConcessionSettlement, FruitBin, GoodsReception, Supplier, SupplierLedgerEntry, SupplierPayment,
+)
+
+
+def _lotes(qs, tamano=500):
+    iterador = qs.iterator(chunk_size=tamano)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica la cuenta corriente de los proveedores: el saldo guardado en Supplier contra la "
+        "suma del libro (SupplierLedgerEntry), y el libro contra sus recepciones, bins, pagos y "
+        "liquidaciones (los movimientos que faltarían se calculan y se descartan). Con --fix registra "
+        "los movimientos faltantes y corrige el saldo. También sirve para cargar el libro de los "
+        "proveedores existentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=None, help='Solo los proveedores de este negocio')
+        parser.add_argument('--fix', action='store_true', help='Corregir las diferencias encontradas')
+
+    def handle(self, *args, **options):
+        proveedores = Supplier.objects.only('id', 'nombre', 'saldo_cuenta', 'business_id').order_by('id')
+        if options['business']:
+            proveedores = proveedores.filter(business_id=options['business'])
+
+        revisados = con_diferencias = 0
+        for proveedor in proveedores.iterator(chunk_size=500):
+            revisados += 1
+            with transaction.atomic():
+                faltantes = self._sincronizar(proveedor)
+                if not options['fix']:
+                    transaction.set_rollback(True)
+
+            problemas = []
+            if faltantes:
+                monto = sum((m.monto for m in faltantes), Decimal('0'))
+                problemas.append(f"{len(faltantes)} movimientos faltantes (neto {monto})")
+            libro = SupplierLedgerEntry.objects.filter(proveedor=proveedor).aggregate(s=Sum('monto'))['s'] or Decimal('0')
+            guardado = Supplier.objects.filter(pk=proveedor.pk).values_list('saldo_cuenta', flat=True).get()
+            if guardado != libro:
+                problemas.append(f"saldo guardado {guardado} != libro {libro}")
+                if options['fix']:
+                    self._fix_saldo(proveedor)
+            if not problemas:
+                continue
+
+            con_diferencias += 1
+            self.stdout.write(f"{proveedor.nombre} (id {proveedor.pk}): " + '; '.join(problemas))
+
+        resumen = f"{revisados} proveedores revisados, {con_diferencias} con diferencias"
+        if con_diferencias and not options['fix']:
+            raise CommandError(f"{resumen} (ejecuta con --fix para corregir)")
+        self.stdout.write(self.style.SUCCESS(resumen + (' (corregidas)' if con_diferencias else '')))
+
+    def _sincronizar(self, proveedor):
+        """Sincroniza todos los documentos del proveedor y devuelve los movimientos agregados."""
+        documentos = [
+            GoodsReception.objects.filter(proveedor=proveedor),
+            FruitBin.objects.filter(proveedor=proveedor),
+            SupplierPayment.objects.filter(recepcion__proveedor=proveedor).select_related('recepcion'),
+            ConcessionSettlement.objects.filter(proveedor=proveedor),
+        ]
+        agregados = []
+        for qs in documentos:
+            for lote in _lotes(qs.order_by('pk')):
+                agregados.extend(supplier_ledger.sincronizar(lote))
+        return agregados
+
+    def _fix_saldo(self, proveedor):
+        with transaction.atomic():
+            # Recalcular con el proveedor bloqueado: entre la lectura y el ajuste pudo entrar un movimiento
+            Supplier.objects.select_for_update().filter(pk=proveedor.pk).values_list('pk').get()
+            libro = SupplierLedgerEntry.objects.filter(proveedor=proveedor).aggregate(s=Sum('monto'))['s'] or Decimal('0')
+            Supplier.objects.filter(pk=proveedor.pk).update(saldo_cuenta=libro)
@@ -5,7 +5,8 @@ from django.utils.translation import gettext_lazy as _
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from core.models import BaseModel
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
+from .product_categories import CATEGORIA_CHOICES, CATEGORIAS, clasificar
 
 class Product(BaseModel):
     options = [
@@ -22,19 +23,43 @@ class Product(BaseModel):
     marca = models.CharField(max_length=50, blank=True)
     unidad = models.CharField(max_length=20, default="caja", choices=options)
     tipo_producto = models.CharField(max_length=10, choices=TIPO_PRODUCTO_CHOICES, default='palta', help_text='Tipo de producto: palta o otro')
+    categoria = models.CharField(
+        max_length=20, choices=CATEGORIA_CHOICES, blank=True,
+        help_text='Categoría del producto (inventory/product_categories.py); vacía se asigna según el nombre',
+    )
     business = models.ForeignKey('business.Business', on_delete=models.CASCADE)
     activo = models.BooleanField(default=True)
     image_path = models.ImageField(upload_to='product_images', blank=True, null=True)
 
     history = HistoricalRecords()
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['business', 'categoria'], name='product_biz_categoria_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nombre y categoría guardados, para reclasificar al renombrar (ver save)
+        instance._guardado = (instance.__dict__.get('nombre'), instance.__dict__.get('categoria'))
+        return instance
+
     def save(self, *args, **kwargs):
-        """Asegura que el tipo de producto se asigne automáticamente."""
-        if 'palta' in self.nombre.lower():
-            self.tipo_producto = 'palta'
-        else:
-            self.tipo_producto = 'otro'
+        """
+        Asigna la categoría según el nombre si no se indicó o si el producto cambió de nombre (salvo
+        que en el mismo guardado se elija otra categoría), y el tipo de producto según la categoría.
+        """
+        nombre_guardado, categoria_guardada = getattr(self, '_guardado', (None, None))
+        renombrado = nombre_guardado is not None and self.nombre != nombre_guardado and self.categoria == categoria_guardada
+        if not self.categoria or renombrado:
+            self.categoria = clasificar(self.nombre)
+        self.tipo_producto = CATEGORIAS[self.categoria].tipo_producto
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nombre' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'categoria', 'tipo_producto'}
         super().save(*args, **kwargs)
+        self._guardado = (self.nombre, self.categoria)
 
     def __str__(self):
         return f"{self.nombre} ({self.marca})"
@@ -164,6 +189,14 @@ class FruitLot(BaseModel):
         return max(0, self.cantidad_cajas - self.unidades_reservadas)
 
     def save(self, *args, **kwargs):
+        self.completar_campos()
+        super().save(*args, **kwargs)
+
+    def completar_campos(self):
+        """
+        Valida y completa los campos calculados (peso neto, unidades, QR, estado) antes de guardar.
+        Lo usa save() y también la creación en lote de inventory/reception_intake.py, que no pasa por save().
+        """
         from django.core.exceptions import ValidationError
         # Validaciones para evitar inconsistencias
         if self.cantidad_cajas < 0:
@@ -204,12 +237,19 @@ class FruitLot(BaseModel):
                 if self.cantidad_cajas <= 0:
                     # self.estado_lote = 'agotado'
                     pass
-        
-        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.producto.nombre} - Lote {self.id} ({self.estado_maduracion})"
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['business', 'estado_lote', 'cantidad_cajas'], name='lot_biz_estado_cajas_idx'),
+            # Stock disponible (cantidad_cajas > 0): cierre de turno, dashboard y listados
+            models.Index(fields=['business'], condition=models.Q(cantidad_cajas__gt=0), name='lot_biz_con_stock_idx'),
+            # Timeline del dashboard: lotes más recientes del negocio (core/timeline.py)
+            models.Index(fields=['business', 'created_at'], name='lot_biz_created_idx'),
+        ]
+
 class MadurationHistory(models.Model):
     lote = models.ForeignKey(FruitLot, on_delete=models.CASCADE, related_name='maduration_history')
     estado_maduracion = models.CharField(max_length=16, choices=[('verde','Verde'),('pre-maduro','Pre-maduro'),('maduro','Maduro'),('sobremaduro','Sobremaduro')])
@@ -254,6 +294,15 @@ class StockReservation(BaseModel):
         else:
             return f"Reserva {self.id} - Lote {self.lote_id} - {self.unidades_reservadas}unidades/{self.cajas_reservadas}cajas - {self.estado} ({cliente_str})"
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['lote', 'estado'], name='reserva_lote_estado_idx'),
+            # Casi todas las lecturas buscan las reservas activas de un lote
+            models.Index(fields=['lote'], condition=models.Q(estado='en_proceso'), name='reserva_lote_activa_idx'),
+            # Timeline del dashboard: reservas más recientes (core/timeline.py)
+            models.Index(fields=['created_at'], name='reserva_created_idx'),
+        ]
+
 class Supplier(BaseModel):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
     """
@@ -268,11 +317,27 @@ class Supplier(BaseModel):
     observaciones = models.TextField(blank=True, null=True)
     business = models.ForeignKey('business.Business', on_delete=models.CASCADE)
     activo = models.BooleanField(default=True)
+
+    # Cuenta corriente: se actualiza junto con cada movimiento (SupplierLedgerEntry), ver inventory/supplier_ledger.py
+    saldo_cuenta = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False,
+                                       help_text="Saldo adeudado al proveedor (cargos menos abonos)")
     
-    history = HistoricalRecords()
+    history = HistoricalRecords(excluded_fields=['saldo_cuenta'])
+
+    CAMPOS_CUENTA = ('saldo_cuenta',)
     
     def __str__(self):
         return f"{self.nombre} ({self.rut})"
+
+    def save(self, *args, **kwargs):
+        # El saldo solo lo escribe inventory/supplier_ledger.py; un save() completo de una instancia
+        # leída antes de un movimiento no debe pisarlo con un valor viejo
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_CUENTA
+            ]
+        super().save(*args, **kwargs)
     
     class Meta:
         verbose_name = _("Supplier")
@@ -375,35 +440,11 @@ class GoodsReception(BaseModel):
     def actualizar_totales(self):
         """
         Actualiza los totales basados en los detalles de la recepción y
-        calcula el monto_total basado en los lotes vinculados (peso_neto * costo_inicial)
+        calcula el monto_total basado en los lotes vinculados (peso_neto * costo_inicial).
+        Ver inventory/reception_intake.py.
         """
-        detalles = self.detalles.all()
-        self.total_pallets = detalles.count()
-        self.total_cajas = sum(d.cantidad_cajas for d in detalles)
-        self.total_peso_bruto = sum(d.peso_bruto for d in detalles)
-        
-        # Calcular el monto total basado en los lotes vinculados
-        monto_total = 0
-        for detalle in detalles:
-            if detalle.lote_creado:
-                # Si hay un lote vinculado, usar su peso_neto y costo_inicial (para palta),
-                # o cantidad_cajas * costo_inicial (para otros productos)
-                lote = detalle.lote_creado
-                if getattr(lote.producto, 'tipo_producto', None) == 'palta':
-                    monto_total += float(lote.peso_neto or 0) * float(lote.costo_inicial or 0)
-                else:
-                    monto_total += float(lote.cantidad_cajas or 0) * float(lote.costo_inicial or 0)
-            else:
-                # Si no hay lote vinculado: estimar según tipo de producto del detalle
-                tipo = getattr(detalle.producto, 'tipo_producto', None) if getattr(detalle, 'producto', None) else None
-                if tipo == 'palta':
-                    peso_neto_estimado = float(detalle.peso_bruto or 0) - float(detalle.peso_tara or 0)
-                    monto_total += max(peso_neto_estimado, 0) * float(detalle.costo or 0)
-                else:
-                    monto_total += float(detalle.cantidad_cajas or 0) * float(detalle.costo or 0)
-        
-        self.monto_total = monto_total
-        self.save()
+        from .reception_intake import actualizar_totales
+        actualizar_totales(self)
     
     class Meta:
         verbose_name = _("Goods Reception")
@@ -511,72 +552,13 @@ def crear_lotes_al_aprobar_recepcion(sender, instance, created, **kwargs):
     """
     import logging
     logger = logging.getLogger(__name__)
-    
+
+    if instance.estado != "aprobado":
+        return
     try:
-        # Solo proceder si la recepción está en estado aprobado
-        if instance.estado == "aprobado":
-            logger.info(f"Procesando recepción {instance.numero_guia} para crear lotes")
-            
-            # Procesar solo detalles que no tienen lote creado aún
-            detalles_sin_lote = instance.detalles.filter(lote_creado__isnull=True)
-            logger.info(f"Encontrados {detalles_sin_lote.count()} detalles sin lote")
-            
-            # Usar una bandera para evitar recursividad y duplicación
-            if not hasattr(instance, '_lotes_creados') or not instance._lotes_creados:
-                # Marcar que ya se procesaron los lotes para esta instancia
-                instance._lotes_creados = True
-                
-                for detalle in detalles_sin_lote:
-                    try:
-                        logger.info(f"Creando lote para detalle {detalle.id} - Producto: {detalle.producto.nombre if detalle.producto else 'No especificado'}")
-                        
-                        # Crear un nuevo lote de fruta basado en el detalle de recepción
-                        lote = FruitLot(
-                            producto=detalle.producto,
-                            # Preferir la marca del detalle si viene, si no usar la del producto
-                            marca=(detalle.marca or (detalle.producto.marca if getattr(detalle, 'producto', None) and getattr(detalle.producto, 'marca', None) else "")),
-                            variedad=detalle.variedad or "",
-                            proveedor=instance.proveedor if instance.proveedor else None,
-                            procedencia=instance.proveedor.direccion if instance.proveedor and instance.proveedor.direccion else "No especificada",
-                            pais="Chile",  # Valor por defecto, podría ser un campo en Proveedor
-                            calibre=detalle.calibre or "No especificado",
-                            box_type=detalle.box_type,
-                            cantidad_cajas=detalle.cantidad_cajas,
-                            peso_bruto=detalle.peso_bruto,
-                            # peso_neto será calculado en FruitLot.save() usando peso_bruto, box_type y pallet_type
-                            business=instance.business,
-                            fecha_ingreso=instance.fecha_recepcion.date() if instance.fecha_recepcion else None,
-                            estado_maduracion=detalle.estado_maduracion or "verde",
-                            costo_inicial=detalle.costo,  # Usar el costo del detalle de recepción
-                            porcentaje_perdida_estimado=detalle.porcentaje_perdida_estimado,  # Usar el porcentaje de pérdida estimado del detalle
-                            # Campos de concesión
-                            en_concesion=detalle.en_concesion,
-                            comision_por_kilo=detalle.comision_por_kilo,
-                            fecha_limite_concesion=detalle.fecha_limite_concesion,
-                            # El campo propietario_original espera un objeto Supplier, no un string
-                            propietario_original=instance.proveedor if detalle.en_concesion else None,
-                            # Precios sugeridos
-                            precio_sugerido_min=detalle.precio_sugerido_min,
-                            precio_sugerido_max=detalle.precio_sugerido_max,
-                        )
-                        
-                        # Guardar el lote
-                        lote.save()
-                        
-                        # Registrar el cambio de estado de maduración inicial
-                        MadurationHistory.objects.create(
-                            lote=lote,
-                            estado_maduracion=lote.estado_maduracion
-                        )
-                        
-                        # Actualizar el detalle con referencia al lote creado
-                        # Usar update para evitar que se dispare la señal post_save de ReceptionDetail
-                        ReceptionDetail.objects.filter(pk=detalle.pk).update(lote_creado=lote)
-                        
-                        # Log para debugging
-                        logger.info(f"Lote creado automáticamente: {lote} desde recepción {instance.numero_guia}")
-                    except Exception as e:
-                        logger.error(f"Error al crear lote para detalle {detalle.id}: {str(e)}")
+        # Idempotente: solo toma los detalles sin lote, así que volver a guardar la recepción no duplica lotes
+        from .reception_intake import crear_lotes
+        crear_lotes(instance)
     except Exception as e:
         logger.error(f"Error general al crear lotes para recepción {instance.id}: {str(e)}")
 
@@ -701,6 +683,10 @@ class ConcessionSettlement(BaseModel):
     # Comprobante de pago
     comprobante = models.FileField(upload_to='comprobantes_liquidacion', null=True, blank=True)
     
+    # Período liquidado (ventas con fecha en [fecha_desde, fecha_hasta)); vacío en liquidaciones manuales
+    fecha_desde = models.DateTimeField(null=True, blank=True)
+    fecha_hasta = models.DateTimeField(null=True, blank=True)
+
     # Notas
     notas = models.TextField(blank=True, null=True)
     business = models.ForeignKey('business.Business', on_delete=models.CASCADE)
@@ -722,7 +708,9 @@ class ConcessionSettlementDetail(models.Model):
     liquidacion = models.ForeignKey('ConcessionSettlement', on_delete=models.CASCADE, related_name='detalles')
     venta = models.ForeignKey('sales.Sale', on_delete=models.PROTECT)
     item_venta = models.ForeignKey('sales.SaleItem', on_delete=models.PROTECT)
-    lote = models.ForeignKey('FruitLot', on_delete=models.PROTECT)
+    # Un ítem de venta viene de un lote o de un bin
+    lote = models.ForeignKey('FruitLot', on_delete=models.PROTECT, null=True, blank=True)
+    bin = models.ForeignKey('FruitBin', on_delete=models.PROTECT, null=True, blank=True)
     
     cantidad_kilos = models.DecimalField(max_digits=8, decimal_places=2)
     precio_venta = models.DecimalField(max_digits=10, decimal_places=2)
@@ -730,11 +718,15 @@ class ConcessionSettlementDetail(models.Model):
     monto_liquidado = models.DecimalField(max_digits=10, decimal_places=2)
     
     def __str__(self):
-        return f"Detalle {self.id} - Venta {self.venta.id} - {self.cantidad_kilos}kg"
+        return f"Detalle {self.id} - Venta {self.venta_id} - {self.cantidad_kilos}kg"
     
     class Meta:
         verbose_name = _("Concession Settlement Detail")
         verbose_name_plural = _("Concession Settlement Details")
+        indexes = [
+            # Anti-join de ítems ya liquidados (inventory/settlement_service.py)
+            models.Index(fields=['item_venta', 'liquidacion'], name='settle_det_item_idx'),
+        ]
 
 class FruitBin(BaseModel):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
@@ -861,6 +853,13 @@ class FruitBin(BaseModel):
         verbose_name = "Bin de Fruta"
         verbose_name_plural = "Bins de Fruta"
         ordering = ['-fecha_recepcion']
+        indexes = [
+            models.Index(fields=['business', 'estado'], name='bin_biz_estado_idx'),
+        ]
 
 # Importar modelos de trazabilidad bin-lote
-from .bin_to_lot_models import BinToLotTransformation, BinToLotTransformationDetail
\ No newline at end of file
+from .bin_to_lot_models import BinToLotTransformation, BinToLotTransformationDetail
+# Cuenta corriente de proveedores
+from .models_ledger import SupplierBalanceSnapshot, SupplierLedgerEntry
+# Resultado real de los lotes agotados
+from .fruitlot_results import FruitLotResult
@@ -0,0 +1,75 @@
+import uuid
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SupplierLedgerEntry(models.Model):
+    """
+    Movimiento de la cuenta corriente de un proveedor (solo se agregan filas, nunca se editan).
+    `monto` es positivo cuando aumenta lo que se le debe (cargo: recepción, bin, liquidación) y
+    negativo cuando lo reduce (abono: pago). `fecha` es la del documento de origen, así que el
+    estado de cuenta se ordena por fecha y no por orden de registro.
+    El saldo vigente se guarda en `Supplier.saldo_cuenta`; ver inventory/supplier_ledger.py.
+    """
+    TIPO_CHOICES = [
+        ('cargo', _('Cargo')),
+        ('abono', _('Abono')),
+        ('ajuste', _('Ajuste')),
+    ]
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    proveedor = models.ForeignKey('Supplier', on_delete=models.CASCADE, related_name='movimientos')
+    business = models.ForeignKey('business.Business', on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    monto = models.DecimalField(max_digits=14, decimal_places=2)
+    fecha = models.DateTimeField()
+    # Origen del movimiento; se conserva el movimiento aunque se elimine el documento
+    recepcion = models.ForeignKey('GoodsReception', on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='movimientos_cuenta')
+    bin = models.ForeignKey('FruitBin', on_delete=models.SET_NULL, null=True, blank=True,
+                            related_name='movimientos_cuenta')
+    pago = models.ForeignKey('SupplierPayment', on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='movimientos_cuenta')
+    liquidacion = models.ForeignKey('ConcessionSettlement', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='movimientos_cuenta')
+    descripcion = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['proveedor', 'fecha', 'id']
+        verbose_name = _('Movimiento de cuenta de proveedor')
+        verbose_name_plural = _('Movimientos de cuenta de proveedores')
+        indexes = [
+            models.Index(fields=['proveedor', 'fecha', 'id'], name='mov_prov_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.monto} - {self.proveedor_id} ({self.fecha:%d/%m/%Y})"
+
+
+class SupplierBalanceSnapshot(models.Model):
+    """
+    Saldo de cierre de un mes en la cuenta de un proveedor: la suma de sus movimientos con fecha
+    anterior al inicio del mes siguiente. El estado de cuenta parte del último cierre anterior al
+    período y solo suma los movimientos posteriores. Un movimiento con fecha en un mes ya cerrado
+    elimina ese cierre y los siguientes (se recalculan con `manage.py close_supplier_ledger`).
+    """
+    proveedor = models.ForeignKey('Supplier', on_delete=models.CASCADE, related_name='cierres')
+    business = models.ForeignKey('business.Business', on_delete=models.CASCADE)
+    mes = models.DateField(help_text='Primer día del mes cerrado')
+    saldo = models.DecimalField(max_digits=14, decimal_places=2)
+    cargos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    abonos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    movimientos = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['proveedor', 'mes']
+        verbose_name = _('Cierre mensual de proveedor')
+        verbose_name_plural = _('Cierres mensuales de proveedores')
+        constraints = [
+            models.UniqueConstraint(fields=['proveedor', 'mes'], name='cierre_prov_mes_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Cierre {self.mes:%m/%Y} - {self.proveedor_id}: {self.saldo}"
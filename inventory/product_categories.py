@@ -0,0 +1,78 @@
+"""
+Categorías de producto.
+
+Cada producto guarda su categoría en `Product.categoria` (columna indexada), asignada al guardar
+a partir del nombre. Los reportes, la maduración y las ventas filtran y deciden por esa columna
+en vez de buscar 'palta' o 'aguacate' dentro del nombre en cada fila.
+
+Por categoría se define:
+  - palabras: con qué se reconoce en el nombre (se prueban en el orden de CATEGORIAS)
+  - tipo_producto: el valor heredado palta/otro (palta = se vende por kilo)
+  - unidad_venta: cómo se valoriza el stock (kilogramo o caja); None usa la unidad del producto
+  - dias_maduracion: días desde el ingreso en que termina cada estado (verde, pre-maduro,
+    maduro); después pasa a sobremaduro. None si la categoría no sigue maduración.
+  - perdida_maduracion: % de pérdida estimada por estado (None si no se estima)
+
+Los productos ya existentes se clasifican con `manage.py classify_products`.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+
+class Categoria(NamedTuple):
+    clave: str
+    nombre: str
+    palabras: tuple = ()
+    tipo_producto: str = 'otro'
+    unidad_venta: Optional[str] = None
+    dias_maduracion: Optional[tuple] = (5, 10, 15)
+    perdida_maduracion: Optional[dict] = None
+
+    @property
+    def venta_por_peso(self):
+        return self.tipo_producto == 'palta'
+
+    def estado_maduracion(self, dias):
+        """Estado de maduración esperado a los `dias` desde el ingreso."""
+        if self.dias_maduracion is None:
+            return None
+        for estado, limite in zip(ESTADOS_MADURACION, self.dias_maduracion):
+            if dias <= limite:
+                return estado
+        return ESTADOS_MADURACION[-1]
+
+
+ESTADOS_MADURACION = ('verde', 'pre-maduro', 'maduro', 'sobremaduro')
+
+OTRO = 'otro'
+
+CATEGORIAS = {
+    categoria.clave: categoria for categoria in (
+        Categoria(
+            'palta', 'Palta', ('palta', 'aguacate'), tipo_producto='palta', unidad_venta='kilogramo',
+            dias_maduracion=(3, 6, 10),
+            perdida_maduracion={'pre-maduro': Decimal('2.00'), 'maduro': Decimal('5.00'), 'sobremaduro': Decimal('5.00')},
+        ),
+        Categoria('mango', 'Mango', ('mango',), unidad_venta='caja'),
+        Categoria('platano', 'Plátano', ('platano', 'plátano', 'banano', 'banana'), unidad_venta='caja'),
+        Categoria('citrico', 'Cítrico', ('limon', 'limón', 'naranja', 'mandarina', 'pomelo'), dias_maduracion=None),
+        Categoria(OTRO, 'Otro'),
+    )
+}
+
+CATEGORIA_CHOICES = [(clave, categoria.nombre) for clave, categoria in CATEGORIAS.items()]
+
+
+def clasificar(nombre):
+    """Clave de la categoría que corresponde al nombre del producto."""
+    nombre = (nombre or '').lower()
+    for clave, categoria in CATEGORIAS.items():
+        if any(palabra in nombre for palabra in categoria.palabras):
+            return clave
+    return OTRO
+
+
+def categoria_de(producto):
+    """Categoría de un producto (o de su clave); 'otro' si falta o no se reconoce."""
+    clave = getattr(producto, 'categoria', producto)
+    return CATEGORIAS.get(clave or OTRO, CATEGORIAS[OTRO])
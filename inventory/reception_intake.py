@@ -0,0 +1,251 @@
+"""
+Ingreso de recepciones de mercadería en lote.
+
+Un camión trae decenas de pallets y cada uno es un ReceptionDetail. Aquí los productos, tipos de
+caja y detalles existentes de todas las filas se cargan con una consulta cada uno, los detalles se
+escriben con un bulk_create/bulk_update (más su historial) y los totales de la recepción salen de
+un solo aggregate. Al aprobar la recepción, los lotes (FruitLot) y su historial de maduración se
+crean también en lote y se vinculan a sus detalles con un único UPDATE.
+
+Así la cantidad de consultas no depende de cuántos pallets traiga la recepción.
+"""
+import logging
+import uuid
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from rest_framework import serializers
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from .models import BoxType, FruitLot, MadurationHistory, Product, ReceptionDetail, actualizar_lote_desde_detalle
+from .serializers import ReceptionDetailSerializer
+
+logger = logging.getLogger(__name__)
+
+MONTO = DecimalField(max_digits=16, decimal_places=4)
+CERO = Value(Decimal('0'), output_field=MONTO)
+
+
+def _es_uuid(valor):
+    try:
+        uuid.UUID(str(valor))
+        return True
+    except ValueError:
+        return False
+
+
+class Catalogo:
+    """Productos, tipos de caja y detalles existentes que referencian las filas, indexados por id/uid."""
+
+    def __init__(self, recepcion, filas):
+        valores = {str(fila.get('producto')) for fila in filas if fila.get('producto') not in (None, '')}
+        ids = [int(v) for v in valores if v.isdigit()]
+        uids = [v for v in valores if _es_uuid(v)]
+        self.productos = {}
+        if ids or uids:
+            for producto in Product.objects.filter(Q(id__in=ids) | Q(uid__in=uids), business_id=recepcion.business_id):
+                self.productos[str(producto.id)] = self.productos[str(producto.uid)] = producto
+
+        uids = {str(fila['box_type']) for fila in filas if fila.get('box_type') and _es_uuid(fila['box_type'])}
+        self.box_types = {}
+        if uids:
+            self.box_types = {
+                str(box.uid): box for box in BoxType.objects.filter(uid__in=uids, business_id=recepcion.business_id)
+            }
+
+        uids = {str(fila['uid']) for fila in filas if fila.get('uid') and _es_uuid(fila['uid'])}
+        self.detalles = {}
+        if uids:
+            for detalle in recepcion.detalles.filter(uid__in=uids).select_related('producto', 'box_type', 'lote_creado'):
+                # Misma instancia de recepción: sus flags y totales se comparten con el llamador
+                detalle.recepcion = recepcion
+                self.detalles[str(detalle.uid)] = detalle
+
+
+class CatalogoField(serializers.Field):
+    """Relación por uid (o id) resuelta contra el Catálogo del contexto, sin consulta por fila."""
+
+    def __init__(self, coleccion, nombre, **kwargs):
+        self.coleccion = coleccion
+        self.nombre = nombre
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        objeto = getattr(self.context['catalogo'], self.coleccion).get(str(data))
+        if objeto is None:
+            raise serializers.ValidationError(f'{self.nombre} "{data}" no encontrado')
+        return objeto
+
+    def to_representation(self, value):
+        return value.uid
+
+
+class ReceptionDetailIntakeSerializer(ReceptionDetailSerializer):
+    """Validación de una fila del ingreso; la recepción la asigna el servicio."""
+    recepcion = None
+    producto = CatalogoField('productos', 'Producto')
+    box_type = CatalogoField('box_types', 'Tipo de caja', required=False, allow_null=True)
+
+    class Meta(ReceptionDetailSerializer.Meta):
+        fields = tuple(f for f in ReceptionDetailSerializer.Meta.fields if f != 'recepcion')
+
+
+def guardar_detalles(recepcion, filas, crear_si_no_existe=True):
+    """
+    Crea los detalles de `recepcion` a partir de `filas` (dicts del request) o los actualiza si la
+    fila trae el uid de un detalle existente de la recepción. Con crear_si_no_existe=False un uid
+    desconocido es un error en vez de un detalle nuevo.
+
+    Devuelve (creados, actualizados, errores); errores es una lista de (indice, fila, error).
+    Las filas con error no se guardan y no impiden guardar las demás.
+    """
+    catalogo = Catalogo(recepcion, filas)
+    nuevos, modificados, campos, errores = [], {}, set(), []
+
+    for i, fila in enumerate(filas):
+        if fila.get('producto') in (None, ''):
+            errores.append((i, fila, "El campo 'producto' es obligatorio."))
+            continue
+        existente = catalogo.detalles.get(str(fila['uid'])) if fila.get('uid') else None
+        if fila.get('uid') and existente is None and not crear_si_no_existe:
+            errores.append((i, fila, 'Detalle no encontrado'))
+            continue
+
+        serializer = ReceptionDetailIntakeSerializer(
+            existente, data=fila, partial=existente is not None, context={'catalogo': catalogo}
+        )
+        if not serializer.is_valid():
+            errores.append((i, fila, serializer.errors))
+            continue
+
+        if existente is None:
+            nuevos.append(ReceptionDetail(recepcion=recepcion, **serializer.validated_data))
+        else:
+            for campo, valor in serializer.validated_data.items():
+                setattr(existente, campo, valor)
+            campos.update(serializer.validated_data)
+            modificados[existente.pk] = existente
+
+    modificados = list(modificados.values())
+    with transaction.atomic():
+        if nuevos:
+            bulk_create_with_history(nuevos, ReceptionDetail)
+        if modificados:
+            ahora = timezone.now()
+            for detalle in modificados:
+                detalle.updated_at = ahora
+            bulk_update_with_history(modificados, ReceptionDetail, sorted(campos | {'updated_at'}))
+            # bulk_update no dispara post_save: sincronizar a mano los lotes ya creados
+            for detalle in modificados:
+                actualizar_lote_desde_detalle(sender=ReceptionDetail, instance=detalle, created=False)
+        if nuevos or modificados:
+            actualizar_totales(recepcion)
+
+    return nuevos, modificados, errores
+
+
+def crear_lotes(recepcion):
+    """
+    Crea un FruitLot (con su registro inicial de maduración) por cada detalle de la recepción que
+    aún no tenga lote, y los vincula a sus detalles. Devuelve los lotes creados.
+    Los detalles sin tipo de caja o con datos inválidos se registran en el log y se omiten.
+    """
+    # Sin proveedor el lote queda sin proveedor y con procedencia "No especificada"
+    proveedor = recepcion.proveedor if recepcion.proveedor_id else None
+    with transaction.atomic():
+        # El bloqueo evita que dos guardados simultáneos de la recepción creen lotes duplicados
+        detalles = (
+            recepcion.detalles.select_for_update(of=('self',))
+            .filter(lote_creado__isnull=True)
+            .select_related('producto', 'box_type')
+            .order_by('id')
+        )
+        lotes, vinculados = [], []
+        for detalle in detalles:
+            if detalle.box_type_id is None:
+                logger.error(f"Error al crear lote para detalle {detalle.id}: el detalle no tiene tipo de caja")
+                continue
+            lote = FruitLot(
+                producto=detalle.producto,
+                # Preferir la marca del detalle si viene, si no usar la del producto
+                marca=detalle.marca or detalle.producto.marca or "",
+                variedad=detalle.variedad or "",
+                proveedor=proveedor,
+                procedencia=proveedor.direccion if proveedor and proveedor.direccion else "No especificada",
+                pais="Chile",  # Valor por defecto, podría ser un campo en Proveedor
+                calibre=detalle.calibre or "No especificado",
+                box_type=detalle.box_type,
+                cantidad_cajas=detalle.cantidad_cajas,
+                peso_bruto=detalle.peso_bruto,
+                business_id=recepcion.business_id,
+                fecha_ingreso=recepcion.fecha_recepcion.date() if recepcion.fecha_recepcion else timezone.now().date(),
+                estado_maduracion=detalle.estado_maduracion or "verde",
+                costo_inicial=detalle.costo,
+                porcentaje_perdida_estimado=detalle.porcentaje_perdida_estimado,
+                en_concesion=detalle.en_concesion,
+                comision_por_kilo=detalle.comision_por_kilo,
+                fecha_limite_concesion=detalle.fecha_limite_concesion,
+                propietario_original=proveedor if detalle.en_concesion else None,
+                precio_sugerido_min=detalle.precio_sugerido_min,
+                precio_sugerido_max=detalle.precio_sugerido_max,
+            )
+            try:
+                # Lo mismo que haría FruitLot.save(): peso neto, unidades, QR y estado
+                lote.completar_campos()
+            except (DjangoValidationError, TypeError) as e:
+                logger.error(f"Error al crear lote para detalle {detalle.id}: {e}")
+                continue
+            lotes.append(lote)
+            vinculados.append(detalle)
+
+        if not lotes:
+            return []
+
+        bulk_create_with_history(lotes, FruitLot)
+        MadurationHistory.objects.bulk_create(
+            [MadurationHistory(lote=lote, estado_maduracion=lote.estado_maduracion) for lote in lotes]
+        )
+        ReceptionDetail.objects.filter(pk__in=[d.pk for d in vinculados]).update(
+            lote_creado=Case(
+                *[When(pk=detalle.pk, then=Value(lote.pk)) for detalle, lote in zip(vinculados, lotes)],
+                output_field=IntegerField(),
+            )
+        )
+        for detalle, lote in zip(vinculados, lotes):
+            detalle.lote_creado = lote
+
+    logger.info(f"{len(lotes)} lotes creados desde recepción {recepcion.numero_guia}")
+    return lotes
+
+
+def actualizar_totales(recepcion):
+    """
+    Recalcula pallets, cajas, peso bruto y monto total de la recepción con un solo aggregate.
+    El monto usa el lote vinculado si existe (peso neto o cajas por costo inicial, según el tipo de
+    producto); si no, lo estima desde el detalle.
+    """
+    monto = Case(
+        When(
+            lote_creado__isnull=False, lote_creado__producto__tipo_producto='palta',
+            then=Coalesce(F('lote_creado__peso_neto'), CERO) * F('lote_creado__costo_inicial'),
+        ),
+        When(lote_creado__isnull=False, then=F('lote_creado__cantidad_cajas') * F('lote_creado__costo_inicial')),
+        When(producto__tipo_producto='palta', then=Greatest(F('peso_bruto') - F('peso_tara'), CERO) * F('costo')),
+        default=F('cantidad_cajas') * F('costo'),
+        output_field=MONTO,
+    )
+    totales = ReceptionDetail.objects.filter(recepcion=recepcion).aggregate(
+        pallets=Count('id'),
+        cajas=Coalesce(Sum('cantidad_cajas'), 0),
+        peso=Coalesce(Sum('peso_bruto'), Value(Decimal('0'))),
+        monto=Coalesce(Sum(monto), CERO),
+    )
+    recepcion.total_pallets = totales['pallets']
+    recepcion.total_cajas = totales['cajas']
+    recepcion.total_peso_bruto = totales['peso']
+    recepcion.monto_total = Decimal(totales['monto']).quantize(Decimal('0.01'))
+    recepcion.save(update_fields=['total_pallets', 'total_cajas', 'total_peso_bruto', 'monto_total', 'updated_at'])
@@ -1,8 +1,9 @@
 from rest_framework import serializers
-from .models import BoxType, FruitLot, StockReservation, Product, GoodsReception, Supplier, ReceptionDetail, SupplierPayment, ConcessionSettlement, ConcessionSettlementDetail
+from .models import BoxType, FruitLot, FruitLotResult, StockReservation, Product, GoodsReception, Supplier, ReceptionDetail, SupplierPayment, ConcessionSettlement, ConcessionSettlementDetail
 from accounts.models import Perfil
 from sales.models import Customer, SaleItem
 from django.db.models import Sum, Max, F
+from core.uploads import CargaDiferidaMixin, MiniaturaField
 from decimal import Decimal
 
 class BoxTypeSerializer(serializers.ModelSerializer):
@@ -350,16 +351,19 @@ class SupplierSerializerList(serializers.ModelSerializer):
         except Exception:
             return False
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CargaDiferidaMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    miniatura_url = MiniaturaField(source='image_path')
     unidad = serializers.SerializerMethodField()
+    # La imagen se procesa y sube fuera de la request (core/uploads.py)
+    campos_diferidos = ('image_path',)
     
     def get_unidad(self, obj):
         return obj.get_unidad_display()
     
     class Meta:
         model = Product
-        fields = ('uid', 'nombre', 'marca', 'unidad', 'business', 'activo', 'image_path', 'image_url')
+        fields = ('uid', 'nombre', 'marca', 'unidad', 'categoria', 'business', 'activo', 'image_path', 'image_url', 'miniatura_url')
     
     def get_image_url(self, obj):
         if obj.image_path and hasattr(obj.image_path, 'url'):
@@ -372,6 +376,7 @@ class ProductSerializer(serializers.ModelSerializer):
 class FruitLotListSerializer(serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
     tipo_producto = serializers.CharField(source='producto.tipo_producto', read_only=True)
+    categoria = serializers.CharField(source='producto.categoria', read_only=True)
     # Campos para stock disponible
     cajas_disponibles = serializers.SerializerMethodField()
     costo_total_pallet = serializers.SerializerMethodField()
@@ -389,7 +394,7 @@ class FruitLotListSerializer(serializers.ModelSerializer):
     class Meta:
         model = FruitLot
         fields = (
-            'uid', 'producto', 'producto_nombre', 'tipo_producto', 'calibre', 'variedad', 'marca', 'calidad', 'calidad_display', 'codigo',
+            'uid', 'producto', 'producto_nombre', 'tipo_producto', 'categoria', 'calibre', 'variedad', 'marca', 'calidad', 'calidad_display', 'codigo',
             'peso_bruto', 'peso_neto', 'peso_reservado', 'cajas_disponibles','estado_maduracion', 'estado_lote', 'fecha_ingreso', 
             'procedencia', 'proveedor', 'costo_inicial', 'en_concesion', 'costo_total_pallet', 'proveedor',
             # Informativos
@@ -704,9 +709,7 @@ class FruitLotSerializer(serializers.ModelSerializer):
         return obj.costo_actualizado()
 
     def get_peso_reservado(self, obj):
-        from inventory.models import StockReservation
-        reservas = StockReservation.objects.filter(lote=obj, estado='en_proceso').aggregate(total_kg=Sum('kg_reservados'))
-        return reservas['total_kg'] or 0
+        return self._get_active_reservations_sum(obj).get('total_kg') or 0
 
     def get_peso_disponible(self, obj):
         # Usar Decimal para evitar mezclar float y Decimal
@@ -868,19 +871,24 @@ class FruitLotSerializer(serializers.ModelSerializer):
         else:  # tipo 'otro'
             return round(float(obj.cantidad_cajas or 0) * float(obj.costo_inicial or 0), 2)
         
+    def _get_sales_sum(self, obj):
+        # Como _get_active_reservations_sum: una consulta por lote, o precargado en
+        # obj._sales_sum por quien serializa muchos lotes (ver StockReportView)
+        if not hasattr(obj, '_sales_sum'):
+            # Importar SaleItem aquí para evitar importaciones circulares
+            from sales.models import SaleItem
+            obj._sales_sum = SaleItem.objects.filter(lote=obj).aggregate(
+                total_peso=Sum('peso_vendido'),
+                total_subtotal=Sum('subtotal'),
+            )
+        return obj._sales_sum
+
     def get_peso_vendido(self, obj):
-        # Importar Sale aquí para evitar importaciones circulares
-        from sales.models import Sale, SaleItem
         # Sumar el peso vendido de todas las ventas asociadas a este lote
-        total_vendido = SaleItem.objects.filter(lote=obj).aggregate(total=Sum('peso_vendido'))['total'] or 0
-        return float(total_vendido)
+        return float(self._get_sales_sum(obj).get('total_peso') or 0)
     
     def get_dinero_generado(self, obj):
-        # Importar Sale aquí para evitar importaciones circulares
-        from sales.models import SaleItem
-        # Usar el ID del lote en lugar de la relación directa
-        total_dinero = SaleItem.objects.filter(lote=obj).aggregate(total=Sum('subtotal'))['total'] or 0
-        return float(total_dinero)
+        return float(self._get_sales_sum(obj).get('total_subtotal') or 0)
     
     def get_porcentaje_vendido(self, obj):
         """Calcula el porcentaje del lote que ya ha sido vendido"""
@@ -1209,8 +1217,10 @@ class GoodsReceptionSerializer(serializers.ModelSerializer):
         """Respuesta directa de los campos del modelo, sin inferencias automáticas."""
         return super().to_representation(instance)
 
-class SupplierPaymentSerializer(serializers.ModelSerializer):
+class SupplierPaymentSerializer(CargaDiferidaMixin, serializers.ModelSerializer):
     metodo_pago_display = serializers.CharField(source='get_metodo_pago_display', read_only=True)
+    comprobante_miniatura_url = MiniaturaField(source='comprobante')
+    campos_diferidos = ('comprobante',)
     recepcion_numero = serializers.SerializerMethodField()
     proveedor_nombre = serializers.SerializerMethodField()
     
@@ -1218,7 +1228,7 @@ class SupplierPaymentSerializer(serializers.ModelSerializer):
         model = SupplierPayment
         fields = [
             'uid', 'recepcion', 'recepcion_numero', 'monto', 'fecha_pago',
-            'metodo_pago', 'metodo_pago_display', 'comprobante', 'notas',
+            'metodo_pago', 'metodo_pago_display', 'comprobante', 'comprobante_miniatura_url', 'notas',
             'proveedor_nombre', 'created_at', 'updated_at'
         ]
     
@@ -1235,13 +1245,15 @@ class ConcessionSettlementDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = ConcessionSettlementDetail
         fields = [
-            'id', 'liquidacion', 'venta', 'venta_codigo', 'item_venta', 'lote', 'lote_nombre',
+            'id', 'liquidacion', 'venta', 'venta_codigo', 'item_venta', 'lote', 'bin', 'lote_nombre',
             'cantidad_kilos', 'precio_venta', 'comision', 'monto_liquidado'
         ]
     
     def get_lote_nombre(self, obj):
         if obj.lote and obj.lote.producto:
             return f"{obj.lote.producto.nombre} - {obj.lote.calibre}"
+        if obj.bin and obj.bin.producto:
+            return f"{obj.bin.producto.nombre} - Bin {obj.bin.codigo}"
         return f"Lote {obj.lote.id}" if obj.lote else None
     
     def get_venta_codigo(self, obj):
@@ -1258,7 +1270,7 @@ class ConcessionSettlementSerializer(serializers.ModelSerializer):
         fields = [
             'uid', 'proveedor', 'proveedor_nombre', 'proveedor_rut', 'fecha_liquidacion',
             'total_kilos_vendidos', 'total_ventas', 'total_comision', 'monto_a_liquidar',
-            'estado', 'estado_display', 'comprobante', 'notas', 'detalles',
+            'estado', 'estado_display', 'comprobante', 'fecha_desde', 'fecha_hasta', 'notas', 'detalles',
             'created_at', 'updated_at'
         ]
     
@@ -1269,51 +1281,53 @@ class ConcessionSettlementSerializer(serializers.ModelSerializer):
         return obj.proveedor.rut if obj.proveedor else None
 
 class PalletHistorySerializerList(serializers.ModelSerializer):
-    """Serializador para listar el historial de pallets vendidos o agotados"""
+    """
+    Serializador para listar el historial de pallets vendidos o agotados.
+    Lee el resultado guardado al agotarse el lote (FruitLotResult), sin consultar las ventas.
+    """
+    uid = serializers.UUIDField(source='fruitlot.uid', read_only=True)
     nombre_producto = serializers.SerializerMethodField()
-    calibre = serializers.CharField(read_only=True)
-    proveedor = serializers.CharField(read_only=True)
-    procedencia = serializers.CharField(read_only=True)
-    fecha_ingreso = serializers.DateField(read_only=True)
+    calibre = serializers.CharField(source='fruitlot.calibre', read_only=True)
+    proveedor = serializers.CharField(source='fruitlot.proveedor', read_only=True, default=None)
+    procedencia = serializers.CharField(source='fruitlot.procedencia', read_only=True)
+    fecha_ingreso = serializers.DateField(source='fruitlot.fecha_ingreso', read_only=True)
     fecha_ultima_venta = serializers.SerializerMethodField()
-    total_generado = serializers.SerializerMethodField()
+    total_generado = serializers.DecimalField(source='real_ingreso_total', max_digits=12, decimal_places=2, read_only=True)
+    ganancia_pallet = serializers.DecimalField(source='real_ganancia_total', max_digits=12, decimal_places=2, read_only=True)
+    margen = serializers.DecimalField(source='real_margen', max_digits=5, decimal_places=2, read_only=True)
+    dias_en_inventario = serializers.IntegerField(source='real_dias_en_inventario', read_only=True)
     
     class Meta:
-        model = FruitLot
+        model = FruitLotResult
         fields = (
             'uid', 'nombre_producto', 'calibre', 'proveedor', 'procedencia',
-            'fecha_ingreso', 'fecha_ultima_venta', 'total_generado'
+            'fecha_ingreso', 'fecha_ultima_venta', 'total_generado',
+            'ganancia_pallet', 'margen', 'dias_en_inventario',
         )
     
     def get_nombre_producto(self, obj):
-        return obj.producto.nombre if obj.producto else 'Desconocido'
+        producto = obj.fruitlot.producto
+        return producto.nombre if producto else 'Desconocido'
     
     def get_fecha_ultima_venta(self, obj):
-        # Obtener la fecha de la última venta relacionada con este lote
-        ultima_venta = SaleItem.objects.filter(
-            lote=obj
-        ).aggregate(ultima_fecha=Max('created_at'))
-        
-        return ultima_venta.get('ultima_fecha')
-    
-    def get_total_generado(self, obj):
-        # Calcular el total generado por las ventas de este lote
-        ventas = SaleItem.objects.filter(lote=obj)
-        
-        # Sumar todos los subtotales de los items de venta
-        total = ventas.aggregate(total=Sum('subtotal'))['total'] or 0
-        
-        return total
+        # Sin ventas no hay última venta (el lote se agotó por otro motivo)
+        return obj.fecha_venta_completa if obj.num_ventas else None
 
 class PalletHistoryDetailSerializer(serializers.ModelSerializer):
-    """Serializador para el detalle de un pallet vendido o agotado, específico por tipo de fruta"""
+    """
+    Serializador para el detalle de un pallet vendido o agotado, específico por tipo de fruta.
+    Los totales salen del resultado guardado (FruitLotResult); solo el detalle de ventas consulta
+    los ítems del lote.
+    """
+    uid = serializers.UUIDField(source='fruitlot.uid', read_only=True)
     nombre_producto = serializers.SerializerMethodField()
     tipo_producto = serializers.SerializerMethodField()
-    calibre = serializers.CharField(read_only=True)
-    proveedor = serializers.CharField(read_only=True)
-    procedencia = serializers.CharField(read_only=True)
-    pais = serializers.CharField(read_only=True)
-    fecha_ingreso = serializers.DateField(read_only=True)
+    categoria = serializers.SerializerMethodField()
+    calibre = serializers.CharField(source='fruitlot.calibre', read_only=True)
+    proveedor = serializers.CharField(source='fruitlot.proveedor', read_only=True, default=None)
+    procedencia = serializers.CharField(source='fruitlot.procedencia', read_only=True)
+    pais = serializers.CharField(source='fruitlot.pais', read_only=True)
+    fecha_ingreso = serializers.DateField(source='fruitlot.fecha_ingreso', read_only=True)
     fecha_ultima_venta = serializers.SerializerMethodField()
     total_generado = serializers.SerializerMethodField()
     costo_total_pallet = serializers.SerializerMethodField()
@@ -1323,313 +1337,158 @@ class PalletHistoryDetailSerializer(serializers.ModelSerializer):
     ventas_detalle = serializers.SerializerMethodField()
     # Campos específicos por tipo de producto
     datos_especificos = serializers.SerializerMethodField()
+    # Predicción al ingresar contra resultado real
+    resultado = serializers.SerializerMethodField()
     
     class Meta:
-        model = FruitLot
+        model = FruitLotResult
         fields = (
-            'uid', 'nombre_producto', 'tipo_producto', 'calibre', 'proveedor', 
+            'uid', 'nombre_producto', 'tipo_producto', 'categoria', 'calibre', 'proveedor', 
             'procedencia', 'pais', 'fecha_ingreso', 'fecha_ultima_venta', 
             'total_generado', 'costo_total_pallet', 'ganancia_pallet', 'margen_ganancia',
-            'resumen_ventas', 'ventas_detalle', 'datos_especificos'
+            'resumen_ventas', 'ventas_detalle', 'datos_especificos', 'resultado'
         )
     
+    def _es_palta(self, obj):
+        producto = obj.fruitlot.producto
+        return bool(producto and producto.tipo_producto == 'palta')
+    
     def get_nombre_producto(self, obj):
-        return obj.producto.nombre if obj.producto else 'Desconocido'
+        producto = obj.fruitlot.producto
+        return producto.nombre if producto else 'Desconocido'
     
     def get_tipo_producto(self, obj):
-        return obj.producto.tipo_producto if obj.producto else 'desconocido'
+        producto = obj.fruitlot.producto
+        return producto.tipo_producto if producto else 'desconocido'
+    
+    def get_categoria(self, obj):
+        producto = obj.fruitlot.producto
+        return producto.categoria if producto else None
     
     def get_fecha_ultima_venta(self, obj):
-        # Obtener la fecha de la última venta relacionada con este lote
-        ultima_venta = SaleItem.objects.filter(
-            lote=obj
-        ).aggregate(ultima_fecha=Max('created_at'))
-        
-        return ultima_venta.get('ultima_fecha')
+        return obj.fecha_venta_completa if obj.num_ventas else None
     
     def get_total_generado(self, obj):
-        # Calcular el total generado por las ventas de este lote
-        ventas = SaleItem.objects.filter(lote=obj)
-        
-        # Sumar todos los subtotales de los items de venta
-        total = ventas.aggregate(total=Sum('subtotal'))['total'] or 0
-        
-        # Convertir a float para evitar problemas de tipo
-        return float(total)
+        return float(obj.real_ingreso_total)
+    
+    # Costo, ganancia y margen: los mismos del listado (PalletHistorySerializerList), del resultado real
+    # guardado: cantidad inicial completa con almacenaje, margen sobre el ingreso
+
+    def get_costo_total_pallet(self, obj):
+        """Costo real del pallet: cantidad inicial por costo inicial más almacenaje hasta la última venta"""
+        return float(obj.real_costo_total)
+    
+    def get_ganancia_pallet(self, obj):
+        """Ganancia del pallet: total generado - costo real"""
+        return float(obj.real_ganancia_total)
+    
+    def get_margen_ganancia(self, obj):
+        """Margen de ganancia sobre el total generado, como porcentaje"""
+        return float(obj.real_margen)
+    
+    def get_resumen_ventas(self, obj):
+        """Proporciona un resumen de las ventas del pallet"""
+        total_generado = float(obj.real_ingreso_total)
+        resumen = {
+            'num_ventas': obj.num_ventas,
+            'total_generado': total_generado,
+            'costo_vendido': float(obj.costo_vendido),
+            'ganancia_total': self.get_ganancia_pallet(obj),
+            'margen_ganancia': self.get_margen_ganancia(obj),
+        }
+        if self._es_palta(obj):
+            kilos = float(obj.kilos_vendidos)
+            resumen['peso_total_vendido'] = kilos
+            resumen['precio_promedio_kg'] = round(total_generado / kilos, 2) if kilos > 0 else 0
+        else:
+            unidades = obj.unidades_vendidas
+            resumen['unidades_total_vendidas'] = unidades
+            resumen['precio_promedio_unidad'] = round(total_generado / unidades, 2) if unidades > 0 else 0
+        return resumen
     
     def get_ventas_detalle(self, obj):
-        # Obtener todas las ventas relacionadas con este lote
-        ventas = SaleItem.objects.filter(lote=obj).select_related('venta')
+        lote = obj.fruitlot
+        es_palta = self._es_palta(obj)
+        costo_inicial = float(lote.costo_inicial or 0)
+        costo_unidad = costo_inicial / max(1, lote.unidades_por_caja or 0)
+        ventas = (
+            SaleItem.objects.filter(lote=lote, venta__cancelada=False)
+            .select_related('venta__cliente').order_by('created_at')
+        )
         
-        # Crear un resumen de cada venta
         resultado = []
         for venta in ventas:
             item = {
                 'fecha_venta': venta.created_at,
-                'codigo_venta': venta.venta.codigo_venta if hasattr(venta, 'venta') and venta.venta else 'N/A',
+                'codigo_venta': venta.venta.codigo_venta or 'N/A',
                 'subtotal': float(venta.subtotal) if venta.subtotal else 0,
-                'cliente': venta.venta.cliente.nombre if hasattr(venta, 'venta') and venta.venta and venta.venta.cliente else 'Cliente no registrado',
+                'cliente': venta.venta.cliente.nombre if venta.venta.cliente else 'Cliente no registrado',
             }
-            
-            # Añadir campos específicos según el tipo de producto
-            if obj.producto and obj.producto.tipo_producto == 'palta':
+            if es_palta:
                 item['peso_vendido'] = float(venta.peso_vendido) if venta.peso_vendido else 0
                 item['precio_kg'] = float(venta.precio_kg) if venta.precio_kg else 0
-                
-                # Calcular costo_kg con conversión segura a float
-                costo_kg = 0
-                if hasattr(venta, 'costo_kg') and venta.costo_kg:
-                    costo_kg = float(venta.costo_kg)
-                elif obj.costo_inicial:
-                    costo_kg = float(obj.costo_inicial)
-                item['costo_kg'] = costo_kg
-                
-                # Calcular ganancia con valores ya convertidos
-                precio_kg = item['precio_kg']
-                item['ganancia_kg'] = precio_kg - costo_kg
+                item['costo_kg'] = costo_inicial
+                item['ganancia_kg'] = item['precio_kg'] - costo_inicial
                 item['ganancia_item'] = item['ganancia_kg'] * item['peso_vendido']
             else:  # tipo 'otro'
                 item['unidades_vendidas'] = int(venta.unidades_vendidas) if venta.unidades_vendidas else 0
                 item['precio_unidad'] = float(venta.precio_unidad) if venta.precio_unidad else 0
-                
-                # Calcular costo_unidad con conversión segura a float
-                costo_unidad = 0
-                if hasattr(venta, 'costo_unidad') and venta.costo_unidad:
-                    costo_unidad = float(venta.costo_unidad)
-                elif obj.costo_inicial:
-                    costo_unidad = float(obj.costo_inicial)
                 item['costo_unidad'] = costo_unidad
-                
-                # Calcular ganancia con valores ya convertidos
-                precio_unidad = item['precio_unidad']
-                item['ganancia_unidad'] = precio_unidad - costo_unidad
+                item['ganancia_unidad'] = item['precio_unidad'] - costo_unidad
                 item['ganancia_item'] = item['ganancia_unidad'] * item['unidades_vendidas']
-                
             resultado.append(item)
-            
         return resultado
     
     def get_datos_especificos(self, obj):
         """Devuelve datos específicos según el tipo de producto"""
-        if not obj.producto:
+        lote = obj.fruitlot
+        if not lote.producto:
             return {}
-            
-        if obj.producto.tipo_producto == 'palta':
-            # Datos específicos para paltas
-            return {
-                'peso_bruto': float(obj.peso_bruto) if obj.peso_bruto else 0,
-                'peso_neto': float(obj.peso_neto) if obj.peso_neto else 0,
-                'cantidad_cajas': obj.cantidad_cajas,
-                'box_type': obj.box_type.nombre if obj.box_type else 'N/A',
-                'pallet_type': obj.pallet_type.nombre if obj.pallet_type else 'N/A',
-                'estado_maduracion': obj.estado_maduracion,
-                'costo_inicial': float(obj.costo_inicial) if obj.costo_inicial else 0,
-                'costo_kg': float(obj.costo_inicial) if obj.costo_inicial else 0,
-                'precio_sugerido_min': float(obj.precio_sugerido_min) if obj.precio_sugerido_min else 0,
-                'precio_sugerido_max': float(obj.precio_sugerido_max) if obj.precio_sugerido_max else 0,
-                'peso_vendido_total': self.get_peso_vendido(obj),
-            }
-        else:  # tipo 'otro'
-            # Datos específicos para otros productos
-            return {
-                'cantidad_unidades': obj.cantidad_unidades,
-                'unidades_por_caja': obj.unidades_por_caja,
-                'cantidad_cajas': obj.cantidad_cajas,
-                'box_type': obj.box_type.nombre if obj.box_type else 'N/A',
-                'costo_inicial': float(obj.costo_inicial) if obj.costo_inicial else 0,
-                'costo_unidad': float(obj.costo_inicial) / obj.unidades_por_caja if obj.costo_inicial and obj.unidades_por_caja else 0,
-                'precio_sugerido_min': float(obj.precio_sugerido_min) if obj.precio_sugerido_min else 0,
-                'precio_sugerido_max': float(obj.precio_sugerido_max) if obj.precio_sugerido_max else 0,
-                'unidades_vendidas_total': self.get_unidades_vendidas(obj),
-            }
-            
-    def get_ganancia_pallet(self, obj):
-        """Calcula la ganancia total del pallet (total generado - costo de lo vendido)"""
-        # Convertir todos los valores a float para evitar problemas de tipo
-        total_generado = float(self.get_total_generado(obj))
         
-        # Calculamos el costo solo de lo que se ha vendido, no del pallet completo
-        if obj.producto and obj.producto.tipo_producto == 'palta':
-            peso_vendido = self.get_peso_vendido(obj)
-            costo_por_kg = float(obj.costo_inicial or 0)
-            costo_vendido = round(peso_vendido * costo_por_kg, 2)
-        else:  # tipo 'otro'
-            unidades_vendidas = self.get_unidades_vendidas(obj)
-            costo_por_unidad = float(obj.costo_inicial or 0) / max(1, obj.unidades_por_caja)
-            costo_vendido = round(unidades_vendidas * costo_por_unidad, 2)
-            
-        return total_generado - costo_vendido
-    
-    def get_margen_ganancia(self, obj):
-        """Calcula el margen de ganancia como porcentaje"""
-        # Calculamos el costo solo de lo que se ha vendido, no del pallet completo
-        if obj.producto and obj.producto.tipo_producto == 'palta':
-            peso_vendido = self.get_peso_vendido(obj)
-            costo_por_kg = float(obj.costo_inicial or 0)
-            costo_vendido = round(peso_vendido * costo_por_kg, 2)
+        datos = {
+            'cantidad_cajas': lote.cantidad_cajas,
+            'box_type': lote.box_type.nombre if lote.box_type else 'N/A',
+            'costo_inicial': float(lote.costo_inicial) if lote.costo_inicial else 0,
+            'precio_sugerido_min': float(lote.precio_sugerido_min) if lote.precio_sugerido_min else 0,
+            'precio_sugerido_max': float(lote.precio_sugerido_max) if lote.precio_sugerido_max else 0,
+        }
+        if self._es_palta(obj):
+            datos.update({
+                'peso_bruto': float(lote.peso_bruto) if lote.peso_bruto else 0,
+                'peso_neto': float(lote.peso_neto) if lote.peso_neto else 0,
+                'pallet_type': lote.pallet_type.nombre if lote.pallet_type else 'N/A',
+                'estado_maduracion': lote.estado_maduracion,
+                'costo_kg': float(lote.costo_inicial) if lote.costo_inicial else 0,
+                'peso_vendido_total': float(obj.kilos_vendidos),
+            })
         else:  # tipo 'otro'
-            unidades_vendidas = self.get_unidades_vendidas(obj)
-            costo_por_unidad = float(obj.costo_inicial or 0) / max(1, obj.unidades_por_caja)
-            costo_vendido = round(unidades_vendidas * costo_por_unidad, 2)
-        
-        ganancia = self.get_ganancia_pallet(obj)
-        
-        if costo_vendido > 0:
-            return round((ganancia / costo_vendido) * 100, 2)
-        elif ganancia > 0:
-            # Si hay ganancia pero no hay costo registrado, el margen es técnicamente infinito
-            # pero reportamos 100% como valor máximo
-            return 100.0
-        return 0.0
-    
-    def get_peso_vendido(self, obj):
-        """Calcula el peso total vendido para paltas"""
-        if not obj.producto or obj.producto.tipo_producto != 'palta':
-            return 0
-            
-        ventas = SaleItem.objects.filter(lote=obj)
-        return float(ventas.aggregate(total=Sum('peso_vendido'))['total'] or 0)
-    
-    def get_unidades_vendidas(self, obj):
-        """Calcula las unidades totales vendidas para otros productos"""
-        if not obj.producto or obj.producto.tipo_producto == 'palta':
-            return 0
-            
-        ventas = SaleItem.objects.filter(lote=obj)
-        return ventas.aggregate(total=Sum('unidades_vendidas'))['total'] or 0
-        
-    def get_costo_total_pallet(self, obj):
-        """Calcula el costo total del pallet según su tipo, usando el peso histórico"""
-        if not obj.producto:
-            return 0.0
-            
-        try:
-            # Obtener el resumen de ventas que ya tiene calculado el costo vendido
-            resumen = self.get_resumen_ventas(obj)
-            if resumen and 'costo_vendido' in resumen:
-                return float(resumen['costo_vendido'])
-                
-            # Si no podemos obtener el costo desde el resumen, calcularlo manualmente
-            if obj.producto.tipo_producto == 'palta':
-                # Para paltas, usamos el peso vendido total del campo datos_especificos
-                datos_especificos = self.get_datos_especificos(obj)
-                if datos_especificos and 'peso_vendido_total' in datos_especificos:
-                    peso_vendido_total = float(datos_especificos['peso_vendido_total'])
-                    costo_inicial = float(obj.costo_inicial or 0)
-                    return round(peso_vendido_total * costo_inicial, 2)
-                
-                # Si no está en datos_especificos, calcularlo desde las ventas
-                from django.db.models import Sum
-                ventas = SaleItem.objects.filter(lote=obj)
-                peso_vendido_total = ventas.aggregate(total=Sum('peso_vendido'))['total'] or 0
-                costo_inicial = float(obj.costo_inicial or 0)
-                
-                # Si no hay ventas registradas, usamos el peso bruto menos la tara estimada
-                if peso_vendido_total == 0:
-                    # Estimamos el peso neto original basado en el peso bruto
-                    peso_bruto = float(obj.peso_bruto or 0)
-                    tara_estimada = 0
-                    if obj.box_type:
-                        tara_estimada += float(obj.box_type.peso_caja or 0) * float(obj.cantidad_cajas or 1)
-                    if obj.pallet_type:
-                        tara_estimada += float(obj.pallet_type.peso_pallet or 0)
-                    peso_vendido_total = max(0, peso_bruto - tara_estimada)
-                
-                return round(peso_vendido_total * costo_inicial, 2)
-            else:  # tipo 'otro'
-                # Para otros productos, el costo es por cantidad de unidades históricas
-                from django.db.models import Sum
-                ventas = SaleItem.objects.filter(lote=obj)
-                unidades_vendidas_total = ventas.aggregate(total=Sum('unidades_vendidas'))['total'] or 0
-                
-                # Si no hay ventas registradas, usamos la cantidad de unidades original
-                if unidades_vendidas_total == 0:
-                    unidades_vendidas_total = float(obj.cantidad_unidades or 0)
-                
-                costo_por_unidad = float(obj.costo_inicial or 0) / max(1, obj.unidades_por_caja or 1)
-                return round(unidades_vendidas_total * costo_por_unidad, 2)
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error calculando costo total del pallet: {str(e)}")
-            # En caso de error, devolver el costo vendido del resumen si está disponible
-            try:
-                resumen = self.get_resumen_ventas(obj)
-                if resumen and 'costo_vendido' in resumen:
-                    return float(resumen['costo_vendido'])
-            except Exception:
-                pass
-            return 0.0
+            datos.update({
+                'cantidad_unidades': lote.cantidad_unidades,
+                'unidades_por_caja': lote.unidades_por_caja,
+                'costo_unidad': float(lote.costo_inicial) / lote.unidades_por_caja if lote.costo_inicial and lote.unidades_por_caja else 0,
+                'unidades_vendidas_total': obj.unidades_vendidas,
+            })
+        return datos
     
-    def get_resumen_ventas(self, obj):
-        """Proporciona un resumen de las ventas del pallet"""
-        ventas = SaleItem.objects.filter(lote=obj)
-        num_ventas = ventas.count()
-        
-        if not obj.producto:
-            return {
-                'num_ventas': num_ventas,
-                'total_generado': float(self.get_total_generado(obj))
-            }
-        
-        total_generado = float(self.get_total_generado(obj))
-        
-        # Calculamos el costo solo de lo que se ha vendido, no del pallet completo
-        if obj.producto.tipo_producto == 'palta':
-            # Para paltas
-            peso_total_vendido = self.get_peso_vendido(obj)
-            costo_por_kg = float(obj.costo_inicial or 0)
-            costo_vendido = round(peso_total_vendido * costo_por_kg, 2)
-            
-            precio_promedio_kg = 0
-            if peso_total_vendido > 0:
-                precio_promedio_kg = round(total_generado / peso_total_vendido, 2)
-            
-            ganancia_total = total_generado - costo_vendido
-            
-            # Calcular margen de ganancia sobre lo vendido
-            margen_ganancia = 0
-            if costo_vendido > 0:
-                margen_ganancia = round((ganancia_total / costo_vendido) * 100, 2)
-            elif ganancia_total > 0:
-                # Si hay ganancia pero no hay costo registrado, reportamos 100%
-                margen_ganancia = 100.0
-                
-            return {
-                'num_ventas': num_ventas,
-                'peso_total_vendido': peso_total_vendido,
-                'precio_promedio_kg': precio_promedio_kg,
-                'total_generado': total_generado,
-                'costo_vendido': costo_vendido,
-                'ganancia_total': ganancia_total,
-                'margen_ganancia': margen_ganancia
-            }
-        else:  # tipo 'otro'
-            # Para otros productos
-            unidades_total_vendidas = self.get_unidades_vendidas(obj)
-            costo_por_unidad = float(obj.costo_inicial or 0) / max(1, obj.unidades_por_caja)
-            costo_vendido = round(unidades_total_vendidas * costo_por_unidad, 2)
-            
-            precio_promedio_unidad = 0
-            if unidades_total_vendidas > 0:
-                precio_promedio_unidad = round(total_generado / unidades_total_vendidas, 2)
-            
-            ganancia_total = total_generado - costo_vendido
-            
-            # Calcular margen de ganancia sobre lo vendido
-            margen_ganancia = 0
-            if costo_vendido > 0:
-                margen_ganancia = round((ganancia_total / costo_vendido) * 100, 2)
-            elif ganancia_total > 0:
-                # Si hay ganancia pero no hay costo registrado, reportamos 100%
-                margen_ganancia = 100.0
-                
-            return {
-                'num_ventas': num_ventas,
-                'unidades_total_vendidas': unidades_total_vendidas,
-                'precio_promedio_unidad': precio_promedio_unidad,
-                'total_generado': total_generado,
-                'costo_vendido': costo_vendido,
-                'ganancia_total': ganancia_total,
-                'margen_ganancia': margen_ganancia
-            }
+    def get_resultado(self, obj):
+        campos = ('costo_total', 'perdida_kg', 'perdida_porcentaje', 'ingreso_total', 'ganancia_total', 'margen')
+        return {
+            'fecha_cierre': obj.fecha_venta_completa,
+            'prediccion': {
+                **{campo: float(getattr(obj, f'prediccion_{campo}')) for campo in campos},
+                'dias': obj.prediccion_dias_estimados,
+            },
+            'real': {
+                **{campo: float(getattr(obj, f'real_{campo}')) for campo in campos},
+                'dias': obj.real_dias_en_inventario,
+            },
+            'diferencia': {
+                'costo_total': float(obj.diferencia_costo),
+                'perdida_kg': float(obj.diferencia_perdida_kg),
+                'perdida_porcentaje': float(obj.diferencia_perdida_porcentaje),
+                'ingreso_total': float(obj.diferencia_ingreso),
+                'ganancia_total': float(obj.diferencia_ganancia),
+                'margen': float(obj.diferencia_margen),
+                'dias': obj.diferencia_dias,
+            },
+        }
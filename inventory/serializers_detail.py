@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.utils import timezone
 from django.db.models import Sum
 from .models import FruitLot, MadurationHistory
+from .product_categories import categoria_de
 from sales.models import Sale
 from datetime import date
 
@@ -151,14 +152,7 @@ class FruitLotDetailSerializer(serializers.ModelSerializer):
         )
 
     def get_tipo_producto(self, obj):
-        nombre = (obj.producto.nombre if obj.producto else '').lower()
-        if 'palta' in nombre or 'aguacate' in nombre:
-            return 'palta'
-        if 'mango' in nombre:
-            return 'mango'
-        if 'platano' in nombre or 'plátano' in nombre or 'banano' in nombre:
-            return 'platano'
-        return 'otro'
+        return categoria_de(obj.producto).clave
 
     def get_proveedor_id(self, obj):
         # En este caso, proveedor es un string, no un objeto relacionado
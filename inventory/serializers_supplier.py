@@ -23,7 +23,7 @@ class SupplierSerializerList(serializers.ModelSerializer):
         model = Supplier
         fields = (
             'uid', 'nombre', 'rut', 'telefono', 'email', 'contacto', 
-            'activo', 'total_deuda', 'total_pagado', 'recepciones_count',
+            'activo', 'saldo_cuenta', 'total_deuda', 'total_pagado', 'recepciones_count',
             'liquidaciones_count', 'ultima_actividad', 'vinculado'
         )
     
@@ -121,7 +121,7 @@ class SupplierSerializer(serializers.ModelSerializer):
         model = Supplier
         fields = ('uid', 'nombre', 'rut', 'direccion', 'telefono', 'email', 'contacto', 'observaciones', 
                  'business', 'activo', 'created_at', 'updated_at',
-                 'total_deuda', 'total_pagado', 'recepciones_pendientes',
+                 'saldo_cuenta', 'total_deuda', 'total_pagado', 'recepciones_pendientes',
                  'cantidad_recepciones', 'cantidad_liquidaciones', 'cantidad_pallets', 'cantidad_cajas',
                  'total_kg_recepcionados', 'ultima_recepcion', 'ultima_liquidacion', 'ultimo_pago',
                  'detalle_pallets', 'detalle_pallets_desde_bins', 'detalle_bins', 'resumen_pagos', 'resumen_liquidaciones', 'vinculado',
@@ -471,8 +471,9 @@ class SupplierSerializer(serializers.ModelSerializer):
             detalles = []
             for detalle in liquidacion.detalles.all():
                 detalles.append({
-                    'venta_id': detalle.venta.id,
-                    'lote_id': detalle.lote.id,
+                    'venta_id': detalle.venta_id,
+                    'lote_id': detalle.lote_id,
+                    'bin_id': detalle.bin_id,
                     'cantidad_kilos': detalle.cantidad_kilos,
                     'precio_venta': detalle.precio_venta,
                     'comision': detalle.comision,
@@ -0,0 +1,188 @@
+"""
+Liquidación de ventas en concesión.
+
+Un ítem de venta es de concesión si el ítem, su lote o su bin están marcados en concesión, y
+pertenece al proveedor indicado en el ítem (proveedor_original) o, en su defecto, al propietario
+original o proveedor del lote/bin. Queda pendiente mientras ningún detalle de una liquidación no
+cancelada lo referencie (anti-join con NOT EXISTS).
+
+La comisión se calcula en la consulta según la configuración del bin o de la recepción de origen:
+  - kg:     kilos vendidos x comisión por kilo (la del lote/bin, ya resuelta al recibir)
+  - caja:   unidades (cajas) vendidas x monto
+  - unidad: unidades vendidas x monto
+  - venta:  porcentaje del subtotal (o un monto fijo por ítem si no hay porcentaje)
+Sin configuración se usa la comisión por kilo del lote o bin. Si el ítem ya trae comision_ganada,
+esa manda. El neto a pagar es el subtotal menos la comisión.
+
+Generar una liquidación lee los ítems pendientes en una consulta y crea la liquidación con todos
+sus detalles (bulk_create) en una transacción, con el proveedor bloqueado para que dos
+liquidaciones simultáneas no incluyan las mismas ventas.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, CharField, Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Round
+from rest_framework import serializers
+
+from sales.models import SaleItem
+
+from .models import ConcessionSettlement, ConcessionSettlementDetail, ReceptionDetail, Supplier
+
+MONTO = DecimalField(max_digits=14, decimal_places=4)
+CERO = Value(Decimal('0'), output_field=MONTO)
+CENTAVO = Decimal('0.01')
+
+
+def _config_recepcion_lote(campo):
+    """Configuración de comisión de la recepción que creó el lote del ítem."""
+    return Subquery(
+        ReceptionDetail.objects.filter(lote_creado=OuterRef('lote')).order_by('id').values(f'recepcion__{campo}')[:1]
+    )
+
+
+def items_pendientes(business, proveedor, desde=None, hasta=None):
+    """
+    Ítems de venta en concesión del proveedor aún no liquidados, anotados con kilos, venta,
+    comision y neto. `desde`/`hasta` limitan por fecha de la venta ([desde, hasta)).
+    """
+    liquidado = ConcessionSettlementDetail.objects.filter(item_venta=OuterRef('pk')).exclude(liquidacion__estado='cancelado')
+    qs = (
+        SaleItem.objects
+        .filter(venta__business=business, venta__cancelada=False)
+        .filter(Q(es_concesion=True) | Q(lote__en_concesion=True) | Q(bin__en_concesion=True))
+        .alias(
+            proveedor_concesion=Coalesce(
+                'proveedor_original', 'lote__propietario_original', 'bin__propietario_original',
+                'lote__proveedor', 'bin__proveedor',
+            ),
+        )
+        .filter(proveedor_concesion=proveedor.pk)
+        .filter(~Exists(liquidado))
+    )
+    if desde is not None:
+        qs = qs.filter(venta__created_at__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(venta__created_at__lt=hasta)
+
+    base = Coalesce('bin__comision_base', 'bin__recepcion__comision_base', _config_recepcion_lote('comision_base'),
+                    output_field=CharField())
+    monto = Coalesce('bin__comision_monto', 'bin__recepcion__comision_monto', _config_recepcion_lote('comision_monto'),
+                     CERO, output_field=MONTO)
+    porcentaje = Coalesce('bin__comision_porcentaje', 'bin__recepcion__comision_porcentaje',
+                          _config_recepcion_lote('comision_porcentaje'), output_field=MONTO)
+    por_kilo = Coalesce('lote__comision_por_kilo', 'bin__comision_por_kilo', CERO, output_field=MONTO)
+
+    comision = Case(
+        When(comision_ganada__isnull=False, then=F('comision_ganada')),
+        When(base__in=('caja', 'unidad'), then=F('unidades_vendidas') * F('monto')),
+        When(base='venta', porcentaje__isnull=False, then=F('subtotal') * F('porcentaje') / Value(100)),
+        When(base='venta', then=F('monto')),
+        default=F('peso_vendido') * F('por_kilo'),
+        output_field=MONTO,
+    )
+    return (
+        qs.alias(base=base, monto=monto, porcentaje=porcentaje, por_kilo=por_kilo)
+        .annotate(comision=Round(comision, 2, output_field=MONTO))
+        .annotate(neto=F('subtotal') - F('comision'))
+        .order_by('venta__created_at', 'id')
+    )
+
+
+def resumen_pendiente(business, proveedor, desde=None, hasta=None):
+    """Totales de lo que se liquidaría, en un solo aggregate (sin crear nada)."""
+    totales = items_pendientes(business, proveedor, desde, hasta).order_by().aggregate(
+        items=Count('id'),
+        ventas=Count('venta', distinct=True),
+        total_kilos_vendidos=Coalesce(Sum('peso_vendido'), CERO),
+        total_ventas=Coalesce(Sum('subtotal'), CERO),
+        total_comision=Coalesce(Sum('comision'), CERO),
+    )
+    for clave in ('total_kilos_vendidos', 'total_ventas', 'total_comision'):
+        totales[clave] = Decimal(totales[clave]).quantize(CENTAVO)
+    totales['monto_a_liquidar'] = totales['total_ventas'] - totales['total_comision']
+    return totales
+
+
+def pendiente_por_origen(business, proveedor=None, desde=None, hasta=None):
+    """
+    Lo pendiente de liquidar agrupado por lote o bin de origen (para todos los proveedores si no
+    se indica uno). Una consulta por proveedor con pendientes.
+    """
+    proveedores = Supplier.objects.filter(business=business)
+    if proveedor is not None:
+        proveedores = proveedores.filter(pk=proveedor.pk)
+    filas = []
+    for prov in proveedores.only('id', 'uid', 'nombre'):
+        for fila in (
+            items_pendientes(business, prov, desde, hasta).order_by()
+            .values('lote__uid', 'lote__calibre', 'lote__producto__nombre', 'bin__uid', 'bin__codigo', 'bin__producto__nombre')
+            .annotate(
+                items=Count('id'), kilos=Sum('peso_vendido'), ventas=Sum('subtotal'),
+                comision=Sum('comision'),
+            )
+        ):
+            filas.append({
+                'proveedor': prov.uid,
+                'proveedor_nombre': prov.nombre,
+                'origen': 'lote' if fila['lote__uid'] else 'bin',
+                'uid': fila['lote__uid'] or fila['bin__uid'],
+                'producto': fila['lote__producto__nombre'] or fila['bin__producto__nombre'],
+                'descripcion': fila['lote__calibre'] or fila['bin__codigo'],
+                'items': fila['items'],
+                'kilos': Decimal(fila['kilos'] or 0).quantize(CENTAVO),
+                'ventas': Decimal(fila['ventas'] or 0).quantize(CENTAVO),
+                'comision': Decimal(fila['comision'] or 0).quantize(CENTAVO),
+                'neto': Decimal((fila['ventas'] or 0) - (fila['comision'] or 0)).quantize(CENTAVO),
+            })
+    return filas
+
+
+def generar_liquidacion(business, proveedor, desde=None, hasta=None, notas=None):
+    """
+    Crea la liquidación del proveedor con todas sus ventas en concesión pendientes del período.
+    Devuelve la liquidación; falla si no hay ventas por liquidar.
+    """
+    with transaction.atomic():
+        # Serializa las liquidaciones del mismo proveedor
+        Supplier.objects.select_for_update().filter(pk=proveedor.pk).first()
+        filas = list(
+            items_pendientes(business, proveedor, desde, hasta)
+            .values('id', 'venta_id', 'lote_id', 'bin_id', 'peso_vendido', 'subtotal', 'comision')
+        )
+        if not filas:
+            raise serializers.ValidationError('No hay ventas en concesión pendientes de liquidar para este proveedor.')
+
+        detalles = []
+        for fila in filas:
+            comision = Decimal(fila['comision']).quantize(CENTAVO)
+            detalles.append(ConcessionSettlementDetail(
+                venta_id=fila['venta_id'],
+                item_venta_id=fila['id'],
+                lote_id=fila['lote_id'],
+                bin_id=fila['bin_id'],
+                cantidad_kilos=fila['peso_vendido'],
+                precio_venta=fila['subtotal'],
+                comision=comision,
+                monto_liquidado=fila['subtotal'] - comision,
+            ))
+
+        total_ventas = sum((d.precio_venta for d in detalles), Decimal('0'))
+        total_comision = sum((d.comision for d in detalles), Decimal('0'))
+        liquidacion = ConcessionSettlement.objects.create(
+            proveedor=proveedor,
+            business=business,
+            fecha_desde=desde,
+            fecha_hasta=hasta,
+            total_kilos_vendidos=sum((d.cantidad_kilos for d in detalles), Decimal('0')),
+            total_ventas=total_ventas,
+            total_comision=total_comision,
+            monto_a_liquidar=total_ventas - total_comision,
+            notas=notas,
+        )
+        for detalle in detalles:
+            detalle.liquidacion = liquidacion
+        ConcessionSettlementDetail.objects.bulk_create(detalles, batch_size=1000)
+    return liquidacion
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 from django.db.models import Sum
-from .models import StockReservation, FruitLot
+from .models import StockReservation, FruitLot, FruitLotResult, GoodsReception, FruitBin, SupplierPayment, ConcessionSettlement
+from . import lot_result_service, supplier_ledger
+from sales.models import Sale
 
 import logging
 
@@ -46,3 +49,114 @@ def update_lot_status_on_reservation(sender, instance, **kwargs):
 
     except Exception as e:
         logger.error(f"Error en la señal update_lot_status_on_reservation para la reserva {instance.uid}: {str(e)}")
+
+
+# Cuenta corriente de proveedores (inventory/supplier_ledger.py)
+
+def _afecta_cuenta(update_fields, campos):
+    return update_fields is None or bool(set(update_fields) & campos)
+
+
+def _borrado_directo(sender, origin):
+    """True si se elimina el documento en sí y no en cascada (p. ej. al borrar el negocio)."""
+    if isinstance(origin, models.QuerySet):
+        return origin.model is sender
+    return isinstance(origin, sender)
+
+
+@receiver(post_save, sender=GoodsReception)
+def sync_supplier_ledger_reception(sender, instance, update_fields=None, **kwargs):
+    if _afecta_cuenta(update_fields, supplier_ledger.CAMPOS_RECEPCION):
+        supplier_ledger.sincronizar([instance])
+
+
+@receiver(pre_delete, sender=GoodsReception)
+def reverse_supplier_ledger_reception(sender, instance, origin=None, **kwargs):
+    if _borrado_directo(sender, origin):
+        supplier_ledger.sincronizar([instance], eliminados=True)
+        # Los pagos de la recepción se eliminan en cascada junto con ella
+        supplier_ledger.sincronizar(list(instance.pagos.select_related('recepcion')), eliminados=True)
+
+
+@receiver(post_save, sender=FruitBin)
+def sync_supplier_ledger_bin(sender, instance, update_fields=None, **kwargs):
+    if _afecta_cuenta(update_fields, supplier_ledger.CAMPOS_BIN):
+        supplier_ledger.sincronizar([instance])
+
+
+@receiver(pre_delete, sender=FruitBin)
+def reverse_supplier_ledger_bin(sender, instance, origin=None, **kwargs):
+    if _borrado_directo(sender, origin):
+        supplier_ledger.sincronizar([instance], eliminados=True)
+
+
+@receiver(post_save, sender=SupplierPayment)
+def sync_supplier_ledger_payment(sender, instance, update_fields=None, **kwargs):
+    if _afecta_cuenta(update_fields, supplier_ledger.CAMPOS_PAGO):
+        supplier_ledger.sincronizar([instance])
+
+
+@receiver(pre_delete, sender=SupplierPayment)
+def reverse_supplier_ledger_payment(sender, instance, origin=None, **kwargs):
+    if _borrado_directo(sender, origin):
+        supplier_ledger.sincronizar([instance], eliminados=True)
+
+
+@receiver(post_save, sender=ConcessionSettlement)
+def sync_supplier_ledger_settlement(sender, instance, update_fields=None, **kwargs):
+    if _afecta_cuenta(update_fields, supplier_ledger.CAMPOS_LIQUIDACION):
+        supplier_ledger.sincronizar([instance])
+
+
+@receiver(pre_delete, sender=ConcessionSettlement)
+def reverse_supplier_ledger_settlement(sender, instance, origin=None, **kwargs):
+    if _borrado_directo(sender, origin):
+        supplier_ledger.sincronizar([instance], eliminados=True)
+
+
+# Resultado de lotes agotados (inventory/lot_result_service.py)
+
+def _cerrar_lotes_al_confirmar(lote_ids, reemplazar=False):
+    """Cierra los lotes después del commit, con las ventas que los agotaron ya guardadas."""
+    def cerrar():
+        try:
+            lot_result_service.cerrar_lotes(lote_ids, reemplazar=reemplazar)
+        except Exception:
+            # El resultado se puede recalcular con manage.py backfill_lot_results
+            logger.exception(f"No se pudo cerrar el resultado de los lotes {lote_ids}")
+    transaction.on_commit(cerrar)
+
+
+@receiver(post_save, sender=FruitLot)
+def close_depleted_lot(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'cantidad_cajas' not in update_fields):
+        return
+    cerrado = FruitLotResult.objects.filter(fruitlot=instance).exists()
+    if instance.cantidad_cajas == 0:
+        if not cerrado:
+            _cerrar_lotes_al_confirmar([instance.pk])
+    elif cerrado:
+        # El lote cerrado volvió a tener cajas (reposición o edición manual)
+        lot_result_service.reabrir_lote(instance.pk)
+
+
+@receiver(pre_save, sender=Sale)
+def remember_sale_cancelada(sender, instance, update_fields=None, **kwargs):
+    # Solo interesa al pasar a cancelada: el valor guardado se lee si la venta llega cancelada
+    instance._cancelada_previa = None
+    if instance.pk and instance.cancelada and (update_fields is None or 'cancelada' in update_fields):
+        instance._cancelada_previa = (
+            Sale.objects.filter(pk=instance.pk).values_list('cancelada', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Sale)
+def reclose_lots_on_sale_cancel(sender, instance, created=False, **kwargs):
+    # Se recalcula una vez, al cancelarla; las ediciones posteriores de la venta no cierran de nuevo
+    if created or not instance.cancelada or getattr(instance, '_cancelada_previa', None) is not False:
+        return
+    lote_ids = list(
+        FruitLotResult.objects.filter(fruitlot__saleitem__venta=instance).values_list('fruitlot_id', flat=True)
+    )
+    if lote_ids:
+        _cerrar_lotes_al_confirmar(lote_ids, reemplazar=True)
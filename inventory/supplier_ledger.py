@@ -0,0 +1,303 @@
+"""
+Cuenta corriente de proveedores.
+
+Cada documento que cambia lo que se le debe a un proveedor deja movimientos en SupplierLedgerEntry:
+  - recepción (no rechazada): cargo por su monto_total
+  - bin con costo: cargo por su costo, y un abono igual cuando deja de estar pendiente de pago
+  - liquidación de concesión (no cancelada): cargo por el monto a liquidar, y un abono igual al
+    marcarla como pagada
+  - pago a proveedor: abono por su monto
+El saldo vigente se guarda en Supplier.saldo_cuenta y se actualiza en la misma transacción que los
+movimientos, con el proveedor bloqueado (select_for_update).
+
+`sincronizar` es idempotente y trabaja por lotes: compara lo registrado para cada documento con lo
+que corresponde según su estado actual y solo agrega la diferencia, con un bulk_create y un UPDATE
+por proveedor. La primera vez un movimiento toma la fecha del documento; las correcciones
+posteriores (documento modificado, rechazado o eliminado) quedan con la fecha en que ocurren.
+
+Los cierres mensuales (SupplierBalanceSnapshot) guardan el saldo al final de cada mes; el estado de
+cuenta de un período parte del último cierre anterior y solo recorre los movimientos siguientes.
+Para verificar el libro: `manage.py reconcile_supplier_ledger`; para cerrar meses:
+`manage.py close_supplier_ledger`.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    ConcessionSettlement, FruitBin, GoodsReception, Supplier, SupplierBalanceSnapshot, SupplierLedgerEntry,
+    SupplierPayment,
+)
+
+CERO = Decimal('0')
+CENTAVOS = Decimal('0.00')
+
+# Campos que afectan los movimientos de cada documento; un save(update_fields=...) sin ninguno no los cambia
+CAMPOS_RECEPCION = {'proveedor', 'estado', 'monto_total'}
+# Los kilos del bin bajan al venderlo o transformarlo, pero su costo para el proveedor no cambia
+CAMPOS_BIN = {'proveedor', 'costo_total', 'costo_por_kilo', 'pago_pendiente'}
+CAMPOS_PAGO = {'recepcion', 'monto', 'fecha_pago'}
+CAMPOS_LIQUIDACION = {'proveedor', 'estado', 'monto_a_liquidar'}
+
+
+# Meses
+
+def inicio_del_dia(fecha):
+    """Medianoche (hora local) de una fecha, como datetime con zona horaria."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def mes_de(momento):
+    """Primer día del mes (hora local) de un datetime."""
+    return timezone.localtime(momento).date().replace(day=1)
+
+
+def mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+# Lo que corresponde a cada documento según su estado y lo ya registrado ({(proveedor, tipo): monto}):
+# (proveedor_id, {tipo: monto}, fecha del cargo, fecha del abono, referencia)
+
+def _esperado_recepcion(recepcion, previos):
+    cargo = CERO if recepcion.estado == 'rechazado' else (recepcion.monto_total or CERO)
+    return recepcion.proveedor_id, {'cargo': cargo}, recepcion.fecha_recepcion, None, f"Recepción {recepcion.numero_guia}"
+
+
+def _esperado_bin(bin, previos):
+    if not bin.proveedor_id:
+        costo = CERO
+    elif bin.costo_total is not None:
+        costo = bin.costo_total
+    elif (bin.proveedor_id, 'cargo') in previos:
+        # Sin costo_total, el cargo se fija con el peso neto que tenía el bin al registrarlo
+        costo = previos[(bin.proveedor_id, 'cargo')]
+    else:
+        costo = (bin.costo_total_calculado or CERO).quantize(Decimal('0.01'))
+    abono = CERO if bin.pago_pendiente else -costo
+    return bin.proveedor_id, {'cargo': costo, 'abono': abono}, bin.fecha_recepcion, bin.updated_at, f"Bin {bin.codigo}"
+
+
+def _esperado_pago(pago, previos):
+    referencia = f"Pago {pago.get_metodo_pago_display().lower()} recepción {pago.recepcion.numero_guia}"
+    return pago.recepcion.proveedor_id, {'abono': -(pago.monto or CERO)}, None, pago.fecha_pago, referencia
+
+
+def _esperado_liquidacion(liquidacion, previos):
+    monto = CERO if liquidacion.estado == 'cancelado' else (liquidacion.monto_a_liquidar or CERO)
+    abono = -monto if liquidacion.estado == 'pagado' else CERO
+    return (
+        liquidacion.proveedor_id, {'cargo': monto, 'abono': abono},
+        liquidacion.fecha_liquidacion, liquidacion.updated_at, f"Liquidación {liquidacion.uid.hex[:8]}",
+    )
+
+
+DOCUMENTOS = {
+    GoodsReception: ('recepcion', _esperado_recepcion),
+    FruitBin: ('bin', _esperado_bin),
+    SupplierPayment: ('pago', _esperado_pago),
+    ConcessionSettlement: ('liquidacion', _esperado_liquidacion),
+}
+
+
+def _motivo(documento, eliminado):
+    if eliminado:
+        return 'eliminado'
+    if getattr(documento, 'estado', None) in ('rechazado', 'cancelado'):
+        return documento.estado
+    return 'modificado'
+
+
+def _bloquear(proveedor_ids):
+    # En orden de pk para que dos transacciones no se esperen mutuamente
+    list(Supplier.objects.select_for_update().filter(pk__in=proveedor_ids).order_by('pk').values_list('pk'))
+
+
+def sincronizar(documentos, eliminados=False):
+    """
+    Ajusta los movimientos de `documentos` (instancias de un mismo modelo de DOCUMENTOS) según su
+    estado actual, o los revierte si `eliminados`. Devuelve los movimientos agregados.
+    """
+    documentos = [d for d in documentos if d.pk is not None]
+    if not documentos:
+        return []
+    campo, esperado_de = DOCUMENTOS[type(documentos[0])]
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        # Con los proveedores bloqueados, dos sincronizaciones del mismo documento no registran dos veces
+        _bloquear({esperado_de(documento, {})[0] for documento in documentos} - {None})
+        # {documento: {(proveedor, tipo): total registrado}}
+        registrado = defaultdict(dict)
+        for fila in (
+            SupplierLedgerEntry.objects.filter(**{f'{campo}__in': [d.pk for d in documentos]})
+            .values(campo, 'proveedor', 'tipo').annotate(total=Sum('monto')).order_by()
+        ):
+            registrado[fila[campo]][(fila['proveedor'], fila['tipo'])] = fila['total']
+
+        nuevos = []
+        for documento in documentos:
+            nuevos.extend(_diferencias(documento, registrado.get(documento.pk, {}), eliminados, ahora))
+        return registrar(nuevos)
+
+
+def _diferencias(documento, previos, eliminados, ahora):
+    """Movimientos (sin guardar) que llevan lo registrado del documento a lo que corresponde."""
+    campo, esperado_de = DOCUMENTOS[type(documento)]
+    proveedor_id, montos, fecha_cargo, fecha_abono, referencia = esperado_de(documento, previos)
+    esperado = {} if eliminados or proveedor_id is None else {
+        (proveedor_id, tipo): monto for tipo, monto in montos.items()
+    }
+    movimientos = []
+    for proveedor, tipo in sorted(set(esperado) | set(previos)):
+        diferencia = esperado.get((proveedor, tipo), CERO) - previos.get((proveedor, tipo), CERO)
+        if not diferencia:
+            continue
+        if (proveedor, tipo) not in previos:
+            fecha = (fecha_cargo if tipo == 'cargo' else fecha_abono) or ahora
+            descripcion = referencia if tipo == 'cargo' or campo == 'pago' else f"Pago {referencia[0].lower()}{referencia[1:]}"
+        else:
+            fecha = ahora
+            descripcion = f"{referencia} {_motivo(documento, eliminados)}"
+        movimientos.append(SupplierLedgerEntry(
+            proveedor_id=proveedor, business_id=documento.business_id, tipo=tipo, monto=diferencia,
+            fecha=fecha, descripcion=descripcion[:200],
+            # Al eliminar, el movimiento no puede apuntar al documento que se está borrando
+            **{campo: None if eliminados else documento},
+        ))
+    return movimientos
+
+
+def movimientos_iniciales(documentos):
+    """
+    Movimientos (sin guardar) de documentos que todavía no tienen ninguno, p. ej. creados en lote
+    sin pasar por las señales: los mismos que registraría `sincronizar`, sin consultar el libro.
+    """
+    ahora = timezone.now()
+    return [movimiento for documento in documentos for movimiento in _diferencias(documento, {}, False, ahora)]
+
+
+def registrar(movimientos):
+    """Guarda movimientos ya armados y actualiza el saldo (y los cierres) de sus proveedores."""
+    if not movimientos:
+        return []
+    por_proveedor = defaultdict(lambda: CERO)
+    mes_mas_antiguo = {}
+    mes_actual = mes_de(timezone.now())
+    for movimiento in movimientos:
+        por_proveedor[movimiento.proveedor_id] += movimiento.monto
+        mes = mes_de(movimiento.fecha)
+        if mes < mes_actual:
+            mes_mas_antiguo[movimiento.proveedor_id] = min(mes, mes_mas_antiguo.get(movimiento.proveedor_id, mes))
+
+    with transaction.atomic():
+        _bloquear(por_proveedor)
+        for proveedor_id, monto in por_proveedor.items():
+            if monto:
+                Supplier.objects.filter(pk=proveedor_id).update(saldo_cuenta=F('saldo_cuenta') + monto)
+        creados = SupplierLedgerEntry.objects.bulk_create(movimientos)
+        # Un movimiento en un mes ya cerrado invalida ese cierre y los siguientes
+        for proveedor_id, mes in mes_mas_antiguo.items():
+            SupplierBalanceSnapshot.objects.filter(proveedor_id=proveedor_id, mes__gte=mes).delete()
+    return creados
+
+
+# Cierres mensuales
+
+def cerrar_meses(proveedores, hasta=None):
+    """
+    Guarda el cierre de cada mes completo anterior a `hasta` (por defecto, el mes actual) que aún
+    no esté cerrado, a partir del último cierre existente. Devuelve la cantidad de cierres creados.
+    """
+    hasta = (hasta or timezone.localdate()).replace(day=1)
+    creados = 0
+    for proveedor in proveedores:
+        ultimo = SupplierBalanceSnapshot.objects.filter(proveedor=proveedor, mes__lt=hasta).order_by('-mes').first()
+        movimientos = SupplierLedgerEntry.objects.filter(proveedor=proveedor, fecha__lt=inicio_del_dia(hasta))
+        if ultimo is not None:
+            desde, saldo = mes_siguiente(ultimo.mes), ultimo.saldo
+            movimientos = movimientos.filter(fecha__gte=inicio_del_dia(desde))
+        else:
+            primero = movimientos.order_by('fecha').values_list('fecha', flat=True).first()
+            if primero is None:
+                continue
+            desde, saldo = mes_de(primero), CERO
+
+        por_mes = {
+            mes_de(fila['mes']): fila
+            for fila in movimientos.annotate(mes=TruncMonth('fecha')).values('mes').annotate(
+                cargos=Sum('monto', filter=Q(monto__gt=0)), abonos=Sum('monto', filter=Q(monto__lt=0)), n=Count('id'),
+            ).order_by('mes')
+        }
+        cierres = []
+        mes = desde
+        # Se cierran también los meses sin movimientos para que el estado de cuenta siempre tenga un cierre cercano
+        while mes < hasta:
+            fila = por_mes.get(mes, {})
+            cargos, abonos = fila.get('cargos') or CERO, fila.get('abonos') or CERO
+            saldo += cargos + abonos
+            cierres.append(SupplierBalanceSnapshot(
+                proveedor=proveedor, business_id=proveedor.business_id, mes=mes, saldo=saldo,
+                cargos=cargos, abonos=abonos, movimientos=fila.get('n', 0),
+            ))
+            mes = mes_siguiente(mes)
+        SupplierBalanceSnapshot.objects.bulk_create(cierres, ignore_conflicts=True)
+        creados += len(cierres)
+    return creados
+
+
+# Estado de cuenta
+
+def saldo_al(proveedor, momento):
+    """Saldo del proveedor justo antes de `momento`: último cierre anterior más los movimientos siguientes."""
+    movimientos = SupplierLedgerEntry.objects.filter(proveedor=proveedor, fecha__lt=momento)
+    cierre = SupplierBalanceSnapshot.objects.filter(proveedor=proveedor, mes__lt=mes_de(momento)).order_by('-mes').first()
+    saldo = CERO
+    if cierre is not None:
+        saldo = cierre.saldo
+        movimientos = movimientos.filter(fecha__gte=inicio_del_dia(mes_siguiente(cierre.mes)))
+    return saldo + (movimientos.aggregate(s=Sum('monto'))['s'] or CERO)
+
+
+def estado_de_cuenta(proveedor, desde=None, hasta=None, chunk_size=2000):
+    """
+    (saldo_inicial, movimientos) del proveedor con fecha en [desde, hasta). `movimientos` es un
+    iterador (sin cargar todo el período en memoria) de dicts con el saldo acumulado.
+    """
+    saldo_inicial = saldo_al(proveedor, desde) if desde is not None else CERO
+    qs = SupplierLedgerEntry.objects.filter(proveedor=proveedor)
+    if desde is not None:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(fecha__lt=hasta)
+    filas = qs.order_by('fecha', 'id').values(
+        'uid', 'fecha', 'tipo', 'monto', 'descripcion',
+        'recepcion__uid', 'bin__uid', 'pago__uid', 'liquidacion__uid',
+    )
+
+    def movimientos():
+        saldo = saldo_inicial
+        for fila in filas.iterator(chunk_size=chunk_size):
+            saldo += fila['monto']
+            documento = next(
+                ((tipo, fila[f'{tipo}__uid']) for tipo in ('recepcion', 'bin', 'pago', 'liquidacion') if fila[f'{tipo}__uid']),
+                (None, None),
+            )
+            yield {
+                'uid': fila['uid'],
+                'fecha': fila['fecha'],
+                'tipo': fila['tipo'],
+                'descripcion': fila['descripcion'],
+                'documento': documento[0],
+                'documento_uid': documento[1],
+                'cargo': max(fila['monto'], CENTAVOS),
+                'abono': max(-fila['monto'], CENTAVOS),
+                'saldo': saldo,
+            }
+
+    return saldo_inicial, movimientos()
@@ -0,0 +1,276 @@
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connections
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Perfil
+from business.models import Business
+from sales.models import Sale, SaleItem
+
+from .bin_to_lot_models import BinToLotTransformationDetail
+from .bin_to_lot_service import transformar_bins
+from .models import (
+    BoxType, FruitBin, FruitLot, FruitLotResult, GoodsReception, Product, ReceptionDetail, Supplier, crear_lotes_al_aprobar_recepcion,
+)
+from .product_categories import OTRO, clasificar
+
+
+def crear_negocio(sufijo='1'):
+    usuario = CustomUser.objects.create_user(email=f'admin{sufijo}@test.cl', password='x', first_name='Admin')
+    perfil = Perfil.objects.create(user=usuario)
+    negocio = Business.objects.create(
+        nombre='Negocio', rut=f'{sufijo}-9', dueno=perfil, email=usuario.email, telefono='1', direccion='-',
+    )
+    perfil.business = negocio
+    perfil.save(update_fields=['business'])
+    return usuario, negocio
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TransformarBinsConcurrenteTests(TransactionTestCase):
+    """
+    Dos transformaciones simultáneas sobre los mismos bins, cada una por más de la mitad de sus
+    kilos: el bloqueo de los bins debe dejar pasar solo una y no descontar dos veces los mismos kilos.
+    Necesita una base con bloqueo de filas (PostgreSQL); en SQLite se omite.
+    """
+
+    BINS = 20
+    KG_POR_BIN = Decimal('6.00')
+    TARA_BIN = Decimal('40.00')
+
+    def setUp(self):
+        _, self.negocio = crear_negocio()
+        producto = Product.objects.create(nombre='Palta Hass', business=self.negocio)
+        proveedor = Supplier.objects.create(nombre='Proveedor', rut='2-7', business=self.negocio)
+        self.box_type = BoxType.objects.create(
+            nombre='rejilla', peso_caja=Decimal('0.50'), capacidad_por_caja=Decimal('10'), business=self.negocio,
+        )
+        bins = FruitBin.objects.bulk_create([
+            FruitBin(
+                codigo=f'BIN-{i}', producto=producto, proveedor=proveedor, business=self.negocio,
+                peso_bruto=self.TARA_BIN + self.KG_POR_BIN, peso_tara=self.TARA_BIN, peso_neto=self.KG_POR_BIN,
+            )
+            for i in range(self.BINS)
+        ])
+        self.bin_uids = [b.uid for b in bins]
+
+    def test_transformaciones_simultaneas_no_descuentan_dos_veces(self):
+        total = self.BINS * self.KG_POR_BIN
+        cajas = int(total / 2 / self.box_type.capacidad_por_caja) + 1
+        barrera = threading.Barrier(2)
+        resultados = []
+
+        def transformar():
+            try:
+                barrera.wait()
+                lote = transformar_bins(
+                    self.bin_uids, self.box_type, cajas, 'EXTRA', Decimal('1000'), business=self.negocio,
+                )
+                resultados.append(('ok', lote.peso_neto))
+            except Exception as e:
+                resultados.append(('rechazada', e))
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=transformar) for _ in range(2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        exitosas = [peso for estado, peso in resultados if estado == 'ok']
+        self.assertEqual(len(exitosas), 1, resultados)
+
+        bins = FruitBin.objects.filter(uid__in=self.bin_uids)
+        restante = sum((b.peso_bruto - b.peso_tara for b in bins), Decimal('0'))
+        descontado = BinToLotTransformationDetail.objects.filter(bin__in=bins).aggregate(s=Sum('kg_descontados'))['s']
+        self.assertEqual(descontado, exitosas[0])
+        self.assertEqual(descontado + restante, total)
+        self.assertFalse(any(b.peso_bruto < b.peso_tara for b in bins))
+
+
+class AprobarRecepcionTests(TestCase):
+    """Lotes creados al aprobar una recepción (ver inventory/reception_intake.py)."""
+
+    def setUp(self):
+        self.usuario, self.negocio = crear_negocio()
+        self.producto = Product.objects.create(nombre='Palta Hass', business=self.negocio)
+        self.box_type = BoxType.objects.create(
+            nombre='rejilla', peso_caja=Decimal('0.50'), capacidad_por_caja=Decimal('10'), business=self.negocio,
+        )
+        self.proveedor = Supplier.objects.create(
+            nombre='Proveedor', rut='2-7', direccion='Quillota', business=self.negocio,
+        )
+        self.recepcion = GoodsReception.objects.create(
+            proveedor=self.proveedor, recibido_por=self.usuario, business=self.negocio,
+        )
+        ReceptionDetail.objects.create(
+            recepcion=self.recepcion, producto=self.producto, box_type=self.box_type, calibre='20',
+            cantidad_cajas=10, peso_bruto=Decimal('105.00'), costo=Decimal('1000'),
+        )
+
+    def test_aprobar_crea_lotes_con_procedencia_del_proveedor(self):
+        self.recepcion.estado = 'aprobado'
+        self.recepcion.save()
+        lote = FruitLot.objects.get(business=self.negocio)
+        self.assertEqual(lote.proveedor, self.proveedor)
+        self.assertEqual(lote.procedencia, 'Quillota')
+        self.assertEqual(self.recepcion.detalles.get().lote_creado, lote)
+
+    def test_aprobar_recepcion_sin_proveedor(self):
+        # La columna exige proveedor, pero la aprobación no debe depender de él
+        self.recepcion.proveedor = None
+        self.recepcion.estado = 'aprobado'
+        crear_lotes_al_aprobar_recepcion(GoodsReception, self.recepcion, created=False)
+        lote = FruitLot.objects.get(business=self.negocio)
+        self.assertIsNone(lote.proveedor)
+        self.assertEqual(lote.procedencia, 'No especificada')
+        self.assertEqual(lote.cantidad_cajas, 10)
+
+
+class ResultadoLoteTests(TestCase):
+    """Cierre, reapertura y recálculo de FruitLotResult desde las señales (ver inventory/signals.py)."""
+
+    def setUp(self):
+        self.usuario, self.negocio = crear_negocio()
+        producto = Product.objects.create(nombre='Palta Hass', tipo_producto='palta', business=self.negocio)
+        box_type = BoxType.objects.create(
+            nombre='rejilla', peso_caja=Decimal('0.50'), capacidad_por_caja=Decimal('10'), business=self.negocio,
+        )
+        self.lote = FruitLot.objects.create(
+            producto=producto, box_type=box_type, cantidad_cajas=10, peso_bruto=Decimal('105.00'),
+            procedencia='Quillota', pais='Chile', calibre='20', costo_inicial=Decimal('1000'), business=self.negocio,
+        )
+
+    def _vender(self, cajas, kilos, subtotal):
+        venta = Sale.objects.create(
+            vendedor=self.usuario, total=subtotal, metodo_pago='efectivo', business=self.negocio,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            SaleItem.objects.create(
+                venta=venta, lote=FruitLot.objects.get(pk=self.lote.pk), unidades_vendidas=cajas,
+                peso_vendido=kilos, precio_kg=subtotal / kilos, subtotal=subtotal,
+            )
+        return venta
+
+    def _agotar(self):
+        primera = self._vender(5, Decimal('50.00'), Decimal('150000'))
+        segunda = self._vender(5, Decimal('50.00'), Decimal('100000'))
+        return primera, segunda
+
+    def test_cierra_el_lote_al_agotarse(self):
+        self._vender(5, Decimal('50.00'), Decimal('150000'))
+        self.assertFalse(FruitLotResult.objects.filter(fruitlot=self.lote).exists())
+        self._vender(5, Decimal('50.00'), Decimal('100000'))
+        resultado = FruitLotResult.objects.get(fruitlot=self.lote)
+        self.assertEqual(resultado.num_ventas, 2)
+        self.assertEqual(resultado.kilos_vendidos, Decimal('100.00'))
+        self.assertEqual(resultado.unidades_vendidas, 10)
+        self.assertEqual(resultado.real_ingreso_total, Decimal('250000.00'))
+
+    def test_reposicion_reabre_el_lote(self):
+        self._agotar()
+        lote = FruitLot.objects.get(pk=self.lote.pk)
+        lote.cantidad_cajas = 4
+        lote.save()
+        self.assertFalse(FruitLotResult.objects.filter(fruitlot=self.lote).exists())
+
+    def test_editar_lote_con_stock_no_lo_reabre(self):
+        lote = FruitLot.objects.get(pk=self.lote.pk)
+        lote.calibre = '22'
+        with mock.patch('inventory.lot_result_service.reabrir_lote') as reabrir:
+            lote.save()
+        reabrir.assert_not_called()
+
+    def test_cancelar_venta_recalcula_el_resultado(self):
+        primera, _ = self._agotar()
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.cancelar_venta(self.usuario, motivo='error')
+        resultado = FruitLotResult.objects.get(fruitlot=self.lote)
+        self.assertEqual(resultado.num_ventas, 1)
+        self.assertEqual(resultado.kilos_vendidos, Decimal('50.00'))
+        self.assertEqual(resultado.real_ingreso_total, Decimal('100000.00'))
+
+        # Editar la venta ya cancelada no vuelve a recalcular
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            primera.motivo_cancelacion = 'error de digitación'
+            primera.save()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(FruitLotResult.objects.get(fruitlot=self.lote).pk, resultado.pk)
+
+
+class ClasificarTests(SimpleTestCase):
+
+    def test_clasificar_por_nombre(self):
+        self.assertEqual(clasificar('Palta Hass Premium'), 'palta')
+        self.assertEqual(clasificar('AGUACATE fuerte'), 'palta')
+        self.assertEqual(clasificar('Mango Kent'), 'mango')
+        self.assertEqual(clasificar('Plátano Ecuador'), 'platano')
+        self.assertEqual(clasificar('Limón Sutil'), 'citrico')
+        self.assertEqual(clasificar('Frutilla'), OTRO)
+        self.assertEqual(clasificar(None), OTRO)
+
+
+class CategoriaProductoTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.usuario, self.negocio = crear_negocio()
+        self.usuario.groups.add(Group.objects.get_or_create(name='Administrador')[0])
+        self.client.force_authenticate(self.usuario)
+
+    def _filtrar(self, categoria):
+        response = self.client.get(reverse('product-list'), {'categoria': categoria})
+        self.assertEqual(response.status_code, 200)
+        datos = response.data['results'] if isinstance(response.data, dict) else response.data
+        return sorted(producto['nombre'] for producto in datos)
+
+    def test_renombrar_reclasifica(self):
+        producto = Product.objects.create(nombre='Palta Hass', business=self.negocio)
+        self.assertEqual((producto.categoria, producto.tipo_producto), ('palta', 'palta'))
+        producto = Product.objects.get(pk=producto.pk)
+        producto.nombre = 'Mango Kent'
+        producto.save(update_fields=['nombre'])
+        producto.refresh_from_db()
+        self.assertEqual((producto.categoria, producto.tipo_producto), ('mango', 'otro'))
+
+    def test_categoria_elegida_se_respeta(self):
+        producto = Product.objects.create(nombre='Fruta mixta', categoria='citrico', business=self.negocio)
+        self.assertEqual(producto.categoria, 'citrico')
+        # Renombrar y elegir categoría en el mismo cambio: gana la elegida
+        producto = Product.objects.get(pk=producto.pk)
+        producto.nombre = 'Palta mixta'
+        producto.categoria = 'mango'
+        producto.save()
+        self.assertEqual(Product.objects.get(pk=producto.pk).categoria, 'mango')
+        # Editar otro campo no cambia la categoría
+        producto = Product.objects.get(pk=producto.pk)
+        producto.marca = 'Otra'
+        producto.save()
+        self.assertEqual(Product.objects.get(pk=producto.pk).categoria, 'mango')
+
+    def test_filtro_por_categoria(self):
+        Product.objects.create(nombre='Palta Hass', business=self.negocio)
+        Product.objects.create(nombre='Aguacate Fuerte', business=self.negocio)
+        Product.objects.create(nombre='Mango Kent', business=self.negocio)
+        self.assertEqual(self._filtrar('palta'), ['Aguacate Fuerte', 'Palta Hass'])
+        self.assertEqual(self._filtrar('mango'), ['Mango Kent'])
+        self.assertEqual(self._filtrar('citrico'), [])
+
+    def test_classify_products_completa_los_existentes(self):
+        Product.objects.create(nombre='Palta Hass', business=self.negocio)
+        Product.objects.create(nombre='Limón Sutil', business=self.negocio)
+        # Productos anteriores a la columna: categoría vacía
+        Product.objects.update(categoria='')
+        self.assertEqual(self._filtrar('palta'), [])
+        call_command('classify_products', stdout=StringIO())
+        self.assertEqual(self._filtrar('palta'), ['Palta Hass'])
+        self.assertEqual(self._filtrar('citrico'), ['Limón Sutil'])
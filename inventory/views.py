@@ -1,11 +1,16 @@
 from rest_framework import viewsets, status
 from django.db.models import Q
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from .models import BoxType, FruitLot, StockReservation, Product, GoodsReception, Supplier, ReceptionDetail, SupplierPayment, ConcessionSettlement, ConcessionSettlementDetail
+from .models import BoxType, FruitLot, FruitLotResult, StockReservation, Product, GoodsReception, Supplier, ReceptionDetail, SupplierPayment, ConcessionSettlement, ConcessionSettlementDetail
 from .serializers import BoxTypeSerializer, FruitLotSerializer, FruitLotListSerializer, StockReservationSerializer, ProductSerializer, GoodsReceptionSerializer, GoodsReceptionListSerializer, ReceptionDetailSerializer, SupplierPaymentSerializer, ConcessionSettlementSerializer, ConcessionSettlementDetailSerializer, PalletHistorySerializerList, PalletHistoryDetailSerializer
 from .serializers_supplier import SupplierSerializerList, SupplierSerializer
+from . import lot_result_service
 from rest_framework.permissions import IsAuthenticated
+from core.fast_json import FastListMixin
 from core.permissions import IsSameBusiness, IsProveedorReadOnly
+from .list_rows import FruitLotListRows
 from accounts.models import CustomUser
 from sales.models import SalePendingItem
 from rest_framework.response import Response
@@ -15,6 +20,7 @@ from rest_framework.decorators import action
 from django.db.models import Subquery, OuterRef, Sum, F, IntegerField
 from django.db.models.functions import Coalesce
 import json
+from decimal import Decimal
 
 class RolePermissionMixin:
     def get_permissions(self):
@@ -29,7 +35,10 @@ class RolePermissionMixin:
         return perms
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        return self.filtrar_por_rol(super().get_queryset())
+
+    def filtrar_por_rol(self, qs):
+        """Restringe `qs` a lo que el rol del usuario puede ver (también para querysets de otros modelos)."""
         user = self.request.user
         perfil = getattr(user, 'perfil', None)
         
@@ -51,6 +60,8 @@ class RolePermissionMixin:
                     return qs.filter(recepcion__proveedor=proveedor)
                 if model.__name__ == 'FruitLot':
                     return qs.filter(Q(proveedor=proveedor) | Q(propietario_original=proveedor))
+                if model.__name__ == 'FruitLotResult':
+                    return qs.filter(Q(fruitlot__proveedor=proveedor) | Q(fruitlot__propietario_original=proveedor))
                 if model.__name__ == 'SupplierPayment':
                     return qs.filter(recepcion__proveedor=proveedor)
                 if model.__name__ == 'ConcessionSettlement':
@@ -91,8 +102,9 @@ class BoxTypeViewSet(RolePermissionMixin, viewsets.ModelViewSet):
             raise ValidationError({'detail': 'Perfil no encontrado para el usuario'})
         serializer.save(business=perfil.business)
 
-class FruitLotViewSet(RolePermissionMixin, viewsets.ModelViewSet):
+class FruitLotViewSet(FastListMixin, RolePermissionMixin, viewsets.ModelViewSet):
     serializer_class = FruitLotSerializer
+    list_mapper = FruitLotListRows
     permission_classes = [IsAuthenticated, IsSameBusiness]
     queryset = FruitLot.objects.all()
     lookup_field = 'uid'
@@ -155,6 +167,9 @@ class FruitLotViewSet(RolePermissionMixin, viewsets.ModelViewSet):
         # Filtrar por tipo de producto si se especifica
         if tipo_producto is not None:
             qs = qs.filter(producto__tipo_producto=tipo_producto)
+        categoria = self.request.query_params.get('categoria')
+        if categoria:
+            qs = qs.filter(producto__categoria=categoria)
             
         return qs.order_by('-created_at')
 
@@ -226,34 +241,36 @@ class FruitLotViewSet(RolePermissionMixin, viewsets.ModelViewSet):
             
     @action(detail=False, methods=['get'])
     def sold_pallets(self, request):
-        """Retorna una lista de pallets vendidos o con estado agotado"""
+        """Retorna una lista de pallets vendidos o agotados, con su resultado ya calculado"""
         try:
-            # Filtrar pallets vendidos o agotados basándose únicamente en cajas, no en kilos disponibles
-            queryset = FruitLot.objects.filter(cantidad_cajas=0)
+            # Resultado guardado al agotarse cada lote (inventory/lot_result_service.py)
+            queryset = self.filtrar_por_rol(
+                FruitLotResult.objects.select_related('fruitlot__producto', 'fruitlot__proveedor')
+            )
             
             # Aplicar filtros adicionales si se proporcionan
             producto_id = request.query_params.get('producto_id')
             if producto_id:
-                queryset = queryset.filter(producto__uid=producto_id)
+                queryset = queryset.filter(fruitlot__producto__uid=producto_id)
                 
             proveedor = request.query_params.get('proveedor')
             if proveedor:
-                queryset = queryset.filter(proveedor__icontains=proveedor)
+                queryset = queryset.filter(fruitlot__proveedor__nombre__icontains=proveedor)
                 
             procedencia = request.query_params.get('procedencia')
             if procedencia:
-                queryset = queryset.filter(procedencia__icontains=procedencia)
+                queryset = queryset.filter(fruitlot__procedencia__icontains=procedencia)
                 
             fecha_desde = request.query_params.get('fecha_desde')
             if fecha_desde:
-                queryset = queryset.filter(fecha_ingreso__gte=fecha_desde)
+                queryset = queryset.filter(fruitlot__fecha_ingreso__gte=fecha_desde)
                 
             fecha_hasta = request.query_params.get('fecha_hasta')
             if fecha_hasta:
-                queryset = queryset.filter(fecha_ingreso__lte=fecha_hasta)
+                queryset = queryset.filter(fruitlot__fecha_ingreso__lte=fecha_hasta)
             
             # Ordenar por fecha de ingreso descendente (más reciente primero)
-            queryset = queryset.order_by('-fecha_ingreso')
+            queryset = queryset.order_by('-fruitlot__fecha_ingreso', '-id')
             
             # Paginar resultados
             page = self.paginate_queryset(queryset)
@@ -270,10 +287,8 @@ class FruitLotViewSet(RolePermissionMixin, viewsets.ModelViewSet):
     def sold_pallet_detail(self, request, uid=None):
         """Retorna el detalle de un pallet vendido o agotado, con información específica según el tipo de fruta"""
         try:
-            # Obtener el lote directamente por su UID
-            try:
-                lote = FruitLot.objects.get(uid=uid)
-            except FruitLot.DoesNotExist:
+            lote = self.filtrar_por_rol(FruitLot.objects.all()).filter(uid=uid).first()
+            if lote is None:
                 return Response({'error': f'No existe un pallet con el ID: {uid}'}, status=status.HTTP_404_NOT_FOUND)
             
             # Verificar que el lote no tenga cajas disponibles (basado solo en cajas, no en kilos)
@@ -283,7 +298,12 @@ class FruitLotViewSet(RolePermissionMixin, viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            serializer = self.get_serializer(lote)
+            # Si el lote se agotó antes del cierre automático, se calcula ahora (una vez)
+            resultado = lot_result_service.resultado_de(lote)
+            resultado = FruitLotResult.objects.select_related(
+                'fruitlot__producto', 'fruitlot__proveedor', 'fruitlot__box_type', 'fruitlot__pallet_type',
+            ).get(pk=resultado.pk)
+            serializer = self.get_serializer(resultado)
             return Response(serializer.data)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -294,6 +314,13 @@ class ProductViewSet(RolePermissionMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     lookup_field = 'uid'
     
+    def get_queryset(self):
+        qs = super().get_queryset()
+        categoria = self.request.query_params.get('categoria')
+        if categoria:
+            qs = qs.filter(categoria=categoria)
+        return qs
+    
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({'request': self.request})
@@ -378,6 +405,14 @@ class GoodsReceptionViewSet(RolePermissionMixin, viewsets.ModelViewSet):
             return GoodsReceptionListSerializer
         return GoodsReceptionSerializer
     
+    @staticmethod
+    def _con_detalles(qs):
+        """Precarga lo que lee GoodsReceptionSerializer.get_detalles para no consultar por detalle."""
+        from django.db.models import Prefetch
+        return qs.select_related('proveedor', 'recibido_por', 'revisado_por').prefetch_related(
+            Prefetch('detalles', queryset=ReceptionDetail.objects.select_related('producto', 'box_type', 'lote_creado'))
+        )
+
     @action(detail=False, methods=['post'])
     def crear_recepcion(self, request):
         import json
@@ -425,21 +460,6 @@ class GoodsReceptionViewSet(RolePermissionMixin, viewsets.ModelViewSet):
             data['recibido_por'] = user.id
             data['business'] = perfil.business.id
             
-            # Crear recepción
-            recepcion_serializer = self.get_serializer(data=data)
-            recepcion_serializer.is_valid(raise_exception=True)
-            recepcion = recepcion_serializer.save()
-            
-            # Crear detalles
-            from inventory.models import ReceptionDetail
-            from inventory.serializers import ReceptionDetailSerializer
-            
-            detalles_creados = []
-            errores_detalles = []
-            
-            # Imprimir para depuración
-            print(f"Detalles recibidos: {detalles}")
-            
             # Capturar configuración de comisión desde la recepción
             comision_base = data.get('comision_base')
             comision_monto = data.get('comision_monto')
@@ -449,118 +469,54 @@ class GoodsReceptionViewSet(RolePermissionMixin, viewsets.ModelViewSet):
 
             comision_por_kilo_resuelta = None
 
-            for i, detalle in enumerate(detalles):
+            for detalle in detalles:
+                # Calcular comisión por kilo si corresponde (base 'kg')
                 try:
-                    # Manejar producto por uid
-                    producto_val = detalle.get('producto')
-                    print(f"Producto valor: {producto_val}, tipo: {type(producto_val)}")
-                    # ReceptionDetailSerializer espera slug uid para 'producto'
-                    from inventory.models import Product
-                    if producto_val is None:
-                        errores_detalles.append({"detalle": i, "error": "Campo 'producto' es obligatorio"})
-                        continue
-                    if str(producto_val).isdigit():
-                        # Si viene como ID numérico, convertir a UID
-                        try:
-                            producto_obj = Product.objects.get(id=int(producto_val))
-                            detalle['producto'] = str(producto_obj.uid)
-                        except Product.DoesNotExist:
-                            error_msg = f"Producto con ID {producto_val} no encontrado"
-                            print(error_msg)
-                            errores_detalles.append({"detalle": i, "error": error_msg})
-                            continue
-                    else:
-                        # Validar que el UID exista
-                        try:
-                            producto_obj = Product.objects.get(uid=producto_val)
-                            detalle['producto'] = str(producto_obj.uid)
-                        except Product.DoesNotExist:
-                            error_msg = f"Producto con UID {producto_val} no encontrado"
-                            print(error_msg)
-                            errores_detalles.append({"detalle": i, "error": error_msg})
-                            continue
-                    
-                    # ReceptionDetailSerializer espera slug uid para 'recepcion'
-                    detalle['recepcion'] = str(recepcion.uid)
-                    detalle['business'] = perfil.business.id
-                    
-                    # Imprimir para depuración
-                    print(f"Detalle a validar: {detalle}")
-                    
-                    # Calcular comisión por kilo si corresponde (base 'kg')
-                    try:
-                        from decimal import Decimal as D
-                        # Solo si la recepción está en concesión
-                        if en_concesion and (comision_base == 'kg'):
-                            # Preferir monto directo, sino calcular por porcentaje con costo del detalle
-                            if comision_monto not in (None, ''):
-                                detalle['comision_por_kilo'] = D(str(comision_monto))
-                                comision_por_kilo_resuelta = D(str(comision_monto))
-                            elif comision_porcentaje not in (None, ''):
-                                costo_det = detalle.get('costo')
-                                if costo_det not in (None, ''):
-                                    detalle['comision_por_kilo'] = D(str(costo_det)) * D(str(comision_porcentaje)) / D('100')
-                                    comision_por_kilo_resuelta = detalle['comision_por_kilo']
-                    except Exception:
-                        pass
-
-                    # Propagar flags de concesión a cada detalle
-                    detalle['en_concesion'] = en_concesion
-                    detalle['fecha_limite_concesion'] = fecha_limite_concesion
-
-                    # Actualizar por uid si viene, si no crear
-                    detalle_uid = detalle.get('uid')
-                    if detalle_uid:
-                        existente = ReceptionDetail.objects.filter(uid=detalle_uid, recepcion=recepcion).first()
-                        if existente:
-                            detalle_serializer = ReceptionDetailSerializer(existente, data=detalle, partial=True)
-                            if detalle_serializer.is_valid():
-                                detalle_serializer.save()
-                                detalles_creados.append(detalle_serializer.data)
-                            else:
-                                print(f"Errores de validación (update): {detalle_serializer.errors}")
-                                errores_detalles.append({"detalle": i, "error": detalle_serializer.errors})
-                            continue
-                    detalle_serializer = ReceptionDetailSerializer(data=detalle)
-                    if detalle_serializer.is_valid():
-                        detalle_serializer.save()
-                        detalles_creados.append(detalle_serializer.data)
-                    else:
-                        print(f"Errores de validación (create): {detalle_serializer.errors}")
-                        errores_detalles.append({"detalle": i, "error": detalle_serializer.errors})
-                except Exception as e:
-                    print(f"Error al procesar detalle {i}: {str(e)}")
-                    errores_detalles.append({"detalle": i, "error": str(e)})
-            
-            # Si hay errores en los detalles pero la recepción se creó, reportarlos
-            if errores_detalles:
-                # Re-serializar la recepción para que 'detalles' venga del GoodsReceptionSerializer (incluye comisión)
-                recepcion_refrescada = GoodsReception.objects.get(pk=recepcion.pk)
-                respuesta = self.get_serializer(recepcion_refrescada).data
-                respuesta['errores_detalles'] = errores_detalles
-                # Si resolvimos una comisión por kilo, reflejarla a nivel de recepción
-                try:
-                    if comision_por_kilo_resuelta is not None:
-                        recepcion.comision_por_kilo = comision_por_kilo_resuelta
-                        recepcion.save(update_fields=['comision_por_kilo'])
-                        # Recalcular serializer para incluir campo actualizado
-                        respuesta['comision_por_kilo'] = float(comision_por_kilo_resuelta)
+                    from decimal import Decimal as D
+                    # Solo si la recepción está en concesión
+                    if en_concesion and (comision_base == 'kg'):
+                        # Preferir monto directo, sino calcular por porcentaje con costo del detalle
+                        if comision_monto not in (None, ''):
+                            detalle['comision_por_kilo'] = D(str(comision_monto))
+                            comision_por_kilo_resuelta = D(str(comision_monto))
+                        elif comision_porcentaje not in (None, ''):
+                            costo_det = detalle.get('costo')
+                            if costo_det not in (None, ''):
+                                detalle['comision_por_kilo'] = D(str(costo_det)) * D(str(comision_porcentaje)) / D('100')
+                                comision_por_kilo_resuelta = detalle['comision_por_kilo']
                 except Exception:
                     pass
-                return Response(respuesta, status=status.HTTP_201_CREATED)
-            
-            # Si todo salió bien, devolver respuesta completa con 'detalles' ricos (incluye comisión)
-            recepcion_refrescada = GoodsReception.objects.get(pk=recepcion.pk)
-            respuesta = self.get_serializer(recepcion_refrescada).data
-            # Si resolvimos una comisión por kilo, reflejarla a nivel de recepción
-            try:
+
+                # Propagar flags de concesión a cada detalle
+                detalle['en_concesion'] = en_concesion
+                detalle['fecha_limite_concesion'] = fecha_limite_concesion
+
+            from django.db import transaction
+            from inventory.reception_intake import guardar_detalles
+
+            with transaction.atomic():
+                # Crear recepción
+                recepcion_serializer = self.get_serializer(data=data)
+                recepcion_serializer.is_valid(raise_exception=True)
+                recepcion = recepcion_serializer.save()
+
+                # Crear detalles (actualiza por uid si viene, si no crea) y, si está aprobada, sus lotes
+                _, _, errores = guardar_detalles(recepcion, detalles)
+                errores_detalles = [{"detalle": i, "error": error} for i, _, error in errores]
+
+                # Si resolvimos una comisión por kilo, reflejarla a nivel de recepción
                 if comision_por_kilo_resuelta is not None:
                     recepcion.comision_por_kilo = comision_por_kilo_resuelta
                     recepcion.save(update_fields=['comision_por_kilo'])
-                    respuesta['comision_por_kilo'] = float(comision_por_kilo_resuelta)
-            except Exception:
-                pass
-            
+
+            # Re-serializar la recepción para que 'detalles' venga del GoodsReceptionSerializer (incluye comisión)
+            recepcion_refrescada = self._con_detalles(GoodsReception.objects.filter(pk=recepcion.pk)).get()
+            respuesta = self.get_serializer(recepcion_refrescada).data
+            if comision_por_kilo_resuelta is not None:
+                respuesta['comision_por_kilo'] = float(comision_por_kilo_resuelta)
+            # Si hay errores en los detalles pero la recepción se creó, reportarlos
+            if errores_detalles:
+                respuesta['errores_detalles'] = errores_detalles
             return Response(respuesta, status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -632,6 +588,88 @@ class SupplierViewSet(RolePermissionMixin, viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=True, methods=['get'], url_path='statement')
+    def statement(self, request, uid=None):
+        """
+        Estado de cuenta del proveedor entre `desde` y `hasta` (AAAA-MM-DD, ambas incluidas; sin
+        ellas, desde el primer movimiento hasta hoy): saldo inicial, movimientos con saldo acumulado
+        y saldo final. La respuesta se genera por partes (streaming), así que un período largo no se
+        arma completo en memoria. `formato=csv` para descargarlo como planilla.
+        """
+        from datetime import timedelta
+        from django.utils.dateparse import parse_date
+        from .supplier_ledger import estado_de_cuenta, inicio_del_dia
+
+        supplier = self.get_object()
+        limites = {}
+        for campo in ('desde', 'hasta'):
+            valor = request.query_params.get(campo)
+            fecha = parse_date(valor) if valor else None
+            if valor and fecha is None:
+                raise ValidationError({campo: 'Formato de fecha inválido (use AAAA-MM-DD)'})
+            limites[campo] = fecha
+        if limites['desde'] and limites['hasta'] and limites['desde'] > limites['hasta']:
+            raise ValidationError({'hasta': 'Debe ser igual o posterior a desde'})
+        formato = request.query_params.get('formato', 'json')
+        if formato not in ('json', 'csv'):
+            raise ValidationError({'formato': 'Opciones: json, csv'})
+
+        desde = inicio_del_dia(limites['desde']) if limites['desde'] else None
+        hasta = inicio_del_dia(limites['hasta'] + timedelta(days=1)) if limites['hasta'] else None
+        saldo_inicial, movimientos = estado_de_cuenta(supplier, desde, hasta)
+        encabezado = {
+            'proveedor': supplier.uid, 'proveedor_nombre': supplier.nombre, 'proveedor_rut': supplier.rut,
+            'desde': limites['desde'], 'hasta': limites['hasta'], 'saldo_inicial': saldo_inicial,
+        }
+        if formato == 'csv':
+            response = StreamingHttpResponse(_estado_de_cuenta_csv(encabezado, movimientos), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="estado-cuenta-{supplier.rut}.csv"'
+        else:
+            response = StreamingHttpResponse(_estado_de_cuenta_json(encabezado, movimientos), content_type='application/json')
+        return response
+
+
+def _estado_de_cuenta_json(encabezado, movimientos):
+    """Documento JSON por partes: encabezado, movimientos de a uno y totales al final."""
+    def dumps(valor):
+        return json.dumps(valor, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    yield dumps(encabezado)[:-1] + ', "movimientos": ['
+    saldo, cantidad = encabezado['saldo_inicial'], 0
+    cargos = abonos = Decimal('0.00')
+    for movimiento in movimientos:
+        yield (',' if cantidad else '') + dumps(movimiento)
+        saldo, cantidad = movimiento['saldo'], cantidad + 1
+        cargos += movimiento['cargo']
+        abonos += movimiento['abono']
+    totales = {'total_cargos': cargos, 'total_abonos': abonos, 'saldo_final': saldo, 'cantidad_movimientos': cantidad}
+    yield '], ' + dumps(totales)[1:]
+
+
+def _estado_de_cuenta_csv(encabezado, movimientos):
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def fila(*valores):
+        writer.writerow(valores)
+        linea = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return linea
+
+    yield fila('fecha', 'tipo', 'descripcion', 'documento', 'cargo', 'abono', 'saldo')
+    yield fila('', '', 'Saldo inicial', '', '', '', encabezado['saldo_inicial'])
+    for movimiento in movimientos:
+        yield fila(
+            timezone.localtime(movimiento['fecha']).strftime('%Y-%m-%d %H:%M'), movimiento['tipo'],
+            movimiento['descripcion'], movimiento['documento'] or '', movimiento['cargo'], movimiento['abono'],
+            movimiento['saldo'],
+        )
+
+
 class ReceptionDetailViewSet(RolePermissionMixin, viewsets.ModelViewSet):
     serializer_class = ReceptionDetailSerializer
     permission_classes = [IsAuthenticated, IsSameBusiness]
@@ -660,136 +698,25 @@ class ReceptionDetailViewSet(RolePermissionMixin, viewsets.ModelViewSet):
         
         try:
             # Verificar que la recepción existe y pertenece al negocio del usuario
-            recepcion = GoodsReception.objects.get(uid=recepcion_uid, business=perfil.business)
+            recepcion = GoodsReception.objects.select_related('proveedor').get(uid=recepcion_uid, business=perfil.business)
         except GoodsReception.DoesNotExist:
             return Response({'detail': 'Recepción no encontrada'}, status=status.HTTP_404_NOT_FOUND)
         
-        detalles_actualizados = []
-        detalles_creados = []
-        errores = []
-        
-        for i, detalle_data in enumerate(detalles_data):
-            # Asignar la recepción a cada detalle
-            detalle_data['recepcion'] = recepcion.uid
-            # Normalizar 'producto' a UID, ya que el serializer espera slug_field='uid'
-            try:
-                from inventory.models import Product
-                producto_val = detalle_data.get('producto')
-                if producto_val is None:
-                    errores.append({
-                        'indice': i,
-                        'detalle': detalle_data,
-                        'error': "El campo 'producto' es obligatorio."
-                    })
-                    continue
-                if str(producto_val).isdigit():
-                    try:
-                        producto_obj = Product.objects.get(id=int(producto_val))
-                        detalle_data['producto'] = str(producto_obj.uid)
-                    except Product.DoesNotExist:
-                        errores.append({
-                            'indice': i,
-                            'detalle': detalle_data,
-                            'error': f"Producto con ID {producto_val} no encontrado"
-                        })
-                        continue
-                else:
-                    try:
-                        producto_obj = Product.objects.get(uid=producto_val)
-                        detalle_data['producto'] = str(producto_obj.uid)
-                    except Product.DoesNotExist:
-                        errores.append({
-                            'indice': i,
-                            'detalle': detalle_data,
-                            'error': f"Producto con UID {producto_val} no encontrado"
-                        })
-                        continue
-            except Exception as e:
-                errores.append({
-                    'indice': i,
-                    'detalle': detalle_data,
-                    'error': f"Error al normalizar producto: {str(e)}"
-                })
-                continue
-            
-            # Verificar si es una actualización o creación
-            es_actualizacion = 'uid' in detalle_data and detalle_data['uid']
-            
-            # Log de datos del detalle
-            logger.info(f"Procesando detalle {i}: {detalle_data}")
-            if 'precio_sugerido_min' in detalle_data:
-                logger.info(f"Precio sugerido min: {detalle_data['precio_sugerido_min']} (tipo: {type(detalle_data['precio_sugerido_min'])})")
-            
-            try:
-                if es_actualizacion:
-                    # Actualizar detalle existente
-                    try:
-                        # Verificar que el detalle pertenece a la recepción correcta
-                        detalle_obj = ReceptionDetail.objects.get(uid=detalle_data['uid'], recepcion__business=perfil.business)
-                        serializer = self.get_serializer(detalle_obj, data=detalle_data, partial=True)
-                        if serializer.is_valid(raise_exception=False):
-                            logger.info(f"Serializer válido para actualización: {serializer.validated_data}")
-                            serializer.save()  # No pasar business aquí
-                            detalles_actualizados.append(serializer.data)
-                        else:
-                            logger.error(f"Error en serializer para actualización: {serializer.errors}")
-                            errores.append({
-                                'indice': i,
-                                'detalle': detalle_data,
-                                'error': serializer.errors
-                            })
-                    except ReceptionDetail.DoesNotExist:
-                        errores.append({
-                            'indice': i,
-                            'detalle': detalle_data,
-                            'error': 'Detalle no encontrado'
-                        })
-                else:
-                    # Crear nuevo detalle o actualizar si ya existe por uid
-                    # Validar campos obligatorios
-                    if 'producto' not in detalle_data:
-                        errores.append({
-                            'indice': i,
-                            'detalle': detalle_data,
-                            'error': "El campo 'producto' es obligatorio."
-                        })
-                        continue
-                    # Upsert por uid si se entrega
-                    detalle_uid = detalle_data.get('uid')
-                    existente = ReceptionDetail.objects.filter(uid=detalle_uid, recepcion=recepcion).first() if detalle_uid else None
-                    if existente:
-                        serializer = self.get_serializer(existente, data=detalle_data, partial=True)
-                        if serializer.is_valid(raise_exception=False):
-                            logger.info(f"Serializer válido para actualización por upsert: {serializer.validated_data}")
-                            serializer.save()
-                            detalles_actualizados.append(serializer.data)
-                        else:
-                            logger.error(f"Error en serializer para actualización por upsert: {serializer.errors}")
-                            errores.append({
-                                'indice': i,
-                                'detalle': detalle_data,
-                                'error': serializer.errors
-                            })
-                    else:
-                        serializer = self.get_serializer(data=detalle_data)
-                        if serializer.is_valid(raise_exception=False):
-                            logger.info(f"Serializer válido para creación: {serializer.validated_data}")
-                            serializer.save()
-                            detalles_creados.append(serializer.data)
-                        else:
-                            logger.error(f"Error en serializer para creación: {serializer.errors}")
-                            errores.append({
-                                'indice': i,
-                                'detalle': detalle_data,
-                                'error': serializer.errors
-                            })
-            except Exception as e:
-                errores.append({
-                    'indice': i,
-                    'detalle': detalle_data,
-                    'error': str(e)
-                })
-        
+        if not isinstance(detalles_data, list):
+            return Response({'detail': 'detalles debe ser una lista.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        from inventory.reception_intake import guardar_detalles
+
+        # Un uid que no pertenece a la recepción es un error, no un detalle nuevo
+        creados, actualizados, fallidos = guardar_detalles(recepcion, detalles_data, crear_si_no_existe=False)
+
+        serializer_class = self.get_serializer_class()
+        detalles_creados = serializer_class(creados, many=True).data
+        detalles_actualizados = serializer_class(actualizados, many=True).data
+        errores = [{'indice': i, 'detalle': fila, 'error': error} for i, fila, error in fallidos]
+        if errores:
+            logger.error(f"Errores en detalles de recepción {recepcion.uid}: {errores}")
+
         respuesta = {
             'detalles_actualizados': detalles_actualizados,
             'detalles_creados': detalles_creados,
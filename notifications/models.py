@@ -36,6 +36,10 @@ class Notification(BaseModel):
         ordering = ['-created_at']
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
+        indexes = [
+            models.Index(fields=['usuario', 'leida', 'created_at'], name='notif_usuario_leida_idx'),
+            models.Index(fields=['tipo', 'objeto_relacionado_id'], name='notif_tipo_objeto_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.usuario.email}"
@@ -1,5 +1,4 @@
 import json
-import requests
 from django.conf import settings
 from django.db import models
 
@@ -44,6 +43,9 @@ def send_webhook_notification(business_id, event_type, data):
     
     if not subscriptions.exists():
         return
+
+    # Import diferido: requests solo se carga si hay webhooks que enviar
+    import requests
     
     # Preparar el payload
     payload = {
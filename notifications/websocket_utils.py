@@ -1,8 +1,5 @@
 import logging
 from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-
-from .serializers import NotificationSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +10,11 @@ def send_notification_to_websocket(notification):
     Args:
         notification: La instancia de la notificación a enviar.
     """
+    # Imports diferidos: notifications.signals carga este módulo al iniciar cada proceso
+    from channels.layers import get_channel_layer
+
+    from .serializers import NotificationSerializer
+
     channel_layer = get_channel_layer()
     
     if channel_layer is None:
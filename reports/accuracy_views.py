@@ -0,0 +1,69 @@
+from django.utils.dateparse import parse_date
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.permissions import IsSameBusiness
+
+from .views import _get_business_from_user
+
+
+class LotAccuracyReportView(APIView):
+    """
+    Precisión de las predicciones de los lotes cerrados (merma, margen y días), con distribución
+    del error y percentiles por producto, categoría, proveedor, calibre, calidad y estado de maduración.
+
+    Parámetros:
+      - desde / hasta (YYYY-MM-DD): fecha en que se agotó el lote, ambos inclusive
+      - dimensiones: coma-separado, por defecto todas
+      - minimo: lotes mínimos para mostrar un grupo (por defecto 1)
+    """
+    permission_classes = [IsAuthenticated, IsSameBusiness]
+
+    def get(self, request):
+        # Import diferido: lot_accuracy carga NumPy, que no hace falta al iniciar cada worker
+        from inventory import lot_accuracy
+
+        business = _get_business_from_user(request.user)
+        if not business:
+            return Response({"detail": "Usuario no tiene un negocio asociado."}, status=404)
+        # Márgenes y costos: solo administración
+        if not request.user.groups.filter(name__in=['Administrador', 'Supervisor']).exists():
+            return Response({"detail": "No tiene permisos para ver este informe."}, status=403)
+
+        fechas = {}
+        for param in ('desde', 'hasta'):
+            valor = request.query_params.get(param)
+            if valor:
+                try:
+                    fecha = parse_date(valor)
+                except ValueError:
+                    fecha = None
+                if fecha is None:
+                    return Response({"detail": f"Fecha inválida en '{param}', use YYYY-MM-DD."}, status=400)
+                fechas[param] = fecha
+
+        dimensiones = None
+        if request.query_params.get('dimensiones'):
+            dimensiones = [d.strip() for d in request.query_params['dimensiones'].split(',') if d.strip()]
+            invalidas = set(dimensiones) - set(lot_accuracy.DIMENSIONES)
+            if invalidas:
+                return Response({
+                    "detail": f"Dimensiones no válidas: {', '.join(sorted(invalidas))}.",
+                    "dimensiones": list(lot_accuracy.DIMENSIONES),
+                }, status=400)
+        try:
+            minimo = max(1, int(request.query_params.get('minimo', 1)))
+        except ValueError:
+            return Response({"detail": "'minimo' debe ser un número entero."}, status=400)
+
+        informe = lot_accuracy.informe(business, fechas.get('desde'), fechas.get('hasta'), dimensiones, minimo)
+        return Response({
+            **informe,
+            'filtros_aplicados': {
+                'desde': fechas.get('desde'),
+                'hasta': fechas.get('hasta'),
+                'dimensiones': dimensiones or list(lot_accuracy.DIMENSIONES),
+                'minimo': minimo,
+            },
+        })
@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import ReportJob
+
+
+# Reportes en segundo plano: los calcula reports/jobs.py
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('uid', 'tipo', 'formato', 'business', 'usuario', 'estado', 'tamano', 'created_at', 'terminado_at')
+    list_filter = ('estado', 'tipo', 'business')
+    search_fields = ('uid', 'usuario__email')
+    exclude = ('contenido',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ReportJob, ReportJobAdmin)
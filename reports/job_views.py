@@ -0,0 +1,102 @@
+import gzip
+
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.permissions import IsSameBusiness
+
+from . import jobs
+from .models import ReportJob
+from .serializers import ReportJobSerializer
+from .views import _get_business_from_user
+
+CONTENT_TYPES = {'json': 'application/json', 'csv': 'text/csv; charset=utf-8'}
+
+
+def _jobs_visibles(request, business):
+    """Jobs del negocio; los calculados con acceso completo solo para administradores y supervisores."""
+    qs = ReportJob.objects.filter(business=business).defer('contenido')
+    if jobs.acceso_de(request.user) != 'completo':
+        qs = qs.filter(acceso='basico')
+    return qs
+
+
+def _job(request, uid):
+    business = _get_business_from_user(request.user)
+    job = _jobs_visibles(request, business).filter(uid=uid).first() if business else None
+    if job is None:
+        raise Http404
+    return job
+
+
+class ReportJobListCreateView(APIView):
+    """
+    GET: reportes pedidos por el usuario (los últimos 50).
+    POST: pide un reporte en segundo plano. Body: {"tipo": "stock|ventas|turnos|maduracion|precios",
+    "parametros": {...los mismos query params del reporte...}, "formato": "json|csv"}. Responde 202
+    con el job; si hay una solicitud igual reciente responde 200 con ese mismo job.
+    """
+    permission_classes = [IsAuthenticated, IsSameBusiness]
+
+    def get(self, request):
+        business = _get_business_from_user(request.user)
+        if not business:
+            return Response({"detail": "Usuario no tiene un negocio asociado."}, status=404)
+        qs = _jobs_visibles(request, business).filter(usuario=request.user)[:50]
+        return Response(ReportJobSerializer(qs, many=True, context={'request': request}).data)
+
+    def post(self, request):
+        business = _get_business_from_user(request.user)
+        if not business:
+            return Response({"detail": "Usuario no tiene un negocio asociado."}, status=404)
+
+        tipo = request.data.get('tipo')
+        if tipo not in jobs.REPORTES:
+            return Response({"detail": f"Tipo de reporte no válido. Opciones: {', '.join(jobs.REPORTES)}."}, status=400)
+        formato = request.data.get('formato') or 'json'
+        if formato not in dict(ReportJob.FORMATO_CHOICES):
+            return Response({"detail": "Formato no válido. Opciones: json, csv."}, status=400)
+        parametros = request.data.get('parametros') or {}
+        if not isinstance(parametros, dict) or any(isinstance(v, (dict, list)) for v in parametros.values()):
+            return Response({"detail": "'parametros' debe ser un objeto con valores simples."}, status=400)
+
+        try:
+            job, reutilizado = jobs.solicitar(business, request.user, tipo, parametros, formato)
+        except jobs.ReporteInvalido as e:
+            return Response({"detail": str(e)}, status=403)
+        data = ReportJobSerializer(job, context={'request': request}).data
+        data['reutilizado'] = reutilizado
+        return Response(data, status=200 if reutilizado else 202)
+
+
+class ReportJobDetailView(APIView):
+    """Estado de un reporte en segundo plano."""
+    permission_classes = [IsAuthenticated, IsSameBusiness]
+
+    def get(self, request, uid):
+        return Response(ReportJobSerializer(_job(request, uid), context={'request': request}).data)
+
+
+class ReportJobDownloadView(APIView):
+    """
+    Descarga el resultado. Se envía comprimido (Content-Encoding: gzip) si el cliente lo acepta;
+    si no, se descomprime aquí.
+    """
+    permission_classes = [IsAuthenticated, IsSameBusiness]
+
+    def get(self, request, uid):
+        job = _job(request, uid)
+        if job.estado != 'completado':
+            return Response({"detail": "El reporte todavía no está listo.", "estado": job.estado}, status=409)
+
+        contenido = bytes(ReportJob.objects.values_list('contenido', flat=True).get(pk=job.pk))
+        comprimido = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = HttpResponse(contenido if comprimido else gzip.decompress(contenido), content_type=CONTENT_TYPES[job.formato])
+        if comprimido:
+            response['Content-Encoding'] = 'gzip'
+        fecha = timezone.localtime(job.created_at).strftime('%Y%m%d_%H%M')
+        response['Content-Disposition'] = f'attachment; filename="reporte_{job.tipo}_{fecha}.{job.formato}"'
+        return response
@@ -0,0 +1,268 @@
+"""
+Reportes en segundo plano.
+
+Los reportes de stock, ventas y turnos con rangos de fechas largos, la maduración de paltas y los
+precios por maduración se calculaban dentro de la request y ocupaban el worker de Daphne. Con
+``POST reports/jobs/`` se registra un ``ReportJob`` y la respuesta sale de inmediato con su uid.
+
+El reporte lo calcula ``manage.py process_report_jobs`` (worker aparte; pueden correr varios, cada
+job lo toma uno solo) o, con REPORT_JOBS_PROCESS_IN_THREAD, un hilo del mismo proceso al confirmar
+la transacción. Los reportes de stock, ventas y turnos ejecutan la misma vista de siempre con el
+usuario que los pidió, así que aplican sus mismos filtros y permisos.
+
+El resultado se guarda comprimido con gzip (JSON o CSV) y se descarga desde
+``reports/jobs/<uid>/descargar/``. Al terminar, quien lo pidió recibe una Notification, que llega
+por el WebSocket de notificaciones con el enlace de descarga.
+
+Una solicitud igual (mismo negocio, tipo, formato, parámetros y nivel de acceso) dentro de
+REPORT_JOBS_DEDUP_SECONDS reutiliza el job existente, salvo que haya fallado.
+
+Con réplica de lectura configurada, el reporte se calcula leyendo de ella (ver core/db_router.py).
+"""
+import contextlib
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.db_router import usar_replica
+from notifications.models import Notification
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 2
+# Un job "procesando" más antiguo que esto quedó huérfano (p. ej. el worker se reinició)
+PROCESANDO_VENCIDO = timedelta(minutes=30)
+ROLES_COMPLETO = ('Administrador', 'Supervisor')
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-jobs')
+    return _executor
+
+
+class ReporteInvalido(Exception):
+    """El reporte no se puede generar con esos parámetros o permisos (no se reintenta)."""
+
+
+# Reportes disponibles
+
+def _desde_vista(nombre_url):
+    """Genera el reporte llamando a la vista de siempre como GET del usuario que lo pidió."""
+    def generar(job):
+        if job.usuario is None:
+            raise ReporteInvalido('El usuario que pidió el reporte ya no existe.')
+        ruta = reverse(nombre_url)
+        request = APIRequestFactory().get(ruta, job.parametros)
+        force_authenticate(request, user=job.usuario)
+        response = resolve(ruta).func(request)
+        if response.status_code >= 400:
+            detalle = response.data.get('detail') if isinstance(response.data, dict) else None
+            raise ReporteInvalido(str(detalle or response.data))
+        return response.data
+    return generar
+
+
+def _maduracion(job):
+    from scripts.maduracion_report import generar_reporte_maduracion_paltas
+
+    filtros = {
+        clave: job.parametros[clave]
+        for clave in ('lote_id', 'producto_id', 'pallet_id', 'calibre', 'estado_maduracion')
+        if job.parametros.get(clave)
+    }
+    # El script imprime un resumen por consola que aquí no sirve
+    with contextlib.redirect_stdout(io.StringIO()):
+        datos = generar_reporte_maduracion_paltas(business_id=job.business_id, **filtros)
+    return datos or {'lotes': []}
+
+
+def _precios(job):
+    from scripts.maduration_pricing import generate_pricing_report
+
+    return generate_pricing_report(business_id=job.business_id)
+
+
+class Reporte(NamedTuple):
+    generar: Callable
+    # Clave de la lista que va al CSV (None: la respuesta ya es la lista)
+    filas: Optional[str]
+    solo_completo: bool = False
+
+
+REPORTES = {
+    'stock': Reporte(_desde_vista('report-stock'), 'lotes'),
+    'ventas': Reporte(_desde_vista('report-sales'), 'ventas_detalladas'),
+    'turnos': Reporte(_desde_vista('report-shifts'), 'turnos'),
+    'maduracion': Reporte(_maduracion, 'lotes', solo_completo=True),
+    'precios': Reporte(_precios, None, solo_completo=True),
+}
+
+
+# Encolado
+
+def acceso_de(user):
+    return 'completo' if user.groups.filter(name__in=ROLES_COMPLETO).exists() else 'basico'
+
+
+def _huella(tipo, formato, parametros, acceso):
+    datos = json.dumps([tipo, formato, parametros, acceso], sort_keys=True, default=str)
+    return hashlib.sha256(datos.encode()).hexdigest()
+
+
+def solicitar(business, user, tipo, parametros=None, formato='json'):
+    """
+    Registra el reporte pedido, o devuelve el job de una solicitud igual reciente.
+    Devuelve (job, reutilizado).
+    """
+    parametros = {clave: str(valor) for clave, valor in (parametros or {}).items() if valor not in (None, '')}
+    acceso = acceso_de(user)
+    if REPORTES[tipo].solo_completo and acceso != 'completo':
+        raise ReporteInvalido('Solo administradores y supervisores pueden pedir este reporte.')
+    huella = _huella(tipo, formato, parametros, acceso)
+
+    with transaction.atomic():
+        existente = (
+            ReportJob.objects.filter(
+                business=business, huella=huella,
+                created_at__gte=timezone.now() - timedelta(seconds=settings.REPORT_JOBS_DEDUP_SECONDS),
+            ).exclude(estado='error')
+            .order_by('-created_at')
+            .first()
+        )
+        if existente is not None:
+            return existente, True
+        job = ReportJob.objects.create(
+            business=business, usuario=user, tipo=tipo, parametros=parametros,
+            formato=formato, acceso=acceso, huella=huella,
+        )
+        if settings.REPORT_JOBS_PROCESS_IN_THREAD:
+            transaction.on_commit(lambda: _pool().submit(_procesar_en_hilo, job.pk))
+    return job, False
+
+
+def _procesar_en_hilo(job_id):
+    close_old_connections()
+    try:
+        procesar(job_id)
+    except Exception:
+        logger.exception(f"Error inesperado procesando el reporte {job_id}")
+    finally:
+        connection.close()
+
+
+# Procesamiento
+
+def _a_csv(datos, clave):
+    filas = datos if clave is None else (datos or {}).get(clave) or []
+    columnas = list(dict.fromkeys(columna for fila in filas for columna in fila))
+    salida = io.StringIO()
+    writer = csv.DictWriter(salida, fieldnames=columnas)
+    writer.writeheader()
+    for fila in filas:
+        writer.writerow({
+            columna: json.dumps(valor, cls=JSONEncoder, ensure_ascii=False) if isinstance(valor, (dict, list)) else valor
+            for columna, valor in fila.items()
+        })
+    return salida.getvalue().encode('utf-8')
+
+
+def _serializar(job, datos):
+    if job.formato == 'csv':
+        return _a_csv(datos, REPORTES[job.tipo].filas)
+    return JSONRenderer().render(datos)
+
+
+def _reclamar(job_id):
+    """Marca el job como en proceso; False si otro worker ya lo tomó o no está pendiente."""
+    ahora = timezone.now()
+    return ReportJob.objects.filter(pk=job_id, estado='pendiente').update(
+        estado='procesando', intentos=F('intentos') + 1, iniciado_at=ahora, updated_at=ahora,
+    ) == 1
+
+
+def procesar(job_id):
+    """Calcula el reporte de un job pendiente y guarda el resultado. Devuelve el job."""
+    if not _reclamar(job_id):
+        return None
+    job = ReportJob.objects.select_related('usuario', 'business').get(pk=job_id)
+    try:
+        with usar_replica(job.usuario):
+            datos = REPORTES[job.tipo].generar(job)
+        contenido = gzip.compress(_serializar(job, datos), mtime=0)
+    except Exception as e:
+        definitivo = isinstance(e, ReporteInvalido) or job.intentos >= MAX_INTENTOS
+        job.estado = 'error' if definitivo else 'pendiente'
+        job.error = str(e)
+        job.terminado_at = timezone.now() if definitivo else None
+        job.save(update_fields=['estado', 'error', 'terminado_at', 'updated_at'])
+        if not isinstance(e, ReporteInvalido):
+            logger.exception(f"Error generando el reporte {job.pk} ({job})")
+        if definitivo:
+            _notificar(job)
+        return job
+
+    job.estado = 'completado'
+    job.error = ''
+    job.contenido = contenido
+    job.tamano = len(contenido)
+    job.terminado_at = timezone.now()
+    job.save(update_fields=['estado', 'error', 'contenido', 'tamano', 'terminado_at', 'updated_at'])
+    _notificar(job)
+    return job
+
+
+def _notificar(job):
+    if job.usuario is None:
+        return
+    nombre = job.get_tipo_display()
+    if job.estado == 'completado':
+        titulo = f"Reporte listo: {nombre}"
+        mensaje = f"El reporte de {nombre.lower()} ({job.formato.upper()}) está listo para descargar."
+    else:
+        titulo = f"No se pudo generar el reporte: {nombre}"
+        mensaje = job.error[:200]
+    # El post_save de Notification la envía por WebSocket
+    Notification.objects.create(
+        usuario=job.usuario, titulo=titulo, mensaje=mensaje, tipo='sistema',
+        enlace=reverse('report-job-download', kwargs={'uid': job.uid}) if job.estado == 'completado' else None,
+        objeto_relacionado_tipo='report_job', objeto_relacionado_id=str(job.uid),
+    )
+
+
+def procesar_pendientes(limite=20):
+    """Procesa hasta `limite` jobs pendientes (los huérfanos en proceso vuelven a pendientes)."""
+    ReportJob.objects.filter(
+        estado='procesando', updated_at__lt=timezone.now() - PROCESANDO_VENCIDO,
+    ).update(estado='pendiente')
+    ids = list(ReportJob.objects.filter(estado='pendiente').order_by('created_at').values_list('pk', flat=True)[:limite])
+    return [job for job in map(procesar, ids) if job is not None]
+
+
+def purgar(dias=None):
+    """Borra los jobs terminados hace más de `dias` (REPORT_JOBS_RETENTION_DAYS). Devuelve cuántos."""
+    dias = settings.REPORT_JOBS_RETENTION_DAYS if dias is None else dias
+    borrados, _ = ReportJob.objects.filter(
+        estado__in=('completado', 'error'), created_at__lt=timezone.now() - timedelta(days=dias),
+    ).delete()
+    return borrados
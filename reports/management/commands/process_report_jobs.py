@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula los reportes pedidos en segundo plano (reports/jobs.py) y guarda el resultado "
+        "comprimido. Sin --loop procesa lo pendiente y termina; con --loop queda como worker (pueden "
+        "correr varios a la vez). Reintenta una vez los que fallaron por un error inesperado y los "
+        "que quedaron a medias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Seguir esperando jobs nuevos')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Segundos de espera entre rondas con --loop')
+        parser.add_argument('--limit', type=int, default=20, help='Jobs por ronda')
+        parser.add_argument('--status', action='store_true', help='Solo mostrar cuántos jobs hay por estado')
+        parser.add_argument('--purge', action='store_true', help='Borrar los jobs terminados más antiguos que REPORT_JOBS_RETENTION_DAYS y salir')
+
+    def handle(self, *args, **options):
+        from reports.jobs import procesar_pendientes, purgar
+        from reports.models import ReportJob
+
+        if options['status']:
+            for fila in ReportJob.objects.order_by().values('estado').annotate(n=Count('id')).order_by('estado'):
+                self.stdout.write(f"{fila['estado']:<12} {fila['n']}")
+            return
+
+        if options['purge']:
+            self.stdout.write(self.style.SUCCESS(f"{purgar()} jobs borrados"))
+            return
+
+        while True:
+            jobs = procesar_pendientes(options['limit'])
+            for job in jobs:
+                linea = f"[{job.estado}] {job}"
+                if job.estado == 'completado':
+                    segundos = (job.terminado_at - job.iniciado_at).total_seconds()
+                    self.stdout.write(self.style.SUCCESS(f"{linea} {job.tamano} bytes en {segundos:.1f} s"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"{linea}: {job.error}"))
+            if not options['loop']:
+                break
+            if not jobs:
+                time.sleep(options['sleep'])
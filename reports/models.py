@@ -1 +1,58 @@
-# Este archivo puede quedar vacío inicialmente, los reportes serán generados por lógica en views/serializers
+import uuid
+
+from django.db import models
+
+from core.models import BaseModel
+
+
+class ReportJob(BaseModel):
+    """
+    Reporte pedido en segundo plano (ver reports/jobs.py). El resultado queda comprimido con gzip
+    en `contenido` (JSON o CSV) y se descarga por su uid; no pasa por el storage de media, que
+    puede ser público.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    TIPO_CHOICES = [
+        ('stock', 'Stock'),
+        ('ventas', 'Ventas'),
+        ('turnos', 'Turnos'),
+        ('maduracion', 'Maduración de paltas'),
+        ('precios', 'Precios por maduración'),
+    ]
+    ACCESO_CHOICES = [
+        ('completo', 'Administrador/Supervisor'),
+        ('basico', 'Básico'),
+    ]
+    FORMATO_CHOICES = [
+        ('json', 'JSON'),
+        ('csv', 'CSV'),
+    ]
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    business = models.ForeignKey('business.Business', on_delete=models.CASCADE, related_name='report_jobs')
+    usuario = models.ForeignKey('accounts.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict, blank=True)
+    formato = models.CharField(max_length=4, choices=FORMATO_CHOICES, default='json')
+    acceso = models.CharField(max_length=10, choices=ACCESO_CHOICES, default='basico', help_text="Con qué permisos se calculó; los de acceso completo solo los ven administradores y supervisores")
+    huella = models.CharField(max_length=64, help_text="Hash de tipo, formato, parámetros y nivel de acceso; solicitudes iguales reutilizan el job")
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    contenido = models.BinaryField(null=True, blank=True, editable=False)
+    tamano = models.PositiveIntegerField(default=0, help_text="Bytes comprimidos")
+    iniciado_at = models.DateTimeField(null=True, blank=True)
+    terminado_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.uid} ({self.estado})"
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['estado', 'created_at'], name='reportjob_estado_idx'),
+            models.Index(fields=['business', 'huella', 'created_at'], name='reportjob_huella_idx'),
+        ]
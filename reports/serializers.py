@@ -1,5 +1,8 @@
+from django.urls import reverse
 from rest_framework import serializers
 
+from .models import ReportJob
+
 class BaseProductReportSerializer(serializers.Serializer):
     """Serializador base para reportes de productos"""
     id = serializers.IntegerField()
@@ -58,3 +61,23 @@ class StockReportResponseSerializer(serializers.Serializer):
     resumen_paltas_por_calibre = serializers.ListField(child=serializers.DictField(), required=False)
     totales_paltas = serializers.DictField(required=False)
     totales_otros = serializers.DictField(required=False)
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Estado de un reporte en segundo plano (sin el contenido)"""
+    descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'uid', 'tipo', 'formato', 'parametros', 'estado', 'error', 'tamano',
+            'created_at', 'iniciado_at', 'terminado_at', 'descarga',
+        ]
+        read_only_fields = fields
+
+    def get_descarga(self, obj):
+        if obj.estado != 'completado':
+            return None
+        url = reverse('report-job-download', kwargs={'uid': obj.uid})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
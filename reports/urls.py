@@ -1,13 +1,19 @@
 from django.urls import path
 from . import views
+from .accuracy_views import LotAccuracyReportView
 from .dashboard_views import DashboardSummaryView
 from .debug_views import DebugUserBusinessView
+from .job_views import ReportJobDetailView, ReportJobDownloadView, ReportJobListCreateView
 
 urlpatterns = [
     # path('summary/', views.ReportSummaryView.as_view(), name='report-summary'),
     path('stock/', views.StockReportView.as_view(), name='report-stock'),
     path('sales/', views.SalesReportView.as_view(), name='report-sales'),
     path('shifts/', views.ShiftReportView.as_view(), name='report-shifts'),
+    path('lot-accuracy/', LotAccuracyReportView.as_view(), name='report-lot-accuracy'),
     path('summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('jobs/', ReportJobListCreateView.as_view(), name='report-jobs'),
+    path('jobs/<uuid:uid>/', ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('jobs/<uuid:uid>/descargar/', ReportJobDownloadView.as_view(), name='report-job-download'),
     path('debug/', DebugUserBusinessView.as_view(), name='report-debug'),
 ]
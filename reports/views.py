@@ -2,6 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from core.permissions import IsSameBusiness
+from bisect import bisect_left, bisect_right
 from datetime import timedelta, time, datetime
 import datetime as dt
 from django.utils import timezone
@@ -13,6 +14,7 @@ from accounts.models import Perfil
 # Importaciones de modelos
 from sales.models import Sale, SaleItem, SalePendingItem
 from inventory.models import FruitLot, StockReservation, Product
+from inventory.product_categories import CATEGORIAS, categoria_de
 from shifts.models import Shift, ShiftExpense
 
 # Importaciones de utilidades
@@ -326,8 +328,8 @@ class StockReportView(APIView):
 
         # Procesar el parámetro tipo_producto para permitir búsqueda por nombre específico
         if tipo_producto:
-            # Si es uno de los tipos especiales, se aplicará el filtro correspondiente
-            if tipo_producto not in ['paltas', 'otros']:
+            # Si es uno de los tipos especiales o una categoría, se aplicará el filtro correspondiente
+            if tipo_producto not in ['paltas', 'otros'] and tipo_producto not in CATEGORIAS:
                 # Si no es un tipo especial, lo tratamos como nombre de producto
                 nombre_producto = tipo_producto
                 # Limpiamos tipo_producto para evitar conflictos en los filtros
@@ -336,7 +338,7 @@ class StockReportView(APIView):
         # Base del queryset - todos los lotes del negocio
         queryset = FruitLot.objects.filter(
             business=business
-        ).select_related('producto', 'box_type', 'pallet_type')
+        ).select_related('producto', 'box_type', 'pallet_type', 'proveedor', 'propietario_original')
         
         # Verificar si hay un filtro específico por estado_lote
         estado_lote = request.query_params.get('estado_lote', None)
@@ -350,7 +352,9 @@ class StockReportView(APIView):
         
         # Excluir lotes que tienen ventas pendientes asociadas
         from sales.models import SalePending
-        lotes_con_ventas_pendientes = SalePending.objects.filter(estado='pendiente').values_list('lote', flat=True)
+        lotes_con_ventas_pendientes = SalePending.objects.filter(
+            business=business, estado='pendiente', items__lote__isnull=False
+        ).values_list('items__lote', flat=True)
         queryset = queryset.exclude(id__in=lotes_con_ventas_pendientes)
         
         # Aplicar filtros
@@ -369,6 +373,8 @@ class StockReportView(APIView):
             queryset = queryset.filter(producto__tipo_producto='palta')
         elif tipo_producto == 'otros':
             queryset = queryset.filter(producto__tipo_producto='otro')
+        elif tipo_producto:
+            queryset = queryset.filter(producto__categoria=tipo_producto)
         
         # Filtrar por nombre específico de producto (ya aplicado arriba, eliminamos duplicación)
 
@@ -381,28 +387,46 @@ class StockReportView(APIView):
         
         # Crear un diccionario para acceso rápido
         reservas_dict = {item['lote']: item.get('total_reservado', 0) for item in reservas}
+
+        # Reservas activas y ventas de todos los lotes en dos consultas: FruitLotSerializer
+        # las toma de lote._active_reservations_sum / lote._sales_sum en lugar de consultar por lote
+        lotes = list(queryset)
+        ids = [lote.id for lote in lotes]
+        reservas_activas = {
+            fila.pop('lote'): fila
+            for fila in StockReservation.objects.filter(lote_id__in=ids, estado='en_proceso')
+            .order_by().values('lote').annotate(
+                total_cajas=Sum('cajas_reservadas'),
+                total_kg=Sum('kg_reservados'),
+                total_unidades=Sum('unidades_reservadas'),
+            )
+        }
+        ventas_por_lote = {
+            fila.pop('lote'): fila
+            for fila in SaleItem.objects.filter(lote_id__in=ids).order_by().values('lote').annotate(
+                total_peso=Sum('peso_vendido'),
+                total_subtotal=Sum('subtotal'),
+            )
+        }
+        sin_reservas = {'total_cajas': None, 'total_kg': None, 'total_unidades': None}
+        sin_ventas = {'total_peso': None, 'total_subtotal': None}
+        for lote in lotes:
+            lote._active_reservations_sum = reservas_activas.get(lote.id, sin_reservas)
+            lote._sales_sum = ventas_por_lote.get(lote.id, sin_ventas)
         
         # Procesar resultados
         resultados = []
-        for lote in queryset:
+        for lote in lotes:
             # Calcular peso disponible (peso neto - reservado)
             reservado = float(reservas_dict.get(lote.id, 0) or 0)
             disponible = float(lote.peso_neto) - reservado if lote.peso_neto else 0
             
-            # Detectar tipo de producto
-            nombre_producto = lote.producto.nombre.lower()
-            es_palta = 'palta' in nombre_producto or 'aguacate' in nombre_producto
-            es_mango = 'mango' in nombre_producto
-            es_platano = 'platano' in nombre_producto or 'plátano' in nombre_producto or 'banano' in nombre_producto
-            
-            # Determinar tipo de producto para mostrar información específica
-            tipo_producto = 'otro'
-            if es_palta:
-                tipo_producto = 'palta'
-            elif es_mango:
-                tipo_producto = 'mango'
-            elif es_platano:
-                tipo_producto = 'platano'
+            # Categoría del producto (columna de Product) para mostrar información específica
+            categoria = categoria_de(lote.producto)
+            tipo_lote = categoria.clave
+            es_palta = tipo_lote == 'palta'
+            es_mango = tipo_lote == 'mango'
+            es_platano = tipo_lote == 'platano'
             
             # Calcular días desde ingreso
             dias_desde_ingreso = (timezone.now().date() - lote.fecha_ingreso).days if lote.fecha_ingreso else 0
@@ -421,20 +445,6 @@ class StockReportView(APIView):
             reservado = float(reservas_dict.get(lote.id, 0) or 0)
             disponible = float(lote_data.get('peso_neto', 0) or 0) - reservado if lote_data.get('peso_neto') else 0
 
-            # Detectar tipo de producto
-            nombre_producto = lote_data.get('producto_nombre', '').lower()
-            es_palta = 'palta' in nombre_producto or 'aguacate' in nombre_producto
-            es_mango = 'mango' in nombre_producto
-            es_platano = 'platano' in nombre_producto or 'plátano' in nombre_producto or 'banano' in nombre_producto
-
-            tipo_producto = 'otro'
-            if es_palta:
-                tipo_producto = 'palta'
-            elif es_mango:
-                tipo_producto = 'mango'
-            elif es_platano:
-                tipo_producto = 'platano'
-
             # Asegura que fecha_ingreso sea date para evitar errores de tipo
             fecha_ingreso = lote_data.get('fecha_ingreso')
             if fecha_ingreso:
@@ -454,18 +464,20 @@ class StockReportView(APIView):
             else:
                 dias_desde_ingreso = 0
 
-            # Calcular valor total según tipo de producto
-            if es_mango or es_platano:
+            # Calcular valor total según la unidad de venta de la categoría
+            if categoria.unidad_venta == 'caja':
                 valor_total = float(lote_data.get('costo_actualizado', 0) or 0) * float(lote_data.get('cantidad_cajas', 0) or 0)
             else:
                 valor_total = float(lote_data.get('peso_neto', 0) or 0) * float(lote_data.get('costo_actualizado', 0) or 0)
 
             # Actualiza/agrega los campos calculados y manuales
             lote_data.update({
+                'producto_id': lote.producto_id,
                 'peso_reservado': reservado,
                 'peso_disponible': disponible,
                 'valor_total': valor_total,
-                'tipo_producto': tipo_producto,
+                'tipo_producto': tipo_lote,
+                'categoria': tipo_lote,
                 'es_palta': es_palta,
                 'es_mango': es_mango,
                 'es_platano': es_platano,
@@ -476,7 +488,7 @@ class StockReportView(APIView):
 
             
             # Agregar información específica según el tipo de producto
-            if tipo_producto == 'palta':
+            if tipo_lote == 'palta':
                 # Verificar el estado inicial registrado en la base de datos
                 estado_inicial = lote.estado_maduracion if hasattr(lote, 'estado_maduracion') else 'verde'
                 
@@ -637,7 +649,7 @@ class StockReportView(APIView):
                     }
             
             # Información específica para mangos
-            elif tipo_producto == 'mango' and es_admin_o_supervisor:
+            elif tipo_lote == 'mango' and es_admin_o_supervisor:
                 try:
                     # Para mangos, el calibre es la cantidad de mangos por caja
                     calibre_num = int(lote.calibre) if lote.calibre and lote.calibre.isdigit() else 0
@@ -684,7 +696,7 @@ class StockReportView(APIView):
                     lote_data['resumen_producto'] = f"Calibre {lote.calibre} | Información no disponible"
             
             # Información específica para plátanos
-            elif tipo_producto == 'platano' and es_admin_o_supervisor:
+            elif tipo_lote == 'platano' and es_admin_o_supervisor:
                 try:
                     # El costo por caja es el costo_actualizado (ya viene por caja)
                     costo_por_caja = float(lote.costo_actualizado() or 0)
@@ -937,7 +949,7 @@ class StockReportView(APIView):
             if lote.get('precio_recomendado_kg', 0) == 0:
                 # Si no se calculó precio recomendado, usar un margen mínimo del 25%
                 costo_kg = lote.get('costo_real_kg', 0)
-                if costo_kg == 0 and lote.get('costo_actual', 0) > 0 and lote.get('peso_neto', 0) > 0:
+                if costo_kg == 0 and float(lote.get('costo_actual') or 0) > 0 and float(lote.get('peso_neto') or 0) > 0:
                     costo_kg = float(lote.get('costo_actual', 0)) / float(lote.get('peso_neto', 0))
                 lote['precio_recomendado_kg'] = round(costo_kg * 1.25, 2)  # Margen mínimo del 25%
                 
@@ -1039,9 +1051,9 @@ class StockReportView(APIView):
             
             if producto_especifico:
                 # Determinar el tipo de producto (palta, mango, plátano u otro)
-                es_palta = producto_especifico.get('es_palta', False)
-                es_mango = 'mango' in producto_especifico.get('producto_nombre', '').lower()
-                es_platano = 'platano' in producto_especifico.get('producto_nombre', '').lower() or 'plátano' in producto_especifico.get('producto_nombre', '').lower()
+                es_palta = producto_especifico.get('tipo_producto') == 'palta'
+                es_mango = producto_especifico.get('tipo_producto') == 'mango'
+                es_platano = producto_especifico.get('tipo_producto') == 'platano'
                 
                 # Filtrar lotes solo de este producto
                 if producto_id:
@@ -1250,80 +1262,87 @@ class SalesReportView(APIView):
         
         # Usar modelos y funciones importadas en la cabecera
         
-        # Queryset base - todas las ventas del negocio en el período
-        queryset = Sale.objects.filter(
-            business=perfil.business,
-            created_at__range=[start_date, end_date]
-        ).select_related('vendedor', 'cliente', 'lote__producto')
+        # Ítems de las ventas no canceladas del negocio en el período: una venta tiene varios ítems,
+        # cada uno de un lote o de un bin, y de ahí salen el producto, el calibre y los kilos
+        items = SaleItem.objects.filter(
+            venta__business=perfil.business,
+            venta__cancelada=False,
+            venta__created_at__range=[start_date, end_date],
+        )
         
         # Aplicar filtros adicionales
         if vendedor_id:
-            queryset = queryset.filter(vendedor_id=vendedor_id)
+            items = items.filter(venta__vendedor_id=vendedor_id)
         
         if cliente_id:
-            queryset = queryset.filter(cliente_id=cliente_id)
+            items = items.filter(venta__cliente_id=cliente_id)
             
         if producto_id:
-            queryset = queryset.filter(lote__producto_id=producto_id)
-        
-        # Preparar resultados
+            items = items.filter(Q(lote__producto_id=producto_id) | Q(bin__producto_id=producto_id))
+        
+        filas = items.annotate(
+            producto_item=Coalesce('lote__producto_id', 'bin__producto_id'),
+            producto_item_nombre=Coalesce('lote__producto__nombre', 'bin__producto__nombre'),
+        ).values(
+            'venta_id', 'venta__codigo_venta', 'venta__created_at', 'venta__vendedor_id',
+            'venta__vendedor__first_name', 'venta__vendedor__last_name', 'venta__vendedor__email',
+            'venta__cliente_id', 'venta__cliente__nombre', 'producto_item', 'producto_item_nombre',
+            'lote__calibre', 'peso_vendido', 'unidades_vendidas', 'precio_kg', 'precio_unidad', 'subtotal',
+        ).order_by('venta__created_at', 'venta_id', 'id')
+        
+        # Una fila por ítem vendido; 'total' es el subtotal del ítem
         ventas_detalladas = []
-        for venta in queryset:
+        for fila in filas:
+            vendedor_nombre = f"{fila['venta__vendedor__first_name'] or ''} {fila['venta__vendedor__last_name'] or ''}".strip()
             ventas_detalladas.append({
-                'id': venta.id,
-                'fecha': venta.created_at,
-                'vendedor_id': venta.vendedor_id,
-                'vendedor_nombre': f"{venta.vendedor.first_name} {venta.vendedor.last_name}".strip() or venta.vendedor.username,
-                'cliente_id': venta.cliente_id,
-                'cliente_nombre': venta.cliente.nombre if venta.cliente else "Cliente ocasional",
-                'producto_id': venta.lote.producto_id if venta.lote else None,
-                'producto_nombre': venta.lote.producto.nombre if venta.lote and venta.lote.producto else "Desconocido",
-                'calibre': venta.lote.calibre if venta.lote else None,
-                'cantidad_kg': venta.peso_vendido,
-                'precio_por_kg': venta.precio_kg,
-                'total': venta.total
+                'id': fila['venta_id'],
+                'codigo_venta': fila['venta__codigo_venta'],
+                'fecha': fila['venta__created_at'],
+                'vendedor_id': fila['venta__vendedor_id'],
+                'vendedor_nombre': vendedor_nombre or fila['venta__vendedor__email'],
+                'cliente_id': fila['venta__cliente_id'],
+                'cliente_nombre': fila['venta__cliente__nombre'] or "Cliente ocasional",
+                'producto_id': fila['producto_item'],
+                'producto_nombre': fila['producto_item_nombre'] or "Desconocido",
+                'calibre': fila['lote__calibre'],
+                'cantidad_kg': fila['peso_vendido'],
+                'unidades': fila['unidades_vendidas'],
+                'precio_por_kg': fila['precio_kg'],
+                'precio_unidad': fila['precio_unidad'],
+                'total': fila['subtotal'],
             })
         
-        # Agregados por día
-        ventas_por_dia = queryset.annotate(
-            fecha_dia=TruncDate('created_at')
-        ).values('fecha_dia').annotate(
-            total_ventas=Count('id'),
-            total_kg=Sum('items__peso_vendido'),
-            total_ingresos=Sum('items__peso_vendido' * 'items__precio_kg', output_field=DecimalField())
-        ).order_by('fecha_dia')
-        
-        # Agregados por vendedor
-        ventas_por_vendedor = queryset.values(
-            'vendedor_id',
-            vendedor_nombre=F('vendedor__first_name')
-        ).annotate(
-            total_ventas=Count('id'),
-            total_kg=Sum('items__peso_vendido'),
-            total_ingresos=Sum('items__peso_vendido' * 'items__precio_kg', output_field=DecimalField())
-        ).order_by('-total_ingresos')
-        
-        # Modificar para agregar nombre completo
-        for item in ventas_por_vendedor:
-            vendedor = queryset.filter(vendedor_id=item['vendedor_id']).first().vendedor
-            item['vendedor_nombre'] = f"{vendedor.first_name} {vendedor.last_name}".strip() or vendedor.username
-        
-        # Agregados por producto
-        ventas_por_producto = queryset.values(
-            'lote__producto_id',
-            producto_nombre=F('lote__producto__nombre')
-        ).annotate(
-            total_ventas=Count('id'),
-            total_kg=Sum('items__peso_vendido'),
-            total_ingresos=Sum('items__peso_vendido' * 'items__precio_kg', output_field=DecimalField())
-        ).order_by('-total_kg')
+        # Agregados por día, vendedor y producto en una pasada sobre los ítems
+        def agregar(grupos, clave, datos, venta):
+            grupo = grupos.setdefault(clave, {**datos, 'ventas': set(), 'total_kg': 0, 'total_ingresos': 0})
+            grupo['ventas'].add(venta['id'])
+            grupo['total_kg'] += venta['cantidad_kg'] or 0
+            grupo['total_ingresos'] += venta['total'] or 0
+        
+        por_dia, por_vendedor, por_producto = {}, {}, {}
+        for venta in ventas_detalladas:
+            fecha_dia = timezone.localtime(venta['fecha']).date()
+            agregar(por_dia, fecha_dia, {'fecha_dia': fecha_dia}, venta)
+            agregar(por_vendedor, venta['vendedor_id'],
+                    {'vendedor_id': venta['vendedor_id'], 'vendedor_nombre': venta['vendedor_nombre']}, venta)
+            agregar(por_producto, venta['producto_id'],
+                    {'lote__producto_id': venta['producto_id'], 'producto_nombre': venta['producto_nombre']}, venta)
+        
+        def lista(grupos, orden):
+            resultado = []
+            for grupo in grupos.values():
+                grupo['total_ventas'] = len(grupo.pop('ventas'))
+                resultado.append(grupo)
+            return sorted(resultado, key=orden)
+        
+        ventas_por_dia = lista(por_dia, lambda g: g['fecha_dia'])
+        ventas_por_vendedor = lista(por_vendedor, lambda g: -g['total_ingresos'])
+        ventas_por_producto = lista(por_producto, lambda g: -g['total_kg'])
         
         # Calcular totales
-        total_ventas = queryset.count()
-        total_kg = queryset.aggregate(total=Sum('peso_vendido'))['total'] or 0
-        total_ingresos = queryset.aggregate(
-            total=Sum('total', output_field=DecimalField())
-        )['total'] or 0
+        total_ventas = len({venta['id'] for venta in ventas_detalladas})
+        total_kg = sum((venta['cantidad_kg'] or 0 for venta in ventas_detalladas), 0)
+        total_ingresos = sum((venta['total'] or 0 for venta in ventas_detalladas), 0)
         
         return Response({
             'periodo': {
@@ -1335,9 +1354,9 @@ class SalesReportView(APIView):
                 'total_kg': total_kg,
                 'total_ingresos': total_ingresos
             },
-            'ventas_por_dia': list(ventas_por_dia),
-            'ventas_por_vendedor': list(ventas_por_vendedor),
-            'ventas_por_producto': list(ventas_por_producto),
+            'ventas_por_dia': ventas_por_dia,
+            'ventas_por_vendedor': ventas_por_vendedor,
+            'ventas_por_producto': ventas_por_producto,
             'ventas_detalladas': ventas_detalladas
         })
         
@@ -1385,46 +1404,45 @@ class ShiftReportView(APIView):
         if estado:
             queryset = queryset.filter(estado=estado)
         
+        turnos = list(queryset)
+        ahora = timezone.now()
+        
+        # Ventas no canceladas del negocio entre la primera apertura y el último cierre, en una consulta;
+        # cada turno suma las que caen en su rango (hasta ahora si sigue abierto) con sumas acumuladas
+        fechas, acumulado_kg, acumulado_ingresos = [], [0], [0]
+        if turnos:
+            desde = min(turno.fecha_apertura for turno in turnos)
+            hasta = max(turno.fecha_cierre or ahora for turno in turnos)
+            ventas = Sale.objects.filter(
+                business=perfil.business, cancelada=False, created_at__range=[desde, hasta]
+            ).values('id', 'created_at', 'total').annotate(kg=Sum('items__peso_vendido')).order_by('created_at')
+            for venta in ventas:
+                fechas.append(venta['created_at'])
+                acumulado_kg.append(acumulado_kg[-1] + (venta['kg'] or 0))
+                acumulado_ingresos.append(acumulado_ingresos[-1] + (venta['total'] or 0))
+        
         # Procesar resultados
         turnos_data = []
-        for turno in queryset:
-            # Obtener ventas realizadas durante este turno
-            ventas_condicion = Q(
-                business=perfil.business,
-                created_at__range=[turno.fecha_apertura, turno.fecha_cierre or datetime.now()]
-            )
-            
-            # Si es turno cerrado, calcular hasta fecha de cierre
-            if turno.estado == "cerrado" and turno.fecha_cierre:
-                ventas_condicion = Q(
-                    business=perfil.business,
-                    created_at__range=[turno.fecha_apertura, turno.fecha_cierre]
-                )
-            
-            # Si el turno está abierto, calcular hasta ahora
-            ventas = Sale.objects.filter(ventas_condicion)
+        for turno in turnos:
+            fin_turno = turno.fecha_cierre or ahora
+            primera = bisect_left(fechas, turno.fecha_apertura)
+            ultima = bisect_right(fechas, fin_turno)
             
             # Calcular totales de ventas
-            total_ventas = ventas.count()
-            total_kg = ventas.aggregate(total=Sum('items__peso_vendido'))['total'] or 0
-            total_ingresos = ventas.aggregate(
-                total=Sum('items__peso_vendido' * 'items__precio_kg', output_field=DecimalField())
-            )['total'] or 0
+            total_ventas = max(0, ultima - primera)
+            total_kg = acumulado_kg[ultima] - acumulado_kg[primera] if total_ventas else 0
+            total_ingresos = acumulado_ingresos[ultima] - acumulado_ingresos[primera] if total_ventas else 0
+            
+            # Calcular duración en minutos (si sigue abierto, hasta ahora)
+            duracion_minutos = int((fin_turno - turno.fecha_apertura).total_seconds() / 60) if turno.fecha_apertura else 0
             
-            # Calcular duración en minutos
-            duracion_minutos = 0
-            if turno.fecha_apertura and turno.fecha_cierre:
-                delta = turno.fecha_cierre - turno.fecha_apertura
-                duracion_minutos = int(delta.total_seconds() / 60)
-            elif turno.fecha_apertura:
-                delta = datetime.now() - turno.fecha_apertura.replace(tzinfo=None)
-                duracion_minutos = int(delta.total_seconds() / 60)
+            usuario_abre_nombre = f"{turno.usuario_abre.first_name} {turno.usuario_abre.last_name}".strip()
             
             # Crear objeto de turno con datos de ventas
             turnos_data.append({
                 'id': turno.id,
                 'usuario_abre_id': turno.usuario_abre_id,
-                'usuario_abre_nombre': f"{turno.usuario_abre.first_name} {turno.usuario_abre.last_name}".strip() or turno.usuario_abre.username,
+                'usuario_abre_nombre': usuario_abre_nombre or turno.usuario_abre.email,
                 'usuario_cierra_id': turno.usuario_cierra_id,
                 'usuario_cierra_nombre': f"{turno.usuario_cierra.first_name} {turno.usuario_cierra.last_name}".strip() if turno.usuario_cierra else None,
                 'fecha_apertura': turno.fecha_apertura,
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Sale, SalePending, Customer, CustomerPayment
 from .models_billing import BillingInfo
+from .models_ledger import CustomerLedgerEntry, PaymentAllocation
 
 # Configuración avanzada para modelos de ventas
 class SaleAdmin(admin.ModelAdmin):
@@ -124,12 +125,25 @@ class CustomerAdmin(admin.ModelAdmin):
     desmarcar_como_frecuente.short_description = 'Desmarcar como clientes frecuentes'
 
 admin.site.register(Customer, CustomerAdmin)
+
+class PaymentAllocationInline(admin.TabularInline):
+    """Ventas a las que se aplicó el pago (solo lectura: las escribe sales/payments.py)"""
+    model = PaymentAllocation
+    extra = 0
+    can_delete = False
+    fields = ('venta', 'monto', 'created_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 class CustomerPaymentAdmin(admin.ModelAdmin):
     list_display = ('id', 'cliente', 'monto', 'fecha_pago', 'metodo_pago', 'get_business')
     list_filter = ('metodo_pago', 'fecha_pago', 'cliente__business')
     search_fields = ('cliente__nombre', 'cliente__rut', 'id', 'notas')
     date_hierarchy = 'fecha_pago'
     raw_id_fields = ('cliente',)
+    inlines = [PaymentAllocationInline]
     
     fieldsets = (
         ('Información General', {
@@ -208,3 +222,22 @@ class BillingInfoAdmin(admin.ModelAdmin):
     copiar_datos_cliente.short_description = 'Copiar datos desde cliente'
 
 admin.site.register(BillingInfo, BillingInfoAdmin)
+
+
+# Cuenta corriente de clientes: solo lectura, los movimientos los registra sales/ledger.py
+class CustomerLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('cliente', 'tipo', 'monto', 'saldo', 'venta', 'pago', 'created_at')
+    list_filter = ('tipo', 'business')
+    search_fields = ('cliente__nombre', 'cliente__rut', 'descripcion')
+    raw_id_fields = ('cliente', 'venta', 'pago')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+admin.site.register(CustomerLedgerEntry, CustomerLedgerEntryAdmin)
@@ -0,0 +1,108 @@
+"""
+Cuenta corriente de clientes.
+
+Cada venta a crédito genera un cargo y cada pago un abono en CustomerLedgerEntry. El saldo vigente
+se guarda en Customer.saldo_credito y se actualiza en la misma transacción que el movimiento, con
+el cliente bloqueado (select_for_update) para que dos movimientos simultáneos no se pisen.
+
+Las funciones `sincronizar_*` son idempotentes: comparan lo registrado en el libro para la venta
+o el pago con lo que corresponde según su estado actual y solo agregan la diferencia.
+Para verificar el libro contra las ventas y pagos: `manage.py reconcile_customer_ledger`.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import Customer, CustomerLedgerEntry
+
+# Campos de Sale que afectan el cargo; un save(update_fields=...) sin ninguno de ellos no lo cambia
+CAMPOS_CARGO_VENTA = {'cliente', 'metodo_pago', 'total', 'cancelada'}
+
+
+def registrar_movimiento(cliente_id, tipo, monto, venta=None, pago=None, descripcion='', pagado=Decimal('0')):
+    """Agrega un movimiento y actualiza el saldo del cliente de forma atómica."""
+    monto = Decimal(monto)
+    with transaction.atomic():
+        saldo, business_id = (
+            Customer.objects.select_for_update()
+            .filter(pk=cliente_id)
+            .values_list('saldo_credito', 'business_id')
+            .get()
+        )
+        nuevo_saldo = saldo + monto
+        Customer.objects.filter(pk=cliente_id).update(
+            saldo_credito=nuevo_saldo, monto_pagado=F('monto_pagado') + pagado
+        )
+        return CustomerLedgerEntry.objects.create(
+            cliente_id=cliente_id, business_id=business_id, tipo=tipo, monto=monto, saldo=nuevo_saldo,
+            venta=venta, pago=pago, descripcion=descripcion[:200],
+        )
+
+
+def _registrados(**filtro):
+    return dict(
+        CustomerLedgerEntry.objects.filter(**filtro)
+        .values('cliente')
+        .annotate(total=Sum('monto'))
+        .values_list('cliente', 'total')
+    )
+
+
+def _refrescar_cliente(obj, movimiento):
+    """Actualiza el saldo del cliente ya cargado en memoria (si lo está) para no leer un valor viejo."""
+    field = obj.__class__._meta.get_field('cliente')
+    if field.is_cached(obj) and obj.cliente is not None and obj.cliente.pk == movimiento.cliente_id:
+        obj.cliente.saldo_credito = movimiento.saldo
+
+
+def sincronizar_venta(venta, eliminada=False):
+    """Ajusta el cargo de una venta a crédito en la cuenta del cliente según su estado actual."""
+    esperado = {}
+    if not eliminada and venta.cliente_id and venta.metodo_pago == 'credito' and not venta.cancelada:
+        esperado[venta.cliente_id] = venta.total or Decimal('0')
+
+    with transaction.atomic():
+        registrado = _registrados(venta=venta)
+        for cliente_id in set(esperado) | set(registrado):
+            diferencia = esperado.get(cliente_id, Decimal('0')) - (registrado.get(cliente_id) or Decimal('0'))
+            if not diferencia:
+                continue
+            if cliente_id not in registrado:
+                tipo, descripcion = 'cargo', f"Venta {venta.codigo_venta}"
+            elif eliminada:
+                tipo, descripcion = 'ajuste', f"Venta {venta.codigo_venta} eliminada"
+            elif venta.cancelada:
+                tipo, descripcion = 'ajuste', f"Venta {venta.codigo_venta} cancelada"
+            else:
+                tipo, descripcion = 'ajuste', f"Venta {venta.codigo_venta} modificada"
+            # Al eliminar, el movimiento no puede apuntar a la venta que se está borrando
+            movimiento = registrar_movimiento(
+                cliente_id, tipo, diferencia, venta=None if eliminada else venta, descripcion=descripcion
+            )
+            _refrescar_cliente(venta, movimiento)
+
+
+def sincronizar_pago(pago, eliminado=False):
+    """Ajusta el abono de un pago en la cuenta del cliente según su monto actual."""
+    esperado = {}
+    if not eliminado and pago.cliente_id:
+        esperado[pago.cliente_id] = -(pago.monto or Decimal('0'))
+
+    with transaction.atomic():
+        registrado = _registrados(pago=pago)
+        for cliente_id in set(esperado) | set(registrado):
+            diferencia = esperado.get(cliente_id, Decimal('0')) - (registrado.get(cliente_id) or Decimal('0'))
+            if not diferencia:
+                continue
+            referencia = pago.referencia or pago.uid
+            if cliente_id not in registrado:
+                tipo, descripcion = 'abono', f"Pago {referencia}"
+            else:
+                tipo = 'ajuste'
+                descripcion = f"Pago {referencia} eliminado" if eliminado else f"Pago {referencia} modificado"
+            movimiento = registrar_movimiento(
+                cliente_id, tipo, diferencia, pago=None if eliminado else pago, descripcion=descripcion,
+                pagado=-diferencia,
+            )
+            _refrescar_cliente(pago, movimiento)
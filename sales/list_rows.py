@@ -0,0 +1,98 @@
+"""
+Listado de ventas desde ``values()`` (FAST_JSON, ver core/fast_json.py).
+
+Misma salida que ``SaleListSerializer``. Los items de todas las ventas salen en una sola consulta;
+los de lote se arman desde ``values()`` como ``SaleItemSerializer``, y los de bin conservan
+``FruitBinDetailSerializer`` (detalle completo con historial de venta), cargados en lote.
+"""
+from collections import defaultdict
+
+from core.fast_json import Campo, RowMapper
+from core.uploads import nombre_miniatura
+from inventory.fruit_bin_serializers import FruitBinDetailSerializer
+from inventory.models import FruitBin
+
+from .models import Sale, SaleItem
+
+
+class SaleItemRows(RowMapper):
+    model = SaleItem
+    campos = (
+        'uid',
+        Campo('lote'),
+        Campo('bin'),
+        'unidades_vendidas', 'peso_vendido', 'precio_unidad', 'precio_kg', 'subtotal', 'es_concesion',
+    )
+    lookups_extra = (
+        'venta', 'lote_id', 'bin_id', 'lote__uid', 'lote__variedad', 'lote__calibre', 'lote__fecha_ingreso',
+        'lote__en_concesion', 'lote__producto__uid', 'lote__producto__nombre', 'lote__producto__tipo_producto',
+        'lote__producto__marca',
+    )
+
+    def preparar(self, filas):
+        ids = {fila['bin_id'] for fila in filas if fila['bin_id'] is not None}
+        bins = list(FruitBin.objects.filter(pk__in=ids).select_related(
+            'producto', 'proveedor', 'recepcion', 'propietario_original'))
+        datos = FruitBinDetailSerializer(bins, many=True, context=self.context).data
+        self.bins = {b.pk: dato for b, dato in zip(bins, datos)}
+
+    def completar(self, fila, salida):
+        salida['bin'] = self.bins.get(fila['bin_id'])
+        if fila['lote_id'] is None:
+            return
+        producto = None
+        if fila['lote__producto__uid'] is not None:
+            producto = {
+                'uid': fila['lote__producto__uid'],
+                'nombre': fila['lote__producto__nombre'],
+                'tipo_producto': fila['lote__producto__tipo_producto'],
+                'marca': fila['lote__producto__marca'],
+            }
+        # FruitLotSaleSerializer lee proveedor.name y propietario_original.name, que Supplier no tiene:
+        # proveedor_nombre se omite siempre y propietario_original_nombre (allow_null) queda en None
+        salida['lote'] = {
+            'uid': fila['lote__uid'],
+            'producto': producto,
+            'variedad': fila['lote__variedad'],
+            'propietario_original_nombre': None,
+            'calibre': fila['lote__calibre'],
+            'fecha_ingreso': fila['lote__fecha_ingreso'],
+            'en_concesion': fila['lote__en_concesion'],
+        }
+
+
+class SaleListRows(RowMapper):
+    model = Sale
+    campos = (
+        'uid', 'codigo_venta', 'created_at',
+        Campo('cliente_nombre', 'cliente__nombre'),
+        Campo('vendedor_nombre'),
+        'total',
+        Campo('items'),
+        'estado_pago',
+        Campo('estado_pago_display', 'estado_pago', display=True),
+        'metodo_pago',
+        Campo('comprobante_miniatura_url'),
+        'cancelada',
+    )
+    lookups_extra = ('id', 'vendedor__first_name', 'vendedor__last_name', 'comprobante')
+
+    def preparar(self, filas):
+        items = SaleItemRows(context=self.context)
+        filas_items = list(items.values(SaleItem.objects.filter(venta_id__in=[fila['id'] for fila in filas])))
+        self.items = defaultdict(list)
+        for fila, dato in zip(filas_items, items.map(filas_items)):
+            self.items[fila['venta']].append(dato)
+        self.storage = Sale._meta.get_field('comprobante').storage
+        self.request = self.context.get('request')
+
+    def completar(self, fila, salida):
+        nombre = f"{fila['vendedor__first_name']} {fila['vendedor__last_name']}".strip()
+        # El serializer recurre a vendedor.username, que en CustomUser es None
+        salida['vendedor_nombre'] = nombre or None
+        salida['items'] = self.items.get(fila['id'], [])
+        miniatura = nombre_miniatura(fila['comprobante'])
+        if miniatura is not None:
+            url = self.storage.url(miniatura)
+            miniatura = self.request.build_absolute_uri(url) if self.request is not None else url
+        salida['comprobante_miniatura_url'] = miniatura
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from sales import ledger
+from sales.models import Customer, CustomerLedgerEntry, CustomerPayment, Sale
+
+
+def _suma(qs, campo):
+    """Subconsulta con la suma de `campo` por cliente (0 si no hay filas)."""
+    total = qs.filter(cliente=OuterRef('pk')).order_by().values('cliente').annotate(s=Sum(campo)).values('s')
+    return Coalesce(Subquery(total), Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica la cuenta corriente de los clientes: el saldo guardado en Customer contra la suma "
+        "del libro (CustomerLedgerEntry), y el libro contra las ventas a crédito y pagos. "
+        "Con --fix corrige las columnas y registra un ajuste por la diferencia. "
+        "También sirve para cargar el saldo inicial de los clientes existentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=None, help='Solo los clientes de este negocio')
+        parser.add_argument('--fix', action='store_true', help='Corregir las diferencias encontradas')
+
+    def handle(self, *args, **options):
+        clientes = Customer.objects.annotate(
+            libro=_suma(CustomerLedgerEntry.objects.all(), 'monto'),
+            ultimo_saldo=Subquery(
+                CustomerLedgerEntry.objects.filter(cliente=OuterRef('pk')).order_by('-id').values('saldo')[:1]
+            ),
+            cargos=_suma(Sale.objects.filter(metodo_pago='credito', cancelada=False), 'total'),
+            total_pagos=_suma(CustomerPayment.objects.all(), 'monto'),
+        ).only('id', 'nombre', 'saldo_credito', 'monto_pagado').order_by('id')
+        if options['business']:
+            clientes = clientes.filter(business_id=options['business'])
+
+        revisados = con_diferencias = 0
+        for cliente in clientes.iterator(chunk_size=2000):
+            revisados += 1
+            esperado = cliente.cargos - cliente.total_pagos
+            problemas = []
+            if cliente.saldo_credito != cliente.libro:
+                problemas.append(f"saldo guardado {cliente.saldo_credito} != libro {cliente.libro}")
+            if cliente.ultimo_saldo is not None and cliente.ultimo_saldo != cliente.libro:
+                problemas.append(f"último saldo del libro {cliente.ultimo_saldo} != suma {cliente.libro}")
+            if cliente.libro != esperado:
+                problemas.append(f"libro {cliente.libro} != ventas a crédito - pagos {esperado}")
+            if cliente.monto_pagado != cliente.total_pagos:
+                problemas.append(f"monto pagado {cliente.monto_pagado} != pagos {cliente.total_pagos}")
+            if not problemas:
+                continue
+
+            con_diferencias += 1
+            self.stdout.write(f"{cliente.nombre} (id {cliente.pk}): " + '; '.join(problemas))
+            if options['fix']:
+                self._fix(cliente)
+
+        resumen = f"{revisados} clientes revisados, {con_diferencias} con diferencias"
+        if con_diferencias and not options['fix']:
+            raise CommandError(f"{resumen} (ejecuta con --fix para corregir)")
+        self.stdout.write(self.style.SUCCESS(resumen + (' (corregidas)' if con_diferencias else '')))
+
+    def _fix(self, cliente):
+        with transaction.atomic():
+            # Recalcular con el cliente bloqueado: entre la lectura y el ajuste pudo entrar un movimiento
+            Customer.objects.select_for_update().filter(pk=cliente.pk).values_list('pk').get()
+            libro = CustomerLedgerEntry.objects.filter(cliente=cliente).aggregate(s=Sum('monto'))['s'] or Decimal('0')
+            pagos = CustomerPayment.objects.filter(cliente=cliente).aggregate(s=Sum('monto'))['s'] or Decimal('0')
+            cargos = Sale.objects.filter(cliente=cliente, metodo_pago='credito', cancelada=False).aggregate(
+                s=Sum('total'))['s'] or Decimal('0')
+            Customer.objects.filter(pk=cliente.pk).update(saldo_credito=libro, monto_pagado=pagos)
+            diferencia = (cargos - pagos) - libro
+            if diferencia:
+                descripcion = 'Saldo inicial' if not CustomerLedgerEntry.objects.filter(cliente=cliente).exists() \
+                    else 'Ajuste por conciliación'
+                ledger.registrar_movimiento(cliente.pk, 'ajuste', diferencia, descripcion=descripcion)
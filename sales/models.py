@@ -1,15 +1,17 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex
 import uuid
 from datetime import datetime
 from decimal import Decimal
 import logging
 from core.models import BaseModel
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 from django.utils.translation import gettext_lazy as _
 # No importar modelos de otras apps arriba para evitar ciclos
 
 # Importar modelos de facturación
 from .models_billing import BillingInfo
+from .models_ledger import CustomerLedgerEntry, PaymentAllocation
 
 class Customer(BaseModel):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
@@ -28,28 +30,40 @@ class Customer(BaseModel):
     limite_credito = models.DecimalField(max_digits=10, decimal_places=2, default=0, null=True, blank=True, verbose_name=_('Límite de Crédito'))
     cliente_desde = models.DateField(auto_now_add=True, null=True, blank=True, verbose_name=_('Cliente Desde'))
 
-    history = HistoricalRecords()
+    # Cuenta corriente: se actualizan junto con cada movimiento (CustomerLedgerEntry), ver sales/ledger.py
+    saldo_credito = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False,
+                                        verbose_name=_('Saldo de Crédito'))
+    monto_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False,
+                                       verbose_name=_('Monto Pagado'))
+
+    history = HistoricalRecords(excluded_fields=['saldo_credito', 'monto_pagado'])
+
+    CAMPOS_CUENTA = ('saldo_credito', 'monto_pagado')
 
     def __str__(self):
         return f"{self.nombre} ({self.rut}){' [Frecuente]' if self.frecuente else ''}"
+
+    def save(self, *args, **kwargs):
+        # Los saldos solo los escribe sales/ledger.py; un save() completo de una instancia leída
+        # antes de un movimiento no debe pisarlos con un valor viejo
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_CUENTA
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def saldo_actual(self):
-        """Calcula el saldo actual del cliente basado en ventas a crédito no pagadas"""
-        # Suma de los saldos pendientes de todas las ventas a crédito no pagadas
-        # Esto tiene en cuenta los pagos parciales realizados
-        ventas_credito = self.sales.filter(metodo_pago='credito', pagado=False).aggregate(
-            total=models.Sum('saldo_pendiente')
-        )['total'] or Decimal('0.00')
-        
-        return ventas_credito
+        """Saldo adeudado: cargos por ventas a crédito menos pagos (columna, sin consultas)"""
+        return self.saldo_credito
     
     @property
     def credito_disponible(self):
         """Calcula el crédito disponible para el cliente"""
         if not self.credito_activo or not self.limite_credito:
             return Decimal('0.00')
-        return max(self.limite_credito - self.saldo_actual, Decimal('0.00'))
+        return max(self.limite_credito - self.saldo_credito, Decimal('0.00'))
     
     @property
     def pagos_pendientes(self):
@@ -59,8 +73,7 @@ class Customer(BaseModel):
     @property
     def total_pagado(self):
         """Retorna el total pagado por el cliente"""
-        pagos = self.pagos.aggregate(total=models.Sum('monto'))['total'] or Decimal('0.00')
-        return pagos
+        return self.monto_pagado
 
 class CustomerPayment(BaseModel):
     """
@@ -95,40 +108,12 @@ class CustomerPayment(BaseModel):
         super().save(*args, **kwargs)
         
     def asociar_ventas(self, ventas_list):
-        """Asocia ventas a este pago y actualiza su estado y saldo pendiente"""
+        """Aplica este pago a las ventas indicadas (FIFO) y actualiza su estado y saldo pendiente"""
+        from .payments import aplicar_pago
+
         if not ventas_list:
-            return
-            
-        # Asociar las ventas al pago
-        self.ventas.add(*ventas_list)
-        
-        # Monto disponible para aplicar a las ventas
-        monto_disponible = self.monto
-        
-        # Aplicar el pago a cada venta en orden (primero las más antiguas)
-        for venta in ventas_list.order_by('created_at'):
-            if monto_disponible <= 0:
-                break
-                
-            # Calcular cuánto se puede aplicar a esta venta
-            monto_aplicable = min(monto_disponible, venta.saldo_pendiente)
-            
-            # Actualizar el saldo pendiente de la venta
-            venta.saldo_pendiente -= monto_aplicable
-            monto_disponible -= monto_aplicable
-            
-            # Actualizar estado de la venta según el saldo pendiente
-            if venta.saldo_pendiente <= 0:
-                venta.pagado = True
-                venta.estado_pago = 'completo'
-            else:
-                venta.estado_pago = 'parcial'
-            
-            # Guardar los cambios en la venta
-            venta.save(update_fields=['pagado', 'saldo_pendiente', 'estado_pago', 'updated_at'])
-        
-        # Actualizar el cliente para refrescar propiedades calculadas
-        self.cliente.save(update_fields=['updated_at'])
+            return []
+        return aplicar_pago(self, ventas_list)
 
 class Sale(BaseModel):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
@@ -275,6 +260,18 @@ class Sale(BaseModel):
         
         return f"Venta {self.codigo_venta or self.id} - {items_count} productos - {total_str} - Cliente: {cliente_str}{estado_str}"
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            # Las ventas se insertan en orden de created_at: BRIN descarta rangos de bloques
+            # completos en los reportes por fecha con un índice de pocos KB
+            BrinIndex(fields=['created_at'], name='sale_created_brin'),
+            models.Index(fields=['business', 'created_at'], name='sale_biz_created_idx'),
+            models.Index(fields=['business', 'cancelada', 'metodo_pago', 'created_at'], name='sale_biz_cancel_metodo_idx'),
+            # Ventas a crédito abiertas por cliente (saldo y crédito disponible)
+            models.Index(fields=['cliente'], condition=models.Q(metodo_pago='credito', pagado=False),
+                         name='sale_credito_abierto_idx'),
+        ]
+
 class SaleItem(BaseModel):
     """Modelo para representar los ítems individuales de una venta"""
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
@@ -531,6 +528,9 @@ class SaleItem(BaseModel):
     class Meta:
         verbose_name = _("Sale Item")
         verbose_name_plural = _("Sale Items")
+        indexes = [
+            BrinIndex(fields=['created_at'], name='saleitem_created_brin'),
+        ]
 
 
 class SalePending(BaseModel):
@@ -594,6 +594,12 @@ class SalePending(BaseModel):
         cliente_str = self.cliente.nombre if self.cliente else (self.nombre_cliente or '')
         return f"Pre-reserva {self.id} - {self.estado} ({cliente_str})"
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            # Timeline del dashboard: ventas pendientes más recientes del negocio (core/timeline.py)
+            models.Index(fields=['business', 'created_at'], name='pend_biz_created_idx'),
+        ]
+
 
 class SalePendingItem(BaseModel):
     """Modelo para representar los ítems individuales de una venta pendiente"""
@@ -1,6 +1,6 @@
 from django.db import models
 from core.models import BaseModel
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 from django.utils.translation import gettext_lazy as _
 
 class BillingInfo(BaseModel):
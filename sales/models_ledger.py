@@ -0,0 +1,63 @@
+import uuid
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CustomerLedgerEntry(models.Model):
+    """
+    Movimiento de la cuenta corriente de un cliente (solo se agregan filas, nunca se editan).
+    `monto` es positivo cuando aumenta la deuda (cargo) y negativo cuando la reduce (abono);
+    `saldo` es el saldo del cliente después de aplicar el movimiento.
+    El saldo vigente se guarda en `Customer.saldo_credito`; ver sales/ledger.py.
+    """
+    TIPO_CHOICES = [
+        ('cargo', _('Cargo')),
+        ('abono', _('Abono')),
+        ('ajuste', _('Ajuste')),
+    ]
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    cliente = models.ForeignKey('Customer', on_delete=models.CASCADE, related_name='movimientos')
+    business = models.ForeignKey('business.Business', on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    monto = models.DecimalField(max_digits=12, decimal_places=2)
+    saldo = models.DecimalField(max_digits=12, decimal_places=2)
+    # Origen del movimiento; se conserva el movimiento aunque se elimine la venta o el pago
+    venta = models.ForeignKey('Sale', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_cuenta')
+    pago = models.ForeignKey('CustomerPayment', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_cuenta')
+    descripcion = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['cliente', 'id']
+        verbose_name = _('Movimiento de cuenta de cliente')
+        verbose_name_plural = _('Movimientos de cuenta de clientes')
+        indexes = [
+            models.Index(fields=['cliente', 'id'], name='mov_cliente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.monto} - {self.cliente_id} (saldo {self.saldo})"
+
+
+class PaymentAllocation(models.Model):
+    """
+    Parte de un pago de cliente aplicada a una venta a crédito (FIFO por fecha de venta).
+    La suma de las aplicaciones de una venta es lo que se descontó de `Sale.saldo_pendiente`.
+    Las escribe sales/payments.py.
+    """
+    pago = models.ForeignKey('CustomerPayment', on_delete=models.CASCADE, related_name='aplicaciones')
+    venta = models.ForeignKey('Sale', on_delete=models.CASCADE, related_name='aplicaciones_pago')
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['pago', 'id']
+        verbose_name = _('Aplicación de pago')
+        verbose_name_plural = _('Aplicaciones de pagos')
+        indexes = [
+            models.Index(fields=['venta'], name='aplic_venta_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.monto} del pago {self.pago_id} a la venta {self.venta_id}"
@@ -0,0 +1,117 @@
+"""
+Aplicación de pagos de clientes a sus ventas a crédito.
+
+Un pago se reparte FIFO (la venta más antigua primero) entre las ventas a crédito abiertas del
+cliente. Con el cliente y esas ventas bloqueados se calcula el reparto en memoria y se escribe con
+un bulk_update de las ventas (más su historial) y un bulk_create de PaymentAllocation, así que la
+cantidad de consultas no depende de cuántas ventas tenga abiertas el cliente.
+
+El abono en la cuenta corriente lo registra el guardado del pago (ver sales/ledger.py); aquí solo
+se decide a qué ventas corresponde.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
+from simple_history.utils import bulk_update_with_history
+
+from .models import Customer, CustomerPayment, PaymentAllocation, Sale
+
+CAMPOS_PAGO_VENTA = ['saldo_pendiente', 'pagado', 'estado_pago', 'updated_at']
+
+
+def ventas_abiertas(cliente_id):
+    """Ventas a crédito del cliente con saldo pendiente."""
+    return Sale.objects.filter(cliente_id=cliente_id, metodo_pago='credito', cancelada=False, saldo_pendiente__gt=0)
+
+
+def _actualizar_estado(venta, ahora):
+    if venta.saldo_pendiente <= 0:
+        venta.pagado, venta.estado_pago = True, 'completo'
+    elif venta.saldo_pendiente < venta.total:
+        venta.pagado, venta.estado_pago = False, 'parcial'
+    else:
+        venta.pagado, venta.estado_pago = False, 'pendiente'
+    venta.updated_at = ahora
+
+
+def _bloquear_cliente(cliente_id):
+    # Todos los movimientos de un cliente bloquean primero su fila: dos pagos simultáneos del mismo
+    # cliente se aplican uno después del otro y el segundo ve los saldos que dejó el primero
+    Customer.objects.select_for_update().filter(pk=cliente_id).values_list('pk').get()
+
+
+def aplicar_pago(pago, ventas=None):
+    """
+    Aplica la parte aún no aplicada de `pago` a las ventas abiertas del cliente, de la más antigua
+    a la más nueva. `ventas` (queryset, ventas o pks) limita el reparto a esas ventas.
+    Devuelve las aplicaciones creadas; lo que sobra queda como saldo a favor del cliente.
+    """
+    if not pago.cliente_id:
+        return []
+
+    with transaction.atomic():
+        _bloquear_cliente(pago.cliente_id)
+        aplicado = PaymentAllocation.objects.filter(pago=pago).aggregate(s=Sum('monto'))['s'] or Decimal('0')
+        disponible = pago.monto - aplicado
+        if disponible <= 0:
+            return []
+
+        qs = ventas_abiertas(pago.cliente_id)
+        if ventas is not None:
+            pks = ventas.values('pk') if isinstance(ventas, QuerySet) else [getattr(v, 'pk', v) for v in ventas]
+            qs = qs.filter(pk__in=pks)
+
+        ahora = timezone.now()
+        aplicaciones, modificadas = [], []
+        for venta in qs.select_for_update().order_by('created_at', 'id'):
+            if disponible <= 0:
+                break
+            monto = min(disponible, venta.saldo_pendiente)
+            disponible -= monto
+            venta.saldo_pendiente -= monto
+            _actualizar_estado(venta, ahora)
+            modificadas.append(venta)
+            aplicaciones.append(PaymentAllocation(pago=pago, venta=venta, monto=monto))
+
+        if not modificadas:
+            return []
+
+        bulk_update_with_history(
+            modificadas, Sale, CAMPOS_PAGO_VENTA,
+            default_change_reason=f"Pago {pago.referencia or pago.uid}",
+        )
+        PaymentAllocation.objects.bulk_create(aplicaciones)
+        # Relación pago-ventas que usan los serializers; bulk_create no dispara m2m_changed
+        Through = CustomerPayment.ventas.through
+        Through.objects.bulk_create(
+            [Through(customerpayment_id=pago.pk, sale_id=venta.pk) for venta in modificadas],
+            ignore_conflicts=True,
+        )
+    return aplicaciones
+
+
+def revertir_pago(pago):
+    """Devuelve a las ventas el saldo que les descontó `pago` (al eliminar el pago)."""
+    with transaction.atomic():
+        if pago.cliente_id:
+            _bloquear_cliente(pago.cliente_id)
+        montos = dict(
+            PaymentAllocation.objects.filter(pago=pago)
+            .values('venta')
+            .annotate(total=Sum('monto'))
+            .values_list('venta', 'total')
+        )
+        if not montos:
+            return
+
+        ahora = timezone.now()
+        ventas = list(Sale.objects.select_for_update().filter(pk__in=montos))
+        for venta in ventas:
+            venta.saldo_pendiente += montos[venta.pk]
+            _actualizar_estado(venta, ahora)
+        bulk_update_with_history(
+            ventas, Sale, CAMPOS_PAGO_VENTA,
+            default_change_reason=f"Pago {pago.referencia or pago.uid} eliminado",
+        )
@@ -2,55 +2,139 @@ from rest_framework import serializers
 from decimal import Decimal
 import json
 from django.db import models, transaction
-from django.db.models import Sum
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from .models import Sale, SalePending, SalePendingItem, Customer, CustomerPayment, SaleItem
 from accounts.serializers import CustomUserSerializer
 from inventory.models import FruitLot, StockReservation, Product, FruitBin, BoxType
 from inventory.fruit_bin_serializers import FruitBinDetailSerializer
 from .serializers_billing import BillingInfoNestedSerializer
+from core.uploads import CargaDiferidaMixin, MiniaturaField
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+def _contar(qs):
+    """Subconsulta con la cantidad de filas de `qs` por cliente (0 si no hay)."""
+    total = qs.filter(cliente=OuterRef('pk')).order_by().values('cliente').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(total), 0)
+
+
+def _sumar(qs, campo):
+    """Subconsulta con la suma de `campo` en `qs` por cliente (0 si no hay filas)."""
+    total = qs.filter(cliente=OuterRef('pk')).order_by().values('cliente').annotate(s=Sum(campo)).values('s')
+    return Coalesce(Subquery(total), Value(Decimal('0')), output_field=models.DecimalField(max_digits=14, decimal_places=2))
+
+
+VENTAS_CREDITO = Sale.objects.filter(metodo_pago='credito')
+
+
+class CustomerListSerializer(serializers.ModelSerializer):
+    """
+    Cliente para listados: sin colecciones anidadas. Con `setup_eager_loading` el costo del
+    listado no depende de la cantidad de clientes (una consulta con subconsultas correlacionadas).
+    """
+    saldo_actual = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     credito_disponible = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    pagos_pendientes = serializers.IntegerField(read_only=True)
+    pagos_pendientes = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = Customer
+        fields = '__all__'
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.annotate(n_pagos_pendientes=_contar(VENTAS_CREDITO.filter(pagado=False)))
+
+    def get_pagos_pendientes(self, obj):
+        n = getattr(obj, 'n_pagos_pendientes', None)
+        return obj.pagos_pendientes if n is None else n
+
+
+class CustomerSerializer(CustomerListSerializer):
+    """
+    Detalle del cliente con sus últimas compras y pagos. Con `setup_eager_loading` las colecciones
+    se precargan limitadas por cliente (Prefetch con slice: Django lo resuelve con
+    ROW_NUMBER() OVER (PARTITION BY cliente)), así que la cantidad de consultas es fija.
+    """
     ultimas_compras = serializers.SerializerMethodField(read_only=True)
     ultimos_pagos = serializers.SerializerMethodField(read_only=True)
     resumen_credito = serializers.SerializerMethodField(read_only=True)
     billing_info = serializers.SerializerMethodField(read_only=True)
-    
+
+    ULTIMAS_COMPRAS = 5
+    ULTIMOS_PAGOS = 5
+    PAGOS_POR_VENTA = 3
+
     class Meta:
         model = Customer
         fields = '__all__'
-    
+
+    @classmethod
+    def _prefetch_compras(cls):
+        return Prefetch(
+            'sales',
+            queryset=Sale.objects.order_by('-created_at', '-id').prefetch_related(
+                Prefetch('items', queryset=SaleItem.objects.select_related('lote__producto')[:1],
+                         to_attr='primer_item'),
+                Prefetch('pagos', queryset=CustomerPayment.objects.order_by('-created_at', '-id')[:cls.PAGOS_POR_VENTA],
+                         to_attr='ultimos_pagos_venta'),
+            )[:cls.ULTIMAS_COMPRAS],
+            to_attr='ultimas_ventas',
+        )
+
+    @classmethod
+    def _prefetch_pagos(cls):
+        return Prefetch(
+            'pagos',
+            queryset=CustomerPayment.objects.order_by('-created_at', '-id').prefetch_related(
+                Prefetch('ventas', queryset=Sale.objects.only('id', 'uid', 'codigo_venta'))
+            )[:cls.ULTIMOS_PAGOS],
+            to_attr='ultimos_pagos_cliente',
+        )
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return super().setup_eager_loading(queryset).select_related('billing_info').annotate(
+            n_compras_credito=_contar(VENTAS_CREDITO),
+            n_ventas_pendientes=_contar(VENTAS_CREDITO.filter(estado_pago='pendiente')),
+            n_ventas_parciales=_contar(VENTAS_CREDITO.filter(estado_pago='parcial')),
+            n_pagos=_contar(CustomerPayment.objects.all()),
+            monto_compras_credito=_sumar(VENTAS_CREDITO, 'total'),
+        ).prefetch_related(cls._prefetch_compras(), cls._prefetch_pagos())
+
+    def _precargado(self, obj, atributo, prefetch):
+        """Colección precargada por setup_eager_loading; si no lo está (p. ej. un cliente recién guardado) se carga aquí."""
+        if not hasattr(obj, atributo):
+            prefetch_related_objects([obj], prefetch)
+        return getattr(obj, atributo)
+
     def get_ultimas_compras(self, obj):
-        # Obtener las últimas 5 compras del cliente
-        ultimas_compras = obj.sales.all().order_by('-created_at')[:5]
-        
-        return [{
-            'uid': venta.uid,
-            'codigo_venta': venta.codigo_venta,
-            'fecha': venta.created_at,
-            'total': venta.total,
-            'metodo_pago': venta.metodo_pago,
-            'pagado': venta.pagado,
-            'estado_pago': venta.estado_pago,
-            'saldo_pendiente': venta.saldo_pendiente,
-            'monto_pagado': venta.total - venta.saldo_pendiente,  # Monto ya pagado
-            'porcentaje_pagado': round((1 - (venta.saldo_pendiente / venta.total)) * 100 if venta.total > 0 else 0, 2),  # Porcentaje pagado
-            'producto': venta.items.first().lote.producto.nombre if venta.items.exists() and venta.items.first().lote and venta.items.first().lote.producto else None,
-            'peso_vendido': venta.items.first().peso_vendido if venta.items.exists() else 0,
-            'pagos_asociados': [{
-                'uid': pago.uid,
-                'fecha': pago.created_at,
-                'monto': pago.monto,
-                'metodo_pago': pago.metodo_pago
-            } for pago in venta.pagos.all().order_by('-created_at')[:3]]  # Últimos 3 pagos asociados a esta venta
-        } for venta in ultimas_compras]
-    
+        compras = []
+        for venta in self._precargado(obj, 'ultimas_ventas', self._prefetch_compras()):
+            item = venta.primer_item[0] if venta.primer_item else None
+            lote = item.lote if item else None
+            compras.append({
+                'uid': venta.uid,
+                'codigo_venta': venta.codigo_venta,
+                'fecha': venta.created_at,
+                'total': venta.total,
+                'metodo_pago': venta.metodo_pago,
+                'pagado': venta.pagado,
+                'estado_pago': venta.estado_pago,
+                'saldo_pendiente': venta.saldo_pendiente,
+                'monto_pagado': venta.total - venta.saldo_pendiente,  # Monto ya pagado
+                'porcentaje_pagado': round((1 - (venta.saldo_pendiente / venta.total)) * 100 if venta.total > 0 else 0, 2),  # Porcentaje pagado
+                'producto': lote.producto.nombre if lote and lote.producto else None,
+                'peso_vendido': item.peso_vendido if item else 0,
+                'pagos_asociados': [{
+                    'uid': pago.uid,
+                    'fecha': pago.created_at,
+                    'monto': pago.monto,
+                    'metodo_pago': pago.metodo_pago
+                } for pago in venta.ultimos_pagos_venta]  # Últimos pagos asociados a esta venta
+            })
+        return compras
+
     def get_ultimos_pagos(self, obj):
-        # Obtener los últimos 5 pagos del cliente
-        ultimos_pagos = obj.pagos.all().order_by('-created_at')[:5]
-        
         return [{
             'uid': pago.uid,
             'fecha': pago.created_at,
@@ -58,30 +142,19 @@ class CustomerSerializer(serializers.ModelSerializer):
             'metodo_pago': pago.metodo_pago,
             'referencia': pago.referencia,
             'ventas_asociadas': [{'uid': v.uid, 'codigo_venta': v.codigo_venta} for v in pago.ventas.all()]
-        } for pago in ultimos_pagos]
-    
+        } for pago in self._precargado(obj, 'ultimos_pagos_cliente', self._prefetch_pagos())]
+
     def get_resumen_credito(self, obj):
-        # Calcular estadísticas de crédito
-        total_compras = obj.sales.filter(metodo_pago='credito').count()
-        total_pagos = obj.pagos.count()
-        monto_total_compras = obj.sales.filter(metodo_pago='credito').aggregate(
-            total=models.Sum('total')
-        )['total'] or 0
-        monto_total_pagos = obj.pagos.aggregate(
-            total=models.Sum('monto')
-        )['total'] or 0
-        
-        # Calcular ventas pendientes y parciales
-        ventas_pendientes = obj.sales.filter(metodo_pago='credito', estado_pago='pendiente').count()
-        ventas_parciales = obj.sales.filter(metodo_pago='credito', estado_pago='parcial').count()
-        
+        if not hasattr(obj, 'n_compras_credito'):
+            obj = self.setup_eager_loading(Customer.objects.filter(pk=obj.pk)).get()
+
         return {
-            'total_compras_credito': total_compras,
-            'total_pagos': total_pagos,
-            'ventas_pendientes': ventas_pendientes,
-            'ventas_parciales': ventas_parciales,
-            'monto_total_compras': monto_total_compras,
-            'monto_total_pagos': monto_total_pagos,
+            'total_compras_credito': obj.n_compras_credito,
+            'total_pagos': obj.n_pagos,
+            'ventas_pendientes': obj.n_ventas_pendientes,
+            'ventas_parciales': obj.n_ventas_parciales,
+            'monto_total_compras': obj.monto_compras_credito,
+            'monto_total_pagos': obj.total_pagado,
             'saldo_actual': obj.saldo_actual,
             'credito_disponible': obj.credito_disponible,
             'limite_credito': obj.limite_credito
@@ -97,9 +170,12 @@ class CustomerSerializer(serializers.ModelSerializer):
         return None
 
 
-class CustomerPaymentSerializer(serializers.ModelSerializer):
+class CustomerPaymentSerializer(CargaDiferidaMixin, serializers.ModelSerializer):
     cliente_nombre = serializers.SerializerMethodField(read_only=True)
     orden_asociada = serializers.SerializerMethodField(read_only=True)
+    comprobante_miniatura_url = MiniaturaField(source='comprobante')
+    # El comprobante se procesa y sube fuera de la request (core/uploads.py)
+    campos_diferidos = ('comprobante',)
 
     
     class Meta:
@@ -749,11 +825,14 @@ class SaleSerializer(serializers.ModelSerializer):
                 'cajas_vacias_en_bodega': 0,
             }
 
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(CargaDiferidaMixin, serializers.ModelSerializer):
     vendedor_nombre = serializers.SerializerMethodField()
     cliente_nombre = serializers.SerializerMethodField()
     estado_pago_display = serializers.SerializerMethodField()
     pagos_asociados = serializers.SerializerMethodField()
+    comprobante_miniatura_url = MiniaturaField(source='comprobante')
+    # El comprobante se procesa y sube fuera de la request (core/uploads.py)
+    campos_diferidos = ('comprobante',)
     # Campos de cancelación
     cancelada_por_nombre = serializers.SerializerMethodField()
     autorizada_por_nombre = serializers.SerializerMethodField()
@@ -772,7 +851,7 @@ class SaleSerializer(serializers.ModelSerializer):
         model = Sale
         fields = (
             'uid', 'codigo_venta', 'cliente', 'vendedor', 'cajas_vendidas', 'total',
-            'metodo_pago', 'comprobante', 'business', 'pagado', 'fecha_vencimiento',
+            'metodo_pago', 'comprobante', 'comprobante_miniatura_url', 'business', 'pagado', 'fecha_vencimiento',
             'saldo_pendiente', 'estado_pago', 'estado_pago_display', 'pagos_asociados',
             'vendedor_nombre', 'cliente_nombre', 'items', 'resumen',
             # Campos de cancelación
@@ -901,7 +980,8 @@ class SaleSerializer(serializers.ModelSerializer):
         # Crear la venta
         venta = Sale.objects.create(**validated_data)
 
-        # Crear los items de la venta
+        # Crear los items de la venta (cantidades y montos convertidos: el multipart puede traerlos
+        # como texto y SaleItem.save los compara con números)
         for item_data in items_data:
             # Soportar items por lote o por bin
             if item_data.get('bin'):
@@ -910,11 +990,11 @@ class SaleSerializer(serializers.ModelSerializer):
                     SaleItem.objects.create(
                         venta=venta,
                         bin=bin_obj,
-                        unidades_vendidas=item_data.get('unidades_vendidas') or 1,
-                        precio_unidad=item_data.get('precio_unidad') or 0,
-                        peso_vendido=item_data.get('peso_vendido') or 0,
-                        precio_kg=item_data.get('precio_kg') or 0,
-                        subtotal=item_data.get('subtotal') or 0,
+                        unidades_vendidas=int(item_data.get('unidades_vendidas') or 1),
+                        precio_unidad=D(item_data.get('precio_unidad')),
+                        peso_vendido=D(item_data.get('peso_vendido')),
+                        precio_kg=D(item_data.get('precio_kg')),
+                        subtotal=D(item_data.get('subtotal')),
                         es_concesion=False
                     )
                 except FruitBin.DoesNotExist:
@@ -924,11 +1004,11 @@ class SaleSerializer(serializers.ModelSerializer):
                 try:
                     item_payload = {
                         'lote': FruitLot.objects.get(uid=item_data.get('lote')),
-                        'unidades_vendidas': item_data.get('unidades_vendidas', 0) or 0,
-                        'precio_unidad': item_data.get('precio_unidad', 0) or 0,
-                        'peso_vendido': item_data.get('peso_vendido', 0) or 0,
-                        'precio_kg': item_data.get('precio_kg', 0) or 0,
-                        'subtotal': item_data.get('subtotal', 0) or 0,
+                        'unidades_vendidas': int(item_data.get('unidades_vendidas') or 0),
+                        'precio_unidad': D(item_data.get('precio_unidad')),
+                        'peso_vendido': D(item_data.get('peso_vendido')),
+                        'precio_kg': D(item_data.get('precio_kg')),
+                        'subtotal': D(item_data.get('subtotal')),
                         'es_concesion': item_data.get('es_concesion', False)
                     }
                     SaleItem.objects.create(venta=venta, **item_payload)
@@ -978,11 +1058,11 @@ class SaleSerializer(serializers.ModelSerializer):
                     SaleItem.objects.create(
                         venta=instance,
                         bin=bin_obj,
-                        unidades_vendidas=item_data.get('unidades_vendidas') or 1,
-                        precio_unidad=item_data.get('precio_unidad') or 0,
-                        peso_vendido=item_data.get('peso_vendido') or 0,
-                        precio_kg=item_data.get('precio_kg') or 0,
-                        subtotal=item_data.get('subtotal') or 0,
+                        unidades_vendidas=int(item_data.get('unidades_vendidas') or 1),
+                        precio_unidad=D(item_data.get('precio_unidad')),
+                        peso_vendido=D(item_data.get('peso_vendido')),
+                        precio_kg=D(item_data.get('precio_kg')),
+                        subtotal=D(item_data.get('subtotal')),
                         es_concesion=False
                     )
                 except FruitBin.DoesNotExist:
@@ -991,11 +1071,11 @@ class SaleSerializer(serializers.ModelSerializer):
                 try:
                     item_payload = {
                         'lote': FruitLot.objects.get(uid=item_data.get('lote')),
-                        'unidades_vendidas': item_data.get('unidades_vendidas', 0) or 0,
-                        'precio_unidad': item_data.get('precio_unidad', 0) or 0,
-                        'peso_vendido': item_data.get('peso_vendido', 0) or 0,
-                        'precio_kg': item_data.get('precio_kg', 0) or 0,
-                        'subtotal': item_data.get('subtotal', 0) or 0,
+                        'unidades_vendidas': int(item_data.get('unidades_vendidas') or 0),
+                        'precio_unidad': D(item_data.get('precio_unidad')),
+                        'peso_vendido': D(item_data.get('peso_vendido')),
+                        'precio_kg': D(item_data.get('precio_kg')),
+                        'subtotal': D(item_data.get('subtotal')),
                         'es_concesion': item_data.get('es_concesion', False)
                     }
                     SaleItem.objects.create(venta=instance, **item_payload)
@@ -1015,6 +1095,7 @@ class SaleListSerializer(serializers.ModelSerializer):
     vendedor_nombre = serializers.SerializerMethodField()
     estado_pago_display = serializers.CharField(source='get_estado_pago_display', read_only=True)
     items = SaleItemSerializer(many=True, read_only=True)
+    comprobante_miniatura_url = MiniaturaField(source='comprobante')
     class Meta:
         model = Sale
         fields = (
@@ -1028,6 +1109,7 @@ class SaleListSerializer(serializers.ModelSerializer):
             'estado_pago',
             'estado_pago_display',
             'metodo_pago',
+            'comprobante_miniatura_url',
             'cancelada'
         )
 
@@ -1,10 +1,11 @@
-from django.db.models.signals import post_save, m2m_changed, pre_save
+from django.db.models.signals import post_save, pre_save, pre_delete
 from django.dispatch import receiver
 from .models import Sale, CustomerPayment, Customer, SalePending, SaleItem, SalePendingItem
 from django.db import transaction, models
 from django.utils import timezone
 from decimal import Decimal
 from inventory.models import FruitLot, StockReservation
+from . import ledger, payments
 import logging
 import uuid
 
@@ -54,16 +55,45 @@ def update_customer_credit(sender, instance, created, **kwargs):
         # cliente.save(update_fields=['ultima_venta_credito'])
 
 
+@receiver(post_save, sender=Sale)
+def sync_customer_ledger_sale(sender, instance, created, update_fields=None, **kwargs):
+    """Registra en la cuenta corriente del cliente el cargo (o su ajuste) de una venta a crédito."""
+    if created and not (instance.cliente_id and instance.metodo_pago == 'credito'):
+        return
+    if update_fields is not None and not (set(update_fields) & ledger.CAMPOS_CARGO_VENTA):
+        return
+    ledger.sincronizar_venta(instance)
+
+
+def _borrado_directo(sender, origin):
+    """True si se elimina la venta/pago en sí y no en cascada (p. ej. al borrar el cliente o el negocio)."""
+    if isinstance(origin, models.QuerySet):
+        return origin.model is sender
+    return isinstance(origin, sender)
+
+
+@receiver(pre_delete, sender=Sale)
+def reverse_customer_ledger_sale(sender, instance, origin=None, **kwargs):
+    if _borrado_directo(sender, origin):
+        ledger.sincronizar_venta(instance, eliminada=True)
+
+
 @receiver(post_save, sender=CustomerPayment)
 def update_customer_balance(sender, instance, created, **kwargs):
     """
     Señal que se activa después de guardar un pago de cliente.
     Actualiza el saldo del cliente y su crédito disponible.
     """
-    if instance.cliente:
-        logger.info(f"Actualizando saldo para cliente {instance.cliente.nombre} tras pago de ${instance.monto}")
-        # No es necesario hacer nada más aquí, ya que el saldo_actual y credito_disponible
-        # son propiedades calculadas que consultan los pagos y ventas en tiempo real
+    if instance.cliente_id:
+        logger.info(f"Actualizando saldo para cliente {instance.cliente_id} tras pago de ${instance.monto}")
+        ledger.sincronizar_pago(instance)
+
+
+@receiver(pre_delete, sender=CustomerPayment)
+def reverse_customer_balance(sender, instance, origin=None, **kwargs):
+    if _borrado_directo(sender, origin):
+        payments.revertir_pago(instance)
+        ledger.sincronizar_pago(instance, eliminado=True)
 
 
 @receiver(post_save, sender=SaleItem)
@@ -75,42 +105,3 @@ def update_fruit_lot_inventory(sender, instance, created, **kwargs):
     """
     # No hacer nada aquí para evitar doble descuento
     return
-
-
-@receiver(m2m_changed, sender=CustomerPayment.ventas.through)
-def update_sales_payment_status(sender, instance, action, pk_set, **kwargs):
-    """
-    Señal que se activa cuando se asocian ventas a un pago.
-    Actualiza el estado de las ventas asociadas si el pago las cubre.
-    """
-    # Solo procesar cuando se añaden ventas al pago
-    if action == 'post_add' and pk_set:
-        logger.info(f"Procesando pago {instance.uid} para {len(pk_set)} ventas")
-        
-        with transaction.atomic():
-            # Obtener todas las ventas asociadas a este pago que no están pagadas
-            ventas = instance.ventas.filter(pagado=False)
-            
-            if not ventas.exists():
-                logger.info("No hay ventas pendientes asociadas a este pago")
-                return
-                
-            # Calcular el total de las ventas no pagadas
-            total_ventas = sum(venta.total for venta in ventas)
-            logger.info(f"Total de ventas pendientes: ${total_ventas}, monto del pago: ${instance.monto}")
-            
-            # Si el pago cubre el total, marcar las ventas como pagadas
-            if instance.monto >= total_ventas:
-                for venta in ventas:
-                    venta.pagado = True
-                    venta.save(update_fields=['pagado'])
-                logger.info(f"Se marcaron {ventas.count()} ventas como pagadas")
-            else:
-                logger.info(f"El pago no cubre el total de las ventas pendientes (${total_ventas})")
-                
-            # Actualizar el cliente para reflejar el nuevo saldo
-            if instance.cliente:
-                # Forzar una actualización del cliente para refrescar las propiedades calculadas
-                instance.cliente.save(update_fields=['updated_at'])
-                logger.info(f"Saldo actualizado para cliente {instance.cliente.nombre}: ${instance.cliente.saldo_actual}, disponible: ${instance.cliente.credito_disponible}")
-
@@ -0,0 +1,138 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import CustomUser, Perfil
+from business.models import Business
+
+from .models import Customer, CustomerPayment, PaymentAllocation, Sale
+from .payments import aplicar_pago
+from .views import CustomerPaymentViewSet
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class AplicarPagoConcurrenteTests(TransactionTestCase):
+    """
+    Varios pagos del mismo cliente aplicados a la vez: el bloqueo del cliente en aplicar_pago debe
+    serializarlos para que ninguna venta quede pagada dos veces ni con saldo negativo.
+    Necesita una base con bloqueo de filas (PostgreSQL); en SQLite se omite.
+    """
+
+    VENTAS = 20
+    TOTAL_VENTA = Decimal('1000')
+    PAGOS = 6
+    MONTO_PAGO = Decimal('2500')
+
+    def setUp(self):
+        self.usuario = CustomUser.objects.create_user(email='vendedor@test.cl', password='x', first_name='Vendedor')
+        perfil = Perfil.objects.create(user=self.usuario)
+        self.negocio = Business.objects.create(
+            nombre='Negocio', rut='1-9', dueno=perfil, email='negocio@test.cl', telefono='1', direccion='-',
+        )
+        perfil.business = self.negocio
+        perfil.save(update_fields=['business'])
+        self.cliente = Customer.objects.create(nombre='Cliente', rut='2-7', business=self.negocio, credito_activo=True)
+
+        ahora = timezone.now()
+        for i in range(self.VENTAS):
+            venta = Sale.objects.create(
+                cliente=self.cliente, vendedor=self.usuario, total=self.TOTAL_VENTA,
+                metodo_pago='credito', business=self.negocio,
+            )
+            # Fechas distintas para que el orden FIFO sea determinista
+            Sale.objects.filter(pk=venta.pk).update(created_at=ahora - timedelta(days=self.VENTAS - i))
+
+        self.pagos = [
+            CustomerPayment.objects.create(
+                cliente=self.cliente, monto=self.MONTO_PAGO, metodo_pago='efectivo', business=self.negocio,
+            )
+            for _ in range(self.PAGOS)
+        ]
+
+    def _aplicar_en_paralelo(self):
+        errores = []
+        barrera = threading.Barrier(len(self.pagos))
+
+        def aplicar(pago):
+            try:
+                barrera.wait()
+                aplicar_pago(pago)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=aplicar, args=(pago,)) for pago in self.pagos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return errores
+
+    def test_pagos_simultaneos_cuadran_con_lo_facturado(self):
+        errores = self._aplicar_en_paralelo()
+        self.assertEqual(errores, [])
+
+        ventas = Sale.objects.filter(cliente=self.cliente)
+        facturado = ventas.aggregate(s=Sum('total'))['s']
+        saldo = ventas.aggregate(s=Sum('saldo_pendiente'))['s']
+        aplicado = PaymentAllocation.objects.filter(venta__cliente=self.cliente).aggregate(s=Sum('monto'))['s']
+
+        self.assertEqual(aplicado + saldo, facturado)
+        self.assertEqual(aplicado, self.MONTO_PAGO * self.PAGOS)
+        self.assertFalse(ventas.filter(saldo_pendiente__lt=0).exists())
+        for pago in self.pagos:
+            repartido = PaymentAllocation.objects.filter(pago=pago).aggregate(s=Sum('monto'))['s']
+            self.assertEqual(repartido, pago.monto)
+
+
+class CrearPagoTests(TestCase):
+    """Creación de pagos con CustomerPaymentViewSet: sin ventas indicadas solo se aplica FIFO si se pide."""
+
+    def setUp(self):
+        self.usuario = CustomUser.objects.create_user(email='vendedor@test.cl', password='x', first_name='Vendedor')
+        perfil = Perfil.objects.create(user=self.usuario)
+        self.negocio = Business.objects.create(
+            nombre='Negocio', rut='1-9', dueno=perfil, email='negocio@test.cl', telefono='1', direccion='-',
+        )
+        perfil.business = self.negocio
+        perfil.save(update_fields=['business'])
+        self.cliente = Customer.objects.create(nombre='Cliente', rut='2-7', business=self.negocio, credito_activo=True)
+        self.ventas = [
+            Sale.objects.create(
+                cliente=self.cliente, vendedor=self.usuario, total=Decimal('1000'),
+                metodo_pago='credito', business=self.negocio,
+            )
+            for _ in range(2)
+        ]
+
+    def _crear(self, **extra):
+        datos = {
+            'cliente': self.cliente.pk, 'business': self.negocio.pk, 'monto': '1500', 'metodo_pago': 'efectivo',
+            **extra,
+        }
+        request = APIRequestFactory().post('/', datos, format='json')
+        force_authenticate(request, user=self.usuario)
+        response = CustomerPaymentViewSet.as_view({'post': 'create'})(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        return CustomerPayment.objects.get(uid=response.data['uid'])
+
+    def _saldos(self):
+        return [Sale.objects.get(pk=venta.pk).saldo_pendiente for venta in self.ventas]
+
+    def test_sin_ventas_no_se_aplica(self):
+        pago = self._crear()
+        self.assertFalse(PaymentAllocation.objects.filter(pago=pago).exists())
+        self.assertEqual(self._saldos(), [Decimal('1000'), Decimal('1000')])
+
+    def test_aplicar_fifo(self):
+        pago = self._crear(aplicar_fifo=True)
+        self.assertEqual(PaymentAllocation.objects.filter(pago=pago).aggregate(s=Sum('monto'))['s'], Decimal('1500'))
+        self.assertEqual(sorted(self._saldos()), [Decimal('0'), Decimal('500')])
+
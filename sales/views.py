@@ -2,9 +2,15 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Sale, SalePending, Customer, CustomerPayment
-from .serializers import SaleSerializer, SalePendingSerializer, CustomerSerializer, CustomerPaymentSerializer, SaleListSerializer
+from .payments import aplicar_pago
+from .serializers import (
+    SaleSerializer, SalePendingSerializer, CustomerSerializer, CustomerListSerializer, CustomerPaymentSerializer,
+    SaleListSerializer,
+)
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from core.fast_json import FastListMixin
 from core.permissions import IsSameBusiness
+from .list_rows import SaleListRows
 from django.db import transaction
 from rest_framework.exceptions import ValidationError
 from inventory.models import FruitLot
@@ -13,27 +19,7 @@ from datetime import datetime, timedelta
 from django.db.models import Q
 from decimal import Decimal
 from django.db import transaction
-
-class CustomerViewSet(viewsets.ModelViewSet):
-    serializer_class = CustomerSerializer
-    permission_classes = [IsAuthenticated, IsSameBusiness]
-    lookup_field = 'uid'
-    queryset = Customer.objects.all()
-
-    def get_queryset(self):
-        user = self.request.user
-        perfil = getattr(user, 'perfil', None)
-        if perfil is None:
-            return Customer.objects.none()
-        # Filtrado base por negocio - siempre traemos todos los clientes del negocio
-        queryset = Customer.objects.filter(business=perfil.business)
-        return queryset.order_by('-created_at')
-
-    def perform_create(self, serializer):
-        # Asignar automáticamente el negocio del usuario autenticado
-        perfil = getattr(self.request.user, 'perfil', None)
-        serializer.save(business=perfil.business)
-
+import uuid
 
 class SalePendingViewSet(viewsets.ModelViewSet):
     queryset = SalePending.objects.all()
@@ -107,13 +93,27 @@ class CustomerViewSet(viewsets.ModelViewSet):
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated, IsSameBusiness]
     lookup_field = 'uid'
-    
+    queryset = Customer.objects.all()
+
+    def get_serializer_class(self):
+        # El listado no incluye compras ni pagos; el detalle sí
+        if self.action == 'list':
+            return CustomerListSerializer
+        return self.serializer_class
+
     def get_queryset(self):
         user = self.request.user
         perfil = getattr(user, 'perfil', None)
         if perfil is None:
             return Customer.objects.none()
-        return Customer.objects.filter(business=perfil.business).order_by('-created_at')
+        # Filtrado base por negocio - siempre traemos todos los clientes del negocio
+        queryset = Customer.objects.filter(business=perfil.business).order_by('-created_at')
+        return self.get_serializer_class().setup_eager_loading(queryset)
+
+    def perform_create(self, serializer):
+        # Asignar automáticamente el negocio del usuario autenticado
+        perfil = getattr(self.request.user, 'perfil', None)
+        serializer.save(business=perfil.business)
 
 
 class CustomerPaymentViewSet(viewsets.ModelViewSet):
@@ -143,27 +143,18 @@ class CustomerPaymentViewSet(viewsets.ModelViewSet):
         perfil = getattr(self.request.user, 'perfil', None)
         serializer.save(business=perfil.business)
         
-        # Actualizar el estado de las ventas asociadas si se marca como pagado
-        pago = serializer.instance
+        # Aplicar el pago a las ventas indicadas. Sin ventas el pago queda como abono a la cuenta y solo
+        # se reparte entre las ventas abiertas del cliente (la más antigua primero) con aplicar_fifo=true
         ventas_ids = self.request.data.get('ventas', [])
-        
         if ventas_ids:
-            # Asociar ventas al pago
-            ventas = Sale.objects.filter(uid__in=ventas_ids, cliente=pago.cliente)
-            pago.ventas.set(ventas)
-            
-            # Verificar si el pago cubre el total de las ventas
-            total_ventas = sum(venta.total for venta in ventas)
-            
-            # Si el pago cubre el total, marcar las ventas como pagadas
-            if pago.monto >= total_ventas:
-                for venta in ventas:
-                    venta.pagado = True
-                    venta.save()
+            aplicar_pago(serializer.instance, Sale.objects.filter(uid__in=ventas_ids))
+        elif str(self.request.data.get('aplicar_fifo', '')).lower() == 'true':
+            aplicar_pago(serializer.instance)
 
 
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = SaleSerializer
+    list_mapper = SaleListRows
     permission_classes = [IsAuthenticated, IsSameBusiness]
     ordering_fields = ['-created_at']
     lookup_field = 'uid'
@@ -180,8 +171,8 @@ class SaleViewSet(viewsets.ModelViewSet):
         if perfil is None:
             return Response([])  # No hay perfil, no hay clientes
         
-        clientes = Customer.objects.filter(business=perfil.business)
-        serializer = CustomerSerializer(clientes, many=True)
+        clientes = CustomerListSerializer.setup_eager_loading(Customer.objects.filter(business=perfil.business))
+        serializer = CustomerListSerializer(clientes, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='last-code')
@@ -488,6 +479,17 @@ def historial_completo_cliente(request, uid):
         return Response({"detail": "Cliente no encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _filtro_uid_o_codigo(valores):
+    """Q que busca ventas por uid (los valores que son UUID válidos) o por código de venta."""
+    uids = []
+    for valor in valores:
+        try:
+            uids.append(uuid.UUID(valor))
+        except ValueError:
+            pass
+    return Q(uid__in=uids) | Q(codigo_venta__in=valores)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def registrar_pago_cliente(request, uid):
@@ -544,64 +546,19 @@ def registrar_pago_cliente(request, uid):
             )
             pago.save()
             
-            # Determinar cómo aplicar el pago
+            # Se aplica a las ventas indicadas (por uid o código de venta) o, si no se indicaron,
+            # a todas las ventas a crédito abiertas del cliente, de la más antigua a la más nueva
             ventas_a_pagar = None
-            
-            # Caso 1: Se especificaron ventas específicas para pagar
             if ventas_uids:
-                # Convertir ventas_uids a strings si son objetos UUID
-                ventas_uids_str = [str(uid) for uid in ventas_uids]
-                
-                # Buscar ventas por uid
-                ventas_a_pagar = Sale.objects.filter(uid__in=ventas_uids_str, cliente=cliente)
-                
-                # Si no se encuentran ventas, intentar buscar por código de venta
-                if not ventas_a_pagar.exists():
-                    ventas_a_pagar = Sale.objects.filter(codigo_venta__in=ventas_uids_str, cliente=cliente)
-                
-                # Si aún no se encuentran, intentar búsqueda más flexible
-                if not ventas_a_pagar.exists():
-                    print(f"No se encontraron ventas con los UIDs proporcionados: {ventas_uids_str}")
-                    for uid in ventas_uids_str:
-                        try:
-                            # Búsqueda más flexible
-                            venta = Sale.objects.filter(
-                                models.Q(uid__icontains=uid) | 
-                                models.Q(codigo_venta__icontains=uid),
-                                cliente=cliente
-                            ).first()
-                            if venta:
-                                if ventas_a_pagar is None:
-                                    ventas_a_pagar = [venta]
-                                else:
-                                    ventas_a_pagar = list(ventas_a_pagar) + [venta]
-                        except Exception as e:
-                            print(f"Error al buscar venta: {e}")
-            
-            # Caso 2: No se especificaron ventas, obtener automáticamente las ventas pendientes
-            if not ventas_a_pagar or not ventas_a_pagar.exists():
-                print("Obteniendo automáticamente ventas pendientes del cliente...")
-                # Obtener todas las ventas a crédito con saldo pendiente, ordenadas por fecha (más antiguas primero)
                 ventas_a_pagar = Sale.objects.filter(
-                    cliente=cliente,
-                    metodo_pago='credito',
-                    pagado=False,  # Solo las no pagadas completamente
-                    saldo_pendiente__gt=0  # Con saldo pendiente mayor a cero
-                ).order_by('created_at')
-                
-                if not ventas_a_pagar.exists():
-                    print("No se encontraron ventas pendientes para este cliente.")
-            
-            # Aplicar el pago a las ventas encontradas
-            if ventas_a_pagar and (isinstance(ventas_a_pagar, list) or ventas_a_pagar.exists()):
-                # Usar el método asociar_ventas para manejar la asociación y marcado
-                pago.asociar_ventas(ventas_a_pagar)
-                print(f"Pago aplicado a ventas: {[getattr(v, 'uid', v.id) for v in ventas_a_pagar]}")
-            else:
-                print("No se encontraron ventas para aplicar el pago. Actualizando saldo general del cliente.")
-                # Si no hay ventas específicas, simplemente aplicamos el pago al saldo general del cliente
-                cliente.actualizar_saldo()
-            
+                    _filtro_uid_o_codigo([str(uid) for uid in ventas_uids]), cliente=cliente
+                )
+            aplicaciones = aplicar_pago(pago, ventas_a_pagar)
+            if ventas_a_pagar is not None and not aplicaciones:
+                # Las ventas indicadas no existen o ya están pagadas
+                aplicar_pago(pago)
+            cliente.refresh_from_db(fields=Customer.CAMPOS_CUENTA)
+
             # Devolver el pago creado con información actualizada del cliente
             serializer = CustomerPaymentSerializer(pago)
             cliente_serializer = CustomerSerializer(cliente)
@@ -56,7 +56,7 @@ def generar_reporte_maduracion_paltas(business_id=None, lote_id=None, producto_i
     
     # Si no hay filtros específicos de lote/producto/pallet/calibre, mostrar solo paltas
     if not any([lote_id, producto_id, pallet_id, calibre]):
-        query = Q(producto__nombre__icontains='palta') | Q(producto__nombre__icontains='aguacate')
+        query = Q(producto__categoria='palta')
     
     # Aplicar filtros específicos si existen
     if business_id:
@@ -153,7 +153,7 @@ def generar_reporte_maduracion_paltas(business_id=None, lote_id=None, producto_i
         
         # Calcular peso disponible (restando reservas)
         peso_reservado = lote.reservas.filter(estado='confirmada').aggregate(
-            total=Sum('cantidad_kg')
+            total=Sum('kg_reservados')
         )['total'] or 0
         peso_disponible = float(lote.peso_neto) - float(peso_reservado)
         
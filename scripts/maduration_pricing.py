@@ -10,6 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from inventory.models import FruitLot, Product
+from inventory.product_categories import CATEGORIAS, categoria_de
 from django.db.models import F, ExpressionWrapper, DecimalField
 from django.utils import timezone
 
@@ -84,8 +85,7 @@ def calculate_maduration_price(lote):
         ganancia_objetivo = margen_fijo
     
     # Para paltas específicamente, ajustar según calibre
-    producto_nombre = lote.producto.nombre.lower() if lote.producto else ""
-    if "palta" in producto_nombre or "aguacate" in producto_nombre:
+    if lote.producto and lote.producto.categoria == 'palta':
         calibre = lote.calibre
         # Precios base por calibre (referencia)
         precios_base_calibre = {
@@ -137,51 +137,33 @@ def update_maduration_states():
     """
     Actualiza los estados de maduración basados en días transcurridos.
     
-    Para paltas:
+    Los días de cada estado dependen de la categoría del producto
+    (inventory/product_categories.py). Para paltas:
     - 0-3 días: Verde
     - 4-6 días: Pre-maduro
     - 7-10 días: Maduro
     - 11+ días: Sobremaduro
     
-    Diferentes frutas tienen diferentes tiempos de maduración.
+    Las demás frutas maduran más lento (5/10/15 días) y las categorías sin maduración
+    (cítricos) no cambian de estado.
     """
     today = timezone.now().date()
     
-    # Obtener todos los lotes activos
+    # Obtener todos los lotes activos de categorías que maduran
     lotes = FruitLot.objects.filter(
         cantidad_cajas__gt=0,  # Solo lotes con inventario
         peso_neto__gt=0
+    ).exclude(
+        producto__categoria__in=[clave for clave, c in CATEGORIAS.items() if c.dias_maduracion is None]
     ).select_related('producto')
     
     for lote in lotes:
         dias_desde_ingreso = (today - lote.fecha_ingreso).days
-        producto_nombre = lote.producto.nombre.lower() if lote.producto else ""
+        categoria = categoria_de(lote.producto)
         
-        # Configuración específica para paltas
-        if "palta" in producto_nombre or "aguacate" in producto_nombre:
-            if dias_desde_ingreso <= 3:
-                nuevo_estado = 'verde'
-            elif dias_desde_ingreso <= 6:
-                nuevo_estado = 'pre-maduro'
-            elif dias_desde_ingreso <= 10:
-                nuevo_estado = 'maduro'
-            else:
-                nuevo_estado = 'sobremaduro'
-                if not lote.fecha_maduracion:
-                    lote.fecha_maduracion = today - timedelta(days=dias_desde_ingreso - 10)
-        
-        # Configuración para otras frutas (más lenta)
-        else:
-            if dias_desde_ingreso <= 5:
-                nuevo_estado = 'verde'
-            elif dias_desde_ingreso <= 10:
-                nuevo_estado = 'pre-maduro'
-            elif dias_desde_ingreso <= 15:
-                nuevo_estado = 'maduro'
-            else:
-                nuevo_estado = 'sobremaduro'
-                if not lote.fecha_maduracion:
-                    lote.fecha_maduracion = today - timedelta(days=dias_desde_ingreso - 15)
+        nuevo_estado = categoria.estado_maduracion(dias_desde_ingreso)
+        if nuevo_estado == 'sobremaduro' and not lote.fecha_maduracion:
+            lote.fecha_maduracion = today - timedelta(days=dias_desde_ingreso - categoria.dias_maduracion[-1])
         
         # Actualizar estado si ha cambiado
         if lote.estado_maduracion != nuevo_estado:
@@ -198,26 +180,24 @@ def update_maduration_states():
             if nuevo_estado == 'sobremaduro' and not lote.fecha_maduracion:
                 lote.fecha_maduracion = today
             
-            # Para paltas, actualizar porcentaje de pérdida estimado
-            if "palta" in producto_nombre or "aguacate" in producto_nombre:
-                if nuevo_estado == 'pre-maduro':
-                    lote.porcentaje_perdida_estimado = Decimal('2.00')  # 2% de pérdida
-                elif nuevo_estado == 'maduro':
-                    lote.porcentaje_perdida_estimado = Decimal('5.00')  # 5% de pérdida
-                elif nuevo_estado == 'sobremaduro':
+            # Categorías con pérdida por maduración (paltas): actualizar porcentaje estimado
+            perdida = (categoria.perdida_maduracion or {}).get(nuevo_estado)
+            if perdida is not None:
+                if nuevo_estado == 'sobremaduro':
                     # Aumenta 3% por día de sobremaduración
                     dias_sobremaduro = (today - lote.fecha_maduracion).days if lote.fecha_maduracion else 1
-                    lote.porcentaje_perdida_estimado = min(
+                    perdida = min(
                         Decimal('40.00'),  # Máximo 40% de pérdida
-                        Decimal('5.00') + (Decimal('3.00') * dias_sobremaduro)
+                        perdida + (Decimal('3.00') * dias_sobremaduro)
                     )
+                lote.porcentaje_perdida_estimado = perdida
             
             lote.save()
 
 
-def generate_pricing_report():
+def generate_pricing_report(business_id=None):
     """
-    Genera un reporte de precios recomendados para todos los lotes activos.
+    Genera un reporte de precios recomendados para todos los lotes activos (o los de un negocio).
     Incluye la ganancia objetivo de 500 pesos por kilo cuando es posible.
     """
     # Primero actualizar estados de maduración
@@ -228,6 +208,8 @@ def generate_pricing_report():
         cantidad_cajas__gt=0,
         peso_neto__gt=0
     ).select_related('producto', 'business', 'box_type')
+    if business_id:
+        lotes = lotes.filter(business_id=business_id)
     
     report = []
     
@@ -237,6 +219,7 @@ def generate_pricing_report():
         report.append({
             'lote_id': lote.id,
             'producto': lote.producto.nombre if lote.producto else "Desconocido",
+            'categoria': categoria_de(lote.producto).clave,
             'calibre': lote.calibre,
             'business': lote.business.nombre,
             'estado_maduracion': lote.estado_maduracion,
@@ -320,8 +303,7 @@ if __name__ == '__main__':
     print(f"Total de lotes: {len(report)}")
     
     # Mostrar resumen por calibre para paltas
-    palta_items = [item for producto, items in productos.items() 
-                  for item in items if 'palta' in producto.lower()]
+    palta_items = [item for item in report if item['categoria'] == 'palta']
     
     if palta_items:
         print("\n\033[1mRESUMEN POR CALIBRE DE PALTAS\033[0m")
@@ -3,7 +3,7 @@ from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from core.models import BaseModel
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 # No importar modelos de otras apps arriba para evitar ciclos
 
 class Shift(BaseModel):
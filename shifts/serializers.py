@@ -3,6 +3,7 @@ from django.db.models import Sum
 from django.utils import timezone
 from .models import Shift, BoxRefill, ShiftExpense, ShiftClosing
 from sales.models import Sale, SaleItem
+from core.uploads import CargaDiferidaMixin, MiniaturaField
 
 class ShiftSerializer(serializers.ModelSerializer):
     usuario_abre_nombre = serializers.SerializerMethodField()
@@ -150,13 +151,16 @@ class ShiftClosingSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class ShiftExpenseSerializer(serializers.ModelSerializer):
+class ShiftExpenseSerializer(CargaDiferidaMixin, serializers.ModelSerializer):
     """Serializador para los gastos incurridos durante un turno"""
     autorizado_por_nombre = serializers.SerializerMethodField()
     registrado_por_nombre = serializers.SerializerMethodField()
     metodo_pago_display = serializers.SerializerMethodField()
     categoria_display = serializers.SerializerMethodField()
     comprobante_url = serializers.SerializerMethodField()
+    comprobante_miniatura_url = MiniaturaField(source='comprobante')
+    # El comprobante se procesa y sube fuera de la request (core/uploads.py)
+    campos_diferidos = ('comprobante',)
     # Aceptar UID del turno al crear/actualizar
     shift = serializers.CharField(write_only=True, required=True)
     # Exponer el UID del turno en respuestas
@@ -166,7 +170,7 @@ class ShiftExpenseSerializer(serializers.ModelSerializer):
         model = ShiftExpense
         fields = [
             'id', 'shift', 'shift_uid', 'descripcion', 'monto', 'categoria', 'categoria_display',
-            'metodo_pago', 'metodo_pago_display', 'comprobante', 'comprobante_url',
+            'metodo_pago', 'metodo_pago_display', 'comprobante', 'comprobante_url', 'comprobante_miniatura_url',
             'numero_comprobante', 'autorizado_por', 'autorizado_por_nombre',
             'registrado_por', 'registrado_por_nombre', 'fecha', 'business'
         ]